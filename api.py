@@ -1,18 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
-from grpc import Status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, BackgroundTasks
+from fastapi import Query as QueryParam
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List, Optional
 from datetime import timedelta
-
-from requests import Session
-from app.database.connector import connect_to_db, get_db
-from app.middleware.request_logger import setup_middleware
-from llm.langgraph_integration import app as langgraph_app
+from contextlib import asynccontextmanager
+import anyio
+import logging
+import os
+
+from sqlalchemy.orm import Session
+from app.database.connector import get_db, get_primary_db
+from app.database.routing import use_primary, recent_writes
+from app.database.async_connector import get_async_db
+from app.middleware.request_logger import setup_middleware, get_request_log_writer
+from app.middleware.compression import setup_compression
+from app.middleware.metrics import setup_metrics
+from app.utils.log import configure_logging
 
 from app.database.schemas.query import Query
 from app.services.author_services import (
-    retrieve_single_author,
-    retrieve_authors_from_db,
     add_author_to_database,
     edit_author_info,
     delete_author_from_db
@@ -20,32 +27,46 @@ from app.services.author_services import (
 from app.services.user_services import (
     delete_user,
     retrieve_all_users,
-    retrieve_single_user,
-    authenticate_user,
-    edit_user_info,
     register_user
 )
 from app.services.book_services import (
-    retrieve_single_book,
     retrieve_all_books,
-    retrieve_books_from_db,
+    parse_book_sort,
     add_book_to_db,
     delete_book_from_db,
     edit_book_info,
-    search_books_by_title,
     add_to_favourites,
-    remove_from_favourites
+    remove_from_favourites,
+    parse_book_fields
 )
+from app.services import async_book_services, async_author_services, async_user_services
 from app.services.token_services import create_access_token
+from app.services.request_log_services import retrieve_request_stats
+from app.services.book_import_services import (
+    ImportTooLarge,
+    create_import_job,
+    detect_format,
+    import_path,
+    retrieve_import_job,
+    run_import_job,
+    set_job_status,
+    spool_upload,
+)
 from app.schemas.login_info import Login
 from app.schemas.author import Author, AuthorUpdateCurrent
-from app.schemas.book import BookCreate, BookUpdateCurrent, Book
+from app.schemas.book import BookCreate, BookUpdateCurrent, Book, BookFilters
 from app.schemas.user import User, UserUpdateCurrent
 from app.utils.config import ACCESS_TOKEN_EXPIRE_MINUTES
-
-# Import custom modules
-from app.pgAdmi4.SaveDataToVectorstore import similarity_text
-from llm.intent_extraction import IntentExtractor
+from app.config import LLM_DRAIN_TIMEOUT, LLM_RETRY_AFTER, BOOK_IMPORT_MAX_BYTES, BOOK_IMPORT_EMBED
+from llm.inflight import inflight_llm_calls, wait_for_llm_calls
+from llm.scheduler import LLMSchedulerError, LLMQueueFull, run_until_disconnected
+from llm.latency import intent_latency_snapshot
+from app.utils.metrics import render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+# LLM and vector subsystems are loaded on first use
+from llm.loader import (
+    get_langgraph_app, get_intent_extractor, get_vector_manager, get_taste_profiles, update_taste_after_favorite,
+)
 
 # Token verification
 from fastapi import Depends, HTTPException, Security
@@ -55,7 +76,28 @@ from app.services.token_services import verify_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger("api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Let LLM calls started by already-accepted requests finish before the worker exits
+    if inflight_llm_calls():
+        logger.info("Waiting for in-flight LLM calls to finish", extra={"inflight": inflight_llm_calls()})
+        drained = await anyio.to_thread.run_sync(wait_for_llm_calls, LLM_DRAIN_TIMEOUT)
+        if not drained:
+            logger.warning("Shutting down with LLM calls still running", extra={"inflight": inflight_llm_calls()})
+    # Write out request logs still buffered in this worker
+    await anyio.to_thread.run_sync(get_request_log_writer().close)
+
+# orjson serializes the large book listings considerably faster than the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+@app.exception_handler(LLMSchedulerError)
+async def llm_scheduler_error_handler(request: Request, exc: LLMSchedulerError):
+    headers = {"Retry-After": str(LLM_RETRY_AFTER)} if isinstance(exc, LLMQueueFull) else None
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
 
 # Temporary test user
 test_user = {"role": 1, "email": "test@example.com"}
@@ -77,24 +119,27 @@ app.add_middleware(
 )
 
 setup_middleware(app)
+setup_metrics(app)
+# Added last so compression wraps every other middleware
+setup_compression(app)
 
 @app.post("/users/register")
 def add_user(user: User):
-    print("Received user data:", user)
+    logger.debug("Registering user", extra={"user_email": user.email})
     success, message = register_user(user)
     if not success:
         raise HTTPException(status_code=400, detail=message)
     return {"message": message, "user": user.email}
 
 @app.post("/users/login")
-async def auth_user(login_data: Login, db: Session = Depends(get_db)):
+async def auth_user(login_data: Login, db=Depends(get_async_db)):
     # Unpack the three values returned by authenticate_user
-    auth, message, _ = authenticate_user(login_data.email, login_data.password, db)
+    auth, message, _ = await async_user_services.authenticate_user(login_data.email, login_data.password, db)
     
     if not auth:
         raise HTTPException(status_code=401, detail=message)
     
-    success, message, user_info = retrieve_single_user(login_data.email, db)
+    success, message, user_info = await async_user_services.retrieve_single_user(login_data.email, db)
     if not success:
         raise HTTPException(status_code=400, detail=message)
 
@@ -114,13 +159,32 @@ async def auth_user(login_data: Login, db: Session = Depends(get_db)):
 def get_user(current_user: dict = test_user):
     return {"user": current_user}
 
+@app.get("/users/me/recommendations")
+def get_user_recommendations(limit: int = 10, db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+    try:
+        payload = verify_token(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token verification failed")
+    user_email = payload.get("email")
+    if not user_email:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    if limit < 1 or limit > 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50")
+    # Favorites change the taste vector, so read them where they were written
+    if recent_writes.active(user_email):
+        use_primary(db)
+    success, message, books = get_taste_profiles().recommend(db, user_email, limit)
+    if not success:
+        raise HTTPException(status_code=500, detail=message)
+    return {"message": message, "books": books}
+
 @app.put("/users/me")
-async def update_user(user_update: UserUpdateCurrent, current_user: dict = test_user):
+async def update_user(user_update: UserUpdateCurrent, current_user: dict = test_user, db=Depends(get_async_db)):
     email = current_user["email"]
-    success, message = edit_user_info(email, user_update)
+    success, message = await async_user_services.edit_user_info(email, user_update, db)
     if not success:
         raise HTTPException(status_code=400, detail=message)
-    success, message, user = retrieve_single_user(email)
+    success, _, user = await async_user_services.retrieve_single_user(email, db)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user}, expires_delta=access_token_expires
@@ -129,45 +193,73 @@ async def update_user(user_update: UserUpdateCurrent, current_user: dict = test_
 
 # Books
 @app.get("/books")
-def get_books(
-    db: Session = Depends(get_db),
+async def get_books(
+    db=Depends(get_async_db),
     token: str = Security(oauth2_scheme),
     title: str = "", 
     limit: int = 10, 
-    offset: int = 0  
+    offset: int = 0,
+    fields: str = "",
+    genre: List[str] = QueryParam(default=[]),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    min_ratings_count: Optional[int] = None,
+    sort: str = "id",
+    facets: bool = False
 ):  
+    success, message, selected_fields = parse_book_fields(fields)
+    if not success:
+        raise HTTPException(status_code=400, detail=message)
+    success, message, order_by = parse_book_sort(sort)
+    if not success:
+        raise HTTPException(status_code=400, detail=message)
+
     user_email = None
     if token:
-        print("Token received:", token)
         try:
             payload = verify_token(token)
             user_email = payload.get("email")
             if user_email is None:
                 raise HTTPException(status_code=401, detail="Invalid token payload")
-            print(f"Authenticated user: {user_email}")
         except JWTError:
             raise HTTPException(status_code=401, detail="Token verification failed")
-    else:
-        print("No token received")
-        
-    if title != "":
-        print("Searching for books with title:", title)
-        success, message, books = search_books_by_title(db, title=title, limit=limit, offset=offset, email=user_email)
-    else:
-        success, message, books = retrieve_books_from_db(db, limit=limit, offset=offset, email=user_email)
+    # The replica may not have this user's latest favorites yet
+    if recent_writes.active(user_email):
+        use_primary(db)
+
+    filters = BookFilters(
+        title=title,
+        genre=genre,
+        year_from=year_from,
+        year_to=year_to,
+        min_rating=min_rating,
+        min_ratings_count=min_ratings_count,
+    )
+    success, message, books = await async_book_services.filter_books(
+        db, filters, limit=limit, offset=offset, sort=order_by, email=user_email, fields=selected_fields
+    )
     if not success:
         raise HTTPException(status_code=500, detail=message)
-    return {"message": message, "books": books, "limit": limit, "offset": offset}
+    response = {"message": message, "books": books, "limit": limit, "offset": offset}
+
+    if facets:
+        success, message, book_facets = await async_book_services.retrieve_book_facets(db, filters)
+        if not success:
+            raise HTTPException(status_code=500, detail=message)
+        response["facets"] = book_facets
+    return response
 
 @app.get("/books/{book_id}")
-def get_book(book_id: int, db: Session = Depends(get_db), current_user: dict = test_user):
-    success, message, book = retrieve_single_book(db, book_id)
+async def get_book(book_id: int, db=Depends(get_async_db), current_user: dict = test_user):
+    success, message, book = await async_book_services.retrieve_single_book(db, book_id)
     if not success:
         raise HTTPException(status_code=404, detail=message)
     return {"message": message, "book": book}
 
 @app.post("/books/add_to_favorites")
-def add_book_to_favorites(request: FavoriteRequest, db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+def add_book_to_favorites(request: FavoriteRequest, background_tasks: BackgroundTasks,
+                          db: Session = Depends(get_primary_db), token: str = Security(oauth2_scheme)):
     try:
         payload = verify_token(token)
         user_email = payload.get("email")
@@ -177,28 +269,29 @@ def add_book_to_favorites(request: FavoriteRequest, db: Session = Depends(get_db
         success, message = add_to_favourites(db, user_email, request.book_id)
         if not success:
             raise HTTPException(status_code=500, detail=message)
+        recent_writes.record(user_email)
+        background_tasks.add_task(update_taste_after_favorite, user_email, request.book_id, True)
         
         return {"message": message, "book_id": request.book_id, "user_email": user_email}
     except JWTError as e:
         raise HTTPException(status_code=401, detail="Token verification failed")
     except Exception as e:
-        print(f"Error adding book to favorites: {str(e)}")
+        logger.exception("Error adding book to favorites")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
 
 @app.post("/books/remove_from_favorites")
 def remove_book_from_favorites(request: FavoriteRequest,
-                                 db: Session = Depends(get_db),
+                                 background_tasks: BackgroundTasks,
+                                 db: Session = Depends(get_primary_db),
                                  token: str = Security(oauth2_scheme)):
     book_id = request.book_id
     if token:
-        print("Token received:", token)
         try:
             payload = verify_token(token)
             user_email = payload.get("email")
             if user_email is None:
                 raise HTTPException(status_code=401, detail="Invalid token payload")
-            print(f"Authenticated user: {user_email}")
         except JWTError:
             raise HTTPException(status_code=401, detail="Token verification failed")
     else:
@@ -206,76 +299,98 @@ def remove_book_from_favorites(request: FavoriteRequest,
     success, message = remove_from_favourites(db, user_email, book_id)
     if not success:
         raise HTTPException(status_code=500, detail=message)
+    recent_writes.record(user_email)
+    background_tasks.add_task(update_taste_after_favorite, user_email, book_id, False)
     return {"message": message, "book_id": book_id, "user_email": user_email}
 
 # Chat and recom ssumm
 @app.post("/query")
-async def query_books(query: Query):
+async def query_books(query: Query, request: Request):
     description = query.description
     if not description:
         raise HTTPException(status_code=400, detail="Description is required.")
 
-    db_session = connect_to_db()
-
-    intent_extractor = IntentExtractor()
-    intent_response = intent_extractor.classify_intent_and_extract_entities(description)
+    intent_extractor = get_intent_extractor()
+    intent_response = await run_until_disconnected(
+        request, intent_extractor.classify_intent_and_extract_entities, description
+    )
     intent_number = intent_response.intent_number
     entity_name = intent_response.entity_name
 
     try:
         if intent_number and entity_name:
-            initial_state = {"question": description, "intent_number": intent_number, "entity_name": entity_name}
+            initial_state = {"question": description, "intent_number": intent_number, "entity_name": entity_name,
+                             "limit": query.limit, "offset": query.offset}
 
             # Run the compiled workflow with the initial state
-            response_state = app.invoke(initial_state)
+            response_state = await run_until_disconnected(request, get_langgraph_app().invoke, initial_state)
 
             response = response_state.get('response', 'No response generated.')
             return {"response": response}
         else:
             return {"response": "Could not determine intent or entity from the description."}
+    except LLMSchedulerError:
+        raise
     except Exception as e:
-        print(f"Error processing query: {str(e)}")
+        logger.exception("Error processing query")
         return {"response": f"Error processing query: {str(e)}"}
-    finally:
-        db_session.close()
 
 @app.get("/chat")
-def chat_with_bot(query: str):
+async def chat_with_bot(query: str, request: Request):
     model_input = {
         "question": query
     }
     try:
-        result = langgraph_app.invoke(model_input)
+        result = await run_until_disconnected(request, get_langgraph_app().invoke, model_input)
         output = result.get('response', 'No response generated.')
         return {"message": "Response Generated Successfully", "response": output}
+    except LLMSchedulerError:
+        raise
     except Exception as e:
-        print(f"Error processing query: {str(e)}")
+        logger.exception("Error processing chat message")
         raise HTTPException(status_code=500, detail=str(e))
     
+@app.get("/chat/latency")
+def chat_latency():
+    return {"message": "Chat latency by intent", "intents": intent_latency_snapshot()}
+
 @app.post("/recommendations")
 def get_recommendations(description: str):
     try:
-        similar_books_metadata = similarity_text(description)
-        if not similar_books_metadata:
+        book_recommendations = get_vector_manager().recommend_books(description)
+        if not book_recommendations:
             raise HTTPException(status_code=404, detail="No recommendations found")
 
-        book_recommendations = [book['title'] for book in similar_books_metadata]
         return {"message": "Recommendations fetched successfully", "book_recommendations": book_recommendations}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 # Authors
 @app.get("/authors")
-def get_authors(current_user: dict = test_user):
-    return retrieve_authors_from_db()
+async def get_authors(page: int = 1, per_page: int = 10, current_user: dict = test_user, db=Depends(get_async_db)):
+    return await async_author_services.retrieve_authors_from_db(db, page, per_page)
 
 @app.get("/authors/{author_id}")
-def get_author(author_id: int, current_user: dict = test_user):
-    success, message, author = retrieve_single_author(author_id)
+async def get_author(author_id: int, current_user: dict = test_user, db=Depends(get_async_db)):
+    success, message, author = await async_author_services.retrieve_single_author(db, author_id)
     if not success:
         raise HTTPException(status_code=400, detail=message)
     return {"message": message, "author": author}
 
+@app.get("/authors/{author_id}/books")
+async def get_author_books(author_id: int, limit: int = QueryParam(default=10, ge=1, le=50),
+                           offset: int = QueryParam(default=0, ge=0), fields: str = "",
+                           current_user: dict = test_user, db=Depends(get_async_db)):
+    success, message, selected_fields = parse_book_fields(fields)
+    if not success:
+        raise HTTPException(status_code=400, detail=message)
+    success, message, books, total = await async_book_services.retrieve_books_by_author(
+        db, author_id, limit=limit, offset=offset, fields=selected_fields
+    )
+    if not success:
+        raise HTTPException(status_code=500, detail=message)
+    return {"message": message, "books": books, "total": total, "limit": limit, "offset": offset}
+
 @app.post("/authors")
 def add_author(author: Author, current_user: dict = test_user):
     success, message, author_id = add_author_to_database(author)
@@ -303,14 +418,28 @@ def get_all_users(db: Session = Depends(get_db), token: str = Security(oauth2_sc
     payload = verify_token(token)
     if payload.get("role") != 1: 
         raise HTTPException(
-            status_code=Status.HTTP_403_FORBIDDEN,  
+            status_code=403,  
             detail="You do not have permission to view this resource. Contact admin if you believe this is a mistake."
         )
     users = retrieve_all_users(db)
     return users
 
+@app.get("/admin/request_stats")
+def get_request_stats(minutes: int = 60, endpoint: Optional[str] = None,
+                      db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+    payload = verify_token(token)
+    if payload.get("role") != 1:
+        raise HTTPException(
+            status_code=403,
+            detail="You do not have permission to view this resource. Contact admin if you believe this is a mistake."
+        )
+    success, message, stats = retrieve_request_stats(db, minutes=minutes, endpoint=endpoint)
+    if not success:
+        raise HTTPException(status_code=500, detail=message)
+    return {"message": message, "minutes": minutes, "endpoints": stats}
+
 @app.delete("/admin/users/{email}")
-def remove_user(email: str, db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+def remove_user(email: str, db: Session = Depends(get_primary_db), token: str = Security(oauth2_scheme)):
     payload = verify_token(token)
     if payload.get("role") != 1:  
         raise HTTPException(status_code=403, detail="Admin privileges required.")
@@ -321,17 +450,21 @@ def remove_user(email: str, db: Session = Depends(get_db), token: str = Security
     return {"message": "User deleted successfully"}
 
 @app.get("/admin/books")
-def get_all_books(db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+def get_all_books(db: Session = Depends(get_db), token: str = Security(oauth2_scheme), fields: str = ""):
     payload = verify_token(token)
     if payload.get("role") != 1: 
         raise HTTPException(status_code=403, detail="Admin privileges required.")
+
+    success, message, selected_fields = parse_book_fields(fields)
+    if not success:
+        raise HTTPException(status_code=400, detail=message)
     
-    books = retrieve_all_books(db)
+    books = retrieve_all_books(db, fields=selected_fields)
     return {"message": "Books fetched successfully", "books": books}
 
 
 @app.delete("/admin/books/{book_id}")
-def admin_delete_book(book_id: int, db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+def admin_delete_book(book_id: int, db: Session = Depends(get_primary_db), token: str = Security(oauth2_scheme)):
     payload = verify_token(token)
     if payload.get("role") != 1: 
         raise HTTPException(status_code=403, detail="Admin privileges required.")
@@ -342,7 +475,7 @@ def admin_delete_book(book_id: int, db: Session = Depends(get_db), token: str =
     return {"message": "Book deleted successfully"}
 
 @app.post("/books")
-def admin_add_book(book: BookCreate, db: Session = Depends(get_db), token: str = Security(oauth2_scheme)):
+def admin_add_book(book: BookCreate, db: Session = Depends(get_primary_db), token: str = Security(oauth2_scheme)):
     # Verify the token and check if the user is an admin
     user_payload = verify_token(token)
     if user_payload.get("role") != 1:
@@ -353,6 +486,43 @@ def admin_add_book(book: BookCreate, db: Session = Depends(get_db), token: str =
         raise HTTPException(status_code=400, detail=message)
     return {"message": message, "book": book}
 
+@app.post("/admin/books/import", status_code=202)
+async def import_books(request: Request, background_tasks: BackgroundTasks, format: str = "", filename: str = "",
+                       db: Session = Depends(get_primary_db), token: str = Security(oauth2_scheme)):
+    # The body is the raw NDJSON or CSV file; it is streamed to disk and imported in the background
+    payload = verify_token(token)
+    if payload.get("role") != 1:
+        raise HTTPException(status_code=403, detail="Admin privileges required.")
+    fmt = detect_format(format, request.headers.get("content-type", ""), filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown import format. Use format=ndjson or format=csv")
+
+    job = await anyio.to_thread.run_sync(create_import_job, db, fmt, filename or None, payload.get("email"))
+    path = import_path(job.id)
+    try:
+        received = await spool_upload(request.stream(), path, BOOK_IMPORT_MAX_BYTES)
+    except Exception as e:
+        # Too large, or the client went away mid-upload
+        if os.path.exists(path):
+            os.remove(path)
+        await anyio.to_thread.run_sync(lambda: set_job_status(db, job.id, "failed"))
+        if isinstance(e, ImportTooLarge):
+            raise HTTPException(status_code=413, detail=str(e))
+        raise
+    await anyio.to_thread.run_sync(lambda: set_job_status(db, job.id, "queued", bytes_received=received))
+    background_tasks.add_task(run_import_job, job.id, path, fmt, embed=BOOK_IMPORT_EMBED)
+    return {"message": "Import queued", "job_id": job.id, "bytes_received": received}
+
+@app.get("/admin/books/import/{job_id}")
+def get_import_job(job_id: str, db: Session = Depends(get_primary_db), token: str = Security(oauth2_scheme)):
+    payload = verify_token(token)
+    if payload.get("role") != 1:
+        raise HTTPException(status_code=403, detail="Admin privileges required.")
+    success, message, job = retrieve_import_job(db, job_id)
+    if not success:
+        raise HTTPException(status_code=404, detail=message)
+    return {"message": message, "job": job}
+
 
 
 # @app.put("/books/{book_id}")
@@ -362,6 +532,10 @@ def admin_add_book(book: BookCreate, db: Session = Depends(get_db), token: str =
 #         raise HTTPException(status_code=400, detail=message)
 #     return {"message": message, "book_id": book_id}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/healthcheck")
 def health_check():
     return {"status": "healthy"}
@@ -369,5 +543,5 @@ def health_check():
 # run the server
 if __name__ == "__main__":
     import uvicorn
-    # auto reload the server when code changes
+    # auto reload the server when code changes; use server.py for production
     uvicorn.run("api:app", host="localhost", port=6969, reload=True)
\ No newline at end of file
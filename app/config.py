@@ -1,8 +1,157 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SECRET_KEY = os.getenv('SECRET_KEY', default="maha's_super_secret_key_that_nobody_will_decode")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 1
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = 1
+
+# Response compression
+COMPRESSION_MINIMUM_SIZE = int(os.getenv('COMPRESSION_MINIMUM_SIZE', default=1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', default=6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', default=4))
+
+# Production server
+WEB_HOST = os.getenv('WEB_HOST', default="0.0.0.0")
+WEB_PORT = int(os.getenv('WEB_PORT', default=6969))
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', default=(os.cpu_count() or 1)))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', default=60))
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', default="true").lower() in ("1", "true", "yes")
+LLM_DRAIN_TIMEOUT = float(os.getenv('LLM_DRAIN_TIMEOUT', default=30))
+
+# LLM scheduling
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', default=2))
+LLM_MAX_QUEUE_DEPTH = int(os.getenv('LLM_MAX_QUEUE_DEPTH', default=32))
+LLM_CALL_TIMEOUT = float(os.getenv('LLM_CALL_TIMEOUT', default=120))
+LLM_RETRY_AFTER = int(os.getenv('LLM_RETRY_AFTER', default=5))
+
+# Chat pipeline: "fused" skips classification for cached/fast-path questions and classifies and
+# summarizes in one LLM call; "classic" always runs a separate classification call
+LLM_PIPELINE_MODE = os.getenv('LLM_PIPELINE_MODE', default="fused")
+INTENT_CACHE_SIZE = int(os.getenv('INTENT_CACHE_SIZE', default=1024))
+# Questions that refer back ("Who wrote it?") are cached per this many preceding turns of the
+# conversation; questions that name their own book or author are cached regardless of it
+INTENT_CACHE_HISTORY_TURNS = int(os.getenv('INTENT_CACHE_HISTORY_TURNS', default=1))
+# Share of a fused summary's content words that must appear in the catalogue description of the
+# book that was looked up for the summary to be used; otherwise it is rewritten from the description
+FUSED_SUMMARY_MIN_OVERLAP = float(os.getenv('FUSED_SUMMARY_MIN_OVERLAP', default=0.5))
+
+# Database; when unset the connector falls back to the local development Postgres
+DATABASE_URL = os.getenv('DATABASE_URL')
+DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', default=5))
+DATABASE_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', default=10))
+# Read replicas (comma-separated URLs) serve catalogue reads; replicas failing the health check
+# or lagging more than DATABASE_REPLICA_MAX_LAG seconds are skipped. Users who wrote within
+# READ_YOUR_WRITES_SECONDS read from the primary.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', default="").split(",") if url.strip()]
+DATABASE_REPLICA_HEALTH_INTERVAL = float(os.getenv('DATABASE_REPLICA_HEALTH_INTERVAL', default=5))
+DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', default=10))
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', default=10))
+
+# Model providers: "ollama" / "sentence_transformers" in production, "fake" / "hashing" for
+# deterministic offline benchmarking
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', default="ollama")
+LLM_MODEL = os.getenv('LLM_MODEL', default="llama3.1")
+FAKE_LLM_LATENCY = float(os.getenv('FAKE_LLM_LATENCY', default=0.2))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', default=50))
+FAKE_LLM_RESPONSE_TOKENS = int(os.getenv('FAKE_LLM_RESPONSE_TOKENS', default=60))
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', default="sentence_transformers")
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', default="all-MiniLM-L6-v2")
+EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', default=384))
+FAKE_EMBEDDING_LATENCY = float(os.getenv('FAKE_EMBEDDING_LATENCY', default=0))
+# EMBEDDING_PROVIDER=onnx: the exported model directory (python -m llm.onnx_embedder), the model
+# file in it (model_quantized.onnx for int8 weights) and ONNX Runtime threads (0 = its default)
+EMBEDDING_ONNX_PATH = os.getenv('EMBEDDING_ONNX_PATH', default="models/all-MiniLM-L6-v2-onnx")
+EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', default="model.onnx")
+EMBEDDING_ONNX_THREADS = int(os.getenv('EMBEDDING_ONNX_THREADS', default=0))
+# Query embeddings kept per process; repeated recommendation/lookup text skips the model
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', default=2048))
+# Concurrent query embeddings are encoded together: a batch closes at EMBEDDING_BATCH_MAX_SIZE texts
+# or EMBEDDING_BATCH_MAX_WAIT_MS after its first text. EMBEDDING_BATCH_MAX_SIZE=1 encodes each
+# query on the calling thread as before.
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', default=32))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', default=2))
+# Shared vector worker (python -m llm.vector_sidecar): a Unix socket path or host:port. When set,
+# API workers send encode/query/upsert calls there instead of loading the model and opening
+# Chroma themselves. Reads fall back to doing so if it cannot be reached (or a call takes longer
+# than VECTOR_SIDECAR_TIMEOUT seconds), trying it again every VECTOR_SIDECAR_RETRY_INTERVAL seconds;
+# writes raise instead, so queued embeddings stay queued until it is back. TCP addresses must be loopback. The sidecar unpickles what
+# clients send, so VECTOR_SIDECAR_AUTHKEY has no default: sidecar and workers refuse to start without it.
+VECTOR_SIDECAR_ADDRESS = os.getenv('VECTOR_SIDECAR_ADDRESS', default="")
+VECTOR_SIDECAR_AUTHKEY = os.getenv('VECTOR_SIDECAR_AUTHKEY', default="")
+VECTOR_SIDECAR_TIMEOUT = float(os.getenv('VECTOR_SIDECAR_TIMEOUT', default=30))
+VECTOR_SIDECAR_RETRY_INTERVAL = float(os.getenv('VECTOR_SIDECAR_RETRY_INTERVAL', default=30))
+# Vector store: "chroma", or "quantized" for llm.quantized_store, which keeps int8/float16 codes
+# in memory (VECTOR_QUANTIZATION) and rescores the best n_results * VECTOR_RESCORE_FACTOR
+# candidates against the float32 vectors on disk under VECTOR_STORE_PATH. Its files only grow;
+# run python -m llm.quantized_store --compact after re-embedding the catalogue.
+VECTOR_STORE = os.getenv('VECTOR_STORE', default="chroma")
+VECTOR_STORE_PATH = os.getenv('VECTOR_STORE_PATH', default="vector_store")
+VECTOR_QUANTIZATION = os.getenv('VECTOR_QUANTIZATION', default="int8")
+VECTOR_RESCORE_FACTOR = int(os.getenv('VECTOR_RESCORE_FACTOR', default=4))
+# Hybrid retrieval: BM25 and vector candidate lists (HYBRID_CANDIDATES each) fused with
+# reciprocal rank fusion; vector-only hits need HYBRID_MIN_VECTOR_SIMILARITY cosine similarity.
+# The in-memory lexical index is rebuilt in the background on catalogue commits in this process
+# and after HYBRID_INDEX_TTL seconds otherwise.
+HYBRID_RRF_K = int(os.getenv('HYBRID_RRF_K', default=60))
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', default=50))
+HYBRID_MIN_VECTOR_SIMILARITY = float(os.getenv('HYBRID_MIN_VECTOR_SIMILARITY', default=0.5))
+HYBRID_INDEX_TTL = float(os.getenv('HYBRID_INDEX_TTL', default=300))
+# Precomputed item-to-item neighbours: NEIGHBORS_TOP_N per book, scored NEIGHBORS_BLOCK_SIZE
+# books per matrix multiply
+NEIGHBORS_TOP_N = int(os.getenv('NEIGHBORS_TOP_N', default=20))
+NEIGHBORS_BLOCK_SIZE = int(os.getenv('NEIGHBORS_BLOCK_SIZE', default=1024))
+# Personalized recommendations: the taste vector blends the mean favorite embedding with preferred
+# genres (TASTE_PREFERENCE_WEIGHT); favorite sums are cached per worker for TASTE_CACHE_TTL seconds
+TASTE_PREFERENCE_WEIGHT = float(os.getenv('TASTE_PREFERENCE_WEIGHT', default=0.3))
+TASTE_CACHE_SIZE = int(os.getenv('TASTE_CACHE_SIZE', default=10000))
+TASTE_CACHE_TTL = float(os.getenv('TASTE_CACHE_TTL', default=60))
+# Fuzzy title/author resolution for the chat lookups: matches scoring ENTITY_MIN_SCORE or more
+# (0-1) are taken without a search. The index is rebuilt on catalogue commits in this process and
+# after ENTITY_INDEX_TTL seconds otherwise. ENTITY_ALIASES_PATH optionally points to a JSON file of
+# {"books": {alias: title}, "authors": {alias: name}}.
+ENTITY_MIN_SCORE = float(os.getenv('ENTITY_MIN_SCORE', default=0.75))
+ENTITY_INDEX_TTL = float(os.getenv('ENTITY_INDEX_TTL', default=300))
+ENTITY_ALIASES_PATH = os.getenv('ENTITY_ALIASES_PATH', default="")
+
+# Tracing: "none", "console", "file" (JSON lines in TRACING_FILE) or "otel" (opentelemetry API)
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', default="none")
+TRACING_FILE = os.getenv('TRACING_FILE', default="traces.jsonl")
+TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', default="book-api")
+
+# Logging: "json" or "text" to stdout through a background queue; LOG_SAMPLING keeps a fraction
+# of INFO/DEBUG records per logger, e.g. "llm.vector_data_manager=0.1,app.services=0.5"
+LOG_LEVEL = os.getenv('LOG_LEVEL', default="INFO")
+LOG_FORMAT = os.getenv('LOG_FORMAT', default="json")
+LOG_QUEUE = os.getenv('LOG_QUEUE', default="true").lower() in ("1", "true", "yes")
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', default=10000))
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', default="")
+
+# Request logs: rows are buffered and written in batches with per-endpoint, per-minute roll-ups.
+# REQUEST_LOG_BODY_MODE is "off", "truncate" (first REQUEST_LOG_BODY_MAX_BYTES) or "sample"
+# (truncated bodies for REQUEST_LOG_BODY_SAMPLE_RATE of requests)
+REQUEST_LOG_ENABLED = os.getenv('REQUEST_LOG_ENABLED', default="true").lower() in ("1", "true", "yes")
+REQUEST_LOG_BODY_MODE = os.getenv('REQUEST_LOG_BODY_MODE', default="truncate")
+REQUEST_LOG_BODY_MAX_BYTES = int(os.getenv('REQUEST_LOG_BODY_MAX_BYTES', default=1024))
+REQUEST_LOG_BODY_SAMPLE_RATE = float(os.getenv('REQUEST_LOG_BODY_SAMPLE_RATE', default=0.01))
+REQUEST_LOG_BATCH_SIZE = int(os.getenv('REQUEST_LOG_BATCH_SIZE', default=500))
+REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv('REQUEST_LOG_FLUSH_INTERVAL', default=2.0))
+REQUEST_LOG_MAX_BUFFER = int(os.getenv('REQUEST_LOG_MAX_BUFFER', default=20000))
+REQUEST_LOG_RETENTION_DAYS = int(os.getenv('REQUEST_LOG_RETENTION_DAYS', default=14))
+REQUEST_LOG_AGGREGATE_RETENTION_DAYS = int(os.getenv('REQUEST_LOG_AGGREGATE_RETENTION_DAYS', default=400))
+REQUEST_LOG_PARTITIONS_AHEAD = int(os.getenv('REQUEST_LOG_PARTITIONS_AHEAD', default=3))
+
+# Session used by async handlers: "native" (asyncpg/aiosqlite), "threaded" (sync driver in the
+# threadpool) or "auto" (native when the async driver is installed)
+DATABASE_ASYNC_MODE = os.getenv('DATABASE_ASYNC_MODE', default="auto")
+
+# Bulk book imports: uploads are spooled to BOOK_IMPORT_DIR, validated and upserted in chunks of
+# BOOK_IMPORT_CHUNK_SIZE rows, then the imported books are embedded into the vector store
+BOOK_IMPORT_DIR = os.getenv('BOOK_IMPORT_DIR', default=os.path.join(tempfile.gettempdir(), "book_imports"))
+BOOK_IMPORT_CHUNK_SIZE = int(os.getenv('BOOK_IMPORT_CHUNK_SIZE', default=1000))
+BOOK_IMPORT_MAX_BYTES = int(os.getenv('BOOK_IMPORT_MAX_BYTES', default=200 * 1024 * 1024))
+BOOK_IMPORT_MAX_ERRORS = int(os.getenv('BOOK_IMPORT_MAX_ERRORS', default=100))
+BOOK_IMPORT_EMBED = os.getenv('BOOK_IMPORT_EMBED', default="true").lower() in ("1", "true", "yes")
+EMBEDDING_QUEUE_BATCH_SIZE = int(os.getenv('EMBEDDING_QUEUE_BATCH_SIZE', default=256))
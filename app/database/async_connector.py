@@ -0,0 +1,151 @@
+# app/database/async_connector.py
+import asyncio
+import weakref
+from functools import lru_cache
+
+import anyio
+from sqlalchemy.engine import make_url
+
+from app.config import (
+    DATABASE_URL as CONFIGURED_DATABASE_URL,
+    DATABASE_ASYNC_MODE,
+    DATABASE_POOL_SIZE,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_REPLICA_URLS,
+)
+from app.database.connector import engine as sync_engine, replica_set as sync_replica_set, SessionLocal
+from app.database.routing import ReplicaSet, RoutingSession
+
+# Async session path for `async def` handlers. "native" runs an AsyncSession on asyncpg (or
+# aiosqlite for SQLite); "threaded" wraps the regular sync Session and runs each call in the
+# threadpool, which keeps the event loop free when the async drivers are not installed.
+# "auto" picks native when sqlalchemy[asyncio] and the driver import, threaded otherwise.
+# Async services must load relationships eagerly: lazy loads are not possible on AsyncSession.
+
+ASYNC_DRIVERS = {
+    "postgresql": ("postgresql+asyncpg", "asyncpg"),
+    "sqlite": ("sqlite+aiosqlite", "aiosqlite"),
+}
+
+def to_async_url(database_url: str):
+    url = make_url(database_url)
+    driver, _ = ASYNC_DRIVERS[url.get_backend_name()]
+    return url.set(drivername=driver)
+
+def _default_database_url() -> str:
+    return sync_engine.url.render_as_string(hide_password=False)
+
+def native_async_available(database_url: str = None) -> bool:
+    backend = make_url(database_url or _default_database_url()).get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return False
+    try:
+        import greenlet  # noqa: F401
+        __import__(ASYNC_DRIVERS[backend][1])
+    except ImportError:
+        return False
+    return True
+
+def _create_async_engine(database_url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = to_async_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return create_async_engine(url)
+    return create_async_engine(url, pool_size=DATABASE_POOL_SIZE, max_overflow=DATABASE_MAX_OVERFLOW)
+
+def connect_to_db_async(database_url: str = None, replica_urls=DATABASE_REPLICA_URLS):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    engine = _create_async_engine(database_url or CONFIGURED_DATABASE_URL or _default_database_url())
+    replicas = [_create_async_engine(url).sync_engine for url in replica_urls]
+    # Health checks run on the sync engines; the async set follows their results
+    monitor = sync_replica_set if len(replicas) == len(sync_replica_set.replicas) else None
+    replica_set = ReplicaSet(engine.sync_engine, replicas, health_interval=0, monitor=monitor)
+    # Objects stay readable after commit without another round trip
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False,
+                                           sync_session_class=RoutingSession, replica_set=replica_set)
+    return engine, AsyncSessionLocal
+
+
+# A threaded session keeps its pooled connection between thread hops. Without a bound, more open
+# sessions than pooled connections would park every threadpool worker in a blocking pool
+# checkout while the sessions holding connections wait for a thread to finish on. Sessions
+# therefore wait (asynchronously) for one of pool_size + max_overflow slots first.
+_session_slots = weakref.WeakKeyDictionary()
+
+def _session_slot_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _session_slots.get(loop)
+    if semaphore is None:
+        semaphore = _session_slots[loop] = anyio.Semaphore(DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW)
+    return semaphore
+
+class ThreadedAsyncSession:
+    # The subset of the AsyncSession API the async services use, backed by a sync Session.
+    # Results are buffered by the driver, so reading rows afterwards does not block on I/O.
+    def __init__(self, session):
+        self.sync_session = session
+        self._slot = None
+
+    async def _run(self, fn, *args, **kwargs):
+        if self._slot is None:
+            self._slot = _session_slot_semaphore()
+            await self._slot.acquire()
+        return await anyio.to_thread.run_sync(lambda: fn(*args, **kwargs))
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await self._run(self.sync_session.execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await self._run(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return await self._run(self.sync_session.scalars, statement, params, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._run(self.sync_session.get, entity, ident, **kwargs)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    async def flush(self):
+        await self._run(self.sync_session.flush)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def close(self):
+        if self._slot is None:
+            return
+        try:
+            await anyio.to_thread.run_sync(self.sync_session.close)
+        finally:
+            self._slot.release()
+            self._slot = None
+
+
+def resolve_async_mode(mode: str = DATABASE_ASYNC_MODE, database_url: str = None) -> str:
+    if mode == "auto":
+        return "native" if native_async_available(database_url) else "threaded"
+    if mode not in ("native", "threaded"):
+        raise ValueError(f"Unknown DATABASE_ASYNC_MODE: {mode}")
+    return mode
+
+@lru_cache(maxsize=None)
+def get_async_session_factory(mode: str = DATABASE_ASYNC_MODE):
+    if resolve_async_mode(mode) == "native":
+        async_engine, AsyncSessionLocal = connect_to_db_async()
+        return AsyncSessionLocal
+    return lambda: ThreadedAsyncSession(SessionLocal())
+
+# Dependency for async FastAPI handlers
+async def get_async_db():
+    db = get_async_session_factory()()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -0,0 +1,137 @@
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# In-process catalogue version for the in-memory indexes built from books and authors
+# (CatalogueIndex subclasses: llm.entity_resolver, llm.hybrid_retriever). A commit that wrote to
+# one of the catalogue tables, through the ORM or an insert/update/delete statement run on a
+# session, bumps it. Other workers only see the change when their own index TTL runs out.
+
+CATALOGUE_TABLES = frozenset(("books", "authors", "book_author_association"))
+# Favoriting a book changes Book.fans; that is not a catalogue change
+IGNORED_ATTRIBUTES = frozenset(("fans", "genre_ref"))
+
+_counter = itertools.count(1)
+_version = 0
+_lock = threading.Lock()
+
+def catalogue_version() -> int:
+    return _version
+
+def catalogue_changed():
+    global _version
+    with _lock:
+        _version = next(_counter)
+
+def _is_catalogue(obj) -> bool:
+    table = getattr(obj, "__table__", None)
+    return table is not None and table.name in CATALOGUE_TABLES
+
+def _modified(obj) -> bool:
+    return any(attribute.history.has_changes() for attribute in inspect(obj).attrs
+               if attribute.key not in IGNORED_ATTRIBUTES)
+
+class CatalogueIndex:
+    # Base for in-memory indexes built from the catalogue. The first access builds the index; after
+    # a catalogue change or once the TTL runs out the current one keeps being served while a newer
+    # one is built in a background thread. Subclasses implement build(session) and describe(index).
+    description = "Catalogue index"
+    thread_name = "catalogue-index"
+
+    def __init__(self, session_factory=None, ttl: float = 0.0):
+        self._session_factory = session_factory
+        self.ttl = ttl
+        self._index = None
+        self._built_at = 0.0
+        self._version = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    def build(self, session: Session):
+        raise NotImplementedError
+
+    def describe(self, index) -> dict:
+        # Extra fields logged when an index is built
+        return {}
+
+    def _stale(self) -> bool:
+        return self._version != catalogue_version() or (self.ttl > 0 and time.monotonic() - self._built_at > self.ttl)
+
+    @property
+    def index(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self.refresh()
+        elif self._stale() and not self._rebuilding:
+            with self._lock:
+                if self._rebuilding:
+                    return self._index
+                self._rebuilding = True
+            threading.Thread(target=self._rebuild, name=self.thread_name, daemon=True).start()
+        return self._index
+
+    def _rebuild(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception(f"{self.description} rebuild failed")
+        finally:
+            self._rebuilding = False
+
+    def refresh(self):
+        if self._session_factory is None:
+            from app.database.connector import SessionLocal
+            self._session_factory = SessionLocal
+        start = time.perf_counter()
+        # Read before loading, so a commit made during the build makes the new index stale
+        version = catalogue_version()
+        with self._session_factory() as session:
+            index = self.build(session)
+        self._index, self._version, self._built_at = index, version, time.monotonic()
+        logger.info(f"{self.description} built", extra={
+            **self.describe(index), "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+
+    @classmethod
+    def shared(cls):
+        # The per-process instance of this subclass
+        with _shared_lock:
+            if cls not in _shared:
+                _shared[cls] = cls()
+            return _shared[cls]
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+@event.listens_for(Session, "after_flush")
+def _flagged_flush(session, flush_context):
+    # Pre-flush state and attribute history are still available here
+    if any(_is_catalogue(obj) for obj in itertools.chain(session.new, session.deleted)) or \
+            any(_is_catalogue(obj) and _modified(obj) for obj in session.dirty):
+        session.info["catalogue_changed"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _flagged_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None and table.name in CATALOGUE_TABLES:
+        orm_execute_state.session.info["catalogue_changed"] = True
+
+# Bumped after the commit so a rebuild triggered by the new version reads the committed rows
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if session.info.pop("catalogue_changed", False):
+        catalogue_changed()
+
+@event.listens_for(Session, "after_rollback")
+def _clear_on_rollback(session):
+    session.info.pop("catalogue_changed", None)
@@ -1,14 +1,74 @@
 # aoo/database/connector.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
+from app.config import DATABASE_URL as CONFIGURED_DATABASE_URL, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_REPLICA_URLS
+from app.database.routing import ReplicaSet, RoutingSession, use_primary
+from app.utils.tracing import span, current_span
+from app.utils.metrics import gauge, record_query
 
-def connect_to_db(username="postgres", password="123", host="127.0.0.1", port="5432", db_name="test"):
-    DATABASE_URL = f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{db_name}"
-    engine = create_engine(DATABASE_URL)
+def _create_engine(database_url):
+    # SQLite stand-ins (benchmarks, local tests) are shared across the threadpool
+    if database_url.startswith("sqlite"):
+        return create_engine(database_url, connect_args={"check_same_thread": False})
+    return create_engine(database_url, pool_size=DATABASE_POOL_SIZE, max_overflow=DATABASE_MAX_OVERFLOW)
+
+def connect_to_db(username="postgres", password="123", host="127.0.0.1", port="5432", db_name="test", database_url=None):
+    DATABASE_URL = database_url or CONFIGURED_DATABASE_URL or f"postgresql+psycopg2://{username}:{password}@{host}:{port}/{db_name}"
+    engine = _create_engine(DATABASE_URL)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return engine, SessionLocal
 
-engine, SessionLocal = connect_to_db()
+def connect_with_replicas(database_url=None, replica_urls=DATABASE_REPLICA_URLS, **replica_options):
+    # Sessions read from a healthy replica and move to the primary once they write
+    engine, _ = connect_to_db(database_url=database_url)
+    replica_set = ReplicaSet(engine, [_create_engine(url) for url in replica_urls], **replica_options)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine,
+                                class_=RoutingSession, replica_set=replica_set)
+    return engine, replica_set, SessionLocal
+
+engine, replica_set, SessionLocal = connect_with_replicas()
+
+def _pool_usage():
+    pool = engine.pool
+    # Pools without a fixed size (SQLite's SingletonThreadPool/StaticPool) only report what they can
+    return {
+        ("size",): pool.size() if hasattr(pool, "size") else None,
+        ("checked_out",): pool.checkedout() if hasattr(pool, "checkedout") else None,
+        ("overflow",): pool.overflow() if hasattr(pool, "overflow") else None,
+        ("checked_in",): pool.checkedin() if hasattr(pool, "checkedin") else None,
+    }
+
+gauge("db_pool_connections", "Connections in the primary engine's pool by state", ("state",), callback=_pool_usage)
+gauge("db_replica_healthy", "1 when the read replica passes its health check", ("replica",),
+      callback=lambda: {(str(index),): int(ok) for index, ok in enumerate(replica_set.health)})
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    record_query()
+
+# Statements run inside a traced operation (e.g. a chat workflow node) get their own db.query span
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    if current_span() is None or context is None:
+        return
+    query_span = span("db.query", **{"db.system": conn.dialect.name, "db.statement": statement[:200]})
+    query_span.__enter__()
+    context._query_span = query_span
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+    query_span = getattr(context, "_query_span", None)
+    if query_span is not None:
+        context._query_span = None
+        query_span.__exit__(None, None, None)
+
+@event.listens_for(Engine, "handle_error")
+def _fail_query_span(exception_context):
+    query_span = getattr(exception_context.execution_context, "_query_span", None)
+    if query_span is not None:
+        exception_context.execution_context._query_span = None
+        query_span.__exit__(type(exception_context.original_exception), exception_context.original_exception, None)
 
 # Dependency for FastAPI
 def get_db():
@@ -16,4 +76,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency for endpoints that write, so their reads never hit a lagging replica
+def get_primary_db():
+    db = use_primary(SessionLocal())
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,127 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text, delete
+from sqlalchemy.engine import Engine
+
+from app.config import REQUEST_LOG_RETENTION_DAYS, REQUEST_LOG_PARTITIONS_AHEAD, REQUEST_LOG_AGGREGATE_RETENTION_DAYS
+from app.database.schemas.logs import RequestLog, RequestLogMinute
+
+# Postgres keeps request_logs as a table range-partitioned by day on `timestamp`, so retention
+# is a cheap DROP TABLE of whole days instead of a DELETE that scans and bloats one big table.
+# Other backends (SQLite in benchmarks/tests) use a plain table and a DELETE for retention.
+
+PARTITION_PREFIX = "request_logs_p"
+DEFAULT_PARTITION = "request_logs_default"
+_PARTITION_PATTERN = re.compile(rf"^{PARTITION_PREFIX}(\d{{8}})$")
+
+def supports_partitioning(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+def partition_name(day) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+def create_partitioned_request_logs(conn):
+    # Partitioned tables need the partition key in every unique constraint, hence the (id, timestamp) key
+    conn.execute(text("CREATE SEQUENCE IF NOT EXISTS request_log_id_seq"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS request_logs (
+            id INTEGER NOT NULL DEFAULT nextval('request_log_id_seq'),
+            endpoint VARCHAR(255) NOT NULL,
+            method VARCHAR(10) NOT NULL,
+            status_code INTEGER,
+            duration_ms DOUBLE PRECISION,
+            request_body TEXT,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """))
+    # Catches rows if the maintenance job falls behind; normally empty
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF request_logs DEFAULT"))
+    for index in RequestLog.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'request_logs')"
+    )).scalar()
+
+def list_partitions(conn):
+    rows = conn.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'request_logs'
+    """)).scalars().all()
+    return sorted(rows)
+
+def _day_bounds(day):
+    return f"'{day.isoformat()} 00:00:00+00'", f"'{(day + timedelta(days=1)).isoformat()} 00:00:00+00'"
+
+def ensure_partitions(conn, today, days_ahead: int = REQUEST_LOG_PARTITIONS_AHEAD, days_back: int = 0):
+    created = []
+    existing = set(list_partitions(conn))
+    for offset in range(-days_back, days_ahead + 1):
+        day = today + timedelta(days=offset)
+        name = partition_name(day)
+        if name in existing:
+            continue
+        start, end = _day_bounds(day)
+        in_default = conn.execute(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= {start} AND timestamp < {end})"
+        )).scalar()
+        if in_default:
+            # Postgres refuses to create a partition for rows the default partition already holds
+            # (the job fell behind), so the day's rows are moved into a new table that is then attached
+            conn.execute(text(f"CREATE TABLE {name} (LIKE request_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            conn.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= {start} AND timestamp < {end} "
+                f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+            ))
+            conn.execute(text(f"ALTER TABLE request_logs ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})"))
+        else:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF request_logs FOR VALUES FROM ({start}) TO ({end})"
+            ))
+        created.append(name)
+    return created
+
+def drop_expired_partitions(conn, cutoff_day):
+    dropped = []
+    for name in list_partitions(conn):
+        match = _PARTITION_PATTERN.match(name)
+        if match and datetime.strptime(match.group(1), "%Y%m%d").date() < cutoff_day:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
+
+def delete_expired_default_rows(conn, cutoff_day) -> int:
+    # Days that never got a partition keep their rows in the default partition; retention
+    # applies to them too
+    start, _ = _day_bounds(cutoff_day)
+    return conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < {start}")).rowcount
+
+def maintain_request_logs(engine: Engine, now: datetime = None, retention_days: int = REQUEST_LOG_RETENTION_DAYS,
+                          aggregate_retention_days: int = REQUEST_LOG_AGGREGATE_RETENTION_DAYS,
+                          days_ahead: int = REQUEST_LOG_PARTITIONS_AHEAD) -> dict:
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    cutoff_day = today - timedelta(days=retention_days)
+    summary = {"created": [], "dropped": [], "deleted_rows": 0, "deleted_aggregates": 0}
+
+    with engine.begin() as conn:
+        if supports_partitioning(conn):
+            summary["created"] = ensure_partitions(conn, today, days_ahead)
+            summary["dropped"] = drop_expired_partitions(conn, cutoff_day)
+            summary["deleted_rows"] = delete_expired_default_rows(conn, cutoff_day)
+        else:
+            cutoff = datetime.combine(cutoff_day, datetime.min.time(), tzinfo=timezone.utc)
+            summary["deleted_rows"] = conn.execute(
+                delete(RequestLog).where(RequestLog.timestamp < cutoff)
+            ).rowcount
+        aggregate_cutoff = now - timedelta(days=aggregate_retention_days)
+        summary["deleted_aggregates"] = conn.execute(
+            delete(RequestLogMinute).where(RequestLogMinute.minute < aggregate_cutoff)
+        ).rowcount
+    return summary
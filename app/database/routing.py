@@ -0,0 +1,160 @@
+import itertools
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text, event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.config import DATABASE_REPLICA_HEALTH_INTERVAL, DATABASE_REPLICA_MAX_LAG, READ_YOUR_WRITES_SECONDS
+
+# Primary/replica routing for sessions. Each session reads from one healthy replica, chosen
+# round-robin on its first read, so a page and its count or facets see the same snapshot; flushes,
+# DML statements and SELECT ... FOR UPDATE go to the primary, and once a session has written it
+# stays on the primary so it reads its own writes. With no replicas configured (or none
+# healthy) everything uses the primary.
+
+logger = logging.getLogger(__name__)
+
+# Seconds a Postgres replica is behind. The last replayed transaction's age alone keeps growing
+# while the primary is idle, so a replica that has replayed everything it received counts as
+# current. Outside streaming replication the receive LSN is NULL and the age is used.
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+class ReplicaSet:
+    def __init__(self, primary, replicas, health_interval: float = DATABASE_REPLICA_HEALTH_INTERVAL,
+                 max_lag: float = DATABASE_REPLICA_MAX_LAG, monitor: "ReplicaSet" = None):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        # A set routing to the same hosts through other engines (the async ones) reuses the
+        # monitor's health checks instead of probing on its own
+        self.monitor = monitor or self
+        self.health = monitor.health if monitor is not None else [True] * len(self.replicas)
+        self._cycle = itertools.count()
+        self._lock = threading.Lock()
+        self._checker = None
+        self._checker_pid = None
+        for index, replica in enumerate(self.replicas):
+            event.listen(replica, "handle_error", self._on_error(index))
+
+    def _on_error(self, index: int):
+        def mark_down(exception_context):
+            # Connection-level failures take the replica out of rotation until the next health check
+            if exception_context.is_disconnect and self.health[index]:
+                logger.warning("Read replica disconnected, failing over", extra={"replica": index})
+                self.health[index] = False
+        return mark_down
+
+    def choose(self):
+        if not self.replicas:
+            return None
+        self.monitor._ensure_checker()
+        healthy = [replica for replica, ok in zip(self.replicas, self.health) if ok]
+        if not healthy:
+            return None
+        return healthy[next(self._cycle) % len(healthy)]
+
+    def is_healthy(self, replica) -> bool:
+        return self.health[self.replicas.index(replica)]
+
+    def check(self):
+        for index, replica in enumerate(self.replicas):
+            healthy = self._probe(replica)
+            if healthy != self.health[index]:
+                logger.warning("Read replica health changed", extra={"replica": index, "healthy": healthy})
+            self.health[index] = healthy
+
+    def _probe(self, replica) -> bool:
+        try:
+            with replica.connect() as conn:
+                if replica.dialect.name != "postgresql":
+                    conn.execute(text("SELECT 1"))
+                    return True
+                # Replicas too far behind are treated as down so reads do not go stale
+                lag = conn.execute(text(REPLICA_LAG_SQL)).scalar()
+                return lag is None or float(lag) <= self.max_lag
+        except Exception:
+            return False
+
+    def _ensure_checker(self):
+        # Started on first use so each forked worker runs its own checker thread
+        if self._checker_pid == os.getpid() or self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+            self._checker = threading.Thread(target=self._run_checks, name="replica-health", daemon=True)
+            self._checker.start()
+
+    def _run_checks(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check()
+
+
+class RoutingSession(Session):
+    def __init__(self, *args, replica_set: ReplicaSet = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_set = replica_set
+        self.pinned_to_primary = False
+        self.pinned_replica = None
+
+    def use_primary(self):
+        self.pinned_to_primary = True
+        return self
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replica_set is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self._flushing or isinstance(clause, UpdateBase) or getattr(clause, "_for_update_arg", None) is not None:
+            self.pinned_to_primary = True
+        if not self.pinned_to_primary:
+            # A replica that has gone down since is swapped for another one
+            if self.pinned_replica is None or not self.replica_set.is_healthy(self.pinned_replica):
+                self.pinned_replica = self.replica_set.choose()
+            if self.pinned_replica is not None:
+                return self.pinned_replica
+        return self.replica_set.primary
+
+
+def use_primary(session):
+    # Works for sync sessions and for both async session flavours, which expose sync_session
+    getattr(session, "sync_session", session).use_primary()
+    return session
+
+
+class RecentWrites:
+    # Users who wrote within the last `window` seconds read from the primary, so e.g. a favorite
+    # shows up in /books immediately despite replication lag. Kept per worker process.
+    def __init__(self, window: float = READ_YOUR_WRITES_SECONDS):
+        self.window = window
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str):
+        if not key:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._expiry[key] = now + self.window
+            if len(self._expiry) > 10000:
+                self._expiry = {k: expiry for k, expiry in self._expiry.items() if expiry > now}
+
+    def active(self, key: str) -> bool:
+        if not key:
+            return False
+        with self._lock:
+            expiry = self._expiry.get(key)
+        return expiry is not None and expiry > time.monotonic()
+
+recent_writes = RecentWrites()
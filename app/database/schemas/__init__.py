@@ -1,3 +1,4 @@
 from .author import Author
 from .books import Book
+from .genre import Genre
 from .book_author_association import book_author_association
@@ -1,8 +1,10 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Integer, ForeignKey, Index
 from app.database.schemas.base import Base
 
 book_author_association = Table(
     'book_author_association', Base.metadata,
     Column('book_id', Integer, ForeignKey('books.id'), primary_key=True),
-    Column('author_id', Integer, ForeignKey('authors.id'), primary_key=True)
+    Column('author_id', Integer, ForeignKey('authors.id'), primary_key=True),
+    # The primary key leads with book_id; author -> books listings need their own index
+    Index('ix_book_author_association_author_id', 'author_id', 'book_id'),
 )
\ No newline at end of file
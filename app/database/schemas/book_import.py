@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, ForeignKey
+from app.database.schemas.base import Base
+from app.database.schemas.logs import utc_now
+
+class BookImportJob(Base):
+    # One row per bulk import; the background job updates the counters after every chunk so
+    # any worker can answer progress polls
+    __tablename__ = 'book_import_jobs'
+
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False, default="queued")
+    format = Column(String(10), nullable=False)
+    filename = Column(String(255))
+    created_by = Column(String(100))
+    bytes_received = Column(BigInteger, nullable=False, default=0)
+    bytes_processed = Column(BigInteger, nullable=False, default=0)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    rows_updated = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    rows_embedded = Column(Integer, nullable=False, default=0)
+    # JSON list of {"line": ..., "error": ...}, capped at BOOK_IMPORT_MAX_ERRORS
+    errors = Column(Text)
+    created_at = Column(DateTime(timezone=True), default=utc_now, nullable=False)
+    finished_at = Column(DateTime(timezone=True))
+
+class BookEmbeddingQueue(Base):
+    # Books whose vectors are missing or stale; drained into the vector store in batches
+    __tablename__ = 'book_embedding_queue'
+
+    book_id = Column(Integer, ForeignKey('books.id', ondelete="CASCADE"), primary_key=True)
+    queued_at = Column(DateTime(timezone=True), default=utc_now, nullable=False)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from app.database.schemas.base import Base
+from app.database.schemas.logs import utc_now
+
+class BookNeighbor(Base):
+    # Precomputed "books like X": the top-N most similar books per book by embedding cosine
+    # similarity, written by llm.neighbors. Reading a book's list is a primary-key range scan.
+    __tablename__ = 'book_neighbors'
+
+    book_id = Column(Integer, ForeignKey('books.id', ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey('books.id', ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+
+class BookNeighborQueue(Base):
+    # Books whose embedding changed since their neighbours were computed
+    __tablename__ = 'book_neighbor_queue'
+
+    book_id = Column(Integer, primary_key=True)
+    queued_at = Column(DateTime(timezone=True), default=utc_now, nullable=False)
@@ -1,9 +1,10 @@
 # books.py
-from sqlalchemy import Column, Float, String, Integer
+from sqlalchemy import Column, Float, String, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database.schemas.base import Base
 from app.database.schemas.favorite_books import favorite_books
 from app.database.schemas.user import User  # Import User class here
+from app.database.schemas.genre import Genre
 
 class Book(Base):
     __tablename__ = 'books'
@@ -12,16 +13,30 @@ class Book(Base):
     subtitle = Column(String, index=True)
     thumbnail = Column(String)
     genre = Column(String)
+    genre_id = Column(Integer, ForeignKey('genres.id'), index=True)
     published_year = Column(Integer)
     description = Column(String)
     average_rating = Column(Float)
     num_pages = Column(Integer)
     ratings_count = Column(Integer)
+    # Natural key for bulk imports and the vector store ids; NULL for books added by hand
+    isbn13 = Column(String(13))
 
     authors = relationship("Author", secondary="book_author_association", back_populates="books")
+    genre_ref = relationship("Genre", back_populates="books")
     
   # Use a string reference to avoid circular import issues
     fans = relationship('User', secondary=favorite_books, back_populates='favorite_books')
 
+    # Back the /books filters and sort keys; the genre_id composites serve "genre + sort" queries
+    __table_args__ = (
+        Index('ix_books_genre_id_published_year', 'genre_id', 'published_year'),
+        Index('ix_books_genre_id_average_rating', 'genre_id', 'average_rating'),
+        Index('ix_books_published_year', 'published_year'),
+        Index('ix_books_average_rating', 'average_rating'),
+        Index('ix_books_ratings_count', 'ratings_count'),
+        Index('ix_books_isbn13', 'isbn13', unique=True),
+    )
+
     def __repr__(self):
         return f"id: {self.id}, title: {self.title}"
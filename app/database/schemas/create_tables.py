@@ -5,12 +5,24 @@ from app.database.schemas.base import Base  # Import Base class
 from app.database.schemas.author import Author
 from app.database.schemas.book_author_association import book_author_association
 from app.database.schemas.books import Book
+from app.database.schemas.book_import import BookImportJob, BookEmbeddingQueue
+from app.database.schemas.book_neighbors import BookNeighbor, BookNeighborQueue
 from app.database.schemas.favorite_books import favorite_books
-from app.database.schemas.logs import RequestLog
+from app.database.schemas.genre import Genre
+from app.database.schemas.logs import RequestLog, RequestLogMinute
 from app.database.schemas.preferences import Preferences
 from app.database.schemas.user import User
+from app.database.schemas.user_taste import UserTaste
+from app.database.request_log_partitions import supports_partitioning, create_partitioned_request_logs, ensure_partitions
+from datetime import datetime, timezone
 
-# Create all tables in the database
-Base.metadata.create_all(bind=engine)
+# Create all tables in the database; on Postgres request_logs is created as a partitioned table
+if supports_partitioning(engine):
+    Base.metadata.create_all(bind=engine, tables=[table for table in Base.metadata.sorted_tables if table is not RequestLog.__table__])
+    with engine.begin() as conn:
+        create_partitioned_request_logs(conn)
+        ensure_partitions(conn, datetime.now(timezone.utc).date())
+else:
+    Base.metadata.create_all(bind=engine)
 
 print("Tables created successfully!")
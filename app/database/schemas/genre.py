@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Integer
+from sqlalchemy.orm import relationship
+from app.database.schemas.base import Base
+
+class Genre(Base):
+    __tablename__ = 'genres'
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), unique=True, nullable=False)
+
+    books = relationship("Book", back_populates="genre_ref")
+
+    def __repr__(self):
+        return f"id: {self.id}, name: {self.name}"
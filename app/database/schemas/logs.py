@@ -1,12 +1,42 @@
-from sqlalchemy import Column, String, Integer, DateTime, Text, Sequence
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, Float, Sequence, Index
 from datetime import datetime, timezone
 from app.database.schemas.base import Base
 
+def utc_now():
+    return datetime.now(timezone.utc)
+
 class RequestLog(Base):
+    # On Postgres this table is range-partitioned by day on `timestamp` (see
+    # app.database.request_log_partitions); old days are dropped as whole partitions
     __tablename__ = 'request_logs'
-    
+
     id = Column(Integer, Sequence('request_log_id_seq'), primary_key=True, autoincrement=True)
     endpoint = Column(String(255), nullable=False)
     method = Column(String(10), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    duration_ms = Column(Float, nullable=True)
     request_body = Column(Text, nullable=True)
-    timestamp = Column(DateTime(timezone=True), default=datetime.now(timezone.utc), nullable=False)
+    # Callable default: evaluated per row, not once at import
+    timestamp = Column(DateTime(timezone=True), default=utc_now, nullable=False)
+
+    __table_args__ = (
+        Index('ix_request_logs_timestamp', 'timestamp'),
+        Index('ix_request_logs_endpoint_timestamp', 'endpoint', 'timestamp'),
+    )
+
+class RequestLogMinute(Base):
+    # Per-endpoint, per-minute roll-up maintained by the request log writer; analytics read
+    # this instead of scanning raw request_logs
+    __tablename__ = 'request_log_minutes'
+
+    minute = Column(DateTime(timezone=True), primary_key=True)
+    endpoint = Column(String(255), primary_key=True)
+    method = Column(String(10), primary_key=True)
+    request_count = Column(BigInteger, nullable=False, default=0)
+    error_count = Column(BigInteger, nullable=False, default=0)
+    total_duration_ms = Column(Float, nullable=False, default=0.0)
+    max_duration_ms = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index('ix_request_log_minutes_endpoint_minute', 'endpoint', 'minute'),
+    )
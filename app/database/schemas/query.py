@@ -1,5 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class Query(BaseModel):
-    description: str
\ No newline at end of file
+    description: str
+    # Paging for list answers ("List books by <author>")
+    limit: int = Field(default=10, ge=1, le=50)
+    offset: int = Field(default=0, ge=0)
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary, ForeignKey, Text
+from app.database.schemas.base import Base
+from app.database.schemas.logs import utc_now
+
+class UserTaste(Base):
+    # Running sum (float32 bytes) and count of the user's favorite book embeddings, updated on
+    # every favorite add/remove; the taste vector is their mean blended with preferred genres
+    __tablename__ = 'user_tastes'
+
+    email = Column(String(100), ForeignKey('users.email', ondelete="CASCADE"), primary_key=True)
+    favorites_sum = Column(LargeBinary, nullable=False)
+    favorites_count = Column(Integer, nullable=False, default=0)
+    # JSON list of the book ids whose embeddings are in favorites_sum; NULL (rows written before
+    # the column existed) means unknown and the row is rebuilt on the next favorite change
+    favorite_book_ids = Column(Text)
+    updated_at = Column(DateTime(timezone=True), default=utc_now, onupdate=utc_now, nullable=False)
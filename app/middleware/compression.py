@@ -0,0 +1,25 @@
+from fastapi import FastAPI
+from starlette.middleware.gzip import GZipMiddleware
+from app.config import COMPRESSION_MINIMUM_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+# brotli-asgi is optional; without it every client negotiating compression gets gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+def setup_compression(app: FastAPI):
+    if BrotliMiddleware is not None:
+        # Serves br to clients that accept it and falls back to gzip for the rest
+        app.add_middleware(
+            BrotliMiddleware,
+            quality=COMPRESSION_BROTLI_QUALITY,
+            minimum_size=COMPRESSION_MINIMUM_SIZE,
+            gzip_fallback=True,
+        )
+    else:
+        app.add_middleware(
+            GZipMiddleware,
+            minimum_size=COMPRESSION_MINIMUM_SIZE,
+            compresslevel=COMPRESSION_GZIP_LEVEL,
+        )
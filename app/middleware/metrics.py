@@ -0,0 +1,50 @@
+import time
+
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.utils.metrics import (
+    HTTP_REQUESTS,
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS_IN_PROGRESS,
+    DB_QUERIES_PER_REQUEST,
+    start_request_query_count,
+    end_request_query_count,
+)
+
+class MetricsMiddleware:
+    # Plain ASGI middleware (no BaseHTTPMiddleware task/stream overhead). Requests are labelled
+    # by route template, e.g. /books/{book_id}, so label cardinality stays bounded.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries, token = start_request_query_count()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            end_request_query_count(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_REQUEST_DURATION.observe(duration, method=method, route=route)
+            DB_QUERIES_PER_REQUEST.observe(queries[0], route=route)
+
+def setup_metrics(app: FastAPI):
+    app.add_middleware(MetricsMiddleware)
@@ -1,44 +1,214 @@
-from fastapi import Request, FastAPI
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from app.database.connector import connect_to_db
-from app.database.schemas.logs import RequestLog
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
 
-class RequestLoggerMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp) -> None:
-        super().__init__(app)
+from fastapi import FastAPI
+from sqlalchemy import insert, func
+from sqlalchemy.dialects import postgresql, sqlite
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-    async def dispatch(self, request: Request, call_next):
-        request_body = await request.body()
+from app.config import (
+    REQUEST_LOG_ENABLED,
+    REQUEST_LOG_BODY_MODE,
+    REQUEST_LOG_BODY_MAX_BYTES,
+    REQUEST_LOG_BODY_SAMPLE_RATE,
+    REQUEST_LOG_BATCH_SIZE,
+    REQUEST_LOG_FLUSH_INTERVAL,
+    REQUEST_LOG_MAX_BUFFER,
+)
+from app.database.schemas.logs import RequestLog, RequestLogMinute, utc_now
+from app.utils.log import redact
+from app.utils.metrics import counter
 
-        async def receive() -> dict:
-            return {"type": "http.request", "body": request_body, "more_body": False}
+logger = logging.getLogger(__name__)
 
-        original_receive = request._receive
-        request._receive = receive
+REQUEST_LOGS_DROPPED = counter("request_logs_dropped_total", "Request log rows dropped because the buffer was full or a write failed")
 
-        try:
-            response = await call_next(request)
-        finally:
-            request._receive = original_receive
+BODY_MODES = ("off", "truncate", "sample")
+_REQUEST_LOG_COLUMNS = ("endpoint", "method", "status_code", "duration_ms", "request_body", "timestamp")
+_UPSERT_DIALECTS = {
+    "postgresql": (postgresql.insert, func.greatest),
+    "sqlite": (sqlite.insert, func.max),
+}
+
+
+class RequestLogWriter:
+    # Buffers request log rows and writes them from a background thread in one multi-row
+    # INSERT per batch, together with the per-minute roll-up, so requests never wait on the
+    # database. The thread is started on first use, i.e. in each worker after the fork.
+    def __init__(self, engine=None, batch_size: int = REQUEST_LOG_BATCH_SIZE,
+                 flush_interval: float = REQUEST_LOG_FLUSH_INTERVAL, max_buffer: int = REQUEST_LOG_MAX_BUFFER):
+        self._engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.database.connector import engine
+            self._engine = engine
+        return self._engine
+
+    def submit(self, row: dict):
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                REQUEST_LOGS_DROPPED.inc()
+            self._buffer.append(row)
+            pending = len(self._buffer)
+            if self._pid != os.getpid():
+                self._start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                return written
+            try:
+                self.write_batch(batch)
+                written += len(batch)
+            except Exception:
+                REQUEST_LOGS_DROPPED.inc(len(batch))
+                logger.exception("Failed to write request logs", extra={"rows": len(batch)})
+                return written
+
+    def write_batch(self, rows):
+        with self.engine.begin() as conn:
+            conn.execute(insert(RequestLog), [{column: row[column] for column in _REQUEST_LOG_COLUMNS} for row in rows])
+            upsert_minute_aggregates(conn, rows)
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
 
-        engine, SessionLocal = connect_to_db()
-        session = SessionLocal()
 
+def aggregate_by_minute(rows) -> list:
+    groups = {}
+    for row in rows:
+        minute = row["timestamp"].replace(second=0, microsecond=0)
+        key = (minute, row["route"], row["method"])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "minute": minute, "endpoint": row["route"], "method": row["method"],
+                "request_count": 0, "error_count": 0, "total_duration_ms": 0.0, "max_duration_ms": 0.0,
+            }
+        group["request_count"] += 1
+        group["error_count"] += 1 if (row["status_code"] or 500) >= 500 else 0
+        group["total_duration_ms"] += row["duration_ms"]
+        group["max_duration_ms"] = max(group["max_duration_ms"], row["duration_ms"])
+    return list(groups.values())
+
+def upsert_minute_aggregates(conn, rows):
+    dialect_insert, greatest = _UPSERT_DIALECTS[conn.dialect.name]
+    table = RequestLogMinute.__table__
+    stmt = dialect_insert(table).values(aggregate_by_minute(rows))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.minute, table.c.endpoint, table.c.method],
+        set_={
+            "request_count": table.c.request_count + stmt.excluded.request_count,
+            "error_count": table.c.error_count + stmt.excluded.error_count,
+            "total_duration_ms": table.c.total_duration_ms + stmt.excluded.total_duration_ms,
+            "max_duration_ms": greatest(table.c.max_duration_ms, stmt.excluded.max_duration_ms),
+        },
+    )
+    conn.execute(stmt)
+
+
+class RequestLoggerMiddleware:
+    # Plain ASGI middleware: the body is tapped as it streams to the endpoint (only up to
+    # body_max_bytes, and only when capture is on) instead of being buffered up front
+    def __init__(self, app: ASGIApp, writer: RequestLogWriter = None, body_mode: str = REQUEST_LOG_BODY_MODE,
+                 body_max_bytes: int = REQUEST_LOG_BODY_MAX_BYTES, body_sample_rate: float = REQUEST_LOG_BODY_SAMPLE_RATE) -> None:
+        if body_mode not in BODY_MODES:
+            raise ValueError(f"Unknown request log body mode: {body_mode}")
+        self.app = app
+        self.writer = writer or get_request_log_writer()
+        self.body_mode = body_mode
+        self.body_max_bytes = body_max_bytes
+        self.body_sample_rate = body_sample_rate
+
+    def _capture_body(self) -> bool:
+        if self.body_mode == "truncate":
+            return True
+        return self.body_mode == "sample" and random.random() < self.body_sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        status = 500
+
+        async def receive_and_capture():
+            message = await receive()
+            remaining = self.body_max_bytes - len(body)
+            if message["type"] == "http.request" and remaining > 0:
+                body.extend(message.get("body", b"")[:remaining])
+            return message
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        timestamp = utc_now()
+        start = time.perf_counter()
         try:
-            log_entry = RequestLog(
-                endpoint=request.url.path,
-                method=request.method,
-                request_body=request_body.decode('utf-8') if request_body else None
-            )
-            session.add(log_entry)
-            session.commit()
-        except Exception as e:
-            print(f"Logging error: {e}")
+            await self.app(scope, receive_and_capture if self._capture_body() else receive, send_with_status)
         finally:
-            session.close()  
+            self.writer.submit({
+                "endpoint": scope["path"][:255],
+                "route": getattr(scope.get("route"), "path", "unmatched"),
+                "method": scope["method"],
+                "status_code": status,
+                "duration_ms": (time.perf_counter() - start) * 1000,
+                # Login/registration bodies contain passwords
+                "request_body": redact(body.decode("utf-8", errors="replace")) if body else None,
+                "timestamp": timestamp,
+            })
+
+_writer = None
+_writer_lock = threading.Lock()
 
-        return response
+def get_request_log_writer() -> RequestLogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = RequestLogWriter()
+        return _writer
 
 def setup_middleware(app: FastAPI):
-    app.add_middleware(RequestLoggerMiddleware)
\ No newline at end of file
+    if REQUEST_LOG_ENABLED:
+        app.add_middleware(RequestLoggerMiddleware)
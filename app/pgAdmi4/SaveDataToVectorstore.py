@@ -1,62 +1,33 @@
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
+import logging
+import sys
 import os
 
-from llm.vector_data_manager import VectorDataManager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-client = chromadb.PersistentClient(
-    path="chroma_db", 
-    settings=Settings(),
-)
+from sqlalchemy import select, delete, insert
+from app.database.connector import SessionLocal
+from app.database.routing import use_primary
+from app.database.schemas.book_import import BookEmbeddingQueue
+from app.database.schemas.books import Book
+from llm.embedding_queue import drain_embedding_queue
+from app.utils.log import configure_logging
 
-collection = client.get_or_create_collection(name="book_collection")
+logger = logging.getLogger(__name__)
 
 def store_books_in_vectorDB():
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    curr_dir = os.path.dirname(os.path.abspath(__file__))
-    books_path = os.path.join(curr_dir, '../../books.csv')
-    df = pd.read_csv(books_path)
-
-    df.columns = df.columns.str.strip().str.lower()
-    documents = []
-    metadatas = []
-    ids = []
-    for index, row in df.iterrows():
-        text = f"{row['title']}; {row['authors']}; {row['categories']}; {row['description']}"
-        metadata = {
-            'isbn13': row['isbn13'],
-            'isbn10': row['isbn10'],
-            'title': row['title'],
-            'subtitle': row['subtitle'],
-            'authors': row['authors'],
-            'categories': row['categories'],
-            'thumbnail': row['thumbnail'],
-            'description': row['description'],
-            'published_year': row['published_year'],
-            'average_rating': row['average_rating'],
-            'num_pages': row['num_pages'],
-            'ratings_count': row['ratings_count']
-        }
-        documents.append(text)
-        metadatas.append(metadata)
-        ids.append(str(row['isbn13']))
-        print(f"Processed book: {row['title']}")
-        # Add the book to the collection
-    collection.add(
-        documents=documents,
-        ids=ids,  
-        metadatas=metadatas
-    )
+    # Embeds every book already loaded by SavetoDB.py. Vectors are keyed by isbn13 and carry the
+    # book id, so results are hydrated from the books table by primary key; see llm.embedding_queue
+    with use_primary(SessionLocal()) as session:
+        book_ids = session.scalars(select(Book.id)).all()
+        session.execute(delete(BookEmbeddingQueue))
+        session.execute(insert(BookEmbeddingQueue), [{"book_id": book_id} for book_id in book_ids])
+        session.commit()
+        return drain_embedding_queue(session)
 
 def main():
-    store_books_in_vectorDB()
-    print("Books have been successfully added to the ChromaDB collection.")
+    embedded = store_books_in_vectorDB()
+    logger.info("Books added to the ChromaDB collection", extra={"books": embedded})
 
 if __name__ == '__main__':
+    configure_logging()
     main()
-
-def similarity_text(query: str):
-    vector_manager = VectorDataManager()
-    return vector_manager.recommend_books(query)
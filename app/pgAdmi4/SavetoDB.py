@@ -1,11 +1,16 @@
+import logging
 import pandas as pd
 from sqlalchemy.orm import Session
 from app.database.connector import connect_to_db
 from app.database.schemas.books import Book
 from app.database.schemas.author import Author
+from app.database.schemas.genre import Genre
 from app.database.schemas.book_author_association import book_author_association
+from app.utils.log import configure_logging
 import os
 
+logger = logging.getLogger(__name__)
+
 def main():
     engine, SessionLocal = connect_to_db()
     session = SessionLocal()
@@ -17,7 +22,7 @@ def main():
 
         df.columns = df.columns.str.strip().str.lower()
 
-        expected_cols = {'title', 'subtitle', 'thumbnail', 'categories', 'published_year', 
+        expected_cols = {'isbn13', 'title', 'subtitle', 'thumbnail', 'categories', 'published_year', 
                          'description', 'average_rating', 'num_pages', 'ratings_count', 'authors'}
         if not expected_cols.issubset(set(df.columns)):
             missing_cols = expected_cols - set(df.columns)
@@ -30,12 +35,21 @@ def main():
         df['ratings_count'] = pd.to_numeric(df['ratings_count'], errors='coerce').fillna(0).astype(int)
         df.fillna('', inplace=True)
 
-        for _, row in df.iterrows():
+        genres = {}
+        for name in df['categories'].str.strip().unique():
+            if name:
+                genres[name] = session.query(Genre).filter_by(name=name).first() or Genre(name=name)
+                session.add(genres[name])
+        session.flush()
+
+        for count, (_, row) in enumerate(df.iterrows(), start=1):
             book = Book(
+                isbn13=str(row['isbn13']) or None,
                 title=row['title'],
                 subtitle=row['subtitle'],
                 thumbnail=row['thumbnail'],
                 genre=row['categories'],  
+                genre_ref=genres.get(row['categories'].strip()),
                 published_year=row['published_year'],
                 description=row['description'],
                 average_rating=row['average_rating'],
@@ -49,23 +63,24 @@ def main():
             for name in author_names:
                 author = session.query(Author).filter_by(name=name.strip()).first()
                 if not author:
-                    print(f"Creating new author: {name}")
+                    logger.debug("Creating author", extra={"author": name.strip()})
                     author = Author(name=name.strip())
                     session.add(author)
                     session.flush()
                 book.authors.append(author)
-                print(f"Added author: {author.name} to book: {book.title}")
             session.add(book)
-            print(f"Added book: {book.title}")
+            if count % 1000 == 0:
+                logger.info("Loading books", extra={"books": count, "total": len(df)})
 
         session.commit()
-        print("Books and authors added successfully!")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.info("Books and authors added", extra={"books": len(df)})
+    except Exception:
+        logger.exception("Loading books failed")
         session.rollback()
     finally:
         session.close()
 
 if __name__ == '__main__':
+    configure_logging()
     main()
 
@@ -0,0 +1,35 @@
+import argparse
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.config import NEIGHBORS_TOP_N
+from app.database.connector import SessionLocal
+from app.database.routing import use_primary
+from app.utils.log import configure_logging
+from llm.loader import get_vector_manager
+from llm.neighbors import load_embedding_matrix, compute_all_neighbors, update_queued_neighbors
+
+logger = logging.getLogger(__name__)
+
+# Batch job for the book_neighbors table. By default only books queued by the embedding queue
+# (and the books whose lists they affect) are recomputed; --full rebuilds every list.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute similar books from the stored embeddings")
+    parser.add_argument("--full", action="store_true", help="Recompute every book instead of the queued ones")
+    parser.add_argument("--top-n", type=int, default=NEIGHBORS_TOP_N)
+    args = parser.parse_args(argv)
+
+    with use_primary(SessionLocal()) as session:
+        matrix = load_embedding_matrix(session, get_vector_manager().collection)
+        if args.full:
+            count = compute_all_neighbors(session, matrix, top_n=args.top_n)
+        else:
+            count = update_queued_neighbors(session, matrix, top_n=args.top_n)
+    logger.info("Book neighbours written", extra={"books": count, "full": args.full})
+
+if __name__ == '__main__':
+    configure_logging()
+    main()
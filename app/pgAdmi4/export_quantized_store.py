@@ -0,0 +1,35 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.config import VECTOR_STORE_PATH, VECTOR_QUANTIZATION
+from app.utils.log import configure_logging
+from llm.quantized_store import QuantizedCollection
+from llm.vector_data_manager import open_chroma_collection
+
+logger = logging.getLogger(__name__)
+
+# Copies every vector and its metadata from the Chroma collection into the quantized store
+# (llm.quantized_store). Afterwards set VECTOR_STORE=quantized and restart the API workers.
+def export_quantized_store(source=None, target=None, page_size: int = 5000):
+    source = source or open_chroma_collection()
+    target = target or QuantizedCollection(VECTOR_STORE_PATH, VECTOR_QUANTIZATION)
+    exported = 0
+    while True:
+        page = source.get(include=["embeddings", "metadatas"], limit=page_size, offset=exported)
+        if not len(page["ids"]):
+            return exported
+        target.upsert(ids=page["ids"], embeddings=page["embeddings"], metadatas=page["metadatas"])
+        exported += len(page["ids"])
+        logger.info("Exported vectors", extra={"vectors": exported})
+
+def main():
+    exported = export_quantized_store()
+    logger.info("Quantized store written", extra={"vectors": exported, "path": VECTOR_STORE_PATH,
+                                                  "quantization": VECTOR_QUANTIZATION})
+
+if __name__ == '__main__':
+    configure_logging()
+    main()
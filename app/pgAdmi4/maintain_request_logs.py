@@ -0,0 +1,22 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database.connector import connect_to_db
+from app.database.request_log_partitions import maintain_request_logs
+from app.utils.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Retention job; run daily (e.g. from cron). Creates the next days' request_logs partitions,
+# drops partitions older than REQUEST_LOG_RETENTION_DAYS and prunes old per-minute aggregates.
+def main():
+    engine, SessionLocal = connect_to_db()
+    summary = maintain_request_logs(engine)
+    logger.info("Request log retention applied", extra=summary)
+
+if __name__ == "__main__":
+    configure_logging()
+    main()
@@ -0,0 +1,24 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database.connector import connect_to_db
+from app.database.schemas.book_author_association import book_author_association
+from app.utils.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Adds ix_book_author_association_author_id to an existing database; the author -> books listing
+# (GET /authors/{id}/books, chat intent 6) reads it instead of scanning the association table.
+def migrate_author_books_index():
+    engine, SessionLocal = connect_to_db()
+    with engine.begin() as conn:
+        for index in book_author_association.indexes:
+            index.create(bind=conn, checkfirst=True)
+    logger.info("ix_book_author_association_author_id is ready")
+
+if __name__ == "__main__":
+    configure_logging()
+    migrate_author_books_index()
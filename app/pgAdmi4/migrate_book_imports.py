@@ -0,0 +1,29 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+from app.database.connector import connect_to_db
+from app.database.schemas.base import Base
+from app.database.schemas.books import Book
+from app.database.schemas.book_import import BookImportJob, BookEmbeddingQueue
+from app.utils.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Prepares an existing database for bulk imports: adds books.isbn13 with its unique index (the
+# upsert key) and creates the import job and embedding queue tables.
+def migrate_book_imports():
+    engine, SessionLocal = connect_to_db()
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE books ADD COLUMN IF NOT EXISTS isbn13 VARCHAR(13)"))
+        for index in Book.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+    Base.metadata.create_all(bind=engine, tables=[BookImportJob.__table__, BookEmbeddingQueue.__table__])
+    logger.info("books.isbn13, book_import_jobs and book_embedding_queue are ready")
+
+if __name__ == "__main__":
+    configure_logging()
+    migrate_book_imports()
@@ -0,0 +1,48 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+from app.database.connector import connect_to_db
+from app.database.schemas.base import Base
+from app.database.schemas.books import Book
+from app.database.schemas.genre import Genre
+from app.utils.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Brings an existing database up to the normalized genre schema:
+# creates the genres table, adds books.genre_id and the filter indexes, then backfills
+# genres from the free-text books.genre column in two set-based statements.
+def migrate_genres():
+    engine, SessionLocal = connect_to_db()
+
+    Base.metadata.create_all(bind=engine, tables=[Genre.__table__])
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE books ADD COLUMN IF NOT EXISTS genre_id INTEGER REFERENCES genres(id)"))
+        for index in Book.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+        conn.execute(text("""
+            INSERT INTO genres (name)
+            SELECT DISTINCT trim(genre) FROM books
+            WHERE genre IS NOT NULL AND trim(genre) <> ''
+            ON CONFLICT (name) DO NOTHING
+        """))
+        result = conn.execute(text("""
+            UPDATE books SET genre_id = genres.id
+            FROM genres
+            WHERE genres.name = trim(books.genre)
+              AND books.genre_id IS DISTINCT FROM genres.id
+        """))
+        logger.info("Books linked to normalized genres", extra={"books": result.rowcount})
+
+        conn.execute(text("ANALYZE books"))
+        conn.execute(text("ANALYZE genres"))
+
+if __name__ == "__main__":
+    configure_logging()
+    migrate_genres()
@@ -0,0 +1,53 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text, inspect
+from app.config import REQUEST_LOG_RETENTION_DAYS
+from app.database.connector import connect_to_db
+from app.database.schemas.base import Base
+from app.database.schemas.logs import RequestLogMinute
+from app.database.request_log_partitions import create_partitioned_request_logs, ensure_partitions, is_partitioned
+from app.utils.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Moves an existing Postgres database to the partitioned request_logs layout: the old table is
+# renamed, the partitioned table and daily partitions for the retention window are created,
+# rows still inside the window are copied over and the old table is dropped. Rows written
+# before this change all carry the same import-time timestamp, so only those that happen to
+# fall inside the window survive.
+def migrate_request_logs():
+    engine, SessionLocal = connect_to_db()
+    Base.metadata.create_all(bind=engine, tables=[RequestLogMinute.__table__])
+
+    with engine.begin() as conn:
+        if inspect(conn).has_table("request_logs") and is_partitioned(conn):
+            logger.info("request_logs is already partitioned")
+            return
+        has_legacy = inspect(conn).has_table("request_logs")
+        if has_legacy:
+            conn.execute(text("ALTER TABLE request_logs RENAME TO request_logs_legacy"))
+            conn.execute(text("ALTER INDEX IF EXISTS request_logs_pkey RENAME TO request_logs_legacy_pkey"))
+
+        create_partitioned_request_logs(conn)
+        today = datetime.now(timezone.utc).date()
+        ensure_partitions(conn, today, days_back=REQUEST_LOG_RETENTION_DAYS)
+
+        if has_legacy:
+            cutoff = datetime.combine(today - timedelta(days=REQUEST_LOG_RETENTION_DAYS), datetime.min.time(), tzinfo=timezone.utc)
+            result = conn.execute(text("""
+                INSERT INTO request_logs (id, endpoint, method, request_body, timestamp)
+                SELECT id, endpoint, method, request_body, timestamp FROM request_logs_legacy
+                WHERE timestamp >= :cutoff
+            """), {"cutoff": cutoff})
+            conn.execute(text("SELECT setval('request_log_id_seq', GREATEST((SELECT COALESCE(MAX(id), 0) FROM request_logs_legacy), 1))"))
+            conn.execute(text("DROP TABLE request_logs_legacy"))
+            logger.info("Request log rows copied into daily partitions", extra={"rows": result.rowcount})
+
+if __name__ == "__main__":
+    configure_logging()
+    migrate_request_logs()
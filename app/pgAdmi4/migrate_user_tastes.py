@@ -0,0 +1,23 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+from app.database.connector import connect_to_db
+from app.utils.log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Adds user_tastes.favorite_book_ids to an existing database. Rows written before it existed
+# keep it NULL and are rebuilt from the user's favorites on their next favorite change.
+def migrate_user_tastes():
+    engine, SessionLocal = connect_to_db()
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE user_tastes ADD COLUMN IF NOT EXISTS favorite_book_ids TEXT"))
+    logger.info("user_tastes.favorite_book_ids is ready")
+
+if __name__ == "__main__":
+    configure_logging()
+    migrate_user_tastes()
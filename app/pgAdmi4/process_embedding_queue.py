@@ -0,0 +1,23 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.database.connector import SessionLocal
+from app.database.routing import use_primary
+from app.utils.log import configure_logging
+from llm.embedding_queue import drain_embedding_queue
+
+logger = logging.getLogger(__name__)
+
+# Embeds books still waiting in book_embedding_queue, e.g. after an import job failed while
+# embedding or when the API runs with BOOK_IMPORT_EMBED=false
+def main():
+    with use_primary(SessionLocal()) as session:
+        embedded = drain_embedding_queue(session)
+    logger.info("Embedding queue drained", extra={"books": embedded})
+
+if __name__ == '__main__':
+    configure_logging()
+    main()
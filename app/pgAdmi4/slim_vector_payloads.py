@@ -0,0 +1,49 @@
+import logging
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import select
+from app.database.connector import SessionLocal
+from app.database.schemas.books import Book
+from app.utils.log import configure_logging
+from llm.embedding_queue import book_ids_for_vectors, book_metadata
+from llm.loader import get_vector_manager
+
+logger = logging.getLogger(__name__)
+
+# Rewrites vectors stored with the old payload (document text plus a dozen book fields) to the
+# slim one from llm.embedding_queue.book_metadata, keeping the embeddings. Chroma merges metadata
+# on update and cannot drop a document, so each batch is deleted and added back.
+# Vectors whose id matches no book are left as they are.
+def slim_vector_payloads(collection=None, batch_size: int = 1000):
+    collection = collection or get_vector_manager().collection
+    ids = collection.get(include=[])["ids"]
+    rewritten = 0
+    with SessionLocal() as session:
+        for start in range(0, len(ids), batch_size):
+            page = collection.get(ids=ids[start:start + batch_size], include=["embeddings"])
+            by_vector_id = book_ids_for_vectors(session, page["ids"])
+            books = {book.id: book for book in session.scalars(select(Book).where(Book.id.in_(by_vector_id.values())))}
+            batch = [(vector_id, embedding, books[by_vector_id[vector_id]])
+                     for vector_id, embedding in zip(page["ids"], page["embeddings"])
+                     if by_vector_id.get(vector_id) in books]
+            if not batch:
+                continue
+            collection.delete(ids=[vector_id for vector_id, _, _ in batch])
+            collection.add(
+                ids=[vector_id for vector_id, _, _ in batch],
+                embeddings=[list(embedding) for _, embedding, _ in batch],
+                metadatas=[book_metadata(book) for _, _, book in batch],
+            )
+            rewritten += len(batch)
+    return rewritten, len(ids) - rewritten
+
+def main():
+    rewritten, skipped = slim_vector_payloads()
+    logger.info("Vector payloads slimmed", extra={"rewritten": rewritten, "skipped": skipped})
+
+if __name__ == '__main__':
+    configure_logging()
+    main()
@@ -28,6 +28,29 @@ class BookCreate(BaseModel):
     ratings_count: Optional[int] = None
     authors: List[Author] = Field(default_factory=list)
 
+class BookImportRow(BaseModel):
+    # One NDJSON object or CSV row of a bulk import. CSV uses the books.csv headers
+    # ("categories" for the genre, ";"-separated authors).
+    isbn13: str = Field(pattern=r"^\d{13}$")
+    title: str = Field(min_length=1)
+    subtitle: Optional[str] = None
+    thumbnail: Optional[str] = None
+    genre: Optional[str] = None
+    published_year: Optional[int] = None
+    description: Optional[str] = None
+    average_rating: Optional[float] = Field(default=None, ge=0, le=5)
+    num_pages: Optional[int] = Field(default=None, ge=0)
+    ratings_count: Optional[int] = Field(default=None, ge=0)
+    authors: List[str] = Field(default_factory=list)
+
+class BookFilters(BaseModel):
+    title: str = ""
+    genre: List[str] = Field(default_factory=list)
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    min_rating: Optional[float] = None
+    min_ratings_count: Optional[int] = None
+
 class BookUpdateCurrent(BaseModel):
     title: Optional[str] = None
     author_id: Optional[str] = None
@@ -0,0 +1,28 @@
+from sqlalchemy import select
+
+from app.database.schemas.author import Author
+
+# Async counterparts of the read paths in author_services, for handlers using get_async_db.
+# The authors table has only id and name; id is returned as author_id like the sync API.
+
+async def retrieve_single_author(session, id: int):
+    try:
+        stmt = select(Author.id, Author.name).where(Author.id == id)
+        result = (await session.execute(stmt)).fetchone()
+        if result:
+            author = {"author_id": result[0], "name": result[1]}
+            return True, "Author successfully retrieved", author
+        else:
+            return False, "Author could not be retrieved", None
+    except Exception as e:
+        return False, str(e), None
+
+async def retrieve_authors_from_db(session, page: int = 1, per_page: int = 10):
+    try:
+        offset = (page - 1) * per_page
+        stmt = select(Author.id, Author.name).order_by(Author.id).offset(offset).limit(per_page)
+        results = (await session.execute(stmt)).fetchall()
+        authors = [{"author_id": result[0], "name": result[1]} for result in results]
+        return True, "Authors successfully retrieved", authors
+    except Exception as e:
+        return False, str(e), None
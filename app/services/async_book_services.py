@@ -0,0 +1,76 @@
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.database.schemas.books import Book
+from app.database.schemas.favorite_books import favorite_books
+from app.schemas.book import BookFilters
+from app.services.book_services import (
+    book_query_options,
+    book_filter_conditions,
+    book_facets_statement,
+    author_books_statement,
+    author_book_count_statement,
+    collect_facets,
+    serialize_book,
+)
+
+# Async counterparts of the read paths in book_services, for handlers using get_async_db.
+# Relationships are always loaded eagerly since AsyncSession cannot lazy-load.
+
+logger = logging.getLogger(__name__)
+
+async def _favorite_book_ids(session, email: str = None):
+    if not email:
+        return set()
+    stmt = select(favorite_books.c.book_id).where(favorite_books.c.user_email == email)
+    return {row[0] for row in await session.execute(stmt)}
+
+async def retrieve_single_book(session, id: int):
+    try:
+        stmt = select(Book).options(selectinload(Book.authors)).where(Book.id == id)
+        book = (await session.execute(stmt)).scalars().first()
+        if not book:
+            return False, "Book not found", None
+        return True, "Book retrieved successfully", serialize_book(book)
+    except Exception as e:
+        logger.exception("Error retrieving book")
+        return False, str(e), None
+
+async def filter_books(session, filters: BookFilters, limit: int, offset: int, sort=None,
+                       email: str = None, fields=None):
+    try:
+        stmt = (
+            select(Book)
+            .options(*book_query_options(fields))
+            .where(*book_filter_conditions(filters))
+            .order_by(*(sort or [Book.id]))
+            .offset(offset)
+            .limit(limit)
+        )
+        books = (await session.execute(stmt)).scalars().all()
+        favorite_books_ids = await _favorite_book_ids(session, email)
+        book_list = [serialize_book(book, fields, favorite_books_ids) for book in books]
+        return True, "Books retrieved successfully", book_list
+    except Exception as e:
+        logger.exception("Error filtering books")
+        return False, str(e), []
+
+async def retrieve_books_by_author(session, author_id: int, limit: int, offset: int, fields=None):
+    try:
+        total = (await session.execute(author_book_count_statement(author_id))).scalar()
+        stmt = author_books_statement(author_id).options(*book_query_options(fields)).offset(offset).limit(limit)
+        books = (await session.execute(stmt)).scalars().all()
+        return True, "Books retrieved successfully", [serialize_book(book, fields) for book in books], total
+    except Exception as e:
+        logger.exception("Error retrieving books by author")
+        return False, str(e), [], 0
+
+async def retrieve_book_facets(session, filters: BookFilters):
+    try:
+        rows = (await session.execute(book_facets_statement(filters))).all()
+        return True, "Facets retrieved successfully", collect_facets(rows)
+    except Exception as e:
+        logger.exception("Error retrieving facets")
+        return False, str(e), None
@@ -0,0 +1,62 @@
+import logging
+
+from sqlalchemy import select, update
+
+from app.database.schemas.user import User
+from app.utils.hash import deterministic_hash
+
+# Async counterparts of user_services, for handlers using get_async_db
+
+logger = logging.getLogger(__name__)
+
+async def retrieve_single_user(email: str, db):
+    try:
+        stmt = select(User.email, User.fname, User.lname, User.role).where(User.email == email)
+        result = (await db.execute(stmt)).fetchone()
+        if result:
+            user = {
+                "email": result[0],
+                "fname": result[1],
+                "lname": result[2],
+                "role": result[3]
+            }
+            return True, "User retrieved successfully", user
+        else:
+            return False, "User not found", None
+    except Exception as e:
+        return False, str(e), None
+
+async def authenticate_user(email: str, password: str, db):
+    try:
+        stmt = select(User.hashed_pw, User.role).where(User.email == email)
+        output = (await db.execute(stmt)).fetchone()
+
+        if output is None:
+            return False, "User not registered", None
+        if output[0] == deterministic_hash(password):
+            return True, "Login successful", {"email": email, "role": output[1]}
+        return False, "Wrong password", None
+    except Exception as e:
+        logger.exception("Authentication error")
+        return False, str(e), None
+
+async def edit_user_info(email: str, user_update, db):
+    values = {}
+    if user_update.fname is not None:
+        values["fname"] = user_update.fname
+    if user_update.lname is not None:
+        values["lname"] = user_update.lname
+    if user_update.password is not None:
+        values["hashed_pw"] = deterministic_hash(user_update.password)
+
+    try:
+        if values:
+            result = await db.execute(update(User).where(User.email == email).values(**values))
+            if result.rowcount == 0:
+                return False, "User not found"
+            await db.commit()
+        return True, "User updated successfully"
+    except Exception as e:
+        await db.rollback()
+        logger.exception("Error updating user")
+        return False, str(e)
@@ -0,0 +1,285 @@
+import csv
+import json
+import logging
+import os
+import uuid
+
+import anyio
+from pydantic import ValidationError
+from sqlalchemy import select, delete, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import BOOK_IMPORT_DIR, BOOK_IMPORT_CHUNK_SIZE, BOOK_IMPORT_MAX_ERRORS
+from app.database.schemas.author import Author
+from app.database.schemas.book_author_association import book_author_association
+from app.database.schemas.book_import import BookImportJob, BookEmbeddingQueue
+from app.database.schemas.books import Book
+from app.database.schemas.genre import Genre
+from app.database.schemas.logs import utc_now
+from app.schemas.book import BookImportRow
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("ndjson", "csv")
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+_BOOK_COLUMNS = ("title", "subtitle", "thumbnail", "genre", "published_year", "description",
+                 "average_rating", "num_pages", "ratings_count")
+
+class ImportTooLarge(Exception):
+    pass
+
+
+def detect_format(requested: str = "", content_type: str = "", filename: str = ""):
+    if requested:
+        return requested if requested in IMPORT_FORMATS else None
+    if "csv" in content_type or filename.endswith(".csv"):
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+def import_path(job_id: str, import_dir: str = BOOK_IMPORT_DIR) -> str:
+    return os.path.join(import_dir, f"{job_id}.upload")
+
+def create_import_job(session: Session, fmt: str, filename: str = None, created_by: str = None) -> BookImportJob:
+    job = BookImportJob(id=uuid.uuid4().hex, status="receiving", format=fmt, filename=filename, created_by=created_by)
+    session.add(job)
+    session.commit()
+    return job
+
+async def spool_upload(chunks, path: str, max_bytes: int) -> int:
+    # The body goes straight to disk; the request never holds the whole upload in memory
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    received = 0
+    async with await anyio.open_file(path, "wb") as file:
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise ImportTooLarge(f"Upload exceeds {max_bytes} bytes")
+            await file.write(chunk)
+    return received
+
+def set_job_status(session: Session, job_id: str, status: str, **values):
+    if status in ("completed", "failed"):
+        values["finished_at"] = utc_now()
+    session.execute(update(BookImportJob).where(BookImportJob.id == job_id).values(status=status, **values))
+    session.commit()
+
+def serialize_job(job: BookImportJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "format": job.format,
+        "filename": job.filename,
+        "bytes_received": job.bytes_received,
+        "bytes_processed": job.bytes_processed,
+        "progress": round(job.bytes_processed / job.bytes_received, 4) if job.bytes_received else 0.0,
+        "rows_processed": job.rows_processed,
+        "rows_inserted": job.rows_inserted,
+        "rows_updated": job.rows_updated,
+        "rows_failed": job.rows_failed,
+        "rows_embedded": job.rows_embedded,
+        "errors": json.loads(job.errors) if job.errors else [],
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+def retrieve_import_job(session: Session, job_id: str):
+    job = session.get(BookImportJob, job_id)
+    if job is None:
+        return False, "Import job not found", None
+    return True, "Import job fetched successfully", serialize_job(job)
+
+
+def _lines(file):
+    # Yields (line number, text, bytes consumed so far); csv.reader accepts any iterable of lines
+    consumed = 0
+    for number, raw in enumerate(file, start=1):
+        consumed += len(raw)
+        line = raw.decode("utf-8", errors="replace")
+        yield number, line.lstrip("\ufeff") if number == 1 else line, consumed
+
+def read_records(file, fmt: str):
+    # Yields (line number, record or parse error, bytes consumed) from an upload opened in binary mode
+    lines = _lines(file)
+    if fmt == "ndjson":
+        for number, line, consumed in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                yield number, record if isinstance(record, dict) else ValueError("Expected a JSON object"), consumed
+            except ValueError as e:
+                yield number, e, consumed
+        return
+
+    position = {"number": 0, "consumed": 0}
+    def tracked():
+        for number, line, consumed in lines:
+            position["number"], position["consumed"] = number, consumed
+            yield line
+    for record in csv.DictReader(tracked()):
+        yield position["number"], record, position["consumed"]
+
+def normalize_record(record: dict) -> dict:
+    record = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    # CSV cells are strings; empty ones mean "not given"
+    record = {key: (value.strip() or None) if isinstance(value, str) else value for key, value in record.items()}
+    if record.get("genre") is None:
+        record["genre"] = record.get("categories")
+    isbn = record.get("isbn13")
+    if isinstance(isbn, (int, float)):
+        isbn = str(int(isbn))
+    record["isbn13"] = isbn.replace("-", "").replace(" ", "") if isinstance(isbn, str) else isbn
+    authors = record.get("authors") or []
+    if isinstance(authors, str):
+        authors = authors.split(";")
+    # NDJSON may carry BookCreate-style {"name": ...} objects
+    names = (author.get("name") if isinstance(author, dict) else author for author in authors)
+    record["authors"] = list(dict.fromkeys(name.strip() for name in names if isinstance(name, str) and name.strip()))
+    return record
+
+def validate_chunk(records):
+    # Returns the valid rows keyed by isbn13 (the last occurrence wins) and per-line errors
+    rows, errors = {}, []
+    for number, record, _ in records:
+        if isinstance(record, Exception):
+            errors.append({"line": number, "error": str(record)})
+            continue
+        try:
+            row = BookImportRow.model_validate(normalize_record(record))
+        except ValidationError as e:
+            errors.append({"line": number, "error": "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            )})
+            continue
+        rows.pop(row.isbn13, None)
+        rows[row.isbn13] = row
+    return list(rows.values()), errors
+
+
+def _resolve_names(session: Session, model, names):
+    # name -> id for every name, inserting the missing ones in one statement
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    resolved = dict(session.execute(select(model.name, model.id).where(model.name.in_(names))).all())
+    missing = names - resolved.keys()
+    if missing:
+        session.execute(insert(model), [{"name": name} for name in sorted(missing)])
+        resolved.update(session.execute(select(model.name, model.id).where(model.name.in_(missing))).all())
+    return resolved
+
+def upsert_books(session: Session, rows):
+    # Inserts or updates a chunk of validated rows by isbn13 with a fixed number of statements
+    # regardless of the chunk size. Returns (inserted, updated, book ids).
+    if not rows:
+        return 0, 0, []
+    isbns = [row.isbn13 for row in rows]
+    existing = set(session.scalars(select(Book.isbn13).where(Book.isbn13.in_(isbns))))
+    genres = _resolve_names(session, Genre, (row.genre.strip() for row in rows if row.genre))
+    authors = _resolve_names(session, Author, (name for row in rows for name in row.authors))
+
+    values = [{
+        "isbn13": row.isbn13,
+        **{column: getattr(row, column) for column in _BOOK_COLUMNS},
+        "genre_id": genres.get(row.genre.strip()) if row.genre else None,
+    } for row in rows]
+    stmt = _DIALECT_INSERTS[session.get_bind().dialect.name](Book).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Book.isbn13],
+        set_={column: stmt.excluded[column] for column in (*_BOOK_COLUMNS, "genre_id")},
+    ).returning(Book.id, Book.isbn13)
+    book_ids = dict((isbn, book_id) for book_id, isbn in session.execute(stmt))
+
+    # Rows that list authors replace the book's authors; rows without keep the current ones
+    with_authors = [row for row in rows if row.authors]
+    if with_authors:
+        session.execute(delete(book_author_association).where(
+            book_author_association.c.book_id.in_([book_ids[row.isbn13] for row in with_authors])
+        ))
+        session.execute(insert(book_author_association), [
+            {"book_id": book_ids[row.isbn13], "author_id": authors[name]}
+            for row in with_authors for name in row.authors
+        ])
+    inserted = len(isbns) - len(existing)
+    return inserted, len(existing), list(book_ids.values())
+
+def queue_for_embedding(session: Session, book_ids):
+    if not book_ids:
+        return
+    stmt = _DIALECT_INSERTS[session.get_bind().dialect.name](BookEmbeddingQueue).values(
+        [{"book_id": book_id, "queued_at": utc_now()} for book_id in book_ids]
+    )
+    session.execute(stmt.on_conflict_do_nothing(index_elements=[BookEmbeddingQueue.book_id]))
+
+
+def _chunks(records, size: int):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def import_books_from_file(session: Session, job_id: str, path: str, fmt: str,
+                           chunk_size: int = BOOK_IMPORT_CHUNK_SIZE, max_errors: int = BOOK_IMPORT_MAX_ERRORS) -> dict:
+    # Each chunk is validated, upserted and committed together with the job's progress, so a
+    # failing chunk only loses its own rows
+    totals = {"rows_processed": 0, "rows_inserted": 0, "rows_updated": 0, "rows_failed": 0, "bytes_processed": 0}
+    errors = []
+    set_job_status(session, job_id, "running")
+    with open(path, "rb") as file:
+        for chunk in _chunks(read_records(file, fmt), chunk_size):
+            rows, chunk_errors = validate_chunk(chunk)
+            failed = len(chunk_errors)
+            try:
+                inserted, updated, book_ids = upsert_books(session, rows)
+                queue_for_embedding(session, book_ids)
+            except Exception as e:
+                session.rollback()
+                logger.exception("Book import chunk failed", extra={"job_id": job_id, "first_line": chunk[0][0]})
+                inserted, updated, failed = 0, 0, failed + len(rows)
+                chunk_errors.append({"line": chunk[0][0], "error": f"Chunk of {len(rows)} rows rejected: {e}"[:500]})
+            totals["rows_processed"] += len(chunk)
+            totals["rows_inserted"] += inserted
+            totals["rows_updated"] += updated
+            totals["rows_failed"] += failed
+            totals["bytes_processed"] = chunk[-1][2]
+            errors.extend(chunk_errors[:max(max_errors - len(errors), 0)])
+            session.execute(update(BookImportJob).where(BookImportJob.id == job_id).values(
+                **totals, errors=json.dumps(errors) if errors else None,
+            ))
+            session.commit()
+    return totals
+
+def run_import_job(job_id: str, path: str, fmt: str, session_factory=None, embed: bool = True,
+                   chunk_size: int = BOOK_IMPORT_CHUNK_SIZE):
+    # Background task: import the spooled file, then embed the queued books
+    if session_factory is None:
+        from app.database.connector import SessionLocal
+        from app.database.routing import use_primary
+        session_factory = lambda: use_primary(SessionLocal())
+
+    with session_factory() as session:
+        try:
+            totals = import_books_from_file(session, job_id, path, fmt, chunk_size=chunk_size)
+            logger.info("Book import finished", extra={"job_id": job_id, **totals})
+            if embed:
+                set_job_status(session, job_id, "embedding")
+                from llm.embedding_queue import drain_embedding_queue
+                progress = lambda embedded: set_job_status(session, job_id, "embedding", rows_embedded=embedded)
+                drain_embedding_queue(session, on_progress=progress)
+            set_job_status(session, job_id, "completed")
+        except Exception as e:
+            session.rollback()
+            logger.exception("Book import failed", extra={"job_id": job_id})
+            job = session.get(BookImportJob, job_id)
+            errors = (json.loads(job.errors) if job and job.errors else []) + [{"line": None, "error": str(e)[:500]}]
+            set_job_status(session, job_id, "failed", errors=json.dumps(errors))
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
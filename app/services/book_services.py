@@ -1,14 +1,109 @@
 
-from sqlalchemy.orm import Session
-from sqlalchemy import select, delete, insert, update, join
+import logging
+
+from sqlalchemy.orm import Session, load_only, selectinload
+from sqlalchemy import select, delete, insert, update, join, func, literal, cast, union_all, String
 from app.database.connector import connect_to_db
 from app.database.schemas.books import Book
+from app.database.schemas.favorite_books import favorite_books
+from app.database.schemas.genre import Genre
 from app.database.schemas.user import User
 from app.database.schemas.author import Author
 from app.database.schemas.book_author_association import book_author_association
 from app.schemas import book
 from app.services.author_services import retrieve_single_author
-from app.schemas.book import BookCreate, BookUpdateCurrent
+from app.schemas.book import BookCreate, BookUpdateCurrent, BookFilters
+
+logger = logging.getLogger(__name__)
+
+# Fields a client may request through the `fields=` projection on /books
+BOOK_FIELDS = (
+    "id", "title", "subtitle", "thumbnail", "genre", "published_year", "description",
+    "average_rating", "num_pages", "ratings_count", "authors", "is_fav",
+)
+
+def parse_book_fields(fields: str):
+    if not fields:
+        return True, "All fields selected", None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in BOOK_FIELDS]
+    if unknown:
+        return False, f"Unknown book fields: {', '.join(unknown)}", None
+    # id is always returned so clients can key the rows
+    return True, "Fields parsed successfully", ["id"] + [field for field in requested if field != "id"]
+
+def book_query_options(fields=None):
+    if fields is None:
+        return [selectinload(Book.authors)]
+    columns = [getattr(Book, field) for field in fields if field not in ("id", "authors", "is_fav")]
+    options = [load_only(Book.id, *columns)]
+    if "authors" in fields:
+        options.append(selectinload(Book.authors))
+    return options
+
+# Sort keys accepted by /books; prefix with "-" for descending order
+SORT_KEYS = {
+    "id": Book.id,
+    "title": Book.title,
+    "published_year": Book.published_year,
+    "average_rating": Book.average_rating,
+    "ratings_count": Book.ratings_count,
+}
+
+def parse_book_sort(sort: str):
+    key = (sort or "id").strip()
+    descending = key.startswith("-")
+    column = SORT_KEYS.get(key.lstrip("-"))
+    if column is None:
+        return False, f"Unknown sort key: {key}. Use one of: {', '.join(SORT_KEYS)}", None
+    order = column.desc().nulls_last() if descending else column.asc().nulls_last()
+    # id breaks ties so pages never overlap
+    return True, "Sort parsed successfully", [order, Book.id.asc()]
+
+def book_filter_conditions(filters: BookFilters, exclude: str = None):
+    conditions = []
+    if filters.title:
+        conditions.append(Book.title.ilike(f"%{filters.title}%"))
+    if filters.genre and exclude != "genre":
+        genre_ids = select(Genre.id).where(func.lower(Genre.name).in_([genre.lower() for genre in filters.genre]))
+        conditions.append(Book.genre_id.in_(genre_ids))
+    if exclude != "year":
+        if filters.year_from is not None:
+            conditions.append(Book.published_year >= filters.year_from)
+        if filters.year_to is not None:
+            conditions.append(Book.published_year <= filters.year_to)
+    if filters.min_rating is not None:
+        conditions.append(Book.average_rating >= filters.min_rating)
+    if filters.min_ratings_count is not None:
+        conditions.append(Book.ratings_count >= filters.min_ratings_count)
+    return conditions
+
+def _favorite_book_ids(session: Session, email: str = None):
+    if not email:
+        return set()
+    stmt = select(favorite_books.c.book_id).where(favorite_books.c.user_email == email)
+    return {row[0] for row in session.execute(stmt)}
+
+def serialize_book(book: Book, fields=None, favorite_books_ids=None):
+    book_data = {
+        "id": book.id,
+        "title": book.title,
+        "subtitle": book.subtitle,
+        "thumbnail": book.thumbnail,
+        "genre": book.genre,
+        "published_year": book.published_year,
+        "description": book.description,
+        "average_rating": book.average_rating,
+        "num_pages": book.num_pages,
+        "ratings_count": book.ratings_count,
+    } if fields is None else {
+        field: getattr(book, field) for field in fields if field not in ("authors", "is_fav")
+    }
+    if fields is None or "authors" in fields:
+        book_data["authors"] = [author.name for author in book.authors]
+    if favorite_books_ids is not None and (fields is None or "is_fav" in fields):
+        book_data["is_fav"] = book.id in favorite_books_ids
+    return book_data
 
 def insert_book(session: Session, title: str, genre: str, description: str, year: int):
     new_book = Book(title=title, genre=genre, description=description, year=year)
@@ -45,77 +140,145 @@ def retrieve_single_book(session: Session, id: int):
         }
         return True, "Book retrieved successfully", book_data
     except Exception as e:
-        print(f"Error retrieving book: {e}")
+        logger.exception("Error retrieving book")
         return False, str(e), None
     
 
-def retrieve_books_from_db(session: Session, limit: int, offset: int, email: str = None):
+def retrieve_books_from_db(session: Session, limit: int, offset: int, email: str = None, fields=None):
     try:
-        books = session.query(Book).offset(offset).limit(limit).all()
+        books = (
+            session.query(Book)
+            .options(*book_query_options(fields))
+            .order_by(Book.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
 
         # Retrieve the user's favorite books if email is provided
-        favorite_books_ids = []
-        if email:
-            user = session.query(User).filter(User.email == email).first()
-            if user:
-                favorite_books_ids = [book.id for book in user.favorite_books]
-
-        book_list = [
-            {
-                "id": book.id,
-                "title": book.title,
-                "subtitle": book.subtitle,
-                "thumbnail": book.thumbnail,
-                "genre": book.genre,
-                "published_year": book.published_year,
-                "description": book.description,
-                "average_rating": book.average_rating,
-                "num_pages": book.num_pages,
-                "ratings_count": book.ratings_count,
-                "authors": [author.name for author in book.authors],
-                "is_fav": book.id in favorite_books_ids 
-            }
-            for book in books
-        ]
+        favorite_books_ids = _favorite_book_ids(session, email)
+
+        book_list = [serialize_book(book, fields, favorite_books_ids) for book in books]
         
         return True, "Books retrieved successfully", book_list
     except Exception as e:
-        print(f"Error retrieving books: {e}")
+        logger.exception("Error retrieving books")
         return False, str(e), []
 
-def search_books_by_title(session: Session, title: str, limit: int, offset: int, email: str = None):
+def search_books_by_title(session: Session, title: str, limit: int, offset: int, email: str = None, fields=None):
     try:
-        books = session.query(Book).filter(Book.title.ilike(f'%{title}%')).offset(offset).limit(limit).all()
+        books = (
+            session.query(Book)
+            .options(*book_query_options(fields))
+            .filter(Book.title.ilike(f'%{title}%'))
+            .order_by(Book.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
         
-        favorite_books_ids = []
-        if email:
-            user = session.query(User).filter(User.email == email).first()
-            if user:
-                favorite_books_ids = [book.id for book in user.favorite_books]
-
-        book_list = [
-            {
-                "id": book.id,
-                "title": book.title,
-                "subtitle": book.subtitle,
-                "thumbnail": book.thumbnail,
-                "genre": book.genre,
-                "published_year": book.published_year,
-                "description": book.description,
-                "average_rating": book.average_rating,
-                "num_pages": book.num_pages,
-                "ratings_count": book.ratings_count,
-                "authors": [author.name for author in book.authors],
-                "is_fav": book.id in favorite_books_ids  
-            }
-            for book in books
-        ]
+        favorite_books_ids = _favorite_book_ids(session, email)
+
+        book_list = [serialize_book(book, fields, favorite_books_ids) for book in books]
         
         return True, "Books retrieved successfully", book_list
     except Exception as e:
-        print(f"Error searching books: {e}")
+        logger.exception("Error searching books")
         return False, str(e), []
 
+def filter_books(session: Session, filters: BookFilters, limit: int, offset: int, sort=None,
+                 email: str = None, fields=None):
+    try:
+        books = (
+            session.query(Book)
+            .options(*book_query_options(fields))
+            .filter(*book_filter_conditions(filters))
+            .order_by(*(sort or [Book.id]))
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+        favorite_books_ids = _favorite_book_ids(session, email)
+
+        book_list = [serialize_book(book, fields, favorite_books_ids) for book in books]
+
+        return True, "Books retrieved successfully", book_list
+    except Exception as e:
+        logger.exception("Error filtering books")
+        return False, str(e), []
+
+def book_facets_statement(filters: BookFilters):
+    # Both facets come back from one UNION ALL round trip. Each facet ignores its own
+    # filter so the client can show the alternatives alongside the current selection.
+    genre_counts = (
+        select(literal("genre").label("facet"), Genre.name.label("value"), func.count(Book.id).label("count"))
+        .select_from(Book)
+        .join(Genre, Book.genre_id == Genre.id)
+        .where(*book_filter_conditions(filters, exclude="genre"))
+        .group_by(Genre.name)
+    )
+    decade = (Book.published_year // 10) * 10
+    decade_counts = (
+        select(literal("decade").label("facet"), cast(decade, String).label("value"), func.count(Book.id).label("count"))
+        .where(Book.published_year > 0, *book_filter_conditions(filters, exclude="year"))
+        .group_by(decade)
+    )
+    return union_all(genre_counts, decade_counts)
+
+def collect_facets(rows):
+    facets = {"genre": [], "decade": []}
+    for facet, value, count in rows:
+        facets[facet].append({"value": int(value) if facet == "decade" else value, "count": count})
+    facets["genre"].sort(key=lambda entry: (-entry["count"], entry["value"]))
+    facets["decade"].sort(key=lambda entry: entry["value"])
+    return facets
+
+def author_books_statement(author_id: int):
+    # The author's book ids come from ix_book_author_association_author_id, the books by primary key
+    return (
+        select(Book)
+        .join(book_author_association, book_author_association.c.book_id == Book.id)
+        .where(book_author_association.c.author_id == author_id)
+        .order_by(Book.ratings_count.desc().nulls_last(), Book.id)
+    )
+
+def author_book_count_statement(author_id: int):
+    return select(func.count()).select_from(book_author_association).where(
+        book_author_association.c.author_id == author_id
+    )
+
+def retrieve_books_by_author(session: Session, author_id: int, limit: int, offset: int, fields=None):
+    # Most-rated first; returns (success, message, books, total)
+    try:
+        total = session.scalar(author_book_count_statement(author_id))
+        books = session.scalars(
+            author_books_statement(author_id).options(*book_query_options(fields)).offset(offset).limit(limit)
+        ).all()
+        return True, "Books retrieved successfully", [serialize_book(book, fields) for book in books], total
+    except Exception as e:
+        logger.exception("Error retrieving books by author")
+        return False, str(e), [], 0
+
+def retrieve_book_facets(session: Session, filters: BookFilters):
+    try:
+        rows = session.execute(book_facets_statement(filters)).all()
+        return True, "Facets retrieved successfully", collect_facets(rows)
+    except Exception as e:
+        logger.exception("Error retrieving facets")
+        return False, str(e), None
+
+def find_or_create_genre(session: Session, name: str):
+    name = (name or "").strip()
+    if not name:
+        return None
+    genre = session.query(Genre).filter(Genre.name == name).first()
+    if not genre:
+        genre = Genre(name=name)
+        session.add(genre)
+        session.flush()
+    return genre
+
 def delete_book_from_db(db: Session, book_id: int):
     try:
         book = db.query(Book).filter(Book.id == book_id).first()
@@ -143,6 +306,7 @@ def add_book_to_db(session: Session,book: BookCreate):
         num_pages=book.num_pages,
         ratings_count=book.ratings_count,
     )
+    new_book.genre_ref = find_or_create_genre(session, book.genre)
     
     for author_data in book.authors:
         author = session.query(Author).filter(Author.name == author_data.name).first()
@@ -255,24 +419,6 @@ def remove_from_favourites(db: Session, email: str, book_id: int):
 
     return True, "Book removed from favorites"
 
-def retrieve_all_books(db: Session):
-    books = db.query(Book).all()
-    
-    result = []
-    for book in books:
-        authors = [author.name for author in book.authors]
-        result.append({
-            "id": book.id,
-            "title": book.title,
-            "subtitle": book.subtitle,
-            "thumbnail": book.thumbnail,
-            "genre": book.genre,
-            "published_year": book.published_year,
-            "description": book.description,
-            "average_rating": book.average_rating,
-            "num_pages": book.num_pages,
-            "ratings_count": book.ratings_count,
-            "authors": authors  
-        })
-    
-    return result
\ No newline at end of file
+def retrieve_all_books(db: Session, fields=None):
+    books = db.query(Book).options(*book_query_options(fields)).order_by(Book.id).all()
+    return [serialize_book(book, fields) for book in books]
\ No newline at end of file
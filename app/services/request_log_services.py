@@ -0,0 +1,47 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.database.schemas.logs import RequestLogMinute
+
+logger = logging.getLogger(__name__)
+
+def retrieve_request_stats(session: Session, minutes: int = 60, endpoint: str = None):
+    # Reads only the per-minute roll-up; raw request_logs are never scanned here
+    try:
+        since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+        conditions = [RequestLogMinute.minute >= since]
+        if endpoint:
+            conditions.append(RequestLogMinute.endpoint == endpoint)
+
+        rows = session.execute(
+            select(
+                RequestLogMinute.endpoint,
+                RequestLogMinute.method,
+                func.sum(RequestLogMinute.request_count),
+                func.sum(RequestLogMinute.error_count),
+                func.sum(RequestLogMinute.total_duration_ms),
+                func.max(RequestLogMinute.max_duration_ms),
+            )
+            .where(*conditions)
+            .group_by(RequestLogMinute.endpoint, RequestLogMinute.method)
+            .order_by(func.sum(RequestLogMinute.request_count).desc())
+        ).all()
+
+        stats = [
+            {
+                "endpoint": route,
+                "method": method,
+                "requests": requests,
+                "errors": errors,
+                "mean_ms": round(total_ms / requests, 2) if requests else 0.0,
+                "max_ms": round(max_ms, 2),
+            }
+            for route, method, requests, errors, total_ms, max_ms in rows
+        ]
+        return True, "Request statistics retrieved successfully", stats
+    except Exception as e:
+        logger.exception("Error retrieving request statistics")
+        return False, str(e), None
@@ -1,3 +1,5 @@
+import logging
+
 from sqlalchemy import select, update
 from app.database.connector import connect_to_db
 from app.database.schemas.books import Book
@@ -5,6 +7,8 @@ from app.database.schemas.user import User
 from app.utils.hash import deterministic_hash
 from sqlalchemy.orm import Session
 
+logger = logging.getLogger(__name__)
+
 def retrieve_single_user(email: str, db: Session):
     try:
         stmt = select(User.email, User.fname, User.lname, User.role).where(User.email == email)
@@ -38,7 +42,7 @@ def authenticate_user(email: str, password: str, db: Session):
             else:
                 return False, "Wrong password", None
     except Exception as e:
-        print(f"Authentication error: {e}")
+        logger.exception("Authentication error")
         return False, str(e), None
 
 
@@ -73,7 +77,7 @@ def edit_user_info(email, user_update):
             conn.commit()
         return True, "User updated successfully"
     except Exception as e:
-        print(e)
+        logger.exception("Error updating user")
         return False, e
     finally:
         session.close()
@@ -102,7 +106,7 @@ def register_user(user_data):
         session.commit()
         return True, "User registered successfully"
     except Exception as e:
-        print(f"Registration error: {e}")  # Log error details
+        logger.exception("Registration error")
         return False, f"Registration error: {e}"
     finally:
         session.close()  # Close the session instance
@@ -0,0 +1,183 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from app.config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE, LOG_QUEUE_SIZE, LOG_SAMPLING
+from app.utils.tracing import current_span
+
+# One logging setup for the API, the server and the loader scripts. Callers only hand a record
+# to a bounded queue; formatting, redaction and the stdout write happen on a listener thread.
+# INFO/DEBUG records from noisy loggers can be sampled (LOG_SAMPLING, e.g.
+# "llm.vector_data_manager=0.1") or per call with extra={"sample_rate": 0.01}; warnings and
+# errors are always kept.
+
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample_rate"}
+
+_REDACTIONS = [
+    (re.compile(r"(?i)\b(bearer)\s+[A-Za-z0-9\-._~+/]+=*"), r"\1 [REDACTED]"),
+    (re.compile(r"\beyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"), "[REDACTED]"),
+    (re.compile(r"""(?i)(["']?(?:password|access_token|token|secret|authorization)["']?\s*[:=]\s*["']?)[^"',\s}]+"""), r"\1[REDACTED]"),
+]
+_SENSITIVE_KEYS = {"password", "token", "access_token", "authorization", "secret"}
+
+def redact(text: str) -> str:
+    for pattern, replacement in _REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+def _redact_value(key: str, value):
+    if key.lower() in _SENSITIVE_KEYS:
+        return "[REDACTED]"
+    return redact(value) if isinstance(value, str) else value
+
+
+class RedactingJSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = _redact_value(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = redact(record.exc_text)
+        return json.dumps(entry, default=str)
+
+class RedactingTextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: dict = None):
+        super().__init__()
+        self.rates = rates or {}
+
+    def rate_for(self, record: logging.LogRecord) -> float:
+        rate = getattr(record, "sample_rate", None)
+        if rate is not None:
+            return rate
+        name = record.name
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record)
+        return rate >= 1.0 or random.random() < rate
+
+
+class TraceContextFilter(logging.Filter):
+    # Runs in the caller's thread so records carry the active span's ids
+    def filter(self, record: logging.LogRecord) -> bool:
+        active = current_span()
+        if active is not None:
+            record.trace_id = active.trace_id
+            record.span_id = active.span_id
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Only renders the message text in the caller's thread (args may be mutated later); full
+    # formatting and redaction are left to the listener. A full queue drops the record
+    # instead of blocking the request.
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def parse_sampling(value: str) -> dict:
+    rates = {}
+    for part in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, rate = part.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, use_queue: bool = LOG_QUEUE,
+                      sampling: str = LOG_SAMPLING, stream=None, force: bool = False):
+    global _configured, _listener, _queue_handler
+    with _configure_lock:
+        if _configured and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(RedactingJSONFormatter() if fmt == "json" else RedactingTextFormatter())
+
+        if use_queue:
+            handler = _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+            _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+            _listener.start()
+        else:
+            handler = output
+            _queue_handler = None
+        handler.addFilter(SamplingFilter(parse_sampling(sampling)))
+        handler.addFilter(TraceContextFilter())
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level.upper())
+        _configured = True
+
+def flush_logging():
+    # Drains the queue; registered to run at interpreter exit
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def _restart_listener_after_fork():
+    # gunicorn forks workers from a preloaded master; the listener thread does not survive the
+    # fork, so each child gets a fresh queue and thread
+    global _listener, _configure_lock
+    _configure_lock = threading.Lock()
+    if _listener is None or _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _listener = QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+atexit.register(flush_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
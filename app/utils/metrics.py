@@ -0,0 +1,245 @@
+import abc
+import contextvars
+import threading
+from bisect import bisect_left
+
+# In-process Prometheus metrics. Each update is a dict lookup and an add under a per-metric lock,
+# cheap enough for every request, query and LLM call; GET /metrics renders the text exposition
+# format. Under gunicorn each worker reports its own values (scrape per worker or aggregate).
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; Prometheus convention
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric(abc.ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self):
+        # [(sample name, rendered labels, value)] in exposition order
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in values]
+
+
+class Gauge(Metric):
+    # Either set directly or computed at scrape time by `callback`, which returns a value or
+    # a {label_values_tuple: value} dict
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.callback is not None:
+            values = self.callback()
+            values = values if isinstance(values, dict) else {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [(self.name, _format_labels(self.labelnames, key), value)
+                for key, value in sorted(values.items()) if value is not None]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[1] if state else 0
+
+    def series(self) -> dict:
+        # {label values: (per-bucket counts, count, sum)} for every label set observed so far
+        with self._lock:
+            return {key: (list(counts), count, total) for key, (counts, count, total) in self._values.items()}
+
+    def quantile(self, q: float, **labels) -> float:
+        # Upper bound of the bucket holding the q-th observation (the largest finite bound for the overflow bucket)
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            counts, count = (list(state[0]), state[1]) if state else ([], 0)
+        return bucket_quantile(self.buckets, counts, count, q)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), count, total)) for key, (counts, count, total) in self._values.items())
+        samples = []
+        for key, (counts, count, total) in values:
+            running = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                running += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                samples.append((f"{self.name}_bucket", labels, running))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), count))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+        return samples
+
+
+def bucket_quantile(buckets, counts, count: int, q: float) -> float:
+    target = q * count
+    running = 0
+    for bound, bucket_count in zip(buckets, counts):
+        running += bucket_count
+        if bucket_count and running >= target:
+            return bound if bound != float("inf") else buckets[-2]
+    return 0.0
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            # Re-registering (e.g. a module reloaded in tests) keeps the existing series
+            return self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, documentation: str, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name: str, documentation: str, labelnames=(), callback=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# Service-wide metrics. Defined here rather than next to the code that updates them so /metrics
+# lists every series without importing the LLM stack.
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+HTTP_REQUESTS_IN_PROGRESS = gauge("http_requests_in_progress", "HTTP requests currently being served")
+
+DB_QUERIES = counter("db_queries_total", "SQL statements executed")
+DB_QUERIES_PER_REQUEST = histogram("db_queries_per_request", "SQL statements executed per HTTP request", ("route",), COUNT_BUCKETS)
+
+LLM_CALLS = counter("llm_calls_total", "Scheduled LLM calls by priority and outcome", ("priority", "outcome"))
+LLM_CALL_DURATION = histogram("llm_call_duration_seconds", "LLM call latency including queue wait", ("priority",))
+LLM_QUEUE_WAIT = histogram("llm_queue_wait_seconds", "Time LLM calls spend waiting for a scheduler slot", ("priority",))
+LLM_TOKENS = counter("llm_completion_tokens_total", "Whitespace-delimited tokens in LLM responses", ("priority",))
+
+EMBEDDING_CACHE_REQUESTS = counter("embedding_cache_requests_total", "Query embedding cache lookups", ("result",))
+INTENT_CACHE_REQUESTS = counter("intent_cache_requests_total", "Intent classification cache lookups", ("result",))
+EMBEDDING_DURATION = histogram("embedding_encode_duration_seconds", "Time to embed a query (cache misses only)")
+EMBEDDING_BATCH_SIZE = histogram("embedding_batch_size", "Texts per batched encode call of the embedding batcher",
+                                 buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+VECTOR_SEARCH_DURATION = histogram("vector_search_duration_seconds", "Vector store query latency", ("operation",))
+CHAT_WORKFLOW_DURATION = histogram("chat_workflow_duration_seconds", "Chat workflow latency by intent", ("intent",))
+CHAT_NODE_DURATION = histogram("chat_node_duration_seconds", "Chat workflow node latency by intent", ("intent", "node"))
+
+
+# Per-request query counter; the middleware installs a fresh one and the SQLAlchemy listener in
+# app.database.connector increments it. A list is used so increments made in threadpool workers
+# (which run on a copy of the context) are visible to the middleware.
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+def start_request_query_count():
+    counter = [0]
+    return counter, _request_queries.set(counter)
+
+def end_request_query_count(token):
+    _request_queries.reset(token)
+
+def record_query():
+    DB_QUERIES.inc()
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
@@ -0,0 +1,124 @@
+import contextvars
+import json
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import TRACING_EXPORTER, TRACING_FILE, TRACING_SERVICE_NAME
+
+# Spans follow the OpenTelemetry data model (trace/span ids, parent ids, unix-nano timestamps,
+# attributes, status) and are exported as one JSON object per line to the console or a file.
+# With TRACING_EXPORTER=otel they are created through the opentelemetry API instead, so any
+# configured OTel SDK/exporter receives them.
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "attributes", "start_time_ns",
+                 "end_time_ns", "status", "_otel_span")
+
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = None
+        self.status = "OK"
+        self._otel_span = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time_ns or time.time_ns()
+        return (end - self.start_time_ns) / 1e6
+
+    def to_dict(self) -> dict:
+        return {
+            "resource": {"service.name": TRACING_SERVICE_NAME},
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_time_ns,
+            "end_time_unix_nano": self.end_time_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class ConsoleExporter:
+    def export(self, span: Span):
+        sys.stderr.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+class FileExporter:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a") as file:
+            file.write(line)
+
+def _build_exporter(name: str):
+    if name == "console":
+        return ConsoleExporter()
+    if name == "file":
+        return FileExporter(TRACING_FILE)
+    return None
+
+_exporter = _build_exporter(TRACING_EXPORTER)
+_otel_tracer = None
+if TRACING_EXPORTER == "otel":
+    from opentelemetry import trace as otel_trace
+    _otel_tracer = otel_trace.get_tracer(TRACING_SERVICE_NAME)
+
+def set_exporter(exporter):
+    global _exporter
+    _exporter = exporter
+
+def current_span():
+    return _current_span.get()
+
+@contextmanager
+def span(name: str, **attributes):
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    otel_context = None
+    if _otel_tracer is not None:
+        otel_context = _otel_tracer.start_as_current_span(name, attributes=attributes)
+        current._otel_span = otel_context.__enter__()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.attributes["exception.type"] = type(e).__name__
+        raise
+    finally:
+        current.end_time_ns = time.time_ns()
+        _current_span.reset(token)
+        if otel_context is not None:
+            otel_context.__exit__(None, None, None)
+        if _exporter is not None:
+            _exporter.export(current)
+
+def traced(name: str):
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorator
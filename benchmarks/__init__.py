@@ -0,0 +1,5 @@
+# Accounts created by benchmarks.seed and used by the load test's virtual users
+BENCH_PASSWORD = "bench_password"
+
+def bench_user_email(index: int) -> str:
+    return f"bench_user_{index}@example.com"
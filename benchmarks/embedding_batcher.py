@@ -0,0 +1,107 @@
+# Query-embedding throughput with 1, 8 and 64 concurrent callers, each encoding its own text on the
+# calling thread versus going through llm.embedding_batcher.
+#
+#   python -m benchmarks.embedding_batcher --requests 512
+#   python -m benchmarks.embedding_batcher --provider sentence_transformers
+#
+# With the default hashing provider the model is simulated: every encode call costs
+# --call-latency plus --text-latency per text, standing in for a transformer forward pass whose
+# fixed overhead (tokenizer, kernel launch, Python dispatch) dominates at small batch sizes.
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks.load_test import RESULTS_DIR, percentile, git_revision
+
+
+class SimulatedModel:
+    # Serializes calls like a model saturating the CPU would
+    def __init__(self, embedder, call_latency: float, text_latency: float):
+        self.embedder = embedder
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+        self._lock = threading.Lock()
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        with self._lock:
+            count = 1 if isinstance(sentences, str) else len(sentences)
+            time.sleep(self.call_latency + self.text_latency * count)
+            return self.embedder.encode(sentences, batch_size=batch_size)
+
+def build_model(args):
+    from llm.providers import HashingEmbedder, get_embedder
+    if args.provider == "hashing":
+        return SimulatedModel(HashingEmbedder(latency=0), args.call_latency, args.text_latency)
+    return get_embedder(args.provider)
+
+def run(encode, concurrency: int, requests: int):
+    # Each caller encodes its share of distinct texts back to back
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(worker: int):
+        samples = []
+        for index in range(worker, requests, concurrency):
+            start = time.perf_counter()
+            encode(f"a novel about topic {index} and its readers")
+            samples.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(samples)
+
+    threads = [threading.Thread(target=caller, args=(worker,)) for worker in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput_per_s": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark direct vs micro-batched query embedding")
+    parser.add_argument("--provider", default="hashing")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    parser.add_argument("--call-latency", type=float, default=0.004, help="Simulated seconds per encode call")
+    parser.add_argument("--text-latency", type=float, default=0.0002, help="Simulated seconds per encoded text")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    from llm.embedding_batcher import EmbeddingBatcher
+
+    model = build_model(args)
+    results = {}
+    for concurrency in args.concurrency:
+        batcher = EmbeddingBatcher(model, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000)
+        direct = run(lambda text: model.encode(text).tolist(), concurrency, args.requests)
+        batched = run(batcher.encode, concurrency, args.requests)
+        batcher.close()
+        results[concurrency] = {"direct": direct, "batched": batched}
+        for name, stats in (("direct", direct), ("batched", batched)):
+            print(f"{concurrency:>3} callers  {name:<7} {stats['throughput_per_s']:>8.1f} req/s   "
+                  f"p50 {stats['p50_ms']:>7.3f} ms   p95 {stats['p95_ms']:>7.3f} ms")
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    output = {"timestamp": timestamp, "revision": git_revision(), "provider": args.provider,
+              "requests": args.requests, "max_batch_size": args.max_batch_size, "max_wait_ms": args.max_wait_ms,
+              "call_latency": args.call_latency, "text_latency": args.text_latency, "results": results}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"embedding-batcher-{timestamp.replace(':', '')}-{output['revision']}.json")
+    with open(path, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results saved to {path}")
+    return output
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,96 @@
+# Single-query and batched encode latency of the embedding backends: the PyTorch
+# SentenceTransformer and ONNX Runtime with float32 or int8 (dynamically quantized) weights.
+#
+#   python -m llm.onnx_embedder --quantize
+#   python -m benchmarks.embedding_runtime --runtimes sentence_transformers onnx onnx-int8
+#
+# A runtime whose packages or exported model are missing is reported as skipped.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.load_test import RESULTS_DIR, percentile, git_revision
+from benchmarks.seed import BOOKS_CSV
+
+
+def load_runtime(name: str, args):
+    if name == "sentence_transformers":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(args.model, device="cpu")
+    if name in ("onnx", "onnx-int8"):
+        from llm.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(args.onnx_path, "model_quantized.onnx" if name == "onnx-int8" else "model.onnx",
+                            threads=args.threads, model_name=args.model)
+    if name == "hashing":
+        from llm.providers import HashingEmbedder
+        return HashingEmbedder(latency=0)
+    raise ValueError(f"Unknown runtime: {name}")
+
+def time_calls(fn, repeats: int):
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return round(percentile(samples, 50), 3), round(percentile(samples, 95), 3)
+
+def measure(model, queries, documents, args):
+    # Single queries are what /recommendations encodes; batches are what the batcher and the
+    # embedding queue send
+    position = iter(range(10 ** 9))
+    p50, p95 = time_calls(lambda: model.encode(queries[next(position) % len(queries)]), args.repeats)
+    results = {"single": {"p50_ms": p50, "p95_ms": p95}}
+    for batch_size in args.batch_sizes:
+        batch = documents[:batch_size]
+        p50, p95 = time_calls(lambda: model.encode(batch, batch_size=batch_size), max(args.repeats // 10, 5))
+        results[f"batch_{batch_size}"] = {"p50_ms": p50, "p95_ms": p95,
+                                          "texts_per_s": round(batch_size / p50 * 1000, 1)}
+    return results
+
+def main(argv=None):
+    from app.config import EMBEDDING_MODEL, EMBEDDING_ONNX_PATH, EMBEDDING_ONNX_THREADS
+
+    parser = argparse.ArgumentParser(description="Benchmark embedding runtimes")
+    parser.add_argument("--runtimes", nargs="+", default=["sentence_transformers", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--onnx-path", default=EMBEDDING_ONNX_PATH)
+    parser.add_argument("--threads", type=int, default=EMBEDDING_ONNX_THREADS)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    with open(BOOKS_CSV, newline="", encoding="utf-8") as file:
+        rows = [row for _, row in zip(range(max(args.batch_sizes + [200])), csv.DictReader(file))]
+    queries = [f"books like {row['title']}" for row in rows]
+    documents = [f"{row['title']}; {row['authors']}; {row['categories']}; {row['description']}" for row in rows]
+
+    results = {}
+    for name in args.runtimes:
+        try:
+            model = load_runtime(name, args)
+        except (ImportError, OSError) as e:
+            print(f"{name:<22} skipped: {e}")
+            results[name] = {"skipped": str(e)}
+            continue
+        results[name] = stats = measure(model, queries, documents, args)
+        line = "   ".join(f"{key} p50 {value['p50_ms']:>8.3f} ms" for key, value in stats.items())
+        print(f"{name:<22} {line}")
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    output = {"timestamp": timestamp, "revision": git_revision(), "threads": args.threads, "results": results}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"embedding-runtime-{timestamp.replace(':', '')}-{output['revision']}.json")
+    with open(path, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results saved to {path}")
+    return output
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
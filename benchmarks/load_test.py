@@ -0,0 +1,278 @@
+# Load test for the book API.
+#
+#   python -m benchmarks.load_test --concurrency 16 --duration 30
+#   python -m benchmarks.load_test --url http://localhost:6969 --no-seed
+#   python -m benchmarks.load_test --compare benchmarks/results/<previous>.json
+#
+# By default the API runs in-process against a SQLite copy of books.csv with stub LLM and
+# vector backends, so results reflect the web/database layers and are comparable across commits.
+# --real-pipeline runs the actual LangGraph workflow and Chroma store on the deterministic fake
+# LLM and hashing embedder instead (requires langgraph and chromadb to be installed).
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks import bench_user_email, BENCH_PASSWORD
+
+# app modules read DATABASE_URL at import time, so benchmarks.seed and api are imported only after
+# main() has pointed it at the benchmark database
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench.db')
+DEFAULT_MIX = {"browse": 35, "search": 20, "detail": 15, "favorite": 10, "chat": 10, "recommend": 10}
+TOKEN_REFRESH_SECONDS = 45
+CHAT_TEMPLATES = [
+    "Who wrote {title}?",
+    "When was {title} published?",
+    "Summarize {title}",
+    "Recommend 3 books like {title}",
+]
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, email: str, catalogue, rng: random.Random):
+        self.client = client
+        self.email = email
+        self.catalogue = catalogue
+        self.rng = rng
+        self.token = None
+        self.token_time = 0.0
+        self.favorites = set()
+
+    async def headers(self):
+        if self.token is None or time.monotonic() - self.token_time > TOKEN_REFRESH_SECONDS:
+            response = await self.client.post("/users/login", json={"email": self.email, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            self.token = response.json()["access_token"]
+            self.token_time = time.monotonic()
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def random_book(self):
+        return self.rng.choice(self.catalogue)
+
+    async def browse(self):
+        offset = self.rng.randrange(0, max(len(self.catalogue) - 20, 1))
+        return "GET /books", await self.client.get("/books", params={"limit": 20, "offset": offset}, headers=await self.headers())
+
+    async def search(self):
+        words = [word for word in self.random_book()["title"].split() if len(word) > 3] or ["the"]
+        params = {"title": self.rng.choice(words), "limit": 20}
+        return "GET /books?title", await self.client.get("/books", params=params, headers=await self.headers())
+
+    async def detail(self):
+        return "GET /books/{id}", await self.client.get(f"/books/{self.random_book()['id']}")
+
+    async def favorite(self):
+        book_id = self.random_book()["id"]
+        headers = await self.headers()
+        if book_id in self.favorites:
+            self.favorites.discard(book_id)
+            return "POST /books/remove_from_favorites", await self.client.post(
+                "/books/remove_from_favorites", json={"book_id": book_id}, headers=headers
+            )
+        self.favorites.add(book_id)
+        return "POST /books/add_to_favorites", await self.client.post(
+            "/books/add_to_favorites", json={"book_id": book_id}, headers=headers
+        )
+
+    async def chat(self):
+        query = self.rng.choice(CHAT_TEMPLATES).format(title=self.random_book()["title"])
+        return "GET /chat", await self.client.get("/chat", params={"query": query})
+
+    async def recommend(self):
+        description = (self.random_book().get("description") or self.random_book()["title"])[:200]
+        return "POST /recommendations", await self.client.post("/recommendations", params={"description": description})
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def summarize(samples, elapsed: float):
+    endpoints = {}
+    for endpoint, latency, ok in samples:
+        stats = endpoints.setdefault(endpoint, {"latencies": [], "errors": 0})
+        stats["latencies"].append(latency)
+        stats["errors"] += 0 if ok else 1
+
+    summary = {}
+    for endpoint, stats in sorted(endpoints.items()):
+        latencies = sorted(stats["latencies"])
+        summary[endpoint] = {
+            "requests": len(latencies),
+            "errors": stats["errors"],
+            "rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+    all_latencies = sorted(latency for _, latency, _ in samples)
+    summary["total"] = {
+        "requests": len(all_latencies),
+        "errors": sum(stats["errors"] for stats in summary.values()),
+        "rps": round(len(all_latencies) / elapsed, 2),
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(all_latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 2),
+    }
+    return summary
+
+async def fetch_catalogue(client: httpx.AsyncClient):
+    response = await client.get("/books", params={"fields": "title,description", "limit": 100000})
+    response.raise_for_status()
+    return response.json()["books"]
+
+async def run_load(client: httpx.AsyncClient, mix: dict, concurrency: int, duration: float, num_users: int, seed: int = 0):
+    catalogue = await fetch_catalogue(client)
+    if not catalogue:
+        raise RuntimeError("The catalogue is empty; seed the database first")
+
+    scenarios = list(mix)
+    weights = [mix[name] for name in scenarios]
+    samples = []
+    deadline = time.monotonic() + duration
+
+    async def worker(index: int):
+        rng = random.Random(seed + index)
+        user = VirtualUser(client, bench_user_email(index % num_users), catalogue, rng)
+        await user.headers()
+        while time.monotonic() < deadline:
+            scenario = getattr(user, rng.choices(scenarios, weights)[0])
+            start = time.perf_counter()
+            try:
+                endpoint, response = await scenario()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                endpoint, ok = scenario.__name__, False
+            samples.append((endpoint, time.perf_counter() - start, ok))
+
+    start = time.monotonic()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return summarize(samples, time.monotonic() - start)
+
+def in_process_client(llm_latency: float, real_pipeline: bool = False):
+    import api
+    if real_pipeline:
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://benchmark", timeout=60)
+    from app.database.connector import SessionLocal
+    from app.database.schemas.books import Book
+    from benchmarks.stubs import StubLangGraph, StubVectorManager
+
+    session = SessionLocal()
+    try:
+        titles = [title for (title,) in session.query(Book.title).all()]
+    finally:
+        session.close()
+
+    langgraph_stub = StubLangGraph(latency=llm_latency)
+    vector_stub = StubVectorManager(titles)
+    api.get_langgraph_app = lambda: langgraph_stub
+    api.get_vector_manager = lambda: vector_stub
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://benchmark", timeout=60)
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(results: dict, output_dir: str = RESULTS_DIR) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{results['timestamp'].replace(':', '')}-{results['revision']}.json")
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+    return path
+
+def print_summary(summary: dict, baseline: dict = None):
+    header = f"{'endpoint':<36}{'reqs':>8}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, stats in summary.items():
+        line = (f"{endpoint:<36}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+        previous = (baseline or {}).get(endpoint)
+        if previous and previous.get("p95_ms"):
+            change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+            line += f"   p95 {change:+.1f}% vs baseline"
+        print(line)
+
+def parse_mix(value: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    if value:
+        mix = {}
+        for part in value.split(","):
+            name, weight = part.split("=")
+            if name not in DEFAULT_MIX:
+                raise argparse.ArgumentTypeError(f"Unknown scenario {name}; choose from {', '.join(DEFAULT_MIX)}")
+            mix[name] = float(weight)
+    return mix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive a realistic request mix against the book API")
+    parser.add_argument("--url", help="Benchmark a running server instead of an in-process app")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--no-seed", action="store_true", help="Reuse the existing database contents")
+    parser.add_argument("--books", type=int, default=None, help="Seed only the first N books of books.csv")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX), help="e.g. browse=50,search=30,chat=20")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM latency in seconds (in-process only)")
+    parser.add_argument("--real-pipeline", action="store_true",
+                        help="Run the real chat/recommendation pipeline on the fake LLM and hashing embedder")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.database_url
+    if args.real_pipeline:
+        os.environ["LLM_PROVIDER"] = "fake"
+        os.environ["EMBEDDING_PROVIDER"] = "hashing"
+        os.environ.setdefault("FAKE_LLM_LATENCY", str(args.llm_latency))
+    from benchmarks.seed import seed_database
+
+    if not args.no_seed:
+        seeded_books, seeded_users = seed_database(args.database_url, num_books=args.books, num_users=args.users)
+        print(f"Seeded {seeded_books} books and {seeded_users} users into {args.database_url}")
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        client = in_process_client(args.llm_latency, args.real_pipeline)
+
+    async def run():
+        async with client:
+            return await run_load(client, args.mix, args.concurrency, args.duration, args.users)
+
+    summary = asyncio.run(run())
+    results = {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": git_revision(),
+        "target": args.url or ("in-process (fake providers)" if args.real_pipeline else "in-process (stubs)"),
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "mix": args.mix,
+        "summary": summary,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["summary"]
+    print_summary(summary, baseline)
+    print(f"Results saved to {save_results(results, args.output_dir)}")
+    return results
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
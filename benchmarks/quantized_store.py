@@ -0,0 +1,186 @@
+# Memory, cold-load time, query latency and recall@10 of the quantized vector store
+# (llm.quantized_store) with float32, float16 and int8 codes, with and without full-precision
+# rescoring, on the books.csv embeddings and on a synthetic catalogue.
+#
+#   python -m benchmarks.quantized_store --synthetic 200000
+#   python -m benchmarks.quantized_store --provider sentence_transformers
+#
+# Recall@10 is measured against exact float32 brute-force search. Memory is what a loaded store
+# holds: the in-memory arrays, and (traced separately) everything including ids and metadata.
+# The growth run re-upserts the whole catalogue --reembeds times, as re-embedding it would, and
+# reports rows, disk, memory and query latency before and after QuantizedCollection.compact().
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.load_test import RESULTS_DIR, percentile, git_revision
+from benchmarks.seed import BOOKS_CSV
+
+CONFIGURATIONS = [("float32", 0), ("float16", 0), ("float16", 4), ("int8", 0), ("int8", 4)]
+
+
+def book_dataset(args):
+    from llm.providers import get_embedder
+    with open(BOOKS_CSV, newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))[:args.books]
+    model = get_embedder(args.provider)
+    vectors = model.encode([f"{row['title']}; {row['authors']}; {row['categories']}; {row['description']}"
+                            for row in rows], batch_size=64)
+    rng = np.random.default_rng(0)
+    # Queries are what a reader might type: a title plus a genre
+    picks = rng.choice(len(rows), size=min(args.queries, len(rows)), replace=False)
+    queries = model.encode([f"{rows[index]['title']} {rows[index]['categories']}" for index in picks], batch_size=64)
+    return np.asarray(vectors, dtype=np.float32), np.asarray(queries, dtype=np.float32)
+
+def synthetic_dataset(count: int, queries: int, dimension: int, clusters: int = 500):
+    # Unit vectors scattered around cluster centres, like a catalogue of many genres
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(clusters, dimension)).astype(np.float32)
+
+    def sample(n):
+        vectors = centres[rng.integers(clusters, size=n)] + 0.8 * rng.normal(size=(n, dimension)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.concatenate([sample(min(50000, count - start)) for start in range(0, count, 50000)])
+    return vectors.astype(np.float32), sample(queries).astype(np.float32)
+
+def exact_neighbours(vectors, queries, n: int = 10):
+    norms = (vectors ** 2).sum(axis=1)
+    truth = []
+    for query in queries:
+        distances = norms - 2 * (vectors @ query)
+        top = np.argpartition(distances, n - 1)[:n]
+        truth.append(set(top[np.argsort(distances[top])].tolist()))
+    return truth
+
+def store_bytes(collection) -> int:
+    rows = collection._rows
+    arrays = [collection._codes, collection._norms, collection._scales, collection._live]
+    return sum(array[:rows].nbytes for array in arrays if array is not None)
+
+def measure(vectors, queries, truth, quantization: str, rescore_factor: int, directory: str):
+    from llm.quantized_store import QuantizedCollection
+
+    path = os.path.join(directory, quantization)
+    if not os.path.exists(path):
+        writer = QuantizedCollection(path, quantization)
+        for start in range(0, len(vectors), 10000):
+            batch = vectors[start:start + 10000]
+            writer.upsert(ids=[str(start + index) for index in range(len(batch))], embeddings=batch,
+                          metadatas=[{"book_id": start + index} for index in range(len(batch))])
+        del writer
+
+    start = time.perf_counter()
+    collection = QuantizedCollection(path, quantization, rescore_factor=rescore_factor)
+    load_ms = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    traced = QuantizedCollection(path, quantization, rescore_factor=rescore_factor)
+    total_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+
+    latencies, recalls = [], []
+    collection.query(query_embeddings=queries[:1], n_results=10, include=["metadatas"])
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=10, include=["metadatas"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({metadata["book_id"] for metadata in result["metadatas"][0]} & expected) / 10)
+    latencies.sort()
+    disk = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return {
+        "vector_mb": round(store_bytes(collection) / 2 ** 20, 2),
+        "total_mb": round(total_bytes / 2 ** 20, 2),
+        "disk_mb": round(disk / 2 ** 20, 2),
+        "load_ms": round(load_ms, 1),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "recall_at_10": round(float(np.mean(recalls)), 4),
+    }
+
+def query_p50(collection, queries) -> float:
+    collection.query(query_embeddings=queries[:1], n_results=10)
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return round(percentile(latencies, 50), 3)
+
+def measure_growth(vectors, queries, reembeds: int, directory: str, quantization: str = "int8"):
+    from llm.quantized_store import QuantizedCollection
+
+    collection = QuantizedCollection(os.path.join(directory, "growth"), quantization)
+    ids = [str(index) for index in range(len(vectors))]
+    results = {}
+    for _ in range(reembeds + 1):
+        for start in range(0, len(vectors), 10000):
+            collection.upsert(ids=ids[start:start + 10000], embeddings=vectors[start:start + 10000])
+    for label in ("appended", "compacted"):
+        if label == "compacted":
+            collection.compact()
+        stats = collection.stats()
+        results[label] = {"rows": stats["rows"], "dead_rows": stats["dead_rows"],
+                          "disk_mb": round(stats["disk_bytes"] / 2 ** 20, 2),
+                          "vector_mb": round(store_bytes(collection) / 2 ** 20, 2),
+                          "p50_ms": query_p50(collection, queries)}
+        print(f"  growth {label:<10} rows {stats['rows']:>9}   dead {stats['dead_rows']:>9}   "
+              f"disk {results[label]['disk_mb']:>8.2f} MB   vectors {results[label]['vector_mb']:>8.2f} MB   "
+              f"p50 {results[label]['p50_ms']:>7.3f} ms")
+    return results
+
+def run(name: str, vectors, queries, directory: str, reembeds: int = 0):
+    truth = exact_neighbours(vectors, queries)
+    results = {}
+    print(f"{name}: {len(vectors)} vectors x {vectors.shape[1]}, {len(queries)} queries")
+    for quantization, rescore_factor in CONFIGURATIONS:
+        label = quantization if not rescore_factor else f"{quantization}+rescore{rescore_factor}"
+        results[label] = stats = measure(vectors, queries, truth, quantization, rescore_factor,
+                                         os.path.join(directory, name))
+        print(f"  {label:<17} vectors {stats['vector_mb']:>8.2f} MB   total {stats['total_mb']:>8.2f} MB   "
+              f"load {stats['load_ms']:>8.1f} ms   p50 {stats['p50_ms']:>7.3f} ms   p95 {stats['p95_ms']:>7.3f} ms   "
+              f"recall@10 {stats['recall_at_10']:.4f}")
+    if reembeds:
+        results["growth"] = measure_growth(vectors, queries, reembeds, os.path.join(directory, name))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark quantized vector storage")
+    parser.add_argument("--provider", default="hashing")
+    parser.add_argument("--books", type=int, default=None)
+    parser.add_argument("--synthetic", type=int, default=200000, help="Synthetic catalogue size (0 to skip)")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--reembeds", type=int, default=2, help="Catalogue re-upserts for the growth run (0 to skip)")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="quantized-store-")
+    try:
+        results = {"books": run("books", *book_dataset(args), directory, args.reembeds)}
+        if args.synthetic:
+            results["synthetic"] = run("synthetic", *synthetic_dataset(args.synthetic, args.queries, args.dimension),
+                                       directory, args.reembeds)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    output = {"timestamp": timestamp, "revision": git_revision(), "provider": args.provider, "results": results}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"quantized-store-{timestamp.replace(':', '')}-{output['revision']}.json")
+    with open(path, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results saved to {path}")
+    return output
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,73 @@
+import csv
+import os
+
+from app.database.connector import connect_to_db
+from app.database.schemas.base import Base
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from app.database.schemas.genre import Genre
+from app.database.schemas.user import User
+from app.database.schemas.book_author_association import book_author_association
+from app.database.schemas.logs import RequestLog
+from app.database.schemas.preferences import Preferences
+from app.utils.hash import deterministic_hash
+from benchmarks import bench_user_email, BENCH_PASSWORD
+
+BOOKS_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'books.csv')
+
+def _to_number(value, cast, default):
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return default
+
+def seed_database(database_url: str, csv_path: str = BOOKS_CSV, num_books: int = None, num_users: int = 16):
+    engine, SessionLocal = connect_to_db(database_url=database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        if num_books is not None:
+            rows = rows[:num_books]
+
+        authors = {}
+        genres = {}
+        for row in rows:
+            genre_name = row['categories'].strip()
+            if genre_name and genre_name not in genres:
+                genres[genre_name] = Genre(name=genre_name)
+            book = Book(
+                isbn13=row['isbn13'] or None,
+                title=row['title'],
+                subtitle=row['subtitle'],
+                thumbnail=row['thumbnail'],
+                genre=row['categories'],
+                genre_ref=genres.get(genre_name),
+                published_year=_to_number(row['published_year'], int, 0),
+                description=row['description'],
+                average_rating=_to_number(row['average_rating'], float, 0.0),
+                num_pages=_to_number(row['num_pages'], int, 0),
+                ratings_count=_to_number(row['ratings_count'], int, 0),
+            )
+            for name in filter(None, (name.strip() for name in row['authors'].split(';'))):
+                if name not in authors:
+                    authors[name] = Author(name=name)
+                book.authors.append(authors[name])
+            session.add(book)
+
+        for index in range(num_users):
+            session.add(User(
+                email=bench_user_email(index),
+                fname=f"bench_{index}",
+                lname="user",
+                hashed_pw=deterministic_hash(BENCH_PASSWORD),
+                role=0,
+            ))
+        session.commit()
+        return len(rows), num_users
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,78 @@
+import hashlib
+import time
+
+# Network-free stand-ins for the LangGraph workflow and the vector store so the benchmark
+# measures the API itself. Latencies are fixed and configurable.
+
+class StubLangGraph:
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+
+    def invoke(self, state: dict) -> dict:
+        time.sleep(self.latency)
+        return {**state, "response": f"Stub answer to: {state.get('question')}"}
+
+class StubVectorManager:
+    def __init__(self, titles, latency: float = 0.01):
+        self.titles = list(titles)
+        self.latency = latency
+
+    def recommend_books(self, query: str, num_results: int = 2):
+        time.sleep(self.latency)
+        start = int(hashlib.sha1(query.encode('utf-8')).hexdigest(), 16) % max(len(self.titles), 1)
+        return [self.titles[(start + offset) % len(self.titles)] for offset in range(min(num_results, len(self.titles)))]
+
+class StubCollection:
+    # In-memory, brute-force stand-in for the Chroma collection methods the app calls (keyword
+    # arguments, Chroma's result shapes, squared L2 distances)
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+        self.embeddings = None
+        self.metadatas = []
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        import numpy as np
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [None] * len(ids)
+        if self.embeddings is None:
+            self.embeddings = np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+        new = []
+        for vector_id, embedding, metadata in zip(ids, embeddings, metadatas):
+            position = self.positions.get(vector_id)
+            if position is None:
+                self.positions[vector_id] = len(self.ids) + len(new)
+                new.append(embedding)
+                self.ids.append(vector_id)
+                self.metadatas.append(metadata)
+            else:
+                self.embeddings[position] = embedding
+                self.metadatas[position] = metadata
+        if new:
+            self.embeddings = np.vstack([self.embeddings, np.stack(new)])
+
+    add = upsert
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=0):
+        positions = [self.positions[vector_id] for vector_id in ids if vector_id in self.positions] \
+            if ids is not None else list(range(len(self.ids)))[offset:None if limit is None else offset + limit]
+        result = {"ids": [self.ids[position] for position in positions]}
+        if "embeddings" in include:
+            result["embeddings"] = [self.embeddings[position] for position in positions]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[position] for position in positions]
+        return result
+
+    def query(self, query_embeddings, n_results=10, include=("metadatas", "distances")):
+        import numpy as np
+        result = {"ids": [], "metadatas": [], "distances": []}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            distances = ((self.embeddings - query) ** 2).sum(axis=1)
+            order = np.argsort(distances)[:n_results]
+            result["ids"].append([self.ids[position] for position in order])
+            result["metadatas"].append([self.metadatas[position] for position in order])
+            result["distances"].append([float(distances[position]) for position in order])
+        return {key: value for key, value in result.items() if key == "ids" or key in include}
@@ -0,0 +1,161 @@
+# Size and latency of vector query results with the old payload (document text plus every book
+# field as metadata, hydrated by title) and the slim one (book id plus filter fields, hydrated by
+# primary key).
+#
+#   python -m benchmarks.vector_payload --queries 200 --n-results 50
+#
+# Payload sizes are computed from books.csv. The query timings need chromadb (an in-memory client
+# with one collection per payload shape) and are skipped when it is not installed; hydration is
+# timed against the seeded benchmark database.
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.load_test import DEFAULT_DATABASE_URL, RESULTS_DIR, percentile, git_revision
+from benchmarks.seed import BOOKS_CSV
+
+
+def legacy_payload(row: dict):
+    # What app/pgAdmi4/SaveDataToVectorstore.py used to store per vector
+    document = f"{row['title']}; {row['authors']}; {row['categories']}; {row['description']}"
+    metadata = {key: row[key] for key in (
+        "isbn13", "isbn10", "title", "subtitle", "authors", "categories", "thumbnail", "description",
+        "published_year", "average_rating", "num_pages", "ratings_count",
+    )}
+    return document, metadata
+
+def slim_payload(book_id: int, row: dict):
+    metadata = {"book_id": book_id, "genre_id": 1, "published_year": row["published_year"],
+                "average_rating": row["average_rating"]}
+    return None, {key: value for key, value in metadata.items() if value not in ("", None)}
+
+def payload_bytes(vector_id: str, document, metadata) -> int:
+    # One hit as it crosses the client boundary: id, distance, metadata and (if stored) document
+    hit = {"id": vector_id, "distance": 0.0, "metadata": metadata}
+    if document is not None:
+        hit["document"] = document
+    return len(json.dumps(hit).encode("utf-8"))
+
+def time_queries(collection, vectors, queries: int, n_results: int, include):
+    samples = []
+    for query in vectors[:queries]:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query.tolist()], n_results=n_results, include=include)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"p50_ms": round(percentile(samples, 50), 3), "p95_ms": round(percentile(samples, 95), 3)}
+
+def chroma_latency(rows, queries: int, n_results: int, dimension: int):
+    try:
+        import chromadb
+    except ImportError:
+        print("query latency: skipped (chromadb is not installed)")
+        return None
+    from llm.providers import HashingEmbedder
+
+    model = HashingEmbedder(dimension=dimension)
+    embeddings = model.encode([legacy_payload(row)[0] for row in rows])
+    client = chromadb.EphemeralClient()
+    # The legacy client asked for Chroma's default include, which returns the documents too
+    shapes = {"legacy": ["metadatas", "documents", "distances"], "slim": ["metadatas", "distances"]}
+    results = {}
+    for name, include in shapes.items():
+        collection = client.create_collection(f"payload_{name}")
+        for start in range(0, len(rows), 1000):
+            batch = rows[start:start + 1000]
+            payloads = [legacy_payload(row) if name == "legacy" else slim_payload(start + index + 1, row)
+                        for index, row in enumerate(batch)]
+            collection.add(
+                ids=[row["isbn13"] for row in batch],
+                embeddings=embeddings[start:start + len(batch)].tolist(),
+                documents=[document for document, _ in payloads] if name == "legacy" else None,
+                metadatas=[{key: value for key, value in metadata.items() if value not in ("", None)}
+                           for _, metadata in payloads],
+            )
+        queries_vectors = embeddings[random.Random(0).sample(range(len(rows)), min(queries, len(rows)))]
+        time_queries(collection, queries_vectors, 10, n_results, include)
+        results[name] = time_queries(collection, queries_vectors, queries, n_results, include)
+    return results
+
+def hydration_latency(database_url: str, rows, queries: int, n_results: int):
+    # Old: Book.title IN (titles from metadata); new: Book.id IN (book ids from metadata)
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    from app.database.connector import connect_to_db
+    from app.database.schemas.books import Book
+
+    engine, SessionLocal = connect_to_db(database_url=database_url)
+    rng = random.Random(0)
+    with SessionLocal() as session:
+        by_isbn = dict(session.execute(select(Book.isbn13, Book.id)).all())
+        hits = [[rows[index] for index in rng.sample(range(len(rows)), n_results)] for _ in range(queries)]
+        results = {}
+        for name in ("legacy", "slim"):
+            samples = []
+            for batch in hits:
+                condition = Book.title.in_([row["title"] for row in batch]) if name == "legacy" else \
+                    Book.id.in_([by_isbn[row["isbn13"]] for row in batch])
+                start = time.perf_counter()
+                session.scalars(select(Book).where(condition).options(selectinload(Book.authors))).all()
+                samples.append((time.perf_counter() - start) * 1000)
+                session.expunge_all()
+            samples.sort()
+            results[name] = {"p50_ms": round(percentile(samples, 50), 3), "p95_ms": round(percentile(samples, 95), 3)}
+    engine.dispose()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare legacy and slim vector payloads")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--books", type=int, default=None)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=50)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    with open(BOOKS_CSV, newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))[:args.books]
+
+    legacy = [payload_bytes(row["isbn13"], *legacy_payload(row)) for row in rows]
+    slim = [payload_bytes(row["isbn13"], *slim_payload(index, row)) for index, row in enumerate(rows, 1)]
+    payload = {
+        "legacy_bytes_per_hit": round(float(np.mean(legacy)), 1),
+        "slim_bytes_per_hit": round(float(np.mean(slim)), 1),
+        "legacy_bytes_per_query": round(float(np.mean(legacy)) * args.n_results),
+        "slim_bytes_per_query": round(float(np.mean(slim)) * args.n_results),
+    }
+    print(f"payload  legacy {payload['legacy_bytes_per_hit']:>8.1f} B/hit   slim {payload['slim_bytes_per_hit']:>6.1f} B/hit"
+          f"   ({payload['legacy_bytes_per_hit'] / payload['slim_bytes_per_hit']:.1f}x smaller)")
+
+    os.environ["DATABASE_URL"] = args.database_url
+    if not args.no_seed:
+        from benchmarks.seed import seed_database
+        seed_database(args.database_url, num_books=args.books, num_users=1)
+    hydration = hydration_latency(args.database_url, rows, args.queries, min(args.n_results, len(rows)))
+    for name, stats in hydration.items():
+        print(f"hydrate  {name:<7} p50 {stats['p50_ms']:>7.3f} ms   p95 {stats['p95_ms']:>7.3f} ms")
+    query = chroma_latency(rows, args.queries, args.n_results, args.dimension)
+    for name, stats in (query or {}).items():
+        print(f"query    {name:<7} p50 {stats['p50_ms']:>7.3f} ms   p95 {stats['p95_ms']:>7.3f} ms")
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    output = {"timestamp": timestamp, "revision": git_revision(), "books": len(rows), "n_results": args.n_results,
+              "payload": payload, "hydration": hydration, "query": query}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"vector-payload-{timestamp.replace(':', '')}-{output['revision']}.json")
+    with open(path, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results saved to {path}")
+    return output
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,155 @@
+# Memory of API worker processes that each load the embedding model and vector index themselves,
+# versus workers that use the shared vector sidecar (llm.vector_sidecar).
+#
+#   python -m benchmarks.vector_sidecar --workers 4
+#   python -m benchmarks.vector_sidecar --provider sentence_transformers --collection chroma
+#
+# Every worker builds its vector manager and runs --queries embed + query calls, then its RSS and
+# PSS (shared pages split between the processes using them) are read from /proc. With the default
+# hashing provider the model weights are simulated by --model-mb of float32 (all-MiniLM-L6-v2 is
+# about 90 MB), and the default stub collection holds the books.csv embeddings in memory.
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.load_test import RESULTS_DIR, percentile, git_revision
+from benchmarks.seed import BOOKS_CSV
+
+AUTHKEY = "benchmark"
+
+
+class BallastModel:
+    # HashingEmbedder plus resident float32 weights of a real model's size
+    def __init__(self, embedder, model_mb: float):
+        self.embedder = embedder
+        self.weights = np.ones(int(model_mb * 2 ** 20 / 4), dtype=np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        return self.embedder.encode(sentences, batch_size=batch_size)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.embedder.get_sentence_embedding_dimension()
+
+def build_manager(args):
+    from llm.providers import HashingEmbedder, get_embedder
+    from llm.vector_data_manager import VectorDataManager, open_collection
+    from benchmarks.stubs import StubCollection
+
+    if args.provider == "hashing":
+        model = BallastModel(HashingEmbedder(), args.model_mb)
+    else:
+        model = get_embedder(args.provider)
+    if args.collection == "chroma":
+        collection = open_collection()
+    else:
+        with open(BOOKS_CSV, newline="", encoding="utf-8") as file:
+            rows = list(csv.DictReader(file))[:args.books]
+        collection = StubCollection()
+        texts = [f"{row['title']}; {row['authors']}; {row['categories']}; {row['description']}" for row in rows]
+        collection.upsert(ids=[row["isbn13"] for row in rows], embeddings=model.encode(texts, batch_size=64),
+                          metadatas=[{"book_id": index} for index in range(1, len(rows) + 1)])
+    return VectorDataManager(model=model, collection=collection)
+
+def memory_kb(pid: int):
+    with open(f"/proc/{pid}/status") as file:
+        rss = next(int(line.split()[1]) for line in file if line.startswith("VmRSS:"))
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            pss = next(int(line.split()[1]) for line in file if line.startswith("Pss:"))
+    except (OSError, StopIteration):
+        pss = None
+    return rss, pss
+
+def sidecar_process(args, address, ready, done):
+    from llm.vector_sidecar import VectorSidecar
+    sidecar = VectorSidecar(build_manager(args), address=address, authkey=AUTHKEY)
+    sidecar.start()
+    ready.set()
+    done.wait()
+    sidecar.close()
+
+def worker_process(args, mode, address, results, done):
+    from llm.vector_sidecar import sidecar_vector_manager
+    manager = build_manager(args) if mode == "in-process" else sidecar_vector_manager(address, AUTHKEY)
+    samples = []
+    for index in range(args.queries):
+        start = time.perf_counter()
+        manager.query_collection("benchmark", manager.embed_query(f"a novel about topic {index}"), 10)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    results.put((os.getpid(), round(percentile(samples, 50), 3)))
+    done.wait()
+
+def measure(args, mode: str):
+    context = multiprocessing.get_context("spawn")
+    done = context.Event()
+    results = context.Queue()
+    address = os.path.join(tempfile.mkdtemp(), "vectors.sock")
+    sidecar = None
+    if mode == "sidecar":
+        ready = context.Event()
+        sidecar = context.Process(target=sidecar_process, args=(args, address, ready, done))
+        sidecar.start()
+        if not ready.wait(300):
+            raise RuntimeError("Vector sidecar did not start")
+    workers = [context.Process(target=worker_process, args=(args, mode, address, results, done))
+               for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    latencies = dict(results.get(timeout=600) for _ in workers)
+    # Read while every process is still alive and holding its memory
+    worker_memory = [memory_kb(worker.pid) for worker in workers]
+    sidecar_memory = memory_kb(sidecar.pid) if sidecar else (0, 0)
+    done.set()
+    for process in workers + ([sidecar] if sidecar else []):
+        process.join()
+
+    worker_rss = [rss for rss, _ in worker_memory]
+    worker_pss = [pss or 0 for _, pss in worker_memory]
+    return {
+        "worker_rss_mb": round(sum(worker_rss) / len(worker_rss) / 1024, 1),
+        "sidecar_rss_mb": round(sidecar_memory[0] / 1024, 1),
+        "total_rss_mb": round((sum(worker_rss) + sidecar_memory[0]) / 1024, 1),
+        "total_pss_mb": round((sum(worker_pss) + (sidecar_memory[1] or 0)) / 1024, 1),
+        "query_p50_ms": round(sorted(latencies.values())[len(latencies) // 2], 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare worker memory with and without the vector sidecar")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--provider", default="hashing")
+    parser.add_argument("--model-mb", type=float, default=90)
+    parser.add_argument("--collection", choices=("stub", "chroma"), default="stub")
+    parser.add_argument("--books", type=int, default=None)
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for mode in ("in-process", "sidecar"):
+        results[mode] = stats = measure(args, mode)
+        print(f"{mode:<10}  worker RSS {stats['worker_rss_mb']:>7.1f} MB   sidecar RSS {stats['sidecar_rss_mb']:>7.1f} MB   "
+              f"total RSS {stats['total_rss_mb']:>7.1f} MB   total PSS {stats['total_pss_mb']:>7.1f} MB   "
+              f"query p50 {stats['query_p50_ms']:>6.3f} ms")
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    output = {"timestamp": timestamp, "revision": git_revision(), "workers": args.workers, "provider": args.provider,
+              "model_mb": args.model_mb if args.provider == "hashing" else None, "collection": args.collection,
+              "results": results}
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"vector-sidecar-{timestamp.replace(':', '')}-{output['revision']}.json")
+    with open(path, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results saved to {path}")
+    return output
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from app.config import EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS
+from app.utils.metrics import EMBEDDING_BATCH_SIZE
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Query embeddings requested at the same time are encoded in one model call. Callers queue their
+# text and block on (or await) a future; one worker thread takes everything queued - waiting up to
+# max_wait after the first text for more to arrive, or until max_batch_size texts - encodes the
+# distinct texts together and hands each caller its row. While a batch is encoding the next one
+# fills, so under load batches grow without any extra waiting. The max_wait pause is only taken
+# after a batch of more than one text: a lone caller on an idle worker is encoded straight away.
+
+class EmbeddingBatcher:
+    def __init__(self, model, max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_wait: float = EMBEDDING_BATCH_MAX_WAIT_MS / 1000):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._pid = None
+        self._closed = False
+        self._last_batch_size = 0
+
+    def _ensure_worker(self):
+        # Started on first use, again in a forked worker process, where the thread is gone, and
+        # again if the thread has died
+        if self._worker is None or self._pid != os.getpid() or not self._worker.is_alive():
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Embedding batcher is closed")
+            self._pending.append((text, future))
+            self._ensure_worker()
+            self._condition.notify()
+        return future
+
+    def encode(self, text: str, timeout: float = None) -> list:
+        return self.submit(text).result(timeout)
+
+    async def encode_async(self, text: str) -> list:
+        return await asyncio.wrap_future(self.submit(text))
+
+    def close(self):
+        # Pending texts are still encoded before the worker exits
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._worker is not None and self._pid == os.getpid():
+            self._worker.join()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._pending and not self._closed:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            deadline = time.monotonic() + (self.max_wait if self._last_batch_size > 1 else 0)
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))]
+            self._last_batch_size = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._encode(batch)
+            except Exception as e:
+                # Nothing may end the worker while callers are queued behind it
+                logger.exception("Embedding batch could not be delivered", extra={"texts": len(batch)})
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _encode(self, batch):
+        # Callers that gave up (a cancelled encode_async) are dropped; the rest can no longer be
+        # cancelled, so setting their result cannot fail
+        batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            with span("vector.encode_batch", **{"vector.batch_size": len(texts)}):
+                vectors = self.model.encode(texts, batch_size=len(texts))
+        except Exception as e:
+            logger.exception("Batched embedding failed", extra={"texts": len(texts)})
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+        rows = {text: vector.tolist() for text, vector in zip(texts, vectors)}
+        for text, future in batch:
+            future.set_result(rows[text])
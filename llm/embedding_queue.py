@@ -0,0 +1,100 @@
+import logging
+
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import EMBEDDING_QUEUE_BATCH_SIZE
+from app.database.schemas.book_import import BookEmbeddingQueue
+from app.database.schemas.book_neighbors import BookNeighborQueue
+from app.database.schemas.books import Book
+
+logger = logging.getLogger(__name__)
+
+# Books written by bulk imports are queued in book_embedding_queue and embedded here in batches.
+# Vectors carry only the book id plus the fields a vector query may filter on; titles, descriptions
+# and the rest are read from Postgres by primary key when results are shown.
+
+def book_document(book: Book) -> str:
+    authors = ";".join(author.name for author in book.authors)
+    return f"{book.title}; {authors}; {book.genre or ''}; {book.description or ''}"
+
+def book_vector_id(book: Book) -> str:
+    # Vectors are keyed by isbn13; books added by hand have none
+    return vector_id(book.id, book.isbn13)
+
+def vector_id(book_id: int, isbn13: str = None) -> str:
+    return isbn13 or f"book-{book_id}"
+
+def vector_ids_for_books(session: Session, book_ids) -> dict:
+    # {book id: vector id}
+    rows = session.execute(select(Book.id, Book.isbn13).where(Book.id.in_(list(book_ids))))
+    return {book_id: vector_id(book_id, isbn13) for book_id, isbn13 in rows}
+
+def book_ids_for_vectors(session: Session, vector_ids) -> dict:
+    # {vector id: book id}, for the ids that still belong to a book
+    keys = [str(key) for key in vector_ids]
+    by_id = [int(key[5:]) for key in keys if key.startswith("book-") and key[5:].isdigit()]
+    isbns = [key for key in keys if not key.startswith("book-")]
+    mapping = {}
+    if by_id:
+        mapping.update((f"book-{book_id}", book_id) for book_id in session.scalars(select(Book.id).where(Book.id.in_(by_id))))
+    if isbns:
+        mapping.update(session.execute(select(Book.isbn13, Book.id).where(Book.isbn13.in_(isbns))).all())
+    return mapping
+
+def book_metadata(book: Book) -> dict:
+    metadata = {
+        "book_id": book.id,
+        "genre_id": book.genre_id,
+        "published_year": book.published_year,
+        "average_rating": book.average_rating,
+    }
+    # Chroma rejects None metadata values
+    return {key: value for key, value in metadata.items() if value is not None}
+
+def book_ids_for_hits(session: Session, vector_ids, metadatas=None) -> list:
+    # Book ids of a query result, in result order. Slim vectors name their book in metadata;
+    # older ones (full metadata, no book_id) are looked up by vector id in one query.
+    metadatas = metadatas or [None] * len(vector_ids)
+    book_ids = [(metadata or {}).get("book_id") for metadata in metadatas]
+    missing = [vector_id for vector_id, book_id in zip(vector_ids, book_ids) if book_id is None]
+    if missing:
+        legacy = book_ids_for_vectors(session, missing)
+        book_ids = [legacy.get(str(vector_id)) if book_id is None else book_id
+                    for vector_id, book_id in zip(vector_ids, book_ids)]
+    return [int(book_id) for book_id in book_ids if book_id is not None]
+
+def drain_embedding_queue(session: Session, manager=None, batch_size: int = EMBEDDING_QUEUE_BATCH_SIZE,
+                          on_progress=None) -> int:
+    if manager is None:
+        from llm.loader import get_vector_manager
+        manager = get_vector_manager()
+
+    embedded = 0
+    while True:
+        book_ids = session.scalars(
+            select(BookEmbeddingQueue.book_id).order_by(BookEmbeddingQueue.queued_at).limit(batch_size)
+        ).all()
+        if not book_ids:
+            return embedded
+        books = session.scalars(
+            select(Book).where(Book.id.in_(book_ids)).options(selectinload(Book.authors))
+        ).all()
+        if books:
+            # The embedded text is not stored with the vector; it is rebuilt from the book when needed
+            documents = [book_document(book) for book in books]
+            manager.collection.upsert(
+                ids=[book_vector_id(book) for book in books],
+                embeddings=manager.model.encode(documents, batch_size=64).tolist(),
+                metadatas=[book_metadata(book) for book in books],
+            )
+        # Ids of books deleted since they were queued are dropped too; their neighbour lists
+        # (and those of books near them) are recomputed by llm.neighbors
+        session.execute(delete(BookEmbeddingQueue).where(BookEmbeddingQueue.book_id.in_(book_ids)))
+        session.execute(delete(BookNeighborQueue).where(BookNeighborQueue.book_id.in_(book_ids)))
+        session.execute(insert(BookNeighborQueue), [{"book_id": book_id} for book_id in book_ids])
+        session.commit()
+        embedded += len(books)
+        logger.info("Embedded queued books", extra={"books": len(books), "total": embedded})
+        if on_progress is not None:
+            on_progress(embedded)
@@ -0,0 +1,256 @@
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import ENTITY_MIN_SCORE, ENTITY_INDEX_TTL, ENTITY_ALIASES_PATH
+from app.database.catalogue import CatalogueIndex
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from app.utils.metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+# Resolves the entity the intent extractor pulled out of a question ("the hobit", "jk rowling") to
+# catalogue books and authors without touching the database: every title/name is reduced to a
+# normalized key, keys are indexed by character trigram, and the best trigram matches are rescored
+# by edit distance. Aliases (title without subtitle, author surname, curated ENTITY_ALIASES_PATH
+# entries) are extra keys pointing at the same entity.
+
+ENTITY_RESOLVE_DURATION = histogram("entity_resolve_duration_seconds", "Fuzzy entity resolution latency", ("kind",))
+
+BOOK = "book"
+AUTHOR = "author"
+LEADING_ARTICLES = ("the", "a", "an")
+# Alias keys rank just below the entity's own name
+ALIAS_WEIGHT = 0.95
+SURNAME_WEIGHT = 0.9
+MAIN_TITLE_END = re.compile(r"\s*(?::|\(|,\s*or\b)", re.IGNORECASE)
+# Trigram matches rescored by edit distance
+RESCORE_CANDIDATES = 8
+
+def normalize_key(text: str) -> str:
+    # Case, accents, punctuation and a leading article do not tell entities apart
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold().replace("&", " and ")
+    tokens = re.findall(r"\w+", text)
+    if len(tokens) > 1 and tokens[0] in LEADING_ARTICLES:
+        tokens = tokens[1:]
+    return " ".join(tokens)
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+def edit_distance(a: str, b: str) -> int:
+    # Levenshtein distance, bit-parallel (Myers 1999): one pass over b with a's positions as bits
+    if not a or not b:
+        return len(a) + len(b)
+    positions = {}
+    for index, char in enumerate(a):
+        positions[char] = positions.get(char, 0) | (1 << index)
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    plus, minus, distance = mask, 0, len(a)
+    for char in b:
+        equal = positions.get(char, 0)
+        vertical = equal | minus
+        horizontal = (((equal & plus) + plus) ^ plus) | equal
+        horizontal_plus = minus | ~(horizontal | plus)
+        horizontal_minus = plus & horizontal
+        if horizontal_plus & last:
+            distance += 1
+        elif horizontal_minus & last:
+            distance -= 1
+        horizontal_plus = (horizontal_plus << 1) | 1
+        horizontal_minus <<= 1
+        plus = (horizontal_minus | ~(vertical | horizontal_plus)) & mask
+        minus = horizontal_plus & vertical
+    return distance
+
+def similarity(a: str, b: str) -> float:
+    # 1 - edit distance / longer length
+    longest = max(len(a), len(b))
+    return 1 - edit_distance(a, b) / longest if longest else 1.0
+
+
+@dataclass
+class Entity:
+    kind: str
+    id: int
+    name: str
+    # Breaks ties between equally good matches, e.g. several editions with one title
+    popularity: int = 0
+
+@dataclass
+class Candidate:
+    kind: str
+    id: int
+    name: str
+    score: float
+    matched: str
+
+
+def book_keys(title: str, subtitle: str = None):
+    yield normalize_key(title), 1.0
+    if subtitle:
+        yield normalize_key(f"{title} {subtitle}"), ALIAS_WEIGHT
+    # "The Hobbit, Or, There and Back Again" and "Dune (Deluxe Edition)" are asked for as the main title
+    main_title = MAIN_TITLE_END.split(title, 1)[0]
+    if main_title != title:
+        yield normalize_key(main_title), ALIAS_WEIGHT
+
+def author_keys(name: str):
+    key = normalize_key(name)
+    yield key, 1.0
+    tokens = key.split()
+    # "J. R. R. Tolkien" is also "jrr tolkien"
+    initials = [token for token in tokens[:-1] if len(token) == 1]
+    if initials and len(initials) == len(tokens) - 1:
+        yield f"{''.join(initials)} {tokens[-1]}", ALIAS_WEIGHT
+    if len(tokens) > 1 and len(tokens[-1]) > 3:
+        yield tokens[-1], SURNAME_WEIGHT
+
+
+class EntityIndex:
+    def __init__(self, entities, keys):
+        # keys: (entity position, key, weight); several keys can point at one entity
+        self.entities = list(entities)
+        self.keys = [key for _, key, _ in keys]
+        self.owners = np.array([position for position, _, _ in keys], dtype=np.int32)
+        self.weights = np.array([weight for _, _, weight in keys], dtype=np.float32)
+        kinds = np.array([self.entities[position].kind for position, _, _ in keys] or [], dtype=object)
+        self.kind_masks = {kind: kinds == kind for kind in (BOOK, AUTHOR)}
+        self.exact = defaultdict(list)
+        postings = defaultdict(list)
+        self.sizes = np.zeros(len(self.keys), dtype=np.float32)
+        for index, key in enumerate(self.keys):
+            self.exact[key].append(index)
+            grams = trigrams(key)
+            self.sizes[index] = len(grams)
+            for gram in grams:
+                postings[gram].append(index)
+        self.postings = {gram: np.array(indexes, dtype=np.int32) for gram, indexes in postings.items()}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def resolve(self, query: str, kind: str = None, limit: int = 5, min_score: float = 0.0):
+        # Ranked candidates, one per entity, best first
+        key = normalize_key(query)
+        if not key or not self.keys:
+            return []
+        grams = trigrams(key)
+        shared = np.zeros(len(self.keys), dtype=np.float32)
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is not None:
+                shared[posting] += 1
+        if kind is not None:
+            shared[~self.kind_masks[kind]] = 0
+        jaccard = shared / (len(grams) + self.sizes - shared)
+
+        matched = np.flatnonzero(shared)
+        if len(matched) > RESCORE_CANDIDATES:
+            matched = matched[np.argpartition(-jaccard[matched], RESCORE_CANDIDATES - 1)[:RESCORE_CANDIDATES]]
+        exact = [index for index in self.exact.get(key, []) if kind is None or self.kind_masks[kind][index]]
+        best = {}
+        for index in set(matched.tolist()) | set(exact):
+            score = 1.0 if index in exact else max(float(jaccard[index]), similarity(key, self.keys[index]))
+            score *= float(self.weights[index])
+            owner = int(self.owners[index])
+            if score >= min_score and score > best.get(owner, (0.0, None))[0]:
+                best[owner] = (score, self.keys[index])
+        ranked = sorted(best.items(), key=lambda item: (
+            -item[1][0], -self.entities[item[0]].popularity, len(self.entities[item[0]].name), item[0]
+        ))
+        return [
+            Candidate(self.entities[owner].kind, self.entities[owner].id, self.entities[owner].name, round(score, 4), matched_key)
+            for owner, (score, matched_key) in ranked[:limit]
+        ]
+
+
+def load_aliases(path: str = ENTITY_ALIASES_PATH) -> dict:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as handle:
+        aliases = json.load(handle)
+    return {BOOK: aliases.get("books", {}), AUTHOR: aliases.get("authors", {})}
+
+def build_entity_index(books, authors, aliases=None) -> EntityIndex:
+    # books: (id, title, subtitle, ratings count), authors: (id, name);
+    # aliases: {kind: {alias: title or name}}
+    entities, keys = [], []
+    by_name = {BOOK: defaultdict(list), AUTHOR: defaultdict(list)}
+    for book_id, title, subtitle, ratings_count in books:
+        if not title:
+            continue
+        position = len(entities)
+        entities.append(Entity(BOOK, book_id, title, ratings_count or 0))
+        by_name[BOOK][normalize_key(title)].append(position)
+        keys.extend((position, key, weight) for key, weight in book_keys(title, subtitle) if key)
+    for author_id, name in authors:
+        if not name:
+            continue
+        position = len(entities)
+        entities.append(Entity(AUTHOR, author_id, name))
+        by_name[AUTHOR][normalize_key(name)].append(position)
+        keys.extend((position, key, weight) for key, weight in author_keys(name) if key)
+    for kind, table in (aliases or {}).items():
+        for alias, target in table.items():
+            for position in by_name[kind].get(normalize_key(target), []):
+                keys.append((position, normalize_key(alias), ALIAS_WEIGHT))
+    # The same key twice for one entity (e.g. a surname that is the whole name) is kept once
+    unique = {}
+    for position, key, weight in keys:
+        if key and weight > unique.get((position, key), 0):
+            unique[(position, key)] = weight
+    return EntityIndex(entities, [(position, key, weight) for (position, key), weight in unique.items()])
+
+def load_entity_index(session: Session, aliases=None) -> EntityIndex:
+    books = session.execute(select(Book.id, Book.title, Book.subtitle, Book.ratings_count)).all()
+    authors = session.execute(select(Author.id, Author.name)).all()
+    return build_entity_index(books, authors, aliases)
+
+
+class EntityResolver(CatalogueIndex):
+    # Only the first lookup waits for the index to be built
+    description = "Entity index"
+    thread_name = "entity-index"
+
+    def __init__(self, session_factory=None, ttl: float = ENTITY_INDEX_TTL, min_score: float = ENTITY_MIN_SCORE,
+                 aliases=None):
+        super().__init__(session_factory, ttl)
+        self.min_score = min_score
+        self._aliases = aliases
+
+    def build(self, session: Session) -> EntityIndex:
+        if self._aliases is None:
+            self._aliases = load_aliases()
+        return load_entity_index(session, self._aliases)
+
+    def describe(self, index: EntityIndex) -> dict:
+        return {"entities": len(index), "keys": len(index.keys)}
+
+    def resolve(self, query: str, kind: str = None, limit: int = 5, min_score: float = 0.0):
+        start = time.perf_counter()
+        try:
+            return self.index.resolve(query, kind, limit, min_score)
+        finally:
+            ENTITY_RESOLVE_DURATION.observe(time.perf_counter() - start, kind=kind or "any")
+
+    def best(self, query: str, kind: str = None):
+        # The top candidate when it is a confident match, else None
+        candidates = self.resolve(query, kind, limit=1, min_score=self.min_score)
+        return candidates[0] if candidates else None
+
+
+def get_entity_resolver() -> EntityResolver:
+    return EntityResolver.shared()
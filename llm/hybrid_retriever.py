@@ -0,0 +1,273 @@
+import contextvars
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import HYBRID_RRF_K, HYBRID_CANDIDATES, HYBRID_MIN_VECTOR_SIMILARITY, HYBRID_INDEX_TTL
+from app.database.catalogue import CatalogueIndex
+from app.database.schemas.author import Author
+from app.database.schemas.book_author_association import book_author_association
+from app.database.schemas.books import Book
+from app.utils.metrics import histogram
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# One call does what retrieve_book_info used to do as exact title -> ilike -> vector round trips:
+# an in-memory BM25 index over title/authors/genre/description and the vector query run side by
+# side and are merged with reciprocal rank fusion, score(book) = sum over lists of 1 / (k + rank).
+
+RETRIEVAL_STAGE_DURATION = histogram("retrieval_stage_duration_seconds", "Hybrid retrieval latency by stage", ("stage",))
+
+# Title matches count more than author matches, which count more than genre/description ones
+FIELD_WEIGHTS = {"title": 3.0, "authors": 2.0, "genre": 1.0, "description": 1.0}
+STOPWORDS = frozenset("a an and are as at be by for from in is of on or the to with".split())
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Long queries (e.g. a description used as the query) are cut to their first distinct terms
+MAX_QUERY_TERMS = 64
+
+def tokenize(text: str):
+    return [token for token in re.findall(r"\w+", (text or "").lower()) if token not in STOPWORDS]
+
+def normalize_title(text: str) -> str:
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+@dataclass
+class IndexedBook:
+    id: int
+    title: str
+    isbn13: str = None
+    genre: str = None
+    description: str = None
+    authors: list = field(default_factory=list)
+
+@dataclass
+class HybridHit:
+    book_id: int
+    title: str
+    score: float
+    lexical_rank: int = None
+    vector_rank: int = None
+    vector_similarity: float = None
+    exact_title: bool = False
+
+
+class BM25Index:
+    def __init__(self, books):
+        self.books = list(books)
+        self.by_id = {book.id: index for index, book in enumerate(self.books)}
+        self.by_isbn = {book.isbn13: index for index, book in enumerate(self.books) if book.isbn13}
+        self.by_title = defaultdict(list)
+        for index, book in enumerate(self.books):
+            self.by_title[normalize_title(book.title)].append(index)
+
+        weighted_tf = []
+        lengths = np.zeros(len(self.books), dtype=np.float32)
+        for index, book in enumerate(self.books):
+            tf = Counter()
+            for field_name, text in (("title", book.title), ("authors", " ".join(book.authors)),
+                                     ("genre", book.genre), ("description", book.description)):
+                for token in tokenize(text):
+                    tf[token] += FIELD_WEIGHTS[field_name]
+            weighted_tf.append(tf)
+            lengths[index] = sum(tf.values())
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        # Postings hold the length-normalized term weight, so a query only sums idf * weight
+        postings = defaultdict(lambda: ([], []))
+        for index, tf in enumerate(weighted_tf):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[index] / average_length) if average_length else BM25_K1
+            for token, count in tf.items():
+                documents, weights = postings[token]
+                documents.append(index)
+                weights.append(count * (BM25_K1 + 1) / (count + norm))
+        total = len(self.books)
+        self.postings = {
+            token: (np.array(documents, dtype=np.int32), np.array(weights, dtype=np.float32),
+                    math.log(1 + (total - len(documents) + 0.5) / (len(documents) + 0.5)))
+            for token, (documents, weights) in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.books)
+
+    def exact_title(self, query: str):
+        return self.by_title.get(normalize_title(query), [])
+
+    def search(self, query: str, limit: int):
+        # Returns (book index, score) pairs, best first
+        terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        if not terms or not self.books:
+            return []
+        scores = np.zeros(len(self.books), dtype=np.float32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                documents, weights, idf = posting
+                scores[documents] += idf * weights
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        order = matched[np.lexsort((matched, -scores[matched]))]
+        return [(int(index), float(scores[index])) for index in order]
+
+
+def load_indexed_books(session: Session):
+    # Two queries for the whole catalogue: books, then (book id, author name) pairs
+    books = {
+        row.id: IndexedBook(row.id, row.title or "", row.isbn13, row.genre, row.description)
+        for row in session.execute(select(Book.id, Book.title, Book.isbn13, Book.genre, Book.description))
+    }
+    authors = session.execute(
+        select(book_author_association.c.book_id, Author.name)
+        .join(Author, Author.id == book_author_association.c.author_id)
+    )
+    for book_id, name in authors:
+        if book_id in books and name:
+            books[book_id].authors.append(name)
+    return list(books.values())
+
+def reciprocal_rank_fusion(rankings, k: int = HYBRID_RRF_K):
+    # rankings: lists of keys, best first; returns {key: fused score}
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            fused[key] += 1.0 / (k + rank + 1)
+    return fused
+
+
+class HybridRetriever(CatalogueIndex):
+    # The lexical index is a CatalogueIndex; only the first search waits for it to be built
+    description = "Hybrid retrieval index"
+    thread_name = "hybrid-index"
+
+    def __init__(self, session_factory=None, vector_manager=None, ttl: float = HYBRID_INDEX_TTL,
+                 rrf_k: int = HYBRID_RRF_K, candidates: int = HYBRID_CANDIDATES,
+                 min_vector_similarity: float = HYBRID_MIN_VECTOR_SIMILARITY):
+        super().__init__(session_factory, ttl)
+        self._vector_manager = vector_manager
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.min_vector_similarity = min_vector_similarity
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-vector")
+
+    @property
+    def vector_manager(self):
+        if self._vector_manager is None:
+            from llm.loader import get_vector_manager
+            self._vector_manager = get_vector_manager()
+        return self._vector_manager
+
+    def build(self, session: Session) -> BM25Index:
+        return BM25Index(load_indexed_books(session))
+
+    def describe(self, index: BM25Index) -> dict:
+        return {"books": len(index), "terms": len(index.postings)}
+
+    def _vector_stage(self, query: str, limit: int):
+        # Returns [(book index, similarity)] for the hits the lexical index knows about
+        manager = self.vector_manager
+        results = manager.query_collection("hybrid", manager.embed_query(query), limit)
+        ids = results.get("ids", [[]])[0]
+        metadatas = (results.get("metadatas") or [[]])[0] or [{}] * len(ids)
+        distances = (results.get("distances") or [[]])[0] or [None] * len(ids)
+        index = self.index
+        hits = []
+        for vector_id, metadata, distance in zip(ids, metadatas, distances):
+            position = index.by_id.get((metadata or {}).get("book_id"))
+            if position is None:
+                position = self._position_for_vector_id(index, vector_id)
+            if position is not None:
+                # Squared L2 between unit vectors: cosine similarity = 1 - d / 2
+                hits.append((position, None if distance is None else 1 - distance / 2))
+        return hits
+
+    def _timed(self, timings: dict, stage: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            with span(f"retrieval.{stage}"):
+                return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            RETRIEVAL_STAGE_DURATION.observe(elapsed, stage=stage)
+            timings[stage] = round(elapsed * 1000, 3)
+
+    def search(self, query: str, limit: int = 10, exclude=()):
+        # Returns (hits, per-stage milliseconds)
+        index = self.index
+        candidates = max(self.candidates, limit + len(exclude))
+        timings = {}
+        with span("retrieval.hybrid", **{"retrieval.limit": limit}):
+            # The embedding and vector query run in the pool while BM25 scores here; the copied
+            # context keeps the vector span under this one
+            vector_future = self._executor.submit(
+                contextvars.copy_context().run, self._timed, timings, "vector", self._vector_stage, query, candidates
+            )
+            exact = self._timed(timings, "exact", index.exact_title, query)
+            lexical = self._timed(timings, "lexical", index.search, query, candidates)
+            try:
+                vector = vector_future.result()
+            except Exception:
+                logger.exception("Vector stage failed, using lexical results only")
+                vector = []
+
+            start = time.perf_counter()
+            lexical_ranking = list(dict.fromkeys(exact + [position for position, _ in lexical]))
+            lexical_ranks = {position: rank for rank, position in enumerate(lexical_ranking)}
+            similarity = dict(vector)
+            # Vector-only hits below the similarity floor are noise, not matches
+            vector_ranking = [position for position, score in vector
+                              if position in lexical_ranks or score is None or score >= self.min_vector_similarity]
+            fused = reciprocal_rank_fusion([lexical_ranking, vector_ranking], self.rrf_k)
+            excluded = set(exclude)
+            vector_ranks = {position: rank for rank, position in enumerate(vector_ranking)}
+            exact_set = set(exact)
+            # Exact title matches always lead
+            ordered = sorted(fused, key=lambda position: (position not in exact_set, -fused[position], position))
+            hits = []
+            for position in ordered:
+                book = index.books[position]
+                if book.id in excluded:
+                    continue
+                hits.append(HybridHit(
+                    book_id=book.id, title=book.title, score=fused[position],
+                    lexical_rank=lexical_ranks.get(position), vector_rank=vector_ranks.get(position),
+                    vector_similarity=similarity.get(position), exact_title=position in exact_set,
+                ))
+                if len(hits) >= limit:
+                    break
+            elapsed = time.perf_counter() - start
+            RETRIEVAL_STAGE_DURATION.observe(elapsed, stage="fusion")
+            timings["fusion"] = round(elapsed * 1000, 3)
+        logger.debug("Hybrid retrieval", extra={"results": len(hits), "timings_ms": timings})
+        return hits, timings
+
+    def book(self, book_id: int) -> IndexedBook:
+        position = self.index.by_id.get(book_id)
+        return None if position is None else self.index.books[position]
+
+    @staticmethod
+    def _position_for_vector_id(index: BM25Index, vector_id):
+        # Vectors written before payloads carried book_id: isbn13 or "book-<id>"
+        vector_id = str(vector_id)
+        if vector_id.startswith("book-") and vector_id[5:].isdigit():
+            return index.by_id.get(int(vector_id[5:]))
+        return index.by_isbn.get(vector_id)
+
+    def book_by_vector_id(self, vector_id) -> IndexedBook:
+        position = self._position_for_vector_id(self.index, vector_id)
+        return None if position is None else self.index.books[position]
+
+
+def get_hybrid_retriever() -> HybridRetriever:
+    return HybridRetriever.shared()
@@ -0,0 +1,33 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Counts LLM calls currently running in this process so shutdown can wait for them
+_inflight_condition = threading.Condition()
+_inflight_calls = 0
+
+@contextmanager
+def track_llm_call():
+    global _inflight_calls
+    with _inflight_condition:
+        _inflight_calls += 1
+    try:
+        yield
+    finally:
+        with _inflight_condition:
+            _inflight_calls -= 1
+            _inflight_condition.notify_all()
+
+def inflight_llm_calls() -> int:
+    with _inflight_condition:
+        return _inflight_calls
+
+def wait_for_llm_calls(timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    with _inflight_condition:
+        while _inflight_calls > 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _inflight_condition.wait(remaining)
+    return True
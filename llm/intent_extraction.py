@@ -1,9 +1,19 @@
 import re
 import json
-from langchain_ollama import OllamaLLM
+import hashlib
+import logging
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
 from langchain_core.messages import HumanMessage
 from pydantic import BaseModel, Field, ValidationError
 from langchain.memory import ConversationBufferMemory
+from llm.scheduler import run_llm, Priority
+from app.config import INTENT_CACHE_SIZE, INTENT_CACHE_HISTORY_TURNS, LLM_PROVIDER, LLM_MODEL
+from llm.providers import get_llm
+from app.utils.metrics import INTENT_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
 
 class IntentResponseModel(BaseModel):
     intent_number: int = Field(description="The intent number ranging from 1 to 6")
@@ -13,8 +23,168 @@ class IntentResponseModel(BaseModel):
     class Config:
         extra = "forbid"
 
+class FusedIntentResponseModel(IntentResponseModel):
+    summary: Optional[str] = Field(default=None, description="Book summary, only produced for intent 3")
+
+INTENT_CATEGORIES = """Intent Categories:
+
+                1. Get Book Information: User asking about a detailed overview of a book, including title, author, publication year, genre, and summary.
+                Example Query: "Give details of [book title]."
+
+                2. Get Book Author Information: User asking about the author of a specific book.
+                Example Query: "Who wrote [book title]?"
+
+                3. Summarize Book: User asking for a concise and accurate summary of a book's content, highlighting key themes and plot points.
+                Example Query: "Tell me about the [book title] book."
+
+                4. Recommend Books: user seeks book recommendations based on preferences like genre or descriptions. Directly explain why these books are ideal choices, without prefacing your reasoning with any introductory phrases.
+                Example Query: "Recommend 5 books like [book title]."
+
+                5. Get Book Publication Year: User asking for the publication year of a specific book.
+                Example Query: "When was [book title] published?"
+
+                6. List Books by Author: User asking to list books written by a specific author.
+                Example Query: "List books by [author name]."
+                
+                7. Anything else: User asking for general information or making a statement not related to the above categories."""
+
+# Phrasings common enough to classify without the LLM, checked in order
+FAST_PATH_PATTERNS = [
+    (2, re.compile(r"^who (?:wrote|authored|is the author of|are the authors of) (?:the )?(?:book )?(?P<entity>.+?)(?: book)?$", re.IGNORECASE)),
+    (5, re.compile(r"^when (?:was|were) (?:the )?(?:book )?(?P<entity>.+?)(?: book)? (?:published|released|written)$", re.IGNORECASE)),
+    (1, re.compile(r"^(?:give|show)(?: me)? (?:the )?details (?:of|about|for|on) (?:the )?(?:book )?(?P<entity>.+?)(?: book)?$", re.IGNORECASE)),
+    (3, re.compile(r"^(?:summari[sz]e|give me a summary of) (?:the )?(?:book )?(?P<entity>.+?)(?: book)?$", re.IGNORECASE)),
+    (3, re.compile(r"^tell me about (?:the )?book (?P<entity>.+)$", re.IGNORECASE)),
+    (3, re.compile(r"^tell me about (?:the )?(?P<entity>.+?) book$", re.IGNORECASE)),
+    (4, re.compile(r"^recommend (?:me )?(?:\d+ )?(?:books?|novels?) (?:like|similar to) (?P<entity>.+)$", re.IGNORECASE)),
+    (6, re.compile(r"^(?:list|show)(?: me)? (?:all )?(?:the )?books (?:written )?by (?P<entity>.+)$", re.IGNORECASE)),
+]
+
+# An entity made only of these words points back into the conversation ("Who wrote it?", "Tell me
+# about that book"); only the history-aware classifier can tell what it refers to
+REFERRING_WORDS = {
+    "it", "its", "this", "that", "these", "those", "them", "they", "he", "she", "him", "her",
+    "one", "ones", "same", "book", "books", "novel", "last", "previous", "above",
+}
+
+# Words of a question that can only be resolved from earlier turns
+REFERRING_PRONOUNS = {
+    "it", "its", "this", "that", "these", "those", "them", "they", "he", "she", "him", "her",
+    "his", "same", "last", "previous", "above",
+}
+
+def extract_num_recommendations(document: str) -> int:
+    number_match = re.search(r'\b(\d+)\b', document)
+    return int(number_match.group(1)) if number_match else 2
+
+def strip_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question.strip()).rstrip('?.! ')
+
+def normalize_question(question: str) -> str:
+    return strip_question(question).lower()
+
+def clean_entity_name(entity_name: str) -> str:
+    return re.sub(r'[^\w\s]', '', entity_name).strip()
+
+def refers_to_history(entity_name: str) -> bool:
+    words = entity_name.lower().split()
+    return not words or all(word in REFERRING_WORDS for word in words)
+
+def question_refers_back(question: str) -> bool:
+    return any(word in REFERRING_PRONOUNS for word in re.findall(r"\w+", question.lower()))
+
+class IntentCache:
+    # Small LRU of (question, context) -> classification so repeated questions skip the LLM. A
+    # question that names its own entity has no context and hits in any conversation; one that
+    # refers back is keyed on `history`, the last few turns before it (see recent_history), since
+    # the whole conversation only grows and would never repeat.
+    def __init__(self, maxsize: int = INTENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(question: str, history: str):
+        context = hashlib.sha1(history.encode("utf-8")).hexdigest() if question_refers_back(question) else ""
+        return normalize_question(question), context
+
+    def get(self, question: str, history: str = "") -> Optional[IntentResponseModel]:
+        key = self._key(question, history)
+        with self._lock:
+            intent_response = self._entries.get(key)
+            if intent_response is not None:
+                self._entries.move_to_end(key)
+        INTENT_CACHE_REQUESTS.inc(result="hit" if intent_response is not None else "miss")
+        return intent_response
+
+    def put(self, question: str, history: str, intent_response: IntentResponseModel):
+        if self.maxsize <= 0 or not intent_response.entity_name:
+            return
+        # Summaries are produced per request; only the classification is reused
+        cached = IntentResponseModel(
+            intent_number=intent_response.intent_number,
+            entity_name=intent_response.entity_name,
+            num_recommendations=intent_response.num_recommendations,
+        )
+        key = self._key(question, history)
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+intent_cache = IntentCache()
+
 memory = ConversationBufferMemory(memory_key="chat_history")
 
+def chat_history() -> str:
+    return memory.load_memory_variables({})['chat_history']
+
+def recent_history(turns: int = INTENT_CACHE_HISTORY_TURNS) -> str:
+    # The last `turns` question/answer pairs, the context the intent cache keys on
+    messages = memory.chat_memory.messages[-2 * turns:] if turns > 0 else []
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+def match_fast_path(question: str) -> Optional[IntentResponseModel]:
+    # Classifies common phrasings that name their book or author; anything referring back to the
+    # conversation is left to the classifier
+    stripped = strip_question(question)
+    for intent_number, pattern in FAST_PATH_PATTERNS:
+        match = pattern.match(stripped)
+        if match:
+            entity_name = clean_entity_name(match.group("entity"))
+            if refers_to_history(entity_name):
+                return None
+            return IntentResponseModel(
+                intent_number=intent_number,
+                entity_name=entity_name,
+                num_recommendations=extract_num_recommendations(question),
+            )
+    return None
+
+def resolve_intent_fast_path(question: str) -> Optional[IntentResponseModel]:
+    intent_response = match_fast_path(question) or intent_cache.get(question, recent_history())
+    if intent_response is not None:
+        # Later questions ("Who wrote it?") are classified against this turn too
+        remember_turn(question, intent_response)
+    return intent_response
+
+def remember_turn(question: str, intent_response: IntentResponseModel):
+    memory.chat_memory.add_user_message(question)
+    memory.chat_memory.add_ai_message(f"Intent Number: {intent_response.intent_number}\nEntity: {intent_response.entity_name}")
+    save_chat_history(memory)
+
+def parse_fused_response(response: str, document: str) -> FusedIntentResponseModel:
+    # Raises ValueError, AttributeError, TypeError or ValidationError when the model did not
+    # answer with the JSON object it was asked for
+    payload = json.loads(re.search(r"\{.*\}", response, re.DOTALL).group(0))
+    return FusedIntentResponseModel(
+        intent_number=int(payload.get("intent_number") or 0),
+        entity_name=clean_entity_name(str(payload.get("entity_name") or "")),
+        num_recommendations=extract_num_recommendations(document),
+        summary=(payload.get("summary") or "").strip() or None,
+    )
+
 # Function to save chat history to a file
 def save_chat_history(memory):
     try:
@@ -22,7 +192,7 @@ def save_chat_history(memory):
         with open('chat_history.json', 'w') as file:
             json.dump(history, file, indent=4)
     except Exception as e:
-        print(f"Error saving chat history: {e}")
+        logger.exception("Error saving chat history")
 
 def load_chat_history(memory):
     try:
@@ -30,25 +200,24 @@ def load_chat_history(memory):
             history = json.load(file)
             memory.chat_memory.add_user_message(history['chat_history'])
     except FileNotFoundError:
-        print("No previous history found.")
+        logger.info("No previous chat history found")
     except json.JSONDecodeError:
-        print("Error decoding JSON from chat history.")
+        logger.warning("Chat history file is not valid JSON")
     except Exception as e:
-        print(f"Error loading chat history: {e}")
+        logger.exception("Error loading chat history")
 
 
 class IntentExtractor:
-    def __init__(self, model_name="llama3.1"):
-        self.llm = OllamaLLM(model=model_name)
-        print(f"Loaded model: {model_name}")
+    def __init__(self, model_name=LLM_MODEL):
+        self.llm = get_llm(LLM_PROVIDER, model_name)
+        logger.info("Loaded intent model", extra={"model": model_name})
         load_chat_history(memory) 
 
     def classify_intent_and_extract_entities(self, document: str) -> IntentResponseModel:
+        history = recent_history()
         memory.chat_memory.add_user_message(document)
 
-        number_pattern = re.compile(r'\b(\d+)\b')
-        number_match = number_pattern.search(document)
-        num_recommendations = int(number_match.group(1)) if number_match else 2
+        num_recommendations = extract_num_recommendations(document)
 
         prompt_message = HumanMessage(
             content=(
@@ -60,27 +229,7 @@ class IntentExtractor:
 
                 Based on the user's current input, determine the intent number and extract the relevant entity (book title or author name).
                 Classify the user's intent into the following categories and return the number corresponding to the user's intent along with the extracted entity name.
-                Intent Categories:
-
-                1. Get Book Information: User asking about a detailed overview of a book, including title, author, publication year, genre, and summary.
-                Example Query: "Give details of [book title]."
-
-                2. Get Book Author Information: User asking about the author of a specific book.
-                Example Query: "Who wrote [book title]?"
-
-                3. Summarize Book: User asking for a concise and accurate summary of a book's content, highlighting key themes and plot points.
-                Example Query: "Tell me about the [book title] book."
-
-                4. Recommend Books: user seeks book recommendations based on preferences like genre or descriptions. Directly explain why these books are ideal choices, without prefacing your reasoning with any introductory phrases.
-                Example Query: "Recommend 5 books like [book title]."
-
-                5. Get Book Publication Year: User asking for the publication year of a specific book.
-                Example Query: "When was [book title] published?"
-
-                6. List Books by Author: User asking to list books written by a specific author.
-                Example Query: "List books by [author name]."
-                
-                7. Anything else: User asking for general information or making a statement not related to the above categories.
+                {INTENT_CATEGORIES}
 
                 Response Format: 
                 Intent Number: [1-6]
@@ -92,14 +241,15 @@ class IntentExtractor:
             )
         )
         try:
-            print("Extracting Intent...")
-            response = self.llm.invoke([prompt_message]).strip()
-        except Exception as e:
-            print(f"Error invoking model: {e}")
-            response = ""
-            raise e
-        print(f"Prompt: {prompt_message.content}")
-        print(f"Response: {response}")
+            response = run_llm(lambda: self.llm.invoke([prompt_message]), priority=Priority.INTENT).strip()
+        except Exception:
+            logger.exception("Error invoking intent model")
+            raise
+        # Prompt and response bodies are only logged at DEBUG; the lengths are enough to spot runaway history
+        logger.debug("Intent classified", extra={
+            "prompt_chars": len(prompt_message.content),
+            "response": response[:200],
+        })
 
         try:
             # Clean up the response to remove any unnecessary formatting like ** or ""
@@ -109,7 +259,7 @@ class IntentExtractor:
             intent_match = re.search(r"Intent Number: (\d+)", response)
             entity_match = re.search(r"Entity: ([^\n]+)", response)
 
-            cleaned_entity_name = re.sub(r'[^\w\s]', '', entity_match.group(1).strip()) if entity_match else ""
+            cleaned_entity_name = clean_entity_name(entity_match.group(1)) if entity_match else ""
 
             intent_response = IntentResponseModel(
                 intent_number=int(intent_match.group(1)) if intent_match else 0,
@@ -119,16 +269,60 @@ class IntentExtractor:
 
             memory.chat_memory.add_ai_message(response)
             save_chat_history(memory)  # Save history after every interaction
+            intent_cache.put(document, history, intent_response)
 
             return intent_response
         except (ValueError, IndexError, AttributeError, ValidationError) as e:
-            print(f"Error parsing response: {e}")
-            # Re-invoke the model if validation fails
+            logger.warning("Could not parse intent response, retrying", extra={"error": str(e)})
+            # Re-invoke the model if validation fails, without recording the question twice
+            memory.chat_memory.messages.pop()
             return self.classify_intent_and_extract_entities(document)
 
+    def classify_and_summarize(self, document: str) -> IntentResponseModel:
+        # One structured-output call that classifies the question and, for summary requests,
+        # also drafts a summary, which summarize_book_node uses only if the catalogue description
+        # of the book it looks up backs it
+        history = recent_history()
+        memory.chat_memory.add_user_message(document)
+
+        prompt_message = HumanMessage(
+            content=(
+                f"""
+                You are an AI model specializing in book-related queries. You have access to previous conversations with the user.
+
+                Previous conversation:
+                {memory.load_memory_variables({})['chat_history']}
+
+                Based on the user's current input, determine the intent number and extract the relevant entity (book title or author name).
+                {INTENT_CATEGORIES}
+
+                If and only if the intent is 3, also write a concise and engaging summary of the book in 3-4 sentences, focusing on its key themes and impact.
+
+                Respond with a single JSON object and nothing else:
+                {{"intent_number": <1-7>, "entity_name": "<entity name>", "summary": "<summary for intent 3, otherwise empty>"}}
+
+                Entity name must not contain any extra information of context. For example, if the user input "Who is the author of harry potter?" the entity name should be "harry potter" only.
+                '{document}'
+                """
+            )
+        )
+        response = run_llm(lambda: self.llm.invoke([prompt_message]), priority=Priority.INTENT).strip()
+
+        try:
+            intent_response = parse_fused_response(response, document)
+        except (ValueError, AttributeError, TypeError, ValidationError) as e:
+            logger.warning("Could not parse fused response, falling back to plain classification", extra={"error": str(e)})
+            memory.chat_memory.messages.pop()
+            return self.classify_intent_and_extract_entities(document)
+
+        memory.chat_memory.add_ai_message(f"Intent Number: {intent_response.intent_number}\nEntity: {intent_response.entity_name}")
+        save_chat_history(memory)
+        intent_cache.put(document, history, intent_response)
+        return intent_response
+
 
 if __name__ == "__main__":
-    extractor = IntentExtractor(model_name="llama3.1")
+    extractor = IntentExtractor()
     question = "Who wrote Harry Potter?"
     response = extractor.classify_intent_and_extract_entities(question)
     print(response)
\ No newline at end of file
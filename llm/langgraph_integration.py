@@ -1,18 +1,29 @@
 import re
 from langchain.memory import ConversationBufferMemory
-from langchain_ollama import OllamaLLM
 from langchain.chains import LLMChain
 from langchain_core.messages import HumanMessage
 from typing import Dict, Optional, TypedDict
 from langgraph.graph import StateGraph, START, END
-from app.database.connector import connect_to_db
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.database.connector import SessionLocal
 from app.database.schemas.books import Book
 from app.database.schemas.author import Author
-from llm.intent_extraction import IntentExtractor
-from llm.vector_data_manager import VectorDataManager
+from llm.loader import get_intent_extractor
+from llm.hybrid_retriever import get_hybrid_retriever, tokenize
+from llm.entity_resolver import get_entity_resolver, BOOK, AUTHOR
+from app.services.book_services import retrieve_books_by_author
+from llm.neighbors import similar_books
+from llm.scheduler import run_llm, Priority, LLMSchedulerError
+from llm.intent_extraction import resolve_intent_fast_path
+from app.config import LLM_PIPELINE_MODE, FUSED_SUMMARY_MIN_OVERLAP
+from llm.providers import get_llm
+from llm.latency import traced_node, TracedWorkflow
 import logging
 
-ollama_model = OllamaLLM(model="llama3.1")
+logger = logging.getLogger(__name__)
+
+ollama_model = get_llm()
 memory = ConversationBufferMemory(memory_key="chat_history")
 
 # Define the GraphState class
@@ -23,34 +34,63 @@ class GraphState(TypedDict):
     num_recommendations: int
     response: Optional[str]
     book_info: Optional[Dict[str, str]]
+    summary: Optional[str]
+    limit: Optional[int]
+    offset: Optional[int]
 
 def get_db_session():
-    engine, SessionLocal = connect_to_db()
+    # Lookups only read, so they are served by a replica when one is configured
     return SessionLocal()
 
+def resolve_book_id(entity_name: str):
+    # A confident fuzzy title match answers without a search; anything else goes to the exact
+    # title, lexical and vector matching of the hybrid retriever
+    match = get_entity_resolver().best(entity_name, BOOK)
+    if match is not None:
+        logger.info("Book resolved by title", extra={"score": match.score})
+        return match.id
+    hits, timings = get_hybrid_retriever().search(entity_name, limit=1)
+    logger.info("Hybrid book lookup", extra={"hits": len(hits), "timings_ms": timings})
+    return hits[0].book_id if hits else None
+
 def classify_input_node(state: GraphState) -> GraphState:
     question = state.get('question', '').strip()
     if not question:
         state["response"] = "Please ask a valid question about books."
         return state
 
-    intent_extractor = IntentExtractor()
+    if state.get("intent_number") and state.get("entity_name"):
+        # Already classified by the caller (e.g. /query); nothing left to do here
+        return state
+
     try:
-        intent_response = intent_extractor.classify_intent_and_extract_entities(question)
-        logging.info(f"Raw Intent Number: {intent_response.intent_number}, Raw Entity: {intent_response.entity_name}")
+        if LLM_PIPELINE_MODE == "fused":
+            # Cached or pattern-matched questions go straight to the answer nodes without an LLM call
+            intent_response = resolve_intent_fast_path(question)
+            if intent_response is not None:
+                logger.info("Intent resolved by fast path")
+            else:
+                intent_response = get_intent_extractor().classify_and_summarize(question)
+        else:
+            intent_response = get_intent_extractor().classify_intent_and_extract_entities(question)
+        logger.info(f"Raw Intent Number: {intent_response.intent_number}, Raw Entity: {intent_response.entity_name}")
 
         # Clean the entity name to remove unwanted characters like **, *, or ""
         cleaned_entity_name = re.sub(r'[^\w\s]', '', intent_response.entity_name).strip()
 
-        logging.info(f"Cleaned Entity: {cleaned_entity_name}")
+        logger.info(f"Cleaned Entity: {cleaned_entity_name}")
 
         state.update({
             "intent_number": intent_response.intent_number,
             "entity_name": cleaned_entity_name,
             "num_recommendations": intent_response.num_recommendations or 2,
+            "summary": getattr(intent_response, "summary", None),
         })
+    except LLMSchedulerError:
+        # Overload, timeout and cancellation are reported to the client by the API layer
+        raise
     except Exception as e:
-        logging.error(f"Failed to classify intent: {e}")
+        logger.error(f"Failed to classify intent: {e}")
         state["response"] = "Sorry, I couldn't understand your question. Please try again."
     return state
 
@@ -60,16 +100,12 @@ def retrieve_book_info(state: GraphState) -> GraphState:
         state["response"] = "Please provide a book title to search for."
         return state
 
-    logging.info(f"Entity Name being queried: {repr(entity_name)}")
+    logger.info(f"Entity Name being queried: {repr(entity_name)}")
 
     with get_db_session() as db:
         try:
-            logging.info(f"Querying database for exact title match: '{entity_name}'")
-            book = db.query(Book).filter(Book.title == entity_name).first()
-
-            if not book:
-                logging.info(f"No exact match found. Trying ilike with partial matching for: '{entity_name}'")
-                book = db.query(Book).filter(Book.title.ilike(f"%{entity_name}%")).first()
+            book_id = resolve_book_id(entity_name)
+            book = db.get(Book, book_id, options=[selectinload(Book.authors)]) if book_id else None
 
             if book:
                 state["book_info"] = {
@@ -79,80 +115,64 @@ def retrieve_book_info(state: GraphState) -> GraphState:
                     "genre": book.genre,
                     "description": book.description,
                 }
-                logging.info(f"Book info retrieved: {state['book_info']}")
+                logger.debug(f"Book info retrieved: {state['book_info']}")
             else:
-                logging.warning(f"No information found for book: {repr(entity_name)} in DB. Trying vector database.")
-                vector_manager = VectorDataManager()
-                similar_books = vector_manager.search_similar_book(entity_name)
-
-                if similar_books and isinstance(similar_books, list):
-                    best_match, similarity = similar_books[0]
-                    logging.info(f"Best match found: '{best_match}' with similarity: {similarity:.2f}")
-
-                    if similarity >= 0.5:  # similarity is 50% or higher
-                        book = db.query(Book).filter(Book.title == best_match).first()
-                        if book:
-                            state["book_info"] = {
-                                "title": book.title,
-                                "authors": ', '.join([author.name for author in book.authors]),
-                                "published_year": book.published_year,
-                                "genre": book.genre,
-                                "description": book.description,
-                            }
-                            logging.info(f"Book info retrieved: {state['book_info']}")
-                        else:
-                            state["response"] = "No information found for the specified book in either database."
-                    else:
-                        state["response"] = "No similar book found with a high enough similarity score."
-                else:
-                    state["response"] = "No similar book found in the vector database."
+                logger.warning(f"No information found for book: {repr(entity_name)}")
+                state["response"] = "No information found for the specified book."
         except Exception as e:
-            logging.error(f"Error retrieving book info: {e}")
+            logger.error(f"Error retrieving book info: {e}")
             state["response"] = "An error occurred while retrieving the book information."
 
     return state
 
 
 def get_author_info_node(state: GraphState) -> GraphState:
+    # Intent 6, "List books by <author>": fuzzy author match, then one page of the author's books
+    # through the author_id index. No LLM call.
     entity_name = state.get('entity_name', '').strip()
     if not entity_name:
-        state["response"] = "Please provide a book title to search for."
+        state["response"] = "Please provide an author name to list books for."
         return state
+    limit = state.get("limit") or 10
+    offset = state.get("offset") or 0
+
+    author = get_entity_resolver().best(entity_name, AUTHOR)
+    if author is None:
+        logger.warning("No matching author found", extra={"entity": entity_name})
+        state["response"] = "No author found with that name."
+        return state
+    logger.info("Author resolved", extra={"author_id": author.id, "score": author.score})
 
-    logging.info(f"Fetching author name for book: '{entity_name}'")
-    
     with get_db_session() as db:
-        try:
-            # Query to match the book title exactly or with partial matching
-            book = db.query(Book).filter(Book.title.ilike(f"%{entity_name}%")).first()
-            if book and book.authors:
-                # Ensure that author information exists and is correctly retrieved
-                authors = ', '.join([author.name for author in book.authors])
-                state["response"] = f"Author(s): {authors}"
-                logging.info(f"Authors retrieved: {authors}")
-            else:
-                logging.warning("No matching book found for author query.")
-                state["response"] = "No author information found for the specified book."
-        except Exception as e:
-            logging.error(f"Error fetching author information: {e}")
-            state["response"] = "An error occurred while retrieving author information."
-    
+        success, message, books, total = retrieve_books_by_author(
+            db, author.id, limit, offset, fields=["id", "title", "published_year"]
+        )
+    if not success:
+        state["response"] = "An error occurred while retrieving the author's books."
+    elif not books:
+        state["response"] = f"No books found by {author.name}." if not offset else f"No more books by {author.name}."
+    else:
+        lines = [f"- {book['title']}" + (f" ({book['published_year']})" if book['published_year'] else "")
+                 for book in books]
+        state["response"] = (
+            f"Books by {author.name} ({offset + 1}-{offset + len(books)} of {total}):\n" + "\n".join(lines)
+        )
     return state
 
 def get_publication_year_node(state: GraphState) -> GraphState:
     book_info = state.get("book_info")
-    logging.info(f"Retrieving publication year for book: '{state.get('entity_name')}'")
+    logger.info(f"Retrieving publication year for book: '{state.get('entity_name')}'")
     
     if book_info:
-        logging.info(f"Book info found: {book_info}")
+        logger.debug(f"Book info found: {book_info}")
         published_year = book_info.get('published_year')
         if published_year:
             state["response"] = f"Published Year: {published_year}"
         else:
-            logging.warning("Publication year not available in book info.")
+            logger.warning("Publication year not available in book info.")
             state["response"] = "No publication year found for the specified book."
     else:
-        logging.warning("No book info available to retrieve publication year.")
+        logger.warning("No book info available to retrieve publication year.")
         state["response"] = "No publication year found for the specified book."
     
     return state
@@ -179,11 +199,22 @@ def get_author_name_node(state: GraphState) -> GraphState:
         state["response"] = "No author information found for the specified book."
     return state
 
+def summary_is_grounded(summary: str, description: str, min_overlap: float = FUSED_SUMMARY_MIN_OVERLAP) -> bool:
+    # The fused call drafts its summary before the book is looked up, from whatever the model
+    # remembers; it is only trusted when the description of the book actually found backs it
+    summary_words = set(tokenize(summary))
+    if not summary_words:
+        return False
+    return len(summary_words & set(tokenize(description))) / len(summary_words) >= min_overlap
+
 def summarize_book_node(state: GraphState) -> GraphState:
     book_info = state.get("book_info")
     
-    if book_info:
-        description = book_info.get('description', '').strip()
+    if book_info and state.get("summary") and summary_is_grounded(state["summary"], book_info.get("description") or ""):
+        # Already written by the fused classification call
+        state["response"] = state["summary"]
+    elif book_info:
+        description = (book_info.get('description') or '').strip()
         
         if description:
             # if less than 50 words as "brief"
@@ -200,8 +231,8 @@ def summarize_book_node(state: GraphState) -> GraphState:
                     content=f"Please provide a concise and engaging summary of the following book description in 3-4 sentences:\n\n{description}\n\nFocus on the key themes, the significance of the author's arguments, and the impact of the book. Highlight any notable praise or recognition it has received, especially from influential figures."
                 )
             
-            logging.info("Generating Summary ...")
-            response = ollama_model.invoke([prompt_message]).strip()
+            logger.info("Generating Summary ...")
+            response = run_llm(lambda: ollama_model.invoke([prompt_message]), priority=Priority.SUMMARY).strip()
             state["response"] = response
         else:
             state["response"] = "No description found for the specified book in the database."
@@ -217,16 +248,24 @@ def recommend_books_node(state: GraphState) -> GraphState:
     if not entity_name:
         state["response"] = "Please provide a genre, description, or title to base the recommendations on."
         return state
-    vector_manager = VectorDataManager()
+    retriever = get_hybrid_retriever()
+    match = get_entity_resolver().best(entity_name, BOOK)
 
     with get_db_session() as db:
-        target_book = db.query(Book).filter(Book.title.ilike(f"%{entity_name}%")).first()
-        if target_book:
-            book_description = target_book.description
-            recommended_titles = vector_manager.recommend_books(book_description, num_recommendations)
-        else:
-            recommended_titles = vector_manager.recommend_books(entity_name, num_recommendations)
-        recommended_books = db.query(Book).filter(Book.title.in_(recommended_titles)).all()
+        # A named book is the seed: its precomputed neighbours, or failing that a search by its
+        # description without the book itself
+        book_ids = []
+        if match is not None:
+            book_ids = [book_id for book_id, _ in similar_books(db, match.id, num_recommendations)]
+            target = retriever.book(match.id) if not book_ids else None
+            if target is not None:
+                hits, _ = retriever.search(target.description or target.title, num_recommendations, exclude={target.id})
+                book_ids = [hit.book_id for hit in hits]
+        if not book_ids:
+            hits, _ = retriever.search(entity_name, num_recommendations)
+            book_ids = [hit.book_id for hit in hits]
+        books = {book.id: book for book in db.scalars(select(Book).where(Book.id.in_(book_ids)))}
+        recommended_books = [books[book_id] for book_id in book_ids if book_id in books]
 
         if recommended_books:
             limited_books = recommended_books[:num_recommendations]
@@ -253,10 +292,12 @@ def general_chat_node(state: GraphState) -> GraphState:
     prompt_message = HumanMessage(content=f"As a Book Inventory Assistant, I'm here to assist you. Here's what someone is asking: {question}")
     
     try:
-        response = ollama_model.invoke([prompt_message]).strip()
+        response = run_llm(lambda: ollama_model.invoke([prompt_message]), priority=Priority.CHAT).strip()
         state["response"] =  response + " Is there anything else you would like to know?"
+    except LLMSchedulerError:
+        raise
     except Exception as e:
-        logging.error(f"Error invoking model for general chat: {e}")
+        logger.error(f"Error invoking model for general chat: {e}")
         state["response"] = "Sorry, I encountered an issue while processing your request. Please try again."
 
     return state
@@ -281,15 +322,15 @@ def route_question(state: GraphState) -> str:
 
 workflow = StateGraph(GraphState)
 
-workflow.add_node("classify_input", classify_input_node)
-workflow.add_node("retrieve_book_info", retrieve_book_info)
-workflow.add_node("get_book_info", get_book_info_node)
-workflow.add_node("get_author_name", get_author_name_node)
-workflow.add_node("get_publication_year", get_publication_year_node)
-workflow.add_node("summarize_book", summarize_book_node)
-workflow.add_node("recommend_books", recommend_books_node)
-workflow.add_node("get_author_info", get_author_info_node)
-workflow.add_node("general_chat", general_chat_node)
+workflow.add_node("classify_input", traced_node("classify_input", classify_input_node))
+workflow.add_node("retrieve_book_info", traced_node("retrieve_book_info", retrieve_book_info))
+workflow.add_node("get_book_info", traced_node("get_book_info", get_book_info_node))
+workflow.add_node("get_author_name", traced_node("get_author_name", get_author_name_node))
+workflow.add_node("get_publication_year", traced_node("get_publication_year", get_publication_year_node))
+workflow.add_node("summarize_book", traced_node("summarize_book", summarize_book_node))
+workflow.add_node("recommend_books", traced_node("recommend_books", recommend_books_node))
+workflow.add_node("get_author_info", traced_node("get_author_info", get_author_info_node))
+workflow.add_node("general_chat", traced_node("general_chat", general_chat_node))
 
 workflow.add_edge(START, "classify_input")
 workflow.add_conditional_edges(
@@ -325,7 +366,8 @@ workflow.add_edge("recommend_books", END)
 workflow.add_edge("get_author_info", END)
 workflow.add_edge("general_chat", END)
 
-app = workflow.compile()
+# Every invoke is traced as one workflow span with a child span per node
+app = TracedWorkflow(workflow.compile())
 
 if __name__ == "__main__":
     inputs = {"question": "List books written by Sidney Sheldon"}
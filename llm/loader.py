@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+# The LLM and vector subsystems pull in langchain, chromadb, sentence_transformers and torch.
+# They are imported on first use through these accessors so CRUD-only processes never pay for them.
+
+@lru_cache(maxsize=None)
+def get_langgraph_app():
+    from llm.langgraph_integration import app
+    return app
+
+@lru_cache(maxsize=None)
+def get_intent_extractor():
+    from llm.intent_extraction import IntentExtractor
+    return IntentExtractor()
+
+@lru_cache(maxsize=None)
+def get_vector_manager():
+    # Served by the shared vector sidecar when VECTOR_SIDECAR_ADDRESS is set and it is up
+    from app.config import VECTOR_SIDECAR_ADDRESS
+    if VECTOR_SIDECAR_ADDRESS:
+        from llm.vector_sidecar import sidecar_vector_manager
+        manager = sidecar_vector_manager(VECTOR_SIDECAR_ADDRESS)
+        if manager is not None:
+            return manager
+    from llm.vector_data_manager import VectorDataManager
+    return VectorDataManager()
+
+def get_taste_profiles():
+    # llm.taste pulls in numpy; it is loaded by the first recommendation or favorite change
+    from llm.taste import get_taste_profiles
+    return get_taste_profiles()
+
+def update_taste_after_favorite(email: str, book_id: int, added: bool):
+    from llm.taste import update_taste_after_favorite
+    update_taste_after_favorite(email, book_id, added)
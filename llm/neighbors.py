@@ -0,0 +1,158 @@
+import logging
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import Session
+
+from app.config import NEIGHBORS_TOP_N, NEIGHBORS_BLOCK_SIZE
+from app.database.schemas.book_neighbors import BookNeighbor, BookNeighborQueue
+from app.database.schemas.books import Book
+
+logger = logging.getLogger(__name__)
+
+# Item-to-item neighbours are computed offline from the stored book embeddings: unit vectors are
+# multiplied block by block (block x all books), so memory stays at block_size * num_books floats,
+# and each row keeps its top-N by argpartition. "Books like X" then reads N rows by primary key
+# instead of embedding X's description and querying the vector store.
+
+@dataclass
+class EmbeddingMatrix:
+    book_ids: np.ndarray
+    vectors: np.ndarray
+
+    def __post_init__(self):
+        self.positions = {int(book_id): position for position, book_id in enumerate(self.book_ids)}
+
+    def __len__(self):
+        return len(self.book_ids)
+
+def normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def load_embedding_matrix(session: Session, collection, page_size: int = 5000) -> EmbeddingMatrix:
+    # Vector ids are isbn13 (or "book-<id>" for books without one); see llm.embedding_queue
+    by_isbn = dict(session.execute(select(Book.isbn13, Book.id).where(Book.isbn13.isnot(None))).all())
+    book_ids, vectors = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        ids = page["ids"]
+        if not len(ids):
+            break
+        for vector_id, embedding in zip(ids, page["embeddings"]):
+            book_id = by_isbn.get(vector_id)
+            if book_id is None and vector_id.startswith("book-"):
+                book_id = int(vector_id[len("book-"):])
+            if book_id is not None:
+                book_ids.append(book_id)
+                vectors.append(embedding)
+        offset += len(ids)
+    if not vectors:
+        return EmbeddingMatrix(np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32))
+    return EmbeddingMatrix(np.asarray(book_ids, dtype=np.int64), normalize_rows(vectors))
+
+def top_neighbors(matrix: EmbeddingMatrix, rows=None, top_n: int = NEIGHBORS_TOP_N,
+                  block_size: int = NEIGHBORS_BLOCK_SIZE):
+    # Returns (rows, neighbour positions [len(rows), n], scores [len(rows), n]), best first
+    rows = np.arange(len(matrix)) if rows is None else np.asarray(rows, dtype=np.int64)
+    top_n = min(top_n, len(matrix) - 1)
+    neighbors = np.zeros((len(rows), max(top_n, 0)), dtype=np.int64)
+    scores = np.zeros((len(rows), max(top_n, 0)), dtype=np.float32)
+    if top_n <= 0:
+        return rows, neighbors, scores
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        similarity = matrix.vectors[block] @ matrix.vectors.T
+        # A book is not its own neighbour
+        similarity[np.arange(len(block)), block] = -np.inf
+        candidates = np.argpartition(-similarity, top_n - 1, axis=1)[:, :top_n]
+        candidate_scores = np.take_along_axis(similarity, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        neighbors[start:start + len(block)] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(candidate_scores, order, axis=1)
+    return rows, neighbors, scores
+
+def _write_neighbors(session: Session, matrix: EmbeddingMatrix, rows, neighbors, scores, batch_size: int = 5000):
+    book_ids = [int(matrix.book_ids[row]) for row in rows]
+    for start in range(0, len(book_ids), batch_size):
+        session.execute(delete(BookNeighbor).where(BookNeighbor.book_id.in_(book_ids[start:start + batch_size])))
+    values = [
+        {"book_id": book_id, "rank": rank, "neighbor_id": int(matrix.book_ids[neighbor]), "score": float(score)}
+        for book_id, row_neighbors, row_scores in zip(book_ids, neighbors, scores)
+        for rank, (neighbor, score) in enumerate(zip(row_neighbors, row_scores))
+    ]
+    for start in range(0, len(values), batch_size):
+        session.execute(insert(BookNeighbor), values[start:start + batch_size])
+
+def compute_all_neighbors(session: Session, matrix: EmbeddingMatrix, top_n: int = NEIGHBORS_TOP_N,
+                          block_size: int = NEIGHBORS_BLOCK_SIZE) -> int:
+    start = time.perf_counter()
+    session.execute(delete(BookNeighbor))
+    for block_start in range(0, len(matrix), block_size):
+        block = np.arange(block_start, min(block_start + block_size, len(matrix)))
+        _write_neighbors(session, matrix, *top_neighbors(matrix, block, top_n, block_size))
+    session.execute(delete(BookNeighborQueue))
+    session.commit()
+    logger.info("Book neighbours computed", extra={
+        "books": len(matrix), "top_n": top_n, "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+    return len(matrix)
+
+def update_neighbors(session: Session, matrix: EmbeddingMatrix, changed_book_ids, top_n: int = NEIGHBORS_TOP_N,
+                     block_size: int = NEIGHBORS_BLOCK_SIZE) -> int:
+    # Recomputes the changed books, plus every other book whose list the change can affect: it
+    # listed a changed book, it lists fewer than N books (deleting a book from the books table
+    # cascades to the rows naming it as a neighbour, before this runs), or a changed book now
+    # scores above its current N-th neighbour. Returns the number of books recomputed.
+    changed_book_ids = {int(book_id) for book_id in changed_book_ids}
+    if not changed_book_ids:
+        return 0
+    changed_rows = np.array(sorted(matrix.positions[book_id] for book_id in changed_book_ids
+                                   if book_id in matrix.positions), dtype=np.int64)
+    removed = [book_id for book_id in changed_book_ids if book_id not in matrix.positions]
+    if removed:
+        session.execute(delete(BookNeighbor).where(BookNeighbor.book_id.in_(removed)))
+
+    affected = set(session.scalars(
+        select(BookNeighbor.book_id).where(BookNeighbor.neighbor_id.in_(changed_book_ids)).distinct()
+    ))
+    thresholds = np.full(len(matrix), -np.inf, dtype=np.float32)
+    full = min(top_n, len(matrix) - 1)
+    for book_id, lowest, count in session.execute(
+        select(BookNeighbor.book_id, func.min(BookNeighbor.score), func.count()).group_by(BookNeighbor.book_id)
+    ):
+        if count < full:
+            affected.add(book_id)
+        elif book_id in matrix.positions:
+            thresholds[matrix.positions[book_id]] = lowest
+    if len(changed_rows):
+        for start in range(0, len(matrix), block_size):
+            similarity = matrix.vectors[start:start + block_size] @ matrix.vectors[changed_rows].T
+            beaten = (similarity > thresholds[start:start + block_size, None]).any(axis=1)
+            affected.update(int(matrix.book_ids[start + row]) for row in np.flatnonzero(beaten))
+
+    recompute = sorted({matrix.positions[book_id] for book_id in affected | changed_book_ids
+                        if book_id in matrix.positions})
+    if recompute:
+        _write_neighbors(session, matrix, *top_neighbors(matrix, recompute, top_n, block_size))
+    session.execute(delete(BookNeighborQueue).where(BookNeighborQueue.book_id.in_(changed_book_ids)))
+    session.commit()
+    logger.info("Book neighbours updated", extra={"changed": len(changed_book_ids), "recomputed": len(recompute)})
+    return len(recompute)
+
+def update_queued_neighbors(session: Session, matrix: EmbeddingMatrix, top_n: int = NEIGHBORS_TOP_N) -> int:
+    queued = session.scalars(select(BookNeighborQueue.book_id)).all()
+    return update_neighbors(session, matrix, queued, top_n)
+
+def similar_books(session: Session, book_id: int, limit: int = 10):
+    # [(neighbour book id, score)], best first; empty when the book has no precomputed list
+    return session.execute(
+        select(BookNeighbor.neighbor_id, BookNeighbor.score)
+        .where(BookNeighbor.book_id == book_id)
+        .order_by(BookNeighbor.rank)
+        .limit(limit)
+    ).all()
@@ -0,0 +1,128 @@
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+from app.config import EMBEDDING_MODEL, EMBEDDING_ONNX_PATH, EMBEDDING_ONNX_FILE, EMBEDDING_ONNX_THREADS
+
+logger = logging.getLogger(__name__)
+
+# all-MiniLM-L6-v2 on ONNX Runtime's CPU provider (EMBEDDING_PROVIDER=onnx). The model is
+# exported once with
+#
+#   python -m llm.onnx_embedder --output models/all-MiniLM-L6-v2-onnx [--quantize]
+#
+# which needs torch and sentence-transformers; serving only needs onnxruntime and tokenizers.
+# Encoding reproduces the SentenceTransformer pipeline of this model: WordPiece tokens truncated
+# to max_seq_length, the transformer, mean pooling over the attention mask, L2 normalization.
+# --quantize also writes model_quantized.onnx with int8 weights (dynamic quantization); select it
+# with EMBEDDING_ONNX_FILE=model_quantized.onnx.
+
+SETTINGS_FILE = "embedder.json"
+
+
+def mean_pool(token_embeddings, attention_mask):
+    # Mean of the token vectors that are not padding, then unit length
+    mask = attention_mask[:, :, None].astype(np.float32)
+    pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norms, 1e-12, None)
+
+
+class OnnxEmbedder:
+    # Drop-in for the SentenceTransformer.encode/get_sentence_embedding_dimension calls the app makes
+    def __init__(self, path: str = EMBEDDING_ONNX_PATH, model_file: str = EMBEDDING_ONNX_FILE,
+                 threads: int = EMBEDDING_ONNX_THREADS, model_name: str = EMBEDDING_MODEL):
+        with open(os.path.join(path, SETTINGS_FILE)) as file:
+            settings = json.load(file)
+        # Vectors from another model would silently mismatch the ones already in the vector store
+        if settings.get("model_name") != model_name:
+            raise ValueError(f"{path} holds an export of {settings.get('model_name')}, not {model_name}; "
+                             f"re-export it with python -m llm.onnx_embedder --model {model_name}")
+
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.dimension = settings["dimension"]
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(settings["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=settings.get("pad_token_id", 0))
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(path, model_file), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        logger.info("ONNX embedder loaded", extra={"path": path, "model_file": model_file})
+
+    def _encode_batch(self, sentences):
+        encodings = self.tokenizer.encode_batch(sentences)
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {name: value for name, value in inputs.items()
+                                                   if name in self.input_names})[0]
+        return mean_pool(token_embeddings, inputs["attention_mask"])
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_batch([sentences])[0]
+        sentences = list(sentences)
+        vectors = np.zeros((len(sentences), self.dimension), dtype=np.float32)
+        # Batches of similar lengths need less padding, as in SentenceTransformer.encode
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        for start in range(0, len(sentences), batch_size):
+            batch = order[start:start + batch_size]
+            vectors[batch] = self._encode_batch([sentences[index] for index in batch])
+        return vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+
+def export_onnx(output: str, model_name: str = EMBEDDING_MODEL, quantize: bool = False, opset: int = 17):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output, exist_ok=True)
+    reference = SentenceTransformer(model_name, device="cpu")
+    transformer = reference[0].auto_model.eval()
+    tokenizer = reference.tokenizer
+    tokenizer.save_pretrained(output)
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "tokens"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer, tuple(sample[name] for name in names), os.path.join(output, "model.onnx"),
+            input_names=names, output_names=["last_hidden_state"], dynamic_axes=dynamic_axes, opset_version=opset,
+        )
+    with open(os.path.join(output, SETTINGS_FILE), "w") as file:
+        json.dump({"model_name": model_name, "max_seq_length": reference.max_seq_length,
+                   "dimension": reference.get_sentence_embedding_dimension(),
+                   "pad_token_id": tokenizer.pad_token_id}, file, indent=2)
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(os.path.join(output, "model.onnx"), os.path.join(output, "model_quantized.onnx"),
+                         weight_type=QuantType.QInt8)
+    logger.info("ONNX embedder exported", extra={"output": output, "quantized": quantize})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the embedding model for the ONNX Runtime backend")
+    parser.add_argument("--output", default=EMBEDDING_ONNX_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8 model_quantized.onnx")
+    args = parser.parse_args(argv)
+    export_onnx(args.output, args.model, args.quantize)
+
+if __name__ == '__main__':
+    from app.utils.log import configure_logging
+    configure_logging()
+    main()
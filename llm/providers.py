@@ -0,0 +1,152 @@
+import hashlib
+import json
+import re
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from app.config import (
+    LLM_PROVIDER,
+    LLM_MODEL,
+    FAKE_LLM_LATENCY,
+    FAKE_LLM_TOKENS_PER_SECOND,
+    FAKE_LLM_RESPONSE_TOKENS,
+    EMBEDDING_PROVIDER,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIMENSION,
+    FAKE_EMBEDDING_LATENCY,
+)
+
+# Backends are chosen by LLM_PROVIDER / EMBEDDING_PROVIDER. The fake ones are deterministic and
+# need no network or model download, so performance work can be measured on any CI box.
+
+_VOCABULARY = (
+    "the story follows a young hero through a world of loss love and courage where family "
+    "secrets history and memory shape an unforgettable journey told with warmth wit and insight"
+).split()
+
+def _message_text(messages) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(getattr(message, "content", str(message)) for message in messages)
+
+def _question_from_prompt(prompt: str) -> str:
+    quoted = re.findall(r"'([^']*)'", prompt)
+    return quoted[-1].strip() if quoted else prompt.strip().splitlines()[-1]
+
+def _fake_intent(question: str):
+    text = question.lower().rstrip("?.! ")
+    rules = [
+        (2, r"^(?:who (?:wrote|authored|is the author of))\s+(.+)$"),
+        (5, r"^when (?:was|were)\s+(.+?)\s+(?:published|released|written)$"),
+        (1, r"^(?:give|show)(?: me)? (?:the )?details (?:of|about|for)\s+(.+)$"),
+        (3, r"^(?:summari[sz]e|tell me about|give me a summary of)\s+(.+)$"),
+        (4, r"^recommend(?: \d+)? books? (?:like|similar to|about|on)\s+(.+)$"),
+        (6, r"^(?:list|show)(?: me)? (?:all )?books (?:written )?by\s+(.+)$"),
+    ]
+    for intent_number, pattern in rules:
+        match = re.match(pattern, text)
+        if match:
+            return intent_number, match.group(1).strip()
+    return 7, text
+
+
+class FakeLLM:
+    # Drop-in for OllamaLLM.invoke/stream. Answers are a pure function of the prompt; timing is
+    # `latency` (time to first token) plus one token every 1 / tokens_per_second seconds.
+    def __init__(self, latency: float = FAKE_LLM_LATENCY, tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+                 response_tokens: int = FAKE_LLM_RESPONSE_TOKENS):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+
+    def respond(self, prompt: str) -> str:
+        if '"intent_number"' in prompt:
+            intent_number, entity_name = _fake_intent(_question_from_prompt(prompt))
+            summary = self._free_text(prompt) if intent_number == 3 else ""
+            return json.dumps({"intent_number": intent_number, "entity_name": entity_name, "summary": summary})
+        if "Intent Number:" in prompt:
+            intent_number, entity_name = _fake_intent(_question_from_prompt(prompt))
+            return f"Intent Number: {intent_number}\nEntity: {entity_name}"
+        return self._free_text(prompt)
+
+    def _free_text(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        words = [_VOCABULARY[digest[index % len(digest)] % len(_VOCABULARY)] for index in range(self.response_tokens)]
+        return " ".join(words).capitalize() + "."
+
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+    def stream(self, messages):
+        response = self.respond(_message_text(messages))
+        time.sleep(self.latency)
+        for index, token in enumerate(response.split(" ")):
+            time.sleep(self._token_delay())
+            yield token if index == 0 else " " + token
+
+    def invoke(self, messages) -> str:
+        response = self.respond(_message_text(messages))
+        time.sleep(self.latency + self._token_delay() * len(response.split(" ")))
+        return response
+
+
+class HashingEmbedder:
+    # Feature-hashing stand-in for SentenceTransformer.encode: each lowercase word and word bigram
+    # is hashed to a signed bucket, then the vector is L2-normalized. Texts sharing words land close
+    # together, which is enough to exercise retrieval, caching and batching code paths.
+    def __init__(self, dimension: int = EMBEDDING_DIMENSION, latency: float = FAKE_EMBEDDING_LATENCY):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(sentences, str):
+            return self._embed(sentences)
+        return np.stack([self._embed(sentence) for sentence in sentences]) if sentences else np.zeros((0, self.dimension), dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+
+# The accessors fill in their defaults before the cached loaders see the arguments, so get_llm()
+# and get_llm(LLM_PROVIDER, LLM_MODEL) return the same instance (lru_cache keys on the call as written)
+def get_llm(provider: str = LLM_PROVIDER, model_name: str = LLM_MODEL):
+    return _load_llm(provider, model_name)
+
+@lru_cache(maxsize=None)
+def _load_llm(provider: str, model_name: str):
+    if provider == "fake":
+        return FakeLLM()
+    if provider == "ollama":
+        from langchain_ollama import OllamaLLM
+        return OllamaLLM(model=model_name)
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+def get_embedder(provider: str = EMBEDDING_PROVIDER, model_name: str = EMBEDDING_MODEL):
+    return _load_embedder(provider, model_name)
+
+@lru_cache(maxsize=None)
+def _load_embedder(provider: str, model_name: str):
+    if provider == "hashing":
+        return HashingEmbedder()
+    if provider == "sentence_transformers":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if provider == "onnx":
+        # The export under EMBEDDING_ONNX_PATH must be of model_name; see llm.onnx_embedder
+        from llm.onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(model_name=model_name)
+    raise ValueError(f"Unknown embedding provider: {provider}")
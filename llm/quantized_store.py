@@ -0,0 +1,371 @@
+import argparse
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.config import VECTOR_QUANTIZATION, VECTOR_RESCORE_FACTOR, VECTOR_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+# A vector store with the Chroma collection methods the app uses (get/query/upsert/add/delete/
+# count) that keeps only quantized embeddings in memory: int8 codes with one scale per vector
+# (4x smaller than float32) or float16 (2x). A query scans the codes, then rescores the best
+# n_results * rescore_factor candidates against the float32 vectors, which stay on disk and are
+# memory-mapped, so the ranking of the final results is exact. Distances are squared L2, as in Chroma.
+#
+# On disk (under `path`) every file is append-only: vectors.f32, codes.bin, scales.f32 and
+# norms.f32 hold one row per written vector, and entries.jsonl maps rows to ids and metadata and
+# records deletes. Writers append under an flock on entries.jsonl; every process applies new
+# entries before it reads, so writes from one API worker are seen by the others. Rows replaced or
+# deleted stay in the files, in memory and in every scan, masked out: re-embedding the whole
+# catalogue once doubles all of them (stats() reports the dead rows).
+#
+#   python -m llm.quantized_store --compact
+#
+# rewrites the live rows into a new generation of row files (vectors.1.f32, ...) and swaps in a
+# new entries.jsonl, which names its generation on its first line; replacing the log is the commit
+# point, so a crash leaves either store intact. Other processes reload from scratch when they see
+# the new log. Readers take a shared flock while they load, so they never mix generations.
+
+QUANTIZATIONS = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Codes are converted to float32 this many rows at a time while scanning; blocks this small stay
+# in cache between the conversion and the matrix-vector product, which keeps int8 scans as fast
+# as float32 ones (1.5 MB blocks were 4x slower)
+SCAN_ROWS = 1024
+
+
+def quantize(vectors, quantization: str):
+    # Returns (codes, per-row scales); scales are None unless quantization is int8
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(QUANTIZATIONS[quantization]), None
+
+def _grow(array, rows: int):
+    # Capacity doubles so appending n rows one batch at a time stays O(n) overall
+    if array is not None and len(array) >= rows:
+        return array
+    capacity = max(rows, 2 * (0 if array is None else len(array)), 1024)
+    grown = np.zeros((capacity,) + (() if array is None else array.shape[1:]),
+                     dtype=np.float32 if array is None else array.dtype)
+    if array is not None:
+        grown[:len(array)] = array
+    return grown
+
+
+class QuantizedCollection:
+    def __init__(self, path: str = VECTOR_STORE_PATH, quantization: str = VECTOR_QUANTIZATION,
+                 rescore_factor: int = VECTOR_RESCORE_FACTOR):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {quantization}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.rescore_factor = rescore_factor
+        self._lock = threading.Lock()
+        settings_path = os.path.join(path, "store.json")
+        if os.path.exists(settings_path):
+            with open(settings_path) as file:
+                settings = json.load(file)
+            if settings["quantization"] != quantization:
+                raise ValueError(f"{path} holds {settings['quantization']} codes, not {quantization}")
+            self.dimension = settings["dimension"]
+        else:
+            self.dimension = None
+        self.quantization = quantization
+
+        self._reset(None)
+        self._refresh()
+
+    def _reset(self, log_inode):
+        # Forgets every loaded row; the next _refresh reads entries.jsonl from the start
+        self.ids = []
+        self.metadatas = []
+        self.positions = {}
+        self.generation = 0
+        self._rows = 0
+        self._log_inode = log_inode
+        self._log_offset = 0
+        self._codes = None
+        self._scales = None
+        self._norms = None
+        self._live = None
+        self._full = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _row_file(self, name: str, generation: int = None) -> str:
+        # Generation 0 (never compacted) uses the plain names: vectors.f32, vectors.1.f32, ...
+        generation = self.generation if generation is None else generation
+        if generation:
+            stem, extension = os.path.splitext(name)
+            name = f"{stem}.{generation}{extension}"
+        return self._file(name)
+
+    @property
+    def _row_files(self):
+        # (file name, dtype, values per row) of the append-only row files
+        files = [("vectors.f32", np.float32, self.dimension), ("norms.f32", np.float32, 1)]
+        if self.quantization != "float32":
+            files.append(("codes.bin", QUANTIZATIONS[self.quantization], self.dimension))
+        if self.quantization == "int8":
+            files.append(("scales.f32", np.float32, 1))
+        return files
+
+    def _open_log(self, mode: str, lock: int):
+        # entries.jsonl, flocked. A compaction may swap in a new log while this waits for the
+        # lock; the lock is then on the old file, so the new one is opened and locked instead.
+        while True:
+            log = open(self._file("entries.jsonl"), mode)
+            fcntl.flock(log, lock)
+            try:
+                if os.fstat(log.fileno()).st_ino == os.stat(self._file("entries.jsonl")).st_ino:
+                    return log
+            except FileNotFoundError:
+                pass
+            log.close()
+
+    def _refresh(self, locked: bool = False):
+        # Applies entries appended (by this or another process) since the last call, or everything
+        # again after a compaction. `locked` when the caller already holds the writer's lock.
+        with self._lock:
+            try:
+                stat = os.stat(self._file("entries.jsonl"))
+            except FileNotFoundError:
+                return
+            if stat.st_ino == self._log_inode and stat.st_size <= self._log_offset:
+                return
+            if locked:
+                with open(self._file("entries.jsonl"), "rb") as file:
+                    self._apply_log(file)
+            else:
+                with self._open_log("rb", fcntl.LOCK_SH) as file:
+                    self._apply_log(file)
+
+    def _apply_log(self, file):
+        stat = os.fstat(file.fileno())
+        if stat.st_ino != self._log_inode:
+            self._reset(stat.st_ino)
+        if stat.st_size <= self._log_offset:
+            return
+        file.seek(self._log_offset)
+        data = file.read(stat.st_size - self._log_offset)
+        # A writer may be halfway through a line
+        data = data[:data.rfind(b"\n") + 1]
+        if self.dimension is None:
+            with open(self._file("store.json")) as settings:
+                self.dimension = json.load(settings)["dimension"]
+        entries = [json.loads(line) for line in data.splitlines()]
+        if entries and "generation" in entries[0]:
+            # The first line of a compacted log
+            self.generation = entries.pop(0)["generation"]
+        rows = self._rows + sum(1 for entry in entries if "row" in entry)
+        if rows > self._rows:
+            self._load_rows(rows)
+        for entry in entries:
+            previous = self.positions.pop(entry["id"], None)
+            if previous is not None:
+                self._live[previous] = False
+            if "row" in entry:
+                self.ids.append(entry["id"])
+                self.metadatas.append(entry.get("metadata"))
+                self.positions[entry["id"]] = entry["row"]
+                self._live[entry["row"]] = True
+        self._log_offset += len(data)
+
+    def _load_rows(self, rows: int):
+        count = rows - self._rows
+        loaded = {}
+        for name, dtype, width in self._row_files:
+            loaded[name] = np.fromfile(self._row_file(name), dtype=dtype, count=count * width,
+                                       offset=self._rows * width * np.dtype(dtype).itemsize)
+        codes = loaded["codes.bin"] if "codes.bin" in loaded else loaded["vectors.f32"]
+        self._codes = _grow(self._codes if self._codes is not None else
+                            np.zeros((0, self.dimension), dtype=codes.dtype), rows)
+        self._codes[self._rows:rows] = codes.reshape(count, self.dimension)
+        self._norms = _grow(self._norms, rows)
+        self._norms[self._rows:rows] = loaded["norms.f32"]
+        if self.quantization == "int8":
+            self._scales = _grow(self._scales, rows)
+            self._scales[self._rows:rows] = loaded["scales.f32"]
+        self._live = _grow(self._live if self._live is not None else np.zeros(0, dtype=bool), rows)
+        self._full = np.memmap(self._row_file("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        self._rows = rows
+
+    @contextmanager
+    def _writing(self):
+        # One writer at a time across processes; the store is brought up to date first
+        with self._open_log("ab", fcntl.LOCK_EX) as log:
+            try:
+                self._refresh(locked=True)
+                yield log
+                log.flush()
+            finally:
+                fcntl.flock(log, fcntl.LOCK_UN)
+        self._refresh()
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        if documents is not None:
+            raise ValueError("The quantized store does not keep documents")
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if not len(ids):
+            return
+        metadatas = metadatas or [None] * len(ids)
+        with self._writing() as log:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                with open(self._file("store.json"), "w") as file:
+                    json.dump({"quantization": self.quantization, "dimension": self.dimension}, file)
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional embeddings, got {vectors.shape[1]}")
+            codes, scales = quantize(vectors, self.quantization)
+            columns = {"vectors.f32": vectors, "norms.f32": (vectors ** 2).sum(axis=1), "codes.bin": codes,
+                       "scales.f32": scales}
+            for name, dtype, width in self._row_files:
+                with open(self._row_file(name), "ab") as file:
+                    # Drops rows a crashed writer appended without logging them
+                    file.truncate(self._rows * width * np.dtype(dtype).itemsize)
+                    file.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+            log.write(b"".join(
+                json.dumps({"id": vector_id, "row": self._rows + index, "metadata": metadata}).encode("utf-8") + b"\n"
+                for index, (vector_id, metadata) in enumerate(zip(ids, metadatas))
+            ))
+
+    add = upsert
+
+    def delete(self, ids):
+        with self._writing() as log:
+            log.write(b"".join(json.dumps({"id": vector_id}).encode("utf-8") + b"\n"
+                               for vector_id in ids if vector_id in self.positions))
+
+    def compact(self) -> dict:
+        # Rewrites the live rows, in order, into the next generation of row files; returns the
+        # stats() from before and after
+        before = self.stats()
+        if not before["rows"]:
+            return {"before": before, "after": before}
+        with self._writing():
+            rows = np.flatnonzero(self._live[:self._rows])
+            generation = self.generation + 1
+            columns = {"vectors.f32": self._full[rows], "norms.f32": self._norms[rows],
+                       "codes.bin": self._codes[rows], "scales.f32": None if self._scales is None else self._scales[rows]}
+            for name, dtype, width in self._row_files:
+                with open(self._row_file(name, generation), "wb") as file:
+                    file.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+                    file.flush()
+                    os.fsync(file.fileno())
+            with open(self._file("entries.jsonl.compact"), "wb") as file:
+                file.write(json.dumps({"generation": generation}).encode("utf-8") + b"\n")
+                file.write(b"".join(
+                    json.dumps({"id": self.ids[row], "row": index, "metadata": self.metadatas[row]}).encode("utf-8") + b"\n"
+                    for index, row in enumerate(rows.tolist())
+                ))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(self._file("entries.jsonl.compact"), self._file("entries.jsonl"))
+            # Processes still mapping the old vectors keep them until they reload
+            for name, _, _ in self._row_files:
+                try:
+                    os.unlink(self._row_file(name))
+                except FileNotFoundError:
+                    pass
+        return {"before": before, "after": self.stats()}
+
+    def stats(self) -> dict:
+        # Rows held in memory and scanned by every query, how many of them are replaced or
+        # deleted, and the size of the store on disk
+        self._refresh()
+        names = ["entries.jsonl"] + ([os.path.basename(self._row_file(name)) for name, _, _ in self._row_files]
+                                     if self.dimension else [])
+        disk = sum(os.path.getsize(self._file(name)) for name in names if os.path.exists(self._file(name)))
+        live = len(self.positions)
+        return {"rows": self._rows, "live_rows": live, "dead_rows": self._rows - live, "disk_bytes": disk}
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self.positions)
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=0):
+        self._refresh()
+        if ids is not None:
+            rows = [self.positions[vector_id] for vector_id in ids if vector_id in self.positions]
+        else:
+            rows = np.flatnonzero(self._live[:self._rows]) if self._rows else []
+            rows = list(rows[offset:None if limit is None else offset + limit])
+        return self._result(rows, include)
+
+    def _result(self, rows, include, distances=None):
+        result = {"ids": [self.ids[row] for row in rows]}
+        if "embeddings" in include:
+            result["embeddings"] = [np.array(self._full[row]) for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[row] for row in rows]
+        if "distances" in include and distances is not None:
+            result["distances"] = [float(distance) for distance in distances]
+        return result
+
+    def _approximate_distances(self, query, rows: int):
+        if self._codes.dtype == np.float32:
+            return self._norms[:rows] - 2 * (self._codes[:rows] @ query)
+        dots = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, SCAN_ROWS):
+            block = self._codes[start:min(start + SCAN_ROWS, rows)]
+            dots[start:start + len(block)] = block.astype(np.float32) @ query
+        if self._scales is not None:
+            dots *= self._scales[:rows]
+        # Squared L2 without the query's own norm, which does not change the order
+        return self._norms[:rows] - 2 * dots
+
+    def query(self, query_embeddings, n_results: int = 10, include=("metadatas", "distances")):
+        self._refresh()
+        rows = self._rows
+        results = {"ids": []}
+        for key in ("embeddings", "metadatas", "distances"):
+            if key in include:
+                results[key] = []
+        n_results = min(n_results, len(self.positions))
+        for query in np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)):
+            if n_results <= 0:
+                hits = self._result([], include, [])
+            else:
+                approximate = self._approximate_distances(query, rows)
+                approximate[~self._live[:rows]] = np.inf
+                rescore = self.quantization != "float32" and self.rescore_factor > 0
+                candidates = min(n_results * self.rescore_factor if rescore else n_results, len(self.positions))
+                top = np.argpartition(approximate, candidates - 1)[:candidates]
+                if rescore:
+                    # Sorted rows read the memory-mapped vectors front to back
+                    top = np.sort(top)
+                    distances = ((self._full[top] - query) ** 2).sum(axis=1)
+                else:
+                    distances = approximate[top] + float(query @ query)
+                order = np.argsort(distances, kind="stable")[:n_results]
+                hits = self._result(top[order].tolist(), include, distances[order])
+            for key, values in hits.items():
+                results[key].append(values)
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or compact the quantized vector store")
+    parser.add_argument("--path", default=VECTOR_STORE_PATH)
+    parser.add_argument("--quantization", default=VECTOR_QUANTIZATION)
+    parser.add_argument("--compact", action="store_true", help="Drop replaced and deleted rows")
+    args = parser.parse_args(argv)
+    collection = QuantizedCollection(args.path, args.quantization)
+    if args.compact:
+        logger.info("Quantized store compacted", extra={"path": args.path, **collection.compact()})
+    else:
+        logger.info("Quantized store stats", extra={"path": args.path, **collection.stats()})
+
+if __name__ == '__main__':
+    from app.utils.log import configure_logging
+    configure_logging()
+    main()
@@ -0,0 +1,208 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from enum import IntEnum
+from functools import lru_cache
+
+import anyio
+
+from app.config import LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE_DEPTH, LLM_CALL_TIMEOUT
+from llm.inflight import track_llm_call
+from app.utils.tracing import span
+from app.utils.metrics import gauge, LLM_CALLS, LLM_CALL_DURATION, LLM_QUEUE_WAIT, LLM_TOKENS
+
+
+class Priority(IntEnum):
+    INTENT = 0
+    CHAT = 1
+    SUMMARY = 2
+
+# Share of the queue each class may fill before it is shed, so long summaries are rejected
+# first and intent classification keeps flowing under load
+QUEUE_SHARE = {
+    Priority.INTENT: 1.0,
+    Priority.CHAT: 0.75,
+    Priority.SUMMARY: 0.5,
+}
+
+class LLMSchedulerError(Exception):
+    status_code = 503
+
+class LLMQueueFull(LLMSchedulerError):
+    def __init__(self, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LLMTimeout(LLMSchedulerError):
+    status_code = 504
+
+class LLMCancelled(LLMSchedulerError):
+    # Client closed the connection; nothing will read the response
+    status_code = 499
+
+_cancel_event = contextvars.ContextVar("llm_cancel_event", default=None)
+
+@contextmanager
+def cancellation(event: threading.Event):
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue_depth: int = LLM_MAX_QUEUE_DEPTH,
+                 default_timeout: float = LLM_CALL_TIMEOUT, poll_interval: float = 0.05):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.default_timeout = default_timeout
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._waiting)
+
+    def running(self) -> int:
+        with self._condition:
+            return self._running
+
+    def run(self, fn, priority: Priority = Priority.CHAT, timeout: float = None, cancel_event: threading.Event = None):
+        timeout = self.default_timeout if timeout is None else timeout
+        cancel_event = cancel_event or _cancel_event.get()
+        deadline = time.monotonic() + timeout
+
+        priority_name = priority.name.lower()
+        queued_at = time.monotonic()
+        outcome = "error"
+        try:
+            with span("llm.call", **{"llm.priority": priority_name}) as llm_span:
+                ticket = self._enqueue(priority)
+                self._wait_for_slot(ticket, deadline, cancel_event)
+                queue_wait = time.monotonic() - queued_at
+                llm_span.set_attribute("llm.queue_wait_ms", round(queue_wait * 1000, 3))
+                LLM_QUEUE_WAIT.observe(queue_wait, priority=priority_name)
+
+                # The slot is released by _execute when the call really finishes, even if the caller
+                # gave up on it, so Ollama never sees more than max_concurrency requests. It runs in
+                # a copy of the caller's context, so its spans and per-request query counts carry over
+                context = contextvars.copy_context()
+                future = self._executor.submit(context.run, self._execute, fn)
+                while True:
+                    self._check_abandoned(deadline, cancel_event, "running")
+                    try:
+                        result = future.result(timeout=min(deadline - time.monotonic(), self.poll_interval))
+                        break
+                    except FutureTimeoutError:
+                        continue
+            outcome = "ok"
+            if isinstance(result, str):
+                LLM_TOKENS.inc(len(result.split()), priority=priority_name)
+            return result
+        except LLMQueueFull:
+            outcome = "rejected"
+            raise
+        except LLMTimeout:
+            outcome = "timeout"
+            raise
+        except LLMCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_CALLS.inc(priority=priority_name, outcome=outcome)
+            if outcome != "rejected":
+                LLM_CALL_DURATION.observe(time.monotonic() - queued_at, priority=priority_name)
+
+    def _enqueue(self, priority: Priority):
+        with self._condition:
+            depth = len(self._waiting)
+            if depth >= self.max_queue_depth:
+                raise LLMQueueFull(f"LLM queue is full ({depth} waiting)", status_code=503)
+            if depth >= self.max_queue_depth * QUEUE_SHARE[priority]:
+                raise LLMQueueFull(f"Too many {priority.name.lower()} requests queued", status_code=429)
+            ticket = (int(priority), next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            return ticket
+
+    def _wait_for_slot(self, ticket, deadline: float, cancel_event: threading.Event):
+        with self._condition:
+            try:
+                while self._waiting[0] != ticket or self._running >= self.max_concurrency:
+                    self._check_abandoned(deadline, cancel_event, "queued")
+                    self._condition.wait(min(max(deadline - time.monotonic(), 0), self.poll_interval))
+            except LLMSchedulerError:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._running += 1
+            self._condition.notify_all()
+
+    def _check_abandoned(self, deadline: float, cancel_event: threading.Event, stage: str):
+        if cancel_event is not None and cancel_event.is_set():
+            raise LLMCancelled(f"LLM call cancelled while {stage}")
+        if time.monotonic() >= deadline:
+            raise LLMTimeout(f"LLM call timed out while {stage}")
+
+    def _execute(self, fn):
+        try:
+            with track_llm_call():
+                return fn()
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify_all()
+
+
+@lru_cache(maxsize=None)
+def get_llm_scheduler() -> LLMScheduler:
+    return LLMScheduler()
+
+def _scheduler_state():
+    # Only reports once a scheduler exists; scraping /metrics must not create one
+    if not get_llm_scheduler.cache_info().currsize:
+        return {}
+    scheduler = get_llm_scheduler()
+    return {("queued",): scheduler.queue_depth(), ("running",): scheduler.running()}
+
+gauge("llm_scheduler_calls", "LLM calls waiting for or holding a scheduler slot", ("state",), callback=_scheduler_state)
+
+def run_llm(fn, priority: Priority = Priority.CHAT, timeout: float = None):
+    return get_llm_scheduler().run(fn, priority=priority, timeout=timeout)
+
+async def run_until_disconnected(request, fn, *args, poll_interval: float = 0.25):
+    # Runs a blocking LLM pipeline in a worker thread and cancels its queued or running
+    # scheduler calls as soon as the client goes away
+    cancel_event = threading.Event()
+
+    def call():
+        # Errors are handed back as values so the task group does not wrap them in an ExceptionGroup
+        with cancellation(cancel_event):
+            try:
+                return fn(*args), None
+            except Exception as e:
+                return None, e
+
+    async def watch_disconnect():
+        while not await request.is_disconnected():
+            await anyio.sleep(poll_interval)
+        cancel_event.set()
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(watch_disconnect)
+        result, error = await anyio.to_thread.run_sync(call)
+        task_group.cancel_scope.cancel()
+
+    if error is not None:
+        raise error
+    return result
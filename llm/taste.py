@@ -0,0 +1,211 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import TASTE_PREFERENCE_WEIGHT, TASTE_CACHE_SIZE, TASTE_CACHE_TTL
+from app.database.schemas.books import Book
+from app.database.schemas.favorite_books import favorite_books
+from app.database.schemas.preferences import Preferences
+from app.database.schemas.user_taste import UserTaste
+from app.database.schemas.logs import utc_now
+from app.services.book_services import serialize_book
+from llm.embedding_queue import vector_ids_for_books, book_ids_for_hits
+
+logger = logging.getLogger(__name__)
+
+# Per-user taste vectors for /users/me/recommendations. user_tastes keeps the running sum of the
+# user's favorite book embeddings and which books it contains; adding a favorite adds one
+# embedding instead of re-reading every favorite. Updates reconcile the row with the committed
+# favorites, so repeated, reordered or already-rebuilt background updates change nothing.
+# Preferred genres are embedded (through the query embedding cache) at read time, so preference
+# edits apply immediately.
+
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def _encode(vector) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def _decode(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32).copy()
+
+def _unit(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+def book_embeddings(session: Session, collection, book_ids) -> dict:
+    # {book id: embedding} for the books that have one in the vector store
+    vector_ids = vector_ids_for_books(session, book_ids)
+    if not vector_ids:
+        return {}
+    result = collection.get(ids=list(vector_ids.values()), include=["embeddings"])
+    by_vector_id = {vector_id: book_id for book_id, vector_id in vector_ids.items()}
+    return {by_vector_id[vector_id]: np.asarray(embedding, dtype=np.float32)
+            for vector_id, embedding in zip(result["ids"], result["embeddings"])}
+
+
+class TasteProfiles:
+    def __init__(self, vector_manager=None, preference_weight: float = TASTE_PREFERENCE_WEIGHT,
+                 cache_size: int = TASTE_CACHE_SIZE, cache_ttl: float = TASTE_CACHE_TTL):
+        self._vector_manager = vector_manager
+        self.preference_weight = preference_weight
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def vector_manager(self):
+        if self._vector_manager is None:
+            from llm.loader import get_vector_manager
+            self._vector_manager = get_vector_manager()
+        return self._vector_manager
+
+    # Favorites sum/count, cached per worker. Other workers see an update after cache_ttl at most.
+    def _cached(self, email: str):
+        with self._lock:
+            entry = self._cache.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self._cache.move_to_end(email)
+            return entry[1], entry[2]
+
+    def _remember(self, email: str, total, count: int):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[email] = (time.monotonic() + self.cache_ttl, total, count)
+            self._cache.move_to_end(email)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _locked_row(self, session: Session, email: str) -> UserTaste:
+        # Creates the user's row if it is missing and locks it. Two first builds for one user both
+        # find no row; with ON CONFLICT DO NOTHING the second insert waits for the first and then
+        # updates its row instead of failing. The placeholder's NULL favorite_book_ids means unknown
+        # (see UserTaste), and it is only committed together with a real sum.
+        stmt = _DIALECT_INSERTS[session.get_bind().dialect.name](UserTaste).values(
+            email=email, favorites_sum=b"", favorites_count=0, updated_at=utc_now()
+        )
+        session.execute(stmt.on_conflict_do_nothing(index_elements=[UserTaste.email]))
+        return session.scalar(select(UserTaste).where(UserTaste.email == email).with_for_update())
+
+    def _store(self, session: Session, email: str, total, book_ids):
+        taste = session.get(UserTaste, email) or self._locked_row(session, email)
+        taste.favorites_sum = _encode(total)
+        taste.favorites_count = len(book_ids)
+        taste.favorite_book_ids = json.dumps(sorted(book_ids))
+        taste.updated_at = utc_now()
+        session.commit()
+        self._remember(email, total, len(book_ids))
+
+    def rebuild(self, session: Session, email: str):
+        # From scratch: one favorites query and one vector store read
+        favorite_ids = session.scalars(select(favorite_books.c.book_id).where(favorite_books.c.user_email == email)).all()
+        embeddings = book_embeddings(session, self.vector_manager.collection, favorite_ids)
+        if embeddings:
+            total = np.sum(list(embeddings.values()), axis=0)
+        else:
+            dimension = self.vector_manager.model.get_sentence_embedding_dimension()
+            total = np.zeros(dimension, dtype=np.float32)
+        self._store(session, email, total, embeddings.keys())
+        return total, len(embeddings)
+
+    def favorites(self, session: Session, email: str):
+        cached = self._cached(email)
+        if cached is not None:
+            return cached
+        taste = session.get(UserTaste, email)
+        if taste is None:
+            return self.rebuild(session, email)
+        total = _decode(taste.favorites_sum)
+        self._remember(email, total, taste.favorites_count)
+        return total, taste.favorites_count
+
+    def apply_favorite(self, session: Session, email: str, book_id: int, added: bool):
+        # Brings book_id's part of the sum in line with the committed favorites; `added` is what
+        # the request did, but a later request may already have undone it. The row lock keeps
+        # concurrent changes for the same user from losing an update.
+        taste = self._locked_row(session, email)
+        if taste.favorite_book_ids is None:
+            # The favorite is already committed, so a rebuild includes it
+            return self.rebuild(session, email)
+        included = set(json.loads(taste.favorite_book_ids))
+        total = _decode(taste.favorites_sum)
+        is_favorite = session.scalar(select(favorite_books.c.book_id).where(
+            favorite_books.c.user_email == email, favorite_books.c.book_id == book_id
+        )) is not None
+        if not is_favorite and book_id in included:
+            # The book's embedding may have changed since it was added, so subtracting the current
+            # one would leave a residue in the sum; recompute from the remaining favorites instead
+            return self.rebuild(session, email)
+        if is_favorite and book_id not in included:
+            embedding = book_embeddings(session, self.vector_manager.collection, [book_id]).get(book_id)
+            if embedding is not None and embedding.shape == total.shape:
+                included.add(book_id)
+                self._store(session, email, total + embedding, included)
+                return total + embedding, len(included)
+        # Already in line (or the book has no vector yet); release the lock
+        session.commit()
+        return total, len(included)
+
+    def preferences(self, session: Session, email: str):
+        genres = session.scalars(select(Preferences.preference).where(Preferences.email == email)).all()
+        if not genres:
+            return None
+        return np.mean([np.asarray(self.vector_manager.embed_query(genre), dtype=np.float32) for genre in genres], axis=0)
+
+    def taste_vector(self, session: Session, email: str):
+        total, count = self.favorites(session, email)
+        favorites = _unit(total / count) if count else None
+        preferences = self.preferences(session, email)
+        preferences = _unit(preferences) if preferences is not None else None
+        if favorites is None or preferences is None:
+            return favorites if preferences is None else preferences
+        return _unit((1 - self.preference_weight) * favorites + self.preference_weight * preferences)
+
+    def recommend(self, session: Session, email: str, limit: int = 10):
+        taste = self.taste_vector(session, email)
+        if taste is None:
+            return True, "Add favorites or genre preferences to get recommendations", []
+        favorite_ids = set(session.scalars(
+            select(favorite_books.c.book_id).where(favorite_books.c.user_email == email)
+        ))
+        # Over-fetch by the number of favorites so excluding them still leaves `limit` books
+        results = self.vector_manager.query_collection("personalized", taste.tolist(), limit + len(favorite_ids),
+                                                       include=("metadatas",))
+        hit_ids = book_ids_for_hits(session, results["ids"][0], (results.get("metadatas") or [None])[0])
+        book_ids = [book_id for book_id in hit_ids if book_id not in favorite_ids][:limit]
+        books = {book.id: book for book in session.scalars(
+            select(Book).where(Book.id.in_(book_ids)).options(selectinload(Book.authors))
+        )}
+        return True, "Recommendations fetched successfully", [
+            serialize_book(books[book_id]) for book_id in book_ids if book_id in books
+        ]
+
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+def get_taste_profiles() -> TasteProfiles:
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = TasteProfiles()
+        return _profiles
+
+def update_taste_after_favorite(email: str, book_id: int, added: bool):
+    # Background task for the favorites endpoints
+    from app.database.connector import SessionLocal
+    from app.database.routing import use_primary
+    try:
+        with use_primary(SessionLocal()) as session:
+            get_taste_profiles().apply_favorite(session, email, book_id, added)
+    except Exception:
+        logger.exception("Failed to update taste vector", extra={"book_id": book_id})
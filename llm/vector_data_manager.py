@@ -1,73 +1,133 @@
-from chromadb import PersistentClient
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from chromadb.config import Settings
+from app.config import EMBEDDING_CACHE_SIZE, EMBEDDING_BATCH_MAX_SIZE, VECTOR_STORE
+from llm.embedding_batcher import EmbeddingBatcher
+from llm.providers import get_embedder
+from app.utils.tracing import span
+from app.utils.metrics import EMBEDDING_CACHE_REQUESTS, EMBEDDING_DURATION, VECTOR_SEARCH_DURATION
+
+logger = logging.getLogger(__name__)
+
+# One model instance per process (cached by the provider); loading it before the server forks
+# lets workers share the weights
+def get_embedding_model():
+    return get_embedder()
+
+class EmbeddingCache:
+    # LRU of query text -> embedding (as a list, ready for Chroma)
+    def __init__(self, maxsize: int = EMBEDDING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, text: str):
+        with self._lock:
+            vector = self._entries.get(text)
+            if vector is not None:
+                self._entries.move_to_end(text)
+        EMBEDDING_CACHE_REQUESTS.inc(result="hit" if vector is not None else "miss")
+        return vector
+
+    def put(self, text: str, vector):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[text] = vector
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+def open_collection():
+    if VECTOR_STORE == "quantized":
+        from llm.quantized_store import QuantizedCollection
+        return QuantizedCollection()
+    return open_chroma_collection()
+
+def open_chroma_collection():
+    from chromadb import PersistentClient
+    from chromadb.config import Settings
+    client = PersistentClient(
+        path="chroma_db",
+        settings=Settings(),
+    )
+    return client.get_or_create_collection(name="book_collection")
 
 class VectorDataManager:
-    def __init__(self):
-        self.client = PersistentClient(
-            path="chroma_db",
-            settings=Settings(),
-        )
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.collection = self.client.get_or_create_collection(name="book_collection")
-        print("VectorDataManager initialized.")
+    # The model and collection default to in-process ones; llm.vector_sidecar passes proxies to a
+    # shared worker process instead
+    def __init__(self, model=None, collection=None, batch_queries: bool = EMBEDDING_BATCH_MAX_SIZE > 1):
+        self.model = model if model is not None else get_embedding_model()
+        self.collection = collection if collection is not None else open_collection()
+        self.embedding_cache = EmbeddingCache()
+        # Concurrent cache misses share one encode call; see llm.embedding_batcher
+        self.batcher = EmbeddingBatcher(self.model) if batch_queries else None
+        logger.info("VectorDataManager initialized")
 
-    def recommend_books(self, query: str, num_results: int = 2):
-        print("Querying ChromaDB for recommendations...")
-        query_vector = self.model.encode(query).tolist()
+    def embed_query(self, query: str):
+        query_vector = self.embedding_cache.get(query)
+        if query_vector is None:
+            start = time.perf_counter()
+            with span("vector.encode"):
+                if self.batcher is not None:
+                    query_vector = self.batcher.encode(query)
+                else:
+                    query_vector = self.model.encode(query).tolist()
+            EMBEDDING_DURATION.observe(time.perf_counter() - start)
+            self.embedding_cache.put(query, query_vector)
+        return query_vector
 
+    def query_collection(self, operation: str, query_vector, num_results: int, include=("metadatas", "distances")):
+        # Documents are not requested: hits are hydrated from Postgres by book id
+        start = time.perf_counter()
         try:
-            results = self.collection.query(
-                query_embeddings=[query_vector],
-                n_results=num_results  
-            )
-            recommended_titles = [metadata['title'] for metadata in results['metadatas'][0]]
-            print(f"Recommended Titles: {recommended_titles}")
-            return recommended_titles
+            with span("vector.query", **{"vector.n_results": num_results}):
+                return self.collection.query(query_embeddings=[query_vector], n_results=num_results, include=list(include))
+        finally:
+            VECTOR_SEARCH_DURATION.observe(time.perf_counter() - start, operation=operation)
+
+    def recommend_books(self, query: str, num_results: int = 2):
+        # Lexical and vector matches fused in one call; titles, best first
+        from llm.hybrid_retriever import get_hybrid_retriever
+        try:
+            hits, timings = get_hybrid_retriever().search(query, num_results)
+            logger.debug("Recommendations retrieved", extra={"results": len(hits), "timings_ms": timings})
+            return [hit.title for hit in hits]
         except Exception as e:
-            print(f"Error processing query: {str(e)}")
+            logger.exception("Error querying recommendations")
             return []
 
     def cosine_similarity(self, vec1, vec2):
         return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
 
     def search_similar_book(self, query: str, similarity_threshold: float = 0.5, num_results: int = 1):
-        print("Searching for similar books in ChromaDB...")
-        query_vector = self.model.encode(query).tolist()
+        query_vector = self.embed_query(query)
 
         try:
-            results = self.collection.query(
-                query_embeddings=[query_vector],
-                n_results=num_results  
-            )
-            print(f"Raw results from ChromaDB: {results}")
-            
-            if results and 'metadatas' in results and results['metadatas']:
-                # Safely attempt to get the embeddings
-                embeddings = results.get('embeddings', [None])[0]
-                if embeddings is None or not embeddings:
-                    print("No embeddings found, skipping similarity calculation.")
-                    return "No similar book found in the vector database."
-
-                similarities = [
-                    self.cosine_similarity(query_vector, result_embedding)
-                    for result_embedding in embeddings
-                ]
-
-                similar_titles = [
-                    (metadata['title'], similarity)
-                    for metadata, similarity in zip(results['metadatas'][0], similarities)
-                    if similarity >= similarity_threshold
-                ]
-                
-                if similar_titles:
-                    return similar_titles
-                else:
-                    return "No similar book found with a high enough similarity score."
-            else:
-                print("No similar titles found.")
+            results = self.query_collection("search_similar", query_vector, num_results)
+            ids = results.get("ids", [[]])[0]
+            logger.debug("Similar book search returned", extra={"results": len(ids)})
+            if not ids:
                 return "No similar book found in the vector database."
+
+            # Titles come from the lexical index rather than the vector payload
+            from llm.hybrid_retriever import get_hybrid_retriever
+            retriever = get_hybrid_retriever()
+            similar_titles = []
+            for vector_id, metadata, distance in zip(ids, results["metadatas"][0], results["distances"][0]):
+                # Squared L2 between unit vectors: cosine similarity = 1 - d / 2
+                similarity = 1 - distance / 2
+                book = retriever.book((metadata or {}).get("book_id")) or retriever.book_by_vector_id(vector_id)
+                if book is not None and similarity >= similarity_threshold:
+                    similar_titles.append((book.title, similarity))
+
+            if similar_titles:
+                return similar_titles
+            else:
+                return "No similar book found with a high enough similarity score."
         except Exception as e:
-            print(f"Error processing query: {str(e)}")
+            logger.exception("Error searching similar books")
             return "Error processing query."
@@ -0,0 +1,343 @@
+import ipaddress
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+from multiprocessing.connection import Client, Listener, AuthenticationError
+
+import numpy as np
+
+from app.config import (
+    VECTOR_SIDECAR_ADDRESS,
+    VECTOR_SIDECAR_AUTHKEY,
+    VECTOR_SIDECAR_RETRY_INTERVAL,
+    VECTOR_SIDECAR_TIMEOUT,
+)
+from app.utils.metrics import histogram
+
+logger = logging.getLogger(__name__)
+
+# One process owns the embedding model and the Chroma client and serves every API worker over a
+# Unix socket (or localhost TCP), so the weights are loaded once and a single client writes
+# chroma.sqlite3. Requests are pickled (op, kwargs) tuples, answered with ("ok", result) or
+# ("error", exception); the connection handshake checks VECTOR_SIDECAR_AUTHKEY. Unpickling runs
+# arbitrary code, so the key must be set explicitly and TCP is only served on loopback.
+#
+#   VECTOR_SIDECAR_ADDRESS=/tmp/bookapp-vectors.sock VECTOR_SIDECAR_AUTHKEY=... python -m llm.vector_sidecar
+#
+# Query texts sent by different workers go through the sidecar's embedding cache and batcher, so
+# they are cached and batched across workers.
+
+SIDECAR_CALL_DURATION = histogram("vector_sidecar_call_duration_seconds", "Round trip of calls to the vector sidecar", ("op",))
+
+COLLECTION_METHODS = frozenset(("get", "query", "upsert", "add", "delete", "count"))
+WRITE_METHODS = frozenset(("upsert", "add", "delete"))
+
+
+class SidecarUnavailable(ConnectionError):
+    pass
+
+
+def parse_address(address: str):
+    # "host:port" is TCP, anything else a Unix socket path
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        if not _is_loopback(host):
+            raise ValueError(f"Vector sidecar TCP address must be loopback, got {host}")
+        return host, int(port)
+    return address
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+def _authkey(authkey: str) -> bytes:
+    if not authkey:
+        raise ValueError("Set VECTOR_SIDECAR_AUTHKEY to a secret shared by the vector sidecar and the API workers")
+    return authkey.encode("utf-8")
+
+
+class VectorSidecar:
+    def __init__(self, manager, address: str = VECTOR_SIDECAR_ADDRESS, authkey: str = VECTOR_SIDECAR_AUTHKEY):
+        self.manager = manager
+        self.address = parse_address(address)
+        self.authkey = _authkey(authkey)
+        self._listener = None
+        self._closed = threading.Event()
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def _handle(self, op: str, kwargs: dict):
+        if op == "ping":
+            return "pong"
+        if op == "embed_query":
+            return self.manager.embed_query(kwargs["text"])
+        if op == "encode":
+            return self.manager.model.encode(kwargs["sentences"], batch_size=kwargs.get("batch_size", 32))
+        if op == "dimension":
+            return self.manager.model.get_sentence_embedding_dimension()
+        if op == "collection" and kwargs.get("method") in COLLECTION_METHODS:
+            return getattr(self.manager.collection, kwargs["method"])(**kwargs.get("kwargs", {}))
+        raise ValueError(f"Unknown vector sidecar operation: {op} {kwargs.get('method') or ''}".strip())
+
+    def _serve(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+        try:
+            with connection:
+                while not self._closed.is_set():
+                    try:
+                        op, kwargs = connection.recv()
+                    except (EOFError, OSError):
+                        return
+                    try:
+                        connection.send(self._reply(op, kwargs))
+                    except (pickle.PicklingError, TypeError, AttributeError) as e:
+                        # Pickling happens before anything is written, so the connection is intact
+                        connection.send(("error", RuntimeError(f"Unpicklable vector sidecar result: {e}")))
+        except OSError:
+            return
+        finally:
+            with self._lock:
+                self._connections.discard(connection)
+
+    def _reply(self, op: str, kwargs: dict):
+        try:
+            reply = ("ok", self._handle(op, kwargs))
+        except Exception as e:
+            logger.exception("Vector sidecar call failed", extra={"op": op})
+            # Built-in exceptions are re-raised as they are; others (e.g. chromadb's) as RuntimeError
+            if type(e).__module__ != "builtins":
+                e = RuntimeError(f"{type(e).__name__}: {e}")
+            reply = ("error", e)
+        return reply
+
+    def _bind(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # Left behind by a sidecar that did not shut down cleanly
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+
+    def start(self):
+        # Serves from a background thread; used by tests and benchmarks
+        self._bind()
+        thread = threading.Thread(target=self.serve_forever, name="vector-sidecar", daemon=True)
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        if self._listener is None:
+            self._bind()
+        logger.info("Vector sidecar listening", extra={"address": str(self.address)})
+        while not self._closed.is_set():
+            try:
+                connection = self._listener.accept()
+            except AuthenticationError:
+                logger.warning("Vector sidecar rejected a client with the wrong authkey")
+                continue
+            except OSError:
+                if self._closed.is_set():
+                    return
+                raise
+            threading.Thread(target=self._serve, args=(connection,), name="vector-sidecar-conn", daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            # Closing the socket does not wake a blocked accept(); a last connection does
+            try:
+                Client(self.address, authkey=self.authkey).close()
+            except (OSError, EOFError, AuthenticationError):
+                pass
+            self._listener.close()
+        # Shutting the sockets down wakes the handler threads blocked in recv()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                with socket.socket(fileno=os.dup(connection.fileno())) as sock:
+                    sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class SidecarClient:
+    # Connections are pooled and reused; a thread holds one for the length of a call
+    def __init__(self, address: str = VECTOR_SIDECAR_ADDRESS, authkey: str = VECTOR_SIDECAR_AUTHKEY,
+                 timeout: float = VECTOR_SIDECAR_TIMEOUT):
+        self.address = parse_address(address)
+        self.authkey = _authkey(authkey)
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self, reuse: bool = True):
+        # (connection, pooled)
+        if reuse:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop(), True
+        try:
+            return Client(self.address, authkey=self.authkey), False
+        except (OSError, EOFError, AuthenticationError) as e:
+            raise SidecarUnavailable(f"Vector sidecar unreachable at {self.address}: {e}") from e
+
+    def _request(self, connection, op: str, kwargs: dict):
+        try:
+            connection.send((op, kwargs))
+            if not connection.poll(self.timeout):
+                raise SidecarUnavailable(f"Vector sidecar did not answer {op} within {self.timeout}s")
+            return connection.recv()
+        except BaseException:
+            connection.close()
+            raise
+
+    def call(self, op: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            connection, pooled = self._connect()
+            try:
+                status, result = self._request(connection, op, kwargs)
+            except SidecarUnavailable:
+                raise
+            except (OSError, EOFError) as e:
+                if not pooled:
+                    raise SidecarUnavailable(f"Vector sidecar connection lost: {e}") from e
+                # A pooled connection closed by a sidecar restart usually still accepts the send and
+                # only fails at poll/recv. The other idle connections are as stale, so the pool is
+                # dropped and the request retried once on a new connection
+                self.close()
+                connection, _ = self._connect(reuse=False)
+                try:
+                    status, result = self._request(connection, op, kwargs)
+                except SidecarUnavailable:
+                    raise
+                except (OSError, EOFError) as e:
+                    raise SidecarUnavailable(f"Vector sidecar connection lost: {e}") from e
+        finally:
+            SIDECAR_CALL_DURATION.observe(time.perf_counter() - start, op=op)
+        with self._lock:
+            self._idle.append(connection)
+        if status == "error":
+            raise result
+        return result
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class _Remote:
+    # Calls the sidecar; when it is unreachable (or a call times out) the in-process object built
+    # with `fallback` answers reads instead, and the sidecar is tried again every retry_interval
+    # seconds. Writes are never applied to the in-process collection: it would diverge from the
+    # sidecar's, and a timed-out write may still land there, so they always go to the sidecar and
+    # raise SidecarUnavailable when it cannot take them
+    def __init__(self, client: SidecarClient, fallback=None, retry_interval: float = VECTOR_SIDECAR_RETRY_INTERVAL):
+        self.client = client
+        self.fallback = fallback
+        self.retry_interval = retry_interval
+        self.local = None
+        self._retry_at = None
+        self._lock = threading.Lock()
+
+    def _call(self, op: str, **kwargs):
+        # (True, result) from the sidecar, or (False, None) while self.local is standing in
+        if self._retry_at is None or time.monotonic() >= self._retry_at:
+            try:
+                result = self.client.call(op, **kwargs)
+            except SidecarUnavailable:
+                if self.fallback is None:
+                    raise
+                with self._lock:
+                    if self._retry_at is None:
+                        logger.warning("Vector sidecar unavailable, falling back to in-process", exc_info=True)
+                    self._retry_at = time.monotonic() + self.retry_interval
+                    if self.local is None:
+                        self.local = self.fallback()
+            else:
+                if self._retry_at is not None:
+                    logger.info("Vector sidecar reachable again")
+                    self._retry_at = None
+                return True, result
+        return False, None
+
+
+class RemoteModel(_Remote):
+    # The encode/get_sentence_embedding_dimension subset of SentenceTransformer used by the app
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if isinstance(sentences, str):
+            remote, vector = self._call("embed_query", text=sentences)
+            if remote:
+                return np.asarray(vector, dtype=np.float32)
+        else:
+            remote, vectors = self._call("encode", sentences=list(sentences), batch_size=batch_size)
+            if remote:
+                return vectors
+        return self.local.encode(sentences, batch_size=batch_size, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        remote, dimension = self._call("dimension")
+        return dimension if remote else self.local.get_sentence_embedding_dimension()
+
+
+class RemoteCollection(_Remote):
+    # Forwards the Chroma collection methods in COLLECTION_METHODS; arguments are keyword-only
+    def __getattr__(self, method: str):
+        if method not in COLLECTION_METHODS:
+            raise AttributeError(method)
+
+        def call(**kwargs):
+            if method in WRITE_METHODS:
+                return self.client.call("collection", method=method, kwargs=kwargs)
+            remote, result = self._call("collection", method=method, kwargs=kwargs)
+            return result if remote else getattr(self.local, method)(**kwargs)
+        return call
+
+
+def sidecar_vector_manager(address: str = VECTOR_SIDECAR_ADDRESS, authkey: str = VECTOR_SIDECAR_AUTHKEY):
+    # A VectorDataManager backed by the sidecar, or None if it is not running
+    from llm.vector_data_manager import VectorDataManager, get_embedding_model, open_collection
+    client = SidecarClient(address, authkey)
+    try:
+        client.call("ping")
+    except SidecarUnavailable:
+        logger.warning("Vector sidecar unavailable, using an in-process model and collection",
+                       extra={"address": address}, exc_info=True)
+        return None
+    logger.info("Using the vector sidecar", extra={"address": address})
+    # The sidecar batches query embeddings across workers, so they are sent as they come
+    return VectorDataManager(model=RemoteModel(client, get_embedding_model),
+                             collection=RemoteCollection(client, open_collection), batch_queries=False)
+
+
+def main():
+    from llm.vector_data_manager import VectorDataManager
+    if not VECTOR_SIDECAR_ADDRESS:
+        raise SystemExit("Set VECTOR_SIDECAR_ADDRESS to a Unix socket path or host:port")
+    # Checked before the model is loaded
+    try:
+        parse_address(VECTOR_SIDECAR_ADDRESS)
+        _authkey(VECTOR_SIDECAR_AUTHKEY)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    sidecar = VectorSidecar(VectorDataManager())
+    try:
+        sidecar.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sidecar.close()
+
+if __name__ == '__main__':
+    from app.utils.log import configure_logging
+    configure_logging()
+    main()
@@ -0,0 +1,143 @@
+# Production entry point: python server.py [--workers N] [--host H] [--port P]
+import argparse
+import gc
+import importlib
+import logging
+import time
+
+from app.config import (
+    WEB_HOST, WEB_PORT, WEB_WORKERS, WEB_GRACEFUL_TIMEOUT, PRELOAD_MODELS, VECTOR_SIDECAR_ADDRESS,
+    LLM_PROVIDER, EMBEDDING_PROVIDER, VECTOR_STORE,
+)
+from app.utils.log import configure_logging
+
+logger = logging.getLogger("server")
+
+# The heavy packages behind each configured provider and vector store
+LLM_PROVIDER_IMPORTS = {"ollama": ["langchain_ollama"], "fake": []}
+EMBEDDING_PROVIDER_IMPORTS = {"sentence_transformers": ["sentence_transformers"], "onnx": ["onnxruntime", "tokenizers"],
+                              "hashing": []}
+VECTOR_STORE_IMPORTS = {"chroma": ["chromadb"], "quantized": []}
+APP_IMPORTS = [
+    "langgraph.graph",
+    "app.database.connector",
+    "llm.loader",
+    "llm.vector_data_manager",
+    "llm.langgraph_integration",
+    "app.pgAdmi4.SaveDataToVectorstore",
+    "api",
+]
+
+def startup_imports(llm_provider: str = LLM_PROVIDER, embedding_provider: str = EMBEDDING_PROVIDER,
+                    vector_store: str = VECTOR_STORE):
+    # Imported in this order so each timing covers only what the module adds on top of the previous ones
+    return (EMBEDDING_PROVIDER_IMPORTS.get(embedding_provider, []) + VECTOR_STORE_IMPORTS.get(vector_store, [])
+            + LLM_PROVIDER_IMPORTS.get(llm_provider, []) + APP_IMPORTS)
+
+def timed_imports(modules=None):
+    timings = []
+    for module in startup_imports() if modules is None else modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except ModuleNotFoundError as e:
+            # Workers import what they need on first use and report it there
+            logger.warning("Skipping preload of a module that is not installed",
+                           extra={"import": module, "missing": e.name})
+            continue
+        timings.append((module, time.perf_counter() - start))
+    return timings
+
+def preload(load_models: bool = PRELOAD_MODELS):
+    total_start = time.perf_counter()
+    timings = timed_imports()
+
+    if load_models:
+        # api loads these lazily; warming them here lets every worker inherit them.
+        # The Chroma client is deliberately left to each worker since sqlite handles must not cross a fork.
+        from llm.loader import get_langgraph_app, get_intent_extractor
+        from llm.vector_data_manager import get_embedding_model
+        loaders = [("langgraph workflow", get_langgraph_app), ("intent extractor", get_intent_extractor)]
+        if not VECTOR_SIDECAR_ADDRESS:
+            # With the sidecar the weights live in its process; workers only load them as a fallback
+            loaders.insert(0, ("embedding model weights", get_embedding_model))
+        for name, loader in loaders:
+            start = time.perf_counter()
+            try:
+                loader()
+            except ModuleNotFoundError as e:
+                logger.warning("Skipping preload of a model whose packages are not installed",
+                               extra={"model": name, "missing": e.name})
+                continue
+            timings.append((name, time.perf_counter() - start))
+
+    for name, seconds in timings:
+        logger.info(f"startup {name:<40} {seconds * 1000:9.1f} ms")
+    logger.info(f"startup {'total':<40} {(time.perf_counter() - total_start) * 1000:9.1f} ms")
+
+    # Objects created so far are shared with the forked workers; freezing them keeps the
+    # garbage collector from touching (and therefore copying) those pages in every worker
+    gc.collect()
+    gc.freeze()
+
+    from api import app
+    return app
+
+def run_gunicorn(host: str, port: int, workers: int, graceful_timeout: int):
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # With preload_app this runs once in the master, before the workers fork
+            return preload()
+
+    ProductionServer({
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "graceful_timeout": graceful_timeout,
+        "timeout": graceful_timeout * 2,
+    }).run()
+
+def run_uvicorn(host: str, port: int, workers: int, graceful_timeout: int):
+    import uvicorn
+    if workers > 1:
+        logger.warning("gunicorn is not installed; uvicorn workers are spawned and load their own copy of the models")
+    else:
+        preload()
+    uvicorn.run(
+        "api:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the book API with multiple workers")
+    parser.add_argument("--host", default=WEB_HOST)
+    parser.add_argument("--port", type=int, default=WEB_PORT)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--graceful-timeout", type=int, default=WEB_GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    configure_logging()
+
+    try:
+        import gunicorn  # noqa: F401
+        runner = run_gunicorn
+    except ImportError:
+        runner = run_uvicorn
+    runner(args.host, args.port, args.workers, args.graceful_timeout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.schemas.base import Base
+from llm.providers import HashingEmbedder
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    # make_engine("name.db") -> engine on a fresh SQLite file with every table created. Connections
+    # may be used from other threads (background rebuilds, ThreadedAsyncSession).
+    engines = []
+
+    def make(name: str = "test.db"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+@pytest.fixture
+def make_sessionmaker(make_engine):
+    # make_sessionmaker("name.db", **sessionmaker_options) -> sessionmaker over make_engine(name)
+    return lambda name="test.db", **options: sessionmaker(bind=make_engine(name), **options)
+
+@pytest.fixture
+def override_async_db():
+    # override_async_db(SessionLocal) makes the API's get_async_db dependency hand out
+    # ThreadedAsyncSessions over SessionLocal, so endpoints run against a SQLite test database
+    from api import app
+    from app.database.async_connector import ThreadedAsyncSession, get_async_db
+
+    def override(SessionLocal):
+        async def get_test_db():
+            db = ThreadedAsyncSession(SessionLocal())
+            try:
+                yield db
+            finally:
+                await db.close()
+        app.dependency_overrides[get_async_db] = get_test_db
+
+    yield override
+    app.dependency_overrides.pop(get_async_db, None)
+
+
+class FakeCollection:
+    # In-memory, brute-force stand-in for the Chroma collection methods the app calls (keyword
+    # arguments, Chroma's result shapes, squared L2 distances)
+    def __init__(self, ids=(), embeddings=(), metadatas=None):
+        self.vectors = {}
+        if len(ids):
+            self.upsert(ids=list(ids), embeddings=embeddings, metadatas=metadatas)
+
+    def upsert(self, ids, embeddings, metadatas=None, documents=None):
+        # Slim payloads: only ids, embeddings and metadata are written
+        assert documents is None
+        metadatas = metadatas or [None] * len(ids)
+        for vector_id, embedding, metadata in zip(ids, embeddings, metadatas):
+            self.vectors[vector_id] = (np.asarray(embedding, dtype=np.float32), metadata)
+
+    add = upsert
+
+    def delete(self, ids):
+        for vector_id in ids:
+            self.vectors.pop(vector_id, None)
+
+    def count(self):
+        return len(self.vectors)
+
+    def get(self, ids=None, include=("metadatas",), limit=None, offset=0):
+        if ids is None:
+            ids = list(self.vectors)[offset:None if limit is None else offset + limit]
+        return self._result([vector_id for vector_id in ids if vector_id in self.vectors], include)
+
+    def _result(self, ids, include, distances=None):
+        result = {"ids": ids}
+        if "embeddings" in include:
+            result["embeddings"] = [self.vectors[vector_id][0] for vector_id in ids]
+        if "metadatas" in include:
+            result["metadatas"] = [self.vectors[vector_id][1] for vector_id in ids]
+        if "distances" in include and distances is not None:
+            result["distances"] = distances
+        return result
+
+    def query(self, query_embeddings, n_results=10, include=("metadatas", "distances")):
+        ids = list(self.vectors)
+        matrix = np.stack([self.vectors[vector_id][0] for vector_id in ids]) if ids else None
+        results = {"ids": []}
+        for query in np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)):
+            distances = ((matrix - query) ** 2).sum(axis=1) if ids else np.zeros(0)
+            order = np.argsort(distances, kind="stable")[:n_results]
+            hits = self._result([ids[index] for index in order], include,
+                                [float(distances[index]) for index in order])
+            for key, values in hits.items():
+                results.setdefault(key, []).append(values)
+        return results
+
+
+class FakeVectorManager:
+    # The VectorDataManager calls the app makes, over a FakeCollection of HashingEmbedder vectors.
+    # `queries` counts vector searches; `fail` makes them raise like an unreachable store.
+    def __init__(self, ids=(), texts=(), metadatas=None, dimension: int = 64, fail: bool = False):
+        self.model = HashingEmbedder(dimension=dimension)
+        self.vectors = self.model.encode(list(texts))
+        self.collection = FakeCollection(ids, self.vectors, metadatas)
+        self.fail = fail
+        self.queries = 0
+
+    def embed_query(self, query):
+        return self.model.encode(query)
+
+    def query_collection(self, operation, vector, num_results, include=("metadatas", "distances")):
+        self.queries += 1
+        if self.fail:
+            raise RuntimeError("vector store unavailable")
+        return self.collection.query(query_embeddings=[vector], n_results=num_results, include=include)
@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+
+import anyio
+import pytest
+
+from app.database.async_connector import ThreadedAsyncSession, connect_to_db_async, to_async_url, resolve_async_mode
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from app.database.schemas.genre import Genre
+from app.database.schemas.user import User
+from app.schemas.book import BookFilters
+from app.schemas.user import UserUpdateCurrent
+from app.services import async_book_services, async_author_services, async_user_services
+from app.utils.hash import deterministic_hash
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(params=["threaded", "native"])
+def session_factory(request, make_sessionmaker, tmp_path):
+    if request.param == "native":
+        pytest.importorskip("greenlet")
+        pytest.importorskip("aiosqlite")
+    SessionLocal = make_sessionmaker("async.db")
+    with SessionLocal() as session:
+        fantasy = Genre(name="Fantasy")
+        author = Author(name="Ursula K. Le Guin")
+        for index in range(30):
+            book = Book(title=f"Earthsea {index}", genre="Fantasy", genre_ref=fantasy, published_year=1968 + index,
+                        average_rating=4.0, num_pages=200, ratings_count=index)
+            book.authors.append(author)
+            session.add(book)
+        session.add(User(email="reader@example.com", fname="Ged", lname="Sparrowhawk",
+                         hashed_pw=deterministic_hash("secret"), role=0))
+        session.commit()
+    if request.param == "native":
+        _, AsyncSessionLocal = connect_to_db_async(f"sqlite:///{tmp_path / 'async.db'}", replica_urls=[])
+        return AsyncSessionLocal
+    return lambda: ThreadedAsyncSession(SessionLocal())
+
+
+def run(coroutine_fn, session_factory):
+    async def main():
+        session = session_factory()
+        try:
+            return await coroutine_fn(session)
+        finally:
+            await session.close()
+    return anyio.run(main)
+
+
+def test_async_book_reads_load_authors_eagerly(session_factory):
+    success, _, book = run(lambda db: async_book_services.retrieve_single_book(db, 1), session_factory)
+    assert success and book["authors"] == ["Ursula K. Le Guin"]
+
+    filters = BookFilters(genre=["fantasy"], year_from=1990)
+    success, _, books = run(lambda db: async_book_services.filter_books(db, filters, limit=5, offset=0), session_factory)
+    assert success and [book["published_year"] for book in books] == [1990, 1991, 1992, 1993, 1994]
+
+    success, _, facets = run(lambda db: async_book_services.retrieve_book_facets(db, BookFilters()), session_factory)
+    assert facets["genre"] == [{"value": "Fantasy", "count": 30}]
+
+
+def test_books_by_author_are_paged_most_rated_first(session_factory):
+    success, _, books, total = run(
+        lambda db: async_book_services.retrieve_books_by_author(db, 1, limit=3, offset=2, fields=["id", "title"]),
+        session_factory,
+    )
+    assert success and total == 30
+    assert [book["title"] for book in books] == ["Earthsea 27", "Earthsea 26", "Earthsea 25"]
+
+    success, _, books, total = run(lambda db: async_book_services.retrieve_books_by_author(db, 99, 10, 0), session_factory)
+    assert success and (books, total) == ([], 0)
+
+
+def test_async_author_and_user_services(session_factory):
+    success, _, authors = run(lambda db: async_author_services.retrieve_authors_from_db(db), session_factory)
+    assert success and authors[0]["name"] == "Ursula K. Le Guin"
+
+    auth, _, user = run(lambda db: async_user_services.authenticate_user("reader@example.com", "secret", db), session_factory)
+    assert auth and user["role"] == 0
+
+    update = UserUpdateCurrent(fname="Sparrowhawk")
+    assert run(lambda db: async_user_services.edit_user_info("reader@example.com", update, db), session_factory)[0]
+    _, _, user = run(lambda db: async_user_services.retrieve_single_user("reader@example.com", db), session_factory)
+    assert user["fname"] == "Sparrowhawk"
+
+
+def test_more_concurrent_sessions_than_pool_connections_do_not_deadlock(session_factory):
+    results = []
+
+    async def read(book_id):
+        session = session_factory()
+        try:
+            results.append((await async_book_services.retrieve_single_book(session, book_id))[0])
+        finally:
+            await session.close()
+
+    async def main():
+        with anyio.fail_after(20):
+            async with anyio.create_task_group() as task_group:
+                for book_id in range(1, 101):
+                    task_group.start_soon(read, (book_id - 1) % 30 + 1)
+
+    anyio.run(main)
+    assert len(results) == 100 and all(results)
+
+
+def test_async_urls_and_mode_resolution():
+    assert to_async_url("postgresql+psycopg2://u:p@localhost/db").drivername == "postgresql+asyncpg"
+    assert to_async_url("sqlite:///bench.db").drivername == "sqlite+aiosqlite"
+    assert resolve_async_mode("threaded") == "threaded"
+    assert resolve_async_mode("auto", "mysql://localhost/db") == "threaded"
+    with pytest.raises(ValueError):
+        resolve_async_mode("eventually")
+
+
+def test_async_db_benchmark_smoke(tmp_path):
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.async_db",
+            "--database-url", f"sqlite:///{tmp_path / 'bench.db'}",
+            "--books", "50",
+            "--requests", "40",
+            "--concurrency", "1,8",
+            "--variants", "sync,threaded",
+            "--output-dir", str(tmp_path / "results"),
+        ],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    [results_file] = os.listdir(tmp_path / "results")
+    with open(tmp_path / "results" / results_file) as file:
+        results = json.load(file)["results"]
+    assert results["threaded"]["8"]["errors"] == 0
+    assert results["sync"]["1"]["requests"] == 40
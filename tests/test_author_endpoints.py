@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 from api import app
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
 
 client = TestClient(app)
 
@@ -38,6 +40,7 @@ def test_get_author(auth_headers):
     assert response.status_code == 200
     assert "author" in response.json()
 
+
 def test_add_author(admin_auth_headers):
     new_author = {"name": "New Author", "biography": "Bio of new author"}
     response = client.post("/authors", json=new_author, headers=admin_auth_headers)
@@ -73,4 +76,31 @@ def test_delete_author(admin_auth_headers):
     assert response.status_code == 200
 
     response = client.get(f"/authors/{author_id}", headers=admin_auth_headers)
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def author_catalogue(make_sessionmaker, override_async_db):
+    # /authors/{author_id}/books reads through get_async_db and needs no token, so these run against SQLite
+    SessionLocal = make_sessionmaker("authors.db")
+    with SessionLocal() as session:
+        author = Author(name="Ursula K. Le Guin")
+        for index in range(60):
+            book = Book(title=f"Earthsea {index}", genre="Fantasy", published_year=1968 + index)
+            book.authors.append(author)
+            session.add(book)
+        session.commit()
+    override_async_db(SessionLocal)
+
+def test_get_author_books(author_catalogue):
+    response = client.get("/authors/1/books", params={"limit": 2, "offset": 4, "fields": "title"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [book["title"] for book in body["books"]] == ["Earthsea 4", "Earthsea 5"]
+    assert body["total"] == 60
+
+def test_get_author_books_limit_is_capped(author_catalogue):
+    assert client.get("/authors/1/books", params={"limit": 50}).status_code == 200
+    assert client.get("/authors/1/books", params={"limit": 51}).status_code == 422
+    assert client.get("/authors/1/books", params={"limit": 0}).status_code == 422
+    assert client.get("/authors/1/books", params={"offset": -1}).status_code == 422
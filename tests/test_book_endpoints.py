@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 from api import app
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
 
 client = TestClient(app)
 
@@ -99,4 +101,38 @@ def test_delete_book(admin_auth_headers):
     assert response.status_code == 200
 
     response = client.get(f"/books/{book_id}", headers=admin_auth_headers)
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+
+@pytest.fixture
+def catalogue(make_sessionmaker, override_async_db):
+    # /books reads through get_async_db and needs no token, so these run against SQLite
+    SessionLocal = make_sessionmaker("books.db")
+    with SessionLocal() as session:
+        author = Author(name="Ursula K. Le Guin")
+        for index in range(60):
+            book = Book(title=f"Earthsea {index}", genre="Fantasy", published_year=1968 + index, average_rating=4.0,
+                        num_pages=200, ratings_count=index, description="A wizard's journey across the archipelago. " * 4)
+            book.authors.append(author)
+            session.add(book)
+        session.commit()
+    override_async_db(SessionLocal)
+
+def test_get_books_field_projection(catalogue):
+    response = client.get("/books", params={"fields": "title,authors"})
+    assert response.status_code == 200
+    books = response.json()["books"]
+    assert len(books) == 10
+    for book in books:
+        assert set(book.keys()) == {"id", "title", "authors"}
+    assert books[0]["authors"] == ["Ursula K. Le Guin"]
+
+def test_get_books_unknown_field(catalogue):
+    response = client.get("/books", params={"fields": "title,isbn"})
+    assert response.status_code == 400
+
+def test_get_books_compressed(catalogue):
+    response = client.get("/books", params={"limit": 50}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") in ("gzip", "br")
+    assert len(response.json()["books"]) == 50
@@ -0,0 +1,175 @@
+import io
+import json
+import os
+
+import anyio
+import numpy as np
+import pytest
+from sqlalchemy import select, func
+
+from app.database.schemas.author import Author
+from app.database.schemas.book_import import BookEmbeddingQueue
+from app.database.schemas.books import Book
+from app.database.schemas.genre import Genre
+from app.services.book_import_services import (
+    ImportTooLarge,
+    create_import_job,
+    detect_format,
+    import_books_from_file,
+    read_records,
+    retrieve_import_job,
+    run_import_job,
+    spool_upload,
+    validate_chunk,
+)
+from llm.embedding_queue import drain_embedding_queue
+from tests.conftest import FakeCollection
+
+
+@pytest.fixture
+def SessionLocal(make_sessionmaker):
+    return make_sessionmaker("import.db")
+
+def _ndjson(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+def _book(isbn, title, authors=("Ursula K. Le Guin",), genre="Fantasy", **extra):
+    return {"isbn13": isbn, "title": title, "authors": list(authors), "genre": genre, **extra}
+
+
+def test_detect_format():
+    assert detect_format("csv") == "csv"
+    assert detect_format("xml") is None
+    assert detect_format(content_type="application/x-ndjson") == "ndjson"
+    assert detect_format(filename="books.csv") == "csv"
+    assert detect_format() is None
+
+def test_validation_reports_lines_and_keeps_last_duplicate():
+    upload = io.BytesIO(b"\n".join([
+        json.dumps(_book("9780000000001", "First")).encode(),
+        b"{not json",
+        json.dumps(_book("123", "Bad isbn")).encode(),
+        json.dumps(_book("978-0-00-000000-1", "First, corrected")).encode(),
+    ]))
+    rows, errors = validate_chunk(list(read_records(upload, "ndjson")))
+    assert [(row.isbn13, row.title) for row in rows] == [("9780000000001", "First, corrected")]
+    assert [error["line"] for error in errors] == [2, 3]
+    assert "isbn13" in errors[1]["error"]
+
+def test_ndjson_import_upserts_by_isbn(SessionLocal, tmp_path):
+    with SessionLocal() as session:
+        job = create_import_job(session, "ndjson")
+        path = _ndjson(tmp_path / "first.ndjson", [
+            _book("9780000000001", "A Wizard of Earthsea", published_year=1968),
+            _book("9780000000002", "The Tombs of Atuan"),
+            _book("9780000000003", "Good Omens", authors=("Terry Pratchett", "Neil Gaiman"), genre="Comedy"),
+        ])
+        totals = import_books_from_file(session, job.id, path, "ndjson", chunk_size=2)
+        assert (totals["rows_inserted"], totals["rows_updated"], totals["rows_failed"]) == (3, 0, 0)
+        assert totals["bytes_processed"] == os.path.getsize(path)
+
+        path = _ndjson(tmp_path / "second.ndjson", [
+            _book("9780000000001", "A Wizard of Earthsea", published_year=1969, authors=("Ursula Le Guin",)),
+            _book("9780000000004", "Tehanu"),
+        ])
+        totals = import_books_from_file(session, job.id, path, "ndjson")
+        assert (totals["rows_inserted"], totals["rows_updated"]) == (1, 1)
+
+        assert session.scalar(select(func.count(Book.id))) == 4
+        # Authors and genres are shared, not duplicated per book
+        assert session.scalar(select(func.count(Author.id))) == 4
+        assert sorted(session.scalars(select(Genre.name))) == ["Comedy", "Fantasy"]
+        wizard = session.scalar(select(Book).where(Book.isbn13 == "9780000000001"))
+        assert wizard.published_year == 1969
+        assert [author.name for author in wizard.authors] == ["Ursula Le Guin"]
+        assert wizard.genre_ref.name == "Fantasy"
+        assert session.scalar(select(func.count()).select_from(BookEmbeddingQueue)) == 4
+
+def test_csv_import_uses_books_csv_headers(SessionLocal, tmp_path):
+    path = tmp_path / "books.csv"
+    path.write_text(
+        "isbn13,title,authors,categories,published_year,average_rating,description\n"
+        '9780000000001,Mort,Terry Pratchett,Fantasy,1987,4.2,"Death takes an\n apprentice"\n'
+        "9780000000002,Sourcery,Terry Pratchett;Someone Else,Fantasy,not a year,4.0,\n"
+        "9780000000003,,Terry Pratchett,Fantasy,1989,3.9,\n"
+    )
+    with SessionLocal() as session:
+        job = create_import_job(session, "csv")
+        totals = import_books_from_file(session, job.id, str(path), "csv")
+        assert (totals["rows_inserted"], totals["rows_failed"]) == (1, 2)
+        mort = session.scalar(select(Book).where(Book.isbn13 == "9780000000001"))
+        assert mort.description == "Death takes an\n apprentice"
+
+        success, _, progress = retrieve_import_job(session, job.id)
+        assert success
+        assert [error["line"] for error in progress["errors"]] == [4, 5]
+
+def test_failed_chunk_does_not_lose_other_chunks(SessionLocal, tmp_path, monkeypatch):
+    from app.services import book_import_services
+    original = book_import_services.upsert_books
+    calls = []
+
+    def flaky(session, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("deadlock detected")
+        return original(session, rows)
+
+    monkeypatch.setattr(book_import_services, "upsert_books", flaky)
+    path = _ndjson(tmp_path / "books.ndjson", [_book(f"97800000000{index:02d}", f"Book {index}") for index in range(6)])
+    with SessionLocal() as session:
+        job = create_import_job(session, "ndjson")
+        totals = import_books_from_file(session, job.id, path, "ndjson", chunk_size=2)
+        assert (totals["rows_inserted"], totals["rows_failed"]) == (4, 2)
+        assert session.scalar(select(func.count(Book.id))) == 4
+
+def test_run_import_job_records_progress(SessionLocal, tmp_path):
+    path = _ndjson(tmp_path / "books.ndjson", [_book("9780000000001", "Mort"), {"title": "no isbn"}])
+    with SessionLocal() as session:
+        job_id = create_import_job(session, "ndjson").id
+    run_import_job(job_id, path, "ndjson", session_factory=SessionLocal, embed=False)
+
+    with SessionLocal() as session:
+        _, _, job = retrieve_import_job(session, job_id)
+    assert job["status"] == "completed"
+    assert (job["rows_processed"], job["rows_inserted"], job["rows_failed"]) == (2, 1, 1)
+    assert job["finished_at"] is not None
+    assert not os.path.exists(path)
+
+def test_spool_upload_enforces_limit(tmp_path):
+    async def body():
+        for _ in range(4):
+            yield b"x" * 10
+
+    path = str(tmp_path / "spool" / "upload")
+    assert anyio.run(spool_upload, body(), path, 100) == 40
+    with pytest.raises(ImportTooLarge):
+        anyio.run(spool_upload, body(), path, 25)
+
+
+class FakeModel:
+    def encode(self, documents, batch_size=32):
+        return np.ones((len(documents), 4))
+
+class FakeManager:
+    def __init__(self):
+        self.collection = FakeCollection()
+        self.model = FakeModel()
+
+def test_drain_embedding_queue(SessionLocal, tmp_path):
+    path = _ndjson(tmp_path / "books.ndjson", [_book(f"97800000000{index:02d}", f"Book {index}") for index in range(5)])
+    manager = FakeManager()
+    progress = []
+    with SessionLocal() as session:
+        job = create_import_job(session, "ndjson")
+        import_books_from_file(session, job.id, path, "ndjson")
+        assert drain_embedding_queue(session, manager=manager, batch_size=2, on_progress=progress.append) == 5
+        assert session.scalar(select(func.count()).select_from(BookEmbeddingQueue)) == 0
+
+    assert progress == [2, 4, 5]
+    embedding, metadata = manager.collection.vectors["9780000000000"]
+    # Only the book id and filterable fields travel with the vector
+    assert set(metadata) <= {"book_id", "genre_id", "published_year", "average_rating"}
+    with SessionLocal() as session:
+        assert session.get(Book, metadata["book_id"]).isbn13 == "9780000000000"
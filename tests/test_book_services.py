@@ -0,0 +1,95 @@
+import pytest
+
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from app.database.schemas.genre import Genre
+from app.database.schemas.user import User
+from app.schemas.book import BookFilters
+from app.services.book_services import (
+    add_to_favourites,
+    filter_books,
+    parse_book_fields,
+    parse_book_sort,
+    retrieve_book_facets,
+)
+
+# (title, genre, published_year, average_rating, ratings_count)
+BOOKS = [
+    ("A Wizard of Earthsea", "Fantasy", 1968, 4.0, 300),
+    ("The Tombs of Atuan", "Fantasy", 1970, 4.1, 200),
+    ("The Farthest Shore", "Fantasy", 1972, 4.2, 150),
+    ("The Dispossessed", "Science Fiction", 1974, 4.3, 250),
+    ("The Left Hand of Darkness", "Science Fiction", 1969, 4.1, 400),
+    ("Lavinia", "Historical", 2008, 3.9, 50),
+    ("Undated", "Historical", None, None, None),
+]
+
+
+@pytest.fixture
+def SessionLocal(make_sessionmaker):
+    SessionLocal = make_sessionmaker("books.db")
+    with SessionLocal() as session:
+        genres = {}
+        author = Author(name="Ursula K. Le Guin")
+        for title, genre, year, rating, ratings_count in BOOKS:
+            book = Book(title=title, genre=genre, genre_ref=genres.setdefault(genre, Genre(name=genre)),
+                        published_year=year, average_rating=rating, ratings_count=ratings_count)
+            book.authors.append(author)
+            session.add(book)
+        session.add(User(email="reader@example.com", fname="Ged", hashed_pw="x", role=0))
+        session.commit()
+    return SessionLocal
+
+def _titles(books):
+    return [book["title"] for book in books]
+
+def _sort(key):
+    success, _, order_by = parse_book_sort(key)
+    assert success
+    return order_by
+
+
+def test_filters_combine(SessionLocal):
+    with SessionLocal() as session:
+        filters = BookFilters(genre=["fantasy", "SCIENCE FICTION"], year_from=1969, year_to=1972, min_rating=4.1)
+        success, _, books = filter_books(session, filters, limit=10, offset=0)
+    assert success
+    assert _titles(books) == ["The Tombs of Atuan", "The Farthest Shore", "The Left Hand of Darkness"]
+
+def test_title_filter_is_a_case_insensitive_substring(SessionLocal):
+    with SessionLocal() as session:
+        _, _, books = filter_books(session, BookFilters(title="the"), limit=10, offset=0)
+    assert _titles(books) == ["The Tombs of Atuan", "The Farthest Shore", "The Dispossessed",
+                              "The Left Hand of Darkness"]
+
+def test_sort_puts_missing_values_last_and_pages_do_not_overlap(SessionLocal):
+    with SessionLocal() as session:
+        first = filter_books(session, BookFilters(), limit=4, offset=0, sort=_sort("-ratings_count"))[2]
+        rest = filter_books(session, BookFilters(), limit=4, offset=4, sort=_sort("-ratings_count"))[2]
+        ascending = filter_books(session, BookFilters(), limit=10, offset=0, sort=_sort("published_year"))[2]
+    assert _titles(first + rest) == ["The Left Hand of Darkness", "A Wizard of Earthsea", "The Dispossessed",
+                                     "The Tombs of Atuan", "The Farthest Shore", "Lavinia", "Undated"]
+    assert _titles(ascending)[0] == "A Wizard of Earthsea"
+    assert _titles(ascending)[-1] == "Undated"
+
+def test_unknown_sort_and_fields_are_rejected():
+    assert parse_book_sort("isbn")[0] is False
+    assert parse_book_fields("title,isbn")[0] is False
+    assert parse_book_fields("title,authors")[2] == ["id", "title", "authors"]
+
+def test_projection_and_favorites(SessionLocal):
+    with SessionLocal() as session:
+        add_to_favourites(session, "reader@example.com", 2)
+        _, _, books = filter_books(session, BookFilters(genre=["Fantasy"]), limit=10, offset=0,
+                                   email="reader@example.com", fields=["id", "title", "authors", "is_fav"])
+    assert books[1] == {"id": 2, "title": "The Tombs of Atuan", "authors": ["Ursula K. Le Guin"], "is_fav": True}
+    assert not books[0]["is_fav"]
+
+def test_each_facet_ignores_its_own_filter(SessionLocal):
+    with SessionLocal() as session:
+        success, _, facets = retrieve_book_facets(session, BookFilters(genre=["Fantasy"], year_from=1969))
+    assert success
+    # Genres are counted with the year filter only, decades with the genre filter only
+    assert facets["genre"] == [{"value": "Fantasy", "count": 2}, {"value": "Science Fiction", "count": 2},
+                               {"value": "Historical", "count": 1}]
+    assert facets["decade"] == [{"value": 1960, "count": 1}, {"value": 1970, "count": 2}]
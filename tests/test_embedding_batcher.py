@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from llm.embedding_batcher import EmbeddingBatcher
+from llm.providers import HashingEmbedder
+
+
+class RecordingModel:
+    # Records the texts of every encode call; fails on texts containing "boom"
+    def __init__(self, latency: float = 0.02):
+        self.embedder = HashingEmbedder(dimension=16)
+        self.latency = latency
+        self.calls = []
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        self.calls.append(list(sentences))
+        time.sleep(self.latency)
+        if any("boom" in sentence for sentence in sentences):
+            raise RuntimeError("model failed")
+        return self.embedder.encode(sentences)
+
+
+def encode_concurrently(batcher, texts):
+    results = [None] * len(texts)
+    errors = [None] * len(texts)
+
+    def call(index):
+        try:
+            results[index] = batcher.encode(texts[index], timeout=5)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_requests_share_encode_calls():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=64, max_wait=0.05)
+    texts = [f"book {index}" for index in range(16)]
+    results, errors = encode_concurrently(batcher, texts)
+    batcher.close()
+
+    assert errors == [None] * 16
+    assert len(model.calls) < 16
+    for text, vector in zip(texts, results):
+        assert np.allclose(vector, model.embedder.encode(text))
+
+def test_batches_are_capped_and_duplicates_encoded_once():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=4, max_wait=0.05)
+    results, _ = encode_concurrently(batcher, ["same text"] * 3 + [f"book {index}" for index in range(9)])
+    batcher.close()
+
+    assert all(len(call) <= 4 for call in model.calls)
+    assert results[0] == results[1] == results[2]
+
+def test_errors_reach_every_caller_in_the_batch():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait=0.05)
+    # Both texts queue while the worker is busy, so they are encoded together
+    warmup = batcher.submit("warmup")
+    time.sleep(0.005)
+    futures = [batcher.submit("boom"), batcher.submit("fine")]
+    warmup.result(timeout=5)
+    assert all(isinstance(future.exception(timeout=5), RuntimeError) for future in futures)
+    # The worker keeps serving after a failed batch
+    assert batcher.encode("fine", timeout=5) == pytest.approx(model.embedder.encode("fine").tolist())
+    batcher.close()
+
+def test_async_callers():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait=0.05)
+
+    async def main():
+        return await asyncio.gather(*(batcher.encode_async(f"book {index}") for index in range(5)))
+
+    results = asyncio.run(main())
+    batcher.close()
+    assert len(results) == 5
+    assert sum(len(call) for call in model.calls) == 5
+    assert len(model.calls) < 5
+
+def test_cancelled_callers_do_not_stop_the_worker():
+    model = RecordingModel(latency=0.05)
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait=0.05)
+    warmup = batcher.submit("warmup")
+    time.sleep(0.005)
+    cancelled = batcher.submit("gave up")
+    assert cancelled.cancel()
+    kept = batcher.submit("kept")
+    warmup.result(timeout=5)
+    assert kept.result(timeout=5) == pytest.approx(model.embedder.encode("kept").tolist())
+    assert all("gave up" not in call for call in model.calls)
+    assert batcher._worker.is_alive()
+
+    async def give_up():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(batcher.encode_async("slow"), timeout=0.001)
+
+    asyncio.run(give_up())
+    assert batcher.encode("after", timeout=5) == pytest.approx(model.embedder.encode("after").tolist())
+    batcher.close()
+
+def test_a_dead_worker_is_restarted():
+    model = RecordingModel(latency=0)
+    batcher = EmbeddingBatcher(model)
+    batcher.encode("first", timeout=5)
+    # As if the thread had been killed
+    with batcher._condition:
+        batcher._closed = True
+        batcher._condition.notify_all()
+    batcher._worker.join()
+    batcher._closed = False
+    assert batcher.encode("second", timeout=5) == pytest.approx(model.embedder.encode("second").tolist())
+    batcher.close()
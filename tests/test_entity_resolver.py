@@ -0,0 +1,127 @@
+import json
+import time
+
+import pytest
+from sqlalchemy import update
+
+from app.database.catalogue import catalogue_version
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from app.database.schemas.user import User
+from llm.entity_resolver import (
+    AUTHOR,
+    BOOK,
+    EntityResolver,
+    build_entity_index,
+    edit_distance,
+    load_aliases,
+    normalize_key,
+)
+
+BOOKS = [
+    (1, "The Hobbit, Or, There and Back Again", None, 2000),
+    (2, "Harry Potter and the Chamber of Secrets", None, 5000),
+    (3, "Harry Potter and the Chamber of Secrets (Book 2)", None, 100),
+    (4, "Gilead", None, 300),
+    (5, "Dune", "Deluxe Edition", 900),
+    (6, "Dune", None, 4000),
+]
+AUTHORS = [(1, "J. R. R. Tolkien"), (2, "Christopher Tolkien"), (3, "Sidney Sheldon"), (4, "Gabriel García Márquez")]
+
+
+@pytest.fixture
+def index():
+    return build_entity_index(BOOKS, AUTHORS)
+
+def _best(index, query, kind=None):
+    candidates = index.resolve(query, kind, limit=1)
+    return candidates[0] if candidates else None
+
+
+def test_normalize_key_ignores_case_accents_punctuation_and_articles():
+    assert normalize_key("The  Hobbit!") == "hobbit"
+    assert normalize_key("Gabriel García Márquez") == "gabriel garcia marquez"
+    assert normalize_key("Pride & Prejudice") == "pride and prejudice"
+    assert normalize_key("The") == "the"
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting") == 3
+    assert edit_distance("", "abc") == 3
+    assert edit_distance("dune", "dune") == 0
+
+def test_misspelled_titles_resolve(index):
+    assert _best(index, "the hobit", BOOK).id == 1
+    assert _best(index, "harry poter and the chamber of secrets", BOOK).id == 2
+    assert _best(index, "GILEAD").score == 1.0
+
+def test_equal_matches_prefer_the_more_rated_book(index):
+    assert _best(index, "dune", BOOK).id == 6
+    assert _best(index, "dune deluxe edition", BOOK).id == 5
+
+def test_author_aliases(index):
+    assert _best(index, "jrr tolkien", AUTHOR).id == 1
+    assert _best(index, "sidney sheldan", AUTHOR).id == 3
+    assert _best(index, "gabriel garcia marquez", AUTHOR).score == 1.0
+    assert {candidate.id for candidate in index.resolve("tolkien", AUTHOR)} == {1, 2}
+
+def test_kind_filter_and_min_score(index):
+    assert index.resolve("gilead", AUTHOR, min_score=0.5) == []
+    assert index.resolve("xyzzy", min_score=0.75) == []
+
+def test_curated_aliases(tmp_path):
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps({"books": {"LOTR": "The Hobbit, Or, There and Back Again"}, "authors": {}}))
+    index = build_entity_index(BOOKS, AUTHORS, load_aliases(str(path)))
+    assert _best(index, "lotr", BOOK).id == 1
+
+
+@pytest.fixture
+def SessionLocal(make_sessionmaker):
+    SessionLocal = make_sessionmaker("entities.db")
+    with SessionLocal() as session:
+        session.add_all(Book(id=book_id, title=title, subtitle=subtitle, ratings_count=ratings)
+                        for book_id, title, subtitle, ratings in BOOKS)
+        session.add_all(Author(id=author_id, name=name) for author_id, name in AUTHORS)
+        session.add(User(email="reader@example.com", fname="Reader", hashed_pw="x", role=0))
+        session.commit()
+    return SessionLocal
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_resolver_rebuilds_after_catalogue_commits(SessionLocal):
+    resolver = EntityResolver(session_factory=SessionLocal, ttl=0, aliases={})
+    assert resolver.best("silmarillion", BOOK) is None
+
+    with SessionLocal() as session:
+        session.add(Book(id=7, title="The Silmarillion"))
+        session.commit()
+    # The stale index keeps answering while the new one is built
+    resolver.best("silmarillion", BOOK)
+    assert _wait_for(lambda: resolver.best("silmarillion", BOOK) is not None)
+
+    with SessionLocal() as session:
+        session.execute(update(Book).where(Book.id == 4).values(title="Home"))
+        session.commit()
+    resolver.best("home", BOOK)
+    assert _wait_for(lambda: resolver.best("home", BOOK) is not None)
+
+def test_catalogue_version_ignores_unrelated_writes(SessionLocal):
+    with SessionLocal() as session:
+        version = catalogue_version()
+        user = session.get(User, "reader@example.com")
+        user.favorite_books.append(session.get(Book, 4))
+        session.commit()
+        assert catalogue_version() == version
+
+        session.get(Author, 3).name = "Sidney Sheldon Jr."
+        session.flush()
+        session.rollback()
+        assert catalogue_version() == version
+
+        session.get(Author, 3).name = "Sidney Sheldon Jr."
+        session.commit()
+        assert catalogue_version() != version
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from llm.hybrid_retriever import BM25Index, HybridRetriever, IndexedBook, reciprocal_rank_fusion, tokenize
+from tests.conftest import FakeVectorManager
+
+CATALOGUE = [
+    ("9780000000001", "Gilead", "Marilynne Robinson", "Fiction", "An aging preacher writes a letter to his young son in Iowa."),
+    ("9780000000002", "Home", "Marilynne Robinson", "Fiction", "A prodigal son returns home to Gilead, Iowa."),
+    ("9780000000003", "Dune", "Frank Herbert", "Science Fiction", "A desert planet, spice and a young duke in exile."),
+    ("9780000000004", "Children of Dune", "Frank Herbert", "Science Fiction", "The twins of the desert emperor."),
+    ("9780000000005", "The Hobbit", "J. R. R. Tolkien", "Fantasy", "A hobbit joins dwarves to reclaim a mountain from a dragon."),
+]
+
+
+def _vector_manager(ids=None, metadatas=None, fail: bool = False):
+    # By default the vectors predate slim payloads: isbn ids, metadata naming the title, not the book id
+    return FakeVectorManager(ids=ids or [isbn for isbn, *_ in CATALOGUE],
+                             texts=[f"{title}; {author}; {genre}; {description}"
+                                    for _, title, author, genre, description in CATALOGUE],
+                             metadatas=metadatas or [{"title": title} for _, title, *_ in CATALOGUE],
+                             dimension=256, fail=fail)
+
+
+@pytest.fixture
+def SessionLocal(make_sessionmaker):
+    SessionLocal = make_sessionmaker("hybrid.db")
+    with SessionLocal() as session:
+        authors = {}
+        for isbn, title, author, genre, description in CATALOGUE:
+            book = Book(isbn13=isbn, title=title, genre=genre, description=description)
+            book.authors.append(authors.setdefault(author, Author(name=author)))
+            session.add(book)
+        session.commit()
+    return SessionLocal
+
+@pytest.fixture
+def retriever(SessionLocal):
+    return HybridRetriever(session_factory=SessionLocal, vector_manager=_vector_manager(), ttl=0,
+                           min_vector_similarity=0.2)
+
+def _titles(hits):
+    return [hit.title for hit in hits]
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("The Lord of the Rings") == ["lord", "rings"]
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]], k=60)
+    assert max(fused, key=fused.get) == "b"
+    assert fused["a"] == pytest.approx(1 / 61 + 1 / 63)
+
+def test_bm25_prefers_title_over_description_matches():
+    index = BM25Index([
+        IndexedBook(1, "Gilead", description="A letter"),
+        IndexedBook(2, "Home", description="A son returns home to Gilead"),
+    ])
+    assert [position for position, _ in index.search("gilead", 10)] == [0, 1]
+    assert index.search("unknown words", 10) == []
+
+def test_exact_title_leads(retriever):
+    hits, timings = retriever.search("gilead", limit=3)
+    assert hits[0].title == "Gilead"
+    assert hits[0].exact_title
+    assert hits[0].lexical_rank == 0
+    assert set(timings) == {"exact", "lexical", "vector", "fusion"}
+
+def test_author_queries_find_their_books(retriever):
+    hits, _ = retriever.search("Frank Herbert", limit=2)
+    assert sorted(_titles(hits)) == ["Children of Dune", "Dune"]
+
+def test_vector_only_hits_need_enough_similarity(SessionLocal):
+    strict = HybridRetriever(session_factory=SessionLocal, vector_manager=_vector_manager(), ttl=0,
+                             min_vector_similarity=0.99)
+    hits, _ = strict.search("zzz qqq", limit=5)
+    assert hits == []
+
+def test_exclude_and_limit(retriever):
+    hits, _ = retriever.search("dune desert", limit=1, exclude={retriever.book(3).id})
+    assert _titles(hits) == ["Children of Dune"]
+
+def test_vector_failure_falls_back_to_lexical(SessionLocal):
+    retriever = HybridRetriever(session_factory=SessionLocal, vector_manager=_vector_manager(fail=True), ttl=0)
+    hits, _ = retriever.search("The Hobbit", limit=1)
+    assert _titles(hits) == ["The Hobbit"]
+    assert hits[0].vector_rank is None
+
+def test_index_is_rebuilt_in_the_background_after_catalogue_commits(SessionLocal):
+    retriever = HybridRetriever(session_factory=SessionLocal, vector_manager=_vector_manager(), ttl=3600)
+    assert len(retriever.index) == 5
+    index = retriever.index
+    with SessionLocal() as session:
+        session.add(Book(title="The Silmarillion", genre="Fantasy"))
+        session.commit()
+    # Searches keep using the old index until the new one is ready
+    assert retriever.index is index or len(retriever.index) == 6
+    deadline = time.monotonic() + 5
+    while len(retriever.index) != 6 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert retriever.search("silmarillion", limit=1)[0][0].title == "The Silmarillion"
+
+def test_first_search_builds_the_index_synchronously(SessionLocal):
+    retriever = HybridRetriever(session_factory=SessionLocal, vector_manager=_vector_manager(), ttl=0)
+    assert _titles(retriever.search("hobbit", limit=1)[0]) == ["The Hobbit"]
+
+def test_vector_hits_map_through_book_id_metadata(SessionLocal):
+    # Slim payloads: opaque vector ids, the book named only in metadata
+    manager = _vector_manager(ids=[f"vector-{index}" for index in range(len(CATALOGUE))],
+                              metadatas=[{"book_id": index + 1} for index in range(len(CATALOGUE))])
+    retriever = HybridRetriever(session_factory=SessionLocal, vector_manager=manager, ttl=0, min_vector_similarity=0.2)
+    hits, _ = retriever.search("desert planet spice", limit=1)
+    assert hits[0].title == "Dune"
+    assert hits[0].vector_rank == 0
+    assert retriever.book_by_vector_id("9780000000005").title == "The Hobbit"
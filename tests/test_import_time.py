@@ -0,0 +1,58 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative `import api` budget in milliseconds, as reported by python -X importtime (720-850 ms
+# best of five on a single-core box, instrumentation included). Cold start has to stay well under a second; raise it
+# with IMPORT_TIME_BUDGET_MS only on a machine known to be slower.
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 1000))
+
+# Must only be imported when a chat/recommendation endpoint is first used
+LAZY_MODULES = [
+    "langchain",
+    "langchain_ollama",
+    "langgraph",
+    "chromadb",
+    "sentence_transformers",
+    "torch",
+    "pandas",
+    "numpy",
+    "grpc",
+    "llm.langgraph_integration",
+    "llm.intent_extraction",
+    "llm.vector_data_manager",
+    "llm.taste",
+    "app.pgAdmi4.SaveDataToVectorstore",
+]
+
+def import_api_with_importtime():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        pytest.skip(f"api is not importable in this environment: {result.stderr.strip().splitlines()[-1]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match:
+            timings[match.group(4)] = int(match.group(2)) / 1000
+    return timings
+
+def test_api_does_not_import_llm_stack():
+    timings = import_api_with_importtime()
+    eagerly_imported = [module for module in LAZY_MODULES if module in timings]
+    assert eagerly_imported == []
+
+def test_api_import_time_budget():
+    # Best of five runs to keep scheduler noise out of the measurement
+    cumulative_ms = min(import_api_with_importtime()["api"] for _ in range(5))
+    assert cumulative_ms < IMPORT_TIME_BUDGET_MS
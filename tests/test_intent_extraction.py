@@ -0,0 +1,128 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain.memory")
+
+from llm import intent_extraction
+from llm.intent_extraction import (
+    IntentCache,
+    IntentExtractor,
+    IntentResponseModel,
+    chat_history,
+    match_fast_path,
+    parse_fused_response,
+    resolve_intent_fast_path,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_conversation(tmp_path, monkeypatch):
+    # The conversation is saved to chat_history.json in the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(intent_extraction, "intent_cache", IntentCache())
+    intent_extraction.memory.clear()
+    yield
+    intent_extraction.memory.clear()
+
+
+class ScriptedLLM:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return self.responses.pop(0)
+
+def _extractor(*responses):
+    extractor = IntentExtractor.__new__(IntentExtractor)
+    extractor.llm = ScriptedLLM(*responses)
+    return extractor
+
+
+@pytest.mark.parametrize("question, intent_number, entity_name", [
+    ("Who wrote The Left Hand of Darkness?", 2, "Left Hand of Darkness"),
+    ("When was Dune published?", 5, "Dune"),
+    ("Tell me about the Earthsea book", 3, "Earthsea"),
+    ("Recommend 5 books like Gilead", 4, "Gilead"),
+    ("List books by Ursula K. Le Guin", 6, "Ursula K Le Guin"),
+    # Titles that start with a pronoun still name a book
+    ("Who wrote That Hideous Strength?", 2, "That Hideous Strength"),
+])
+def test_fast_path_classifies_named_entities(question, intent_number, entity_name):
+    intent_response = match_fast_path(question)
+    assert (intent_response.intent_number, intent_response.entity_name) == (intent_number, entity_name)
+
+@pytest.mark.parametrize("question", ["Who wrote it?", "Tell me about that book", "When was this one published?",
+                                      "Recommend books like those", "Summarize it"])
+def test_fast_path_leaves_references_to_the_classifier(question):
+    assert match_fast_path(question) is None
+    assert resolve_intent_fast_path(question) is None
+
+def test_fast_path_turns_are_remembered():
+    resolve_intent_fast_path("Who wrote Dune?")
+    history = chat_history()
+    assert "Who wrote Dune?" in history
+    assert "Entity: Dune" in history
+
+
+def test_intent_cache_is_keyed_by_conversation():
+    cache = IntentCache(maxsize=2)
+    classification = IntentResponseModel(intent_number=2, entity_name="Dune")
+    cache.put("Who wrote it?", "Human: Tell me about Dune", classification)
+    assert cache.get("who wrote it", "Human: Tell me about Dune") == classification
+    assert cache.get("Who wrote it?", "Human: Tell me about Gilead") is None
+    assert cache.get("Who wrote it?") is None
+
+def test_intent_cache_evicts_least_recently_used():
+    cache = IntentCache(maxsize=2)
+    for title in ("Dune", "Gilead", "Home"):
+        cache.put(f"Who wrote {title}?", "", IntentResponseModel(intent_number=2, entity_name=title))
+    assert cache.get("Who wrote Dune?") is None
+    assert cache.get("Who wrote Home?").entity_name == "Home"
+
+def test_intent_cache_does_not_keep_summaries():
+    cache = IntentCache()
+    fused = parse_fused_response('{"intent_number": 3, "entity_name": "Dune", "summary": "Spice."}', "Summarize Dune")
+    cache.put("Summarize Dune", "", fused)
+    cached = cache.get("Summarize Dune")
+    assert cached.entity_name == "Dune" and not hasattr(cached, "summary")
+
+
+def test_parse_fused_response_reads_json_wrapped_in_prose():
+    response = 'Sure!\n```json\n{"intent_number": 4, "entity_name": "**Gilead**", "summary": ""}\n```'
+    intent_response = parse_fused_response(response, "Recommend 3 books like Gilead")
+    assert (intent_response.intent_number, intent_response.entity_name) == (4, "Gilead")
+    assert intent_response.num_recommendations == 3
+    assert intent_response.summary is None
+
+@pytest.mark.parametrize("response", ["Intent Number: 2", '{"intent_number": "two"}', "{not json}"])
+def test_parse_fused_response_rejects_other_answers(response):
+    with pytest.raises((ValueError, AttributeError, TypeError)):
+        parse_fused_response(response, "Who wrote Dune?")
+
+def test_unparseable_fused_answer_falls_back_to_plain_classification():
+    extractor = _extractor("I think they mean Dune", "Intent Number: 2\nEntity: Dune")
+    intent_response = extractor.classify_and_summarize("Whose pen gave us the spice saga?")
+    assert (intent_response.intent_number, intent_response.entity_name) == (2, "Dune")
+    assert len(extractor.llm.prompts) == 2
+    # The question is in the conversation once
+    assert chat_history().count("Whose pen gave us the spice saga?") == 1
+
+def test_repeated_questions_hit_the_cache_later_in_the_conversation():
+    extractor = _extractor('{"intent_number": 2, "entity_name": "Dune", "summary": ""}',
+                           '{"intent_number": 2, "entity_name": "Dune", "summary": ""}')
+    extractor.classify_and_summarize("Whose pen gave us the spice saga?")
+    resolve_intent_fast_path("Who wrote Gilead?")
+    # A question that names its book is answered from the cache whatever came before it
+    assert resolve_intent_fast_path("Whose pen gave us the spice saga?").entity_name == "Dune"
+
+    # One that refers back is reused only after the same preceding turn
+    resolve_intent_fast_path("Tell me about the Dune book")
+    extractor.classify_and_summarize("Who wrote it?")
+    resolve_intent_fast_path("Tell me about the Gilead book")
+    assert resolve_intent_fast_path("Who wrote it?") is None
+    resolve_intent_fast_path("Tell me about the Dune book")
+    assert resolve_intent_fast_path("Who wrote it?").entity_name == "Dune"
+    assert len(extractor.llm.prompts) == 2
+    assert chat_history().count("Who wrote it?") == 2
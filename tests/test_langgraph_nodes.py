@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain.chains")
+
+from app.database.schemas.author import Author
+from app.database.schemas.books import Book
+from llm import langgraph_integration
+from llm.entity_resolver import AUTHOR, Candidate
+from llm.langgraph_integration import get_author_info_node, summarize_book_node, summary_is_grounded
+
+DESCRIPTION = ("On the desert planet Arrakis, young Paul Atreides and his family take over the spice trade, "
+               "the most valuable substance in the universe, and are betrayed by the Harkonnens.")
+
+
+class ScriptedLLM:
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+
+    def invoke(self, messages):
+        self.prompts.append(messages[0].content)
+        return self.response
+
+class ScriptedResolver:
+    def __init__(self, *candidates):
+        self.candidates = candidates
+        self.queries = []
+
+    def best(self, query, kind=None):
+        self.queries.append((query, kind))
+        return next((candidate for candidate in self.candidates if candidate.kind == kind), None)
+
+@pytest.fixture
+def authors(make_sessionmaker, monkeypatch):
+    SessionLocal = make_sessionmaker("authors.db")
+    with SessionLocal() as session:
+        author = Author(name="Ursula K. Le Guin")
+        for index, year in enumerate([1968, 1970, 1972, None, 1990]):
+            book = Book(title=f"Earthsea {index}", published_year=year)
+            book.authors.append(author)
+            session.add(book)
+        session.add(Author(name="Frank Herbert"))
+        session.commit()
+    monkeypatch.setattr(langgraph_integration, "get_db_session", SessionLocal)
+    return SessionLocal
+
+
+def test_summary_is_grounded_in_the_description():
+    assert summary_is_grounded("Paul Atreides takes over the spice trade of the desert planet Arrakis.", DESCRIPTION)
+    assert not summary_is_grounded("A wizard of Earthsea learns the true names of dragons.", DESCRIPTION)
+    assert not summary_is_grounded("", DESCRIPTION)
+
+def test_fused_summary_is_only_used_when_the_description_backs_it(monkeypatch):
+    llm = ScriptedLLM("Rewritten from the description.")
+    monkeypatch.setattr(langgraph_integration, "ollama_model", llm)
+    book_info = {"title": "Dune", "description": DESCRIPTION}
+
+    grounded = "Paul Atreides and the spice of the desert planet Arrakis."
+    state = summarize_book_node({"book_info": book_info, "summary": grounded})
+    assert state["response"] == grounded and llm.prompts == []
+
+    state = summarize_book_node({"book_info": book_info, "summary": "A wizard names a dragon in Earthsea."})
+    assert state["response"] == "Rewritten from the description."
+    assert DESCRIPTION in llm.prompts[0]
+
+def test_author_books_are_listed_a_page_at_a_time(authors, monkeypatch):
+    resolver = ScriptedResolver(Candidate(kind=AUTHOR, id=1, name="Ursula K. Le Guin", score=0.9, matched="le guin"))
+    monkeypatch.setattr(langgraph_integration, "get_entity_resolver", lambda: resolver)
+
+    state = get_author_info_node({"entity_name": " Le Guin ", "limit": 3})
+    assert resolver.queries == [("Le Guin", AUTHOR)]
+    assert state["response"] == ("Books by Ursula K. Le Guin (1-3 of 5):\n"
+                                 "- Earthsea 0 (1968)\n- Earthsea 1 (1970)\n- Earthsea 2 (1972)")
+
+    state = get_author_info_node({"entity_name": "Le Guin", "limit": 3, "offset": 3})
+    assert state["response"] == "Books by Ursula K. Le Guin (4-5 of 5):\n- Earthsea 3\n- Earthsea 4 (1990)"
+
+    state = get_author_info_node({"entity_name": "Le Guin", "limit": 3, "offset": 6})
+    assert state["response"] == "No more books by Ursula K. Le Guin."
+
+def test_unknown_and_bookless_authors(authors, monkeypatch):
+    resolver = ScriptedResolver(Candidate(kind=AUTHOR, id=2, name="Frank Herbert", score=0.9, matched="herbert"))
+    monkeypatch.setattr(langgraph_integration, "get_entity_resolver", lambda: resolver)
+    assert get_author_info_node({"entity_name": "Herbert"})["response"] == "No books found by Frank Herbert."
+
+    monkeypatch.setattr(langgraph_integration, "get_entity_resolver", lambda: ScriptedResolver())
+    assert get_author_info_node({"entity_name": "Nobody"})["response"] == "No author found with that name."
+    assert get_author_info_node({"entity_name": "  "})["response"] == "Please provide an author name to list books for."
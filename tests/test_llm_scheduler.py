@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+from llm.scheduler import LLMScheduler, LLMQueueFull, LLMTimeout, LLMCancelled, Priority
+
+
+class StandInLLM:
+    # Local replacement for Ollama: sleeps for `latency` and records peak concurrency and call order
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    def invoke(self, prompt: str) -> str:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.calls.append(prompt)
+        try:
+            time.sleep(self.latency)
+            return f"answer to {prompt}"
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def run_in_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+
+def test_returns_llm_result():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=4, default_timeout=1)
+    assert scheduler.run(lambda: StandInLLM(0).invoke("hi")) == "answer to hi"
+
+
+def test_respects_max_concurrency():
+    llm = StandInLLM(latency=0.05)
+    scheduler = LLMScheduler(max_concurrency=2, max_queue_depth=16, default_timeout=5)
+    run_in_threads([lambda i=i: scheduler.run(lambda: llm.invoke(str(i))) for i in range(8)])
+    assert len(llm.calls) == 8
+    assert llm.peak == 2
+
+
+def test_intent_runs_ahead_of_queued_summaries():
+    llm = StandInLLM(latency=0.05)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=16, default_timeout=5)
+    targets = [lambda: scheduler.run(lambda: llm.invoke("first"), priority=Priority.SUMMARY)]
+    targets += [lambda i=i: scheduler.run(lambda: llm.invoke(f"summary {i}"), priority=Priority.SUMMARY) for i in range(3)]
+    targets += [lambda: scheduler.run(lambda: llm.invoke("intent"), priority=Priority.INTENT)]
+    run_in_threads(targets)
+    assert llm.calls[:2] == ["first", "intent"]
+
+
+def test_sheds_load_when_queue_is_full():
+    llm = StandInLLM(latency=0.3)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=2, default_timeout=5)
+    errors = []
+
+    def call(priority):
+        try:
+            scheduler.run(lambda: llm.invoke("x"), priority=priority)
+        except LLMQueueFull as e:
+            errors.append(e)
+
+    blockers = [threading.Thread(target=call, args=(Priority.INTENT,)) for _ in range(3)]
+    for thread in blockers:
+        thread.start()
+        time.sleep(0.02)
+
+    start = time.monotonic()
+    with pytest.raises(LLMQueueFull) as full:
+        scheduler.run(lambda: llm.invoke("rejected"), priority=Priority.INTENT)
+    assert full.value.status_code == 503
+    assert time.monotonic() - start < 0.05
+
+    for thread in blockers:
+        thread.join()
+    assert errors == []
+
+
+def test_low_priority_is_shed_first():
+    llm = StandInLLM(latency=0.3)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=2, default_timeout=5)
+    blockers = [threading.Thread(target=scheduler.run, args=(lambda: llm.invoke("x"),)) for _ in range(2)]
+    for thread in blockers:
+        thread.start()
+        time.sleep(0.02)
+
+    with pytest.raises(LLMQueueFull) as shed:
+        scheduler.run(lambda: llm.invoke("summary"), priority=Priority.SUMMARY)
+    assert shed.value.status_code == 429
+    for thread in blockers:
+        thread.join()
+
+
+def test_times_out_while_queued_and_frees_the_queue():
+    llm = StandInLLM(latency=0.3)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=4, default_timeout=5)
+    blocker = threading.Thread(target=scheduler.run, args=(lambda: llm.invoke("slow"),))
+    blocker.start()
+    time.sleep(0.02)
+
+    with pytest.raises(LLMTimeout):
+        scheduler.run(lambda: llm.invoke("late"), timeout=0.05)
+    assert scheduler.queue_depth() == 0
+    blocker.join()
+    assert llm.calls == ["slow"]
+
+
+def test_times_out_while_running_but_keeps_slot_until_done():
+    llm = StandInLLM(latency=0.2)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=4, default_timeout=5)
+    with pytest.raises(LLMTimeout):
+        scheduler.run(lambda: llm.invoke("slow"), timeout=0.05)
+    assert scheduler.running() == 1
+    time.sleep(0.3)
+    assert scheduler.running() == 0
+
+
+def test_cancelled_when_client_disconnects():
+    llm = StandInLLM(latency=0.3)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=4, default_timeout=5)
+    blocker = threading.Thread(target=scheduler.run, args=(lambda: llm.invoke("slow"),))
+    blocker.start()
+    time.sleep(0.02)
+
+    disconnected = threading.Event()
+    threading.Timer(0.05, disconnected.set).start()
+    with pytest.raises(LLMCancelled):
+        scheduler.run(lambda: llm.invoke("abandoned"), cancel_event=disconnected)
+    blocker.join()
+    assert "abandoned" not in llm.calls
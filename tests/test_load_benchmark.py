@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_load_benchmark_smoke(tmp_path):
+    # Runs in a subprocess because the API binds its engine to DATABASE_URL at import time
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.load_test",
+            "--database-url", f"sqlite:///{tmp_path / 'bench.db'}",
+            "--books", "100",
+            "--users", "2",
+            "--concurrency", "2",
+            "--duration", "1",
+            "--llm-latency", "0",
+            "--output-dir", str(tmp_path / "results"),
+        ],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    [results_file] = os.listdir(tmp_path / "results")
+    with open(tmp_path / "results" / results_file) as file:
+        summary = json.load(file)["summary"]
+    assert summary["total"]["requests"] > 0
+    assert summary["total"]["errors"] == 0
+    assert {"p50_ms", "p95_ms", "p99_ms", "rps"} <= set(summary["GET /books"])
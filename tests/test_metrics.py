@@ -0,0 +1,85 @@
+import httpx
+import anyio
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.utils.metrics import Metric, Counter, Histogram, Gauge, HTTP_REQUESTS, DB_QUERIES_PER_REQUEST, render_metrics
+from app.middleware.metrics import setup_metrics
+import app.database.connector  # noqa: F401  registers the query counter and pool gauge
+from llm.scheduler import LLMScheduler, LLMQueueFull, Priority
+from app.utils.metrics import LLM_CALLS, LLM_TOKENS
+
+
+def test_counter_and_histogram_render_exposition_format():
+    requests = Counter("demo_requests_total", "Demo requests", ("route",))
+    requests.inc(route="/books")
+    requests.inc(2, route="/books")
+    latency = Histogram("demo_latency_seconds", "Demo latency", buckets=(0.1, 1))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    rendered = requests.render() + "\n" + latency.render()
+    assert '# TYPE demo_requests_total counter' in rendered
+    assert 'demo_requests_total{route="/books"} 3' in rendered
+    assert 'demo_latency_seconds_bucket{le="0.1"} 1' in rendered
+    assert 'demo_latency_seconds_bucket{le="+Inf"} 2' in rendered
+    assert 'demo_latency_seconds_count 2' in rendered
+
+
+def test_gauge_callback_and_label_escaping():
+    pool = Gauge("demo_pool", "Demo pool", ("state",), callback=lambda: {('say "hi"',): 4, ("unknown",): None})
+    rendered = pool.render()
+    assert 'demo_pool{state="say \\"hi\\""} 4' in rendered
+    assert "unknown" not in rendered
+
+
+def test_middleware_counts_requests_by_route_and_queries_per_request():
+    engine = create_engine("sqlite://")
+    web = FastAPI()
+    setup_metrics(web)
+
+    @web.get("/demo/{item_id}")
+    def demo(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return {"item_id": item_id}
+
+    async def call():
+        transport = httpx.ASGITransport(app=web)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/demo/1")
+            await client.get("/demo/2")
+            await client.get("/missing")
+
+    before = HTTP_REQUESTS.value(method="GET", route="/demo/{item_id}", status="200")
+    queries_before = DB_QUERIES_PER_REQUEST.count(route="/demo/{item_id}")
+    anyio.run(call)
+    assert HTTP_REQUESTS.value(method="GET", route="/demo/{item_id}", status="200") == before + 2
+    assert HTTP_REQUESTS.value(method="GET", route="unmatched", status="404") >= 1
+    assert DB_QUERIES_PER_REQUEST.count(route="/demo/{item_id}") == queries_before + 2
+    assert 'db_queries_per_request_bucket{route="/demo/{item_id}",le="2"}' in render_metrics()
+
+
+def test_scheduler_records_outcomes_and_tokens():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=0, default_timeout=1)
+    rejected_before = LLM_CALLS.value(priority="summary", outcome="rejected")
+    try:
+        scheduler.run(lambda: "never", priority=Priority.SUMMARY)
+    except LLMQueueFull:
+        pass
+    assert LLM_CALLS.value(priority="summary", outcome="rejected") == rejected_before + 1
+
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=4, default_timeout=1)
+    tokens_before = LLM_TOKENS.value(priority="intent")
+    assert scheduler.run(lambda: "three word answer", priority=Priority.INTENT) == "three word answer"
+    assert LLM_TOKENS.value(priority="intent") == tokens_before + 3
+    assert LLM_CALLS.value(priority="intent", outcome="ok") >= 1
+
+
+def test_metric_types_must_provide_samples():
+    class Untyped(Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Untyped("untyped_total", "No samples")
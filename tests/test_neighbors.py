@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from sqlalchemy import delete, func, select, text
+
+from app.database.schemas.book_neighbors import BookNeighbor, BookNeighborQueue
+from app.database.schemas.books import Book
+from llm.neighbors import (
+    EmbeddingMatrix,
+    compute_all_neighbors,
+    load_embedding_matrix,
+    normalize_rows,
+    similar_books,
+    top_neighbors,
+    update_neighbors,
+    update_queued_neighbors,
+)
+from tests.conftest import FakeCollection
+
+NUM_BOOKS = 60
+TOP_N = 5
+
+
+@pytest.fixture
+def SessionLocal(make_sessionmaker):
+    SessionLocal = make_sessionmaker("neighbors.db")
+    with SessionLocal() as session:
+        session.add_all(Book(id=book_id, title=f"Book {book_id}", isbn13=f"978{book_id:010d}")
+                        for book_id in range(1, NUM_BOOKS + 1))
+        session.commit()
+    return SessionLocal
+
+def _matrix(seed=0, num_books=NUM_BOOKS):
+    rng = np.random.default_rng(seed)
+    return EmbeddingMatrix(np.arange(1, num_books + 1), normalize_rows(rng.normal(size=(num_books, 16))))
+
+def _table(session):
+    return {
+        (book_id, rank): (neighbor_id, round(score, 5))
+        for book_id, rank, neighbor_id, score in session.execute(
+            select(BookNeighbor.book_id, BookNeighbor.rank, BookNeighbor.neighbor_id, BookNeighbor.score)
+        )
+    }
+
+
+def test_blocked_top_neighbors_match_brute_force():
+    matrix = _matrix()
+    rows, neighbors, scores = top_neighbors(matrix, top_n=TOP_N, block_size=7)
+    similarity = matrix.vectors @ matrix.vectors.T
+    np.fill_diagonal(similarity, -np.inf)
+    expected = np.argsort(-similarity, axis=1, kind="stable")[:, :TOP_N]
+    assert (neighbors == expected).all()
+    assert np.allclose(scores, np.take_along_axis(similarity, expected, axis=1))
+    assert (rows == np.arange(NUM_BOOKS)).all()
+
+def test_top_n_is_capped_by_catalogue_size():
+    _, neighbors, _ = top_neighbors(_matrix(num_books=3), top_n=10)
+    assert neighbors.shape == (3, 2)
+
+def test_similar_books_is_a_key_lookup(SessionLocal):
+    matrix = _matrix()
+    with SessionLocal() as session:
+        compute_all_neighbors(session, matrix, top_n=TOP_N, block_size=16)
+        neighbors = similar_books(session, 1, limit=3)
+        _, expected, scores = top_neighbors(matrix, [0], top_n=3)
+        assert [book_id for book_id, _ in neighbors] == [int(matrix.book_ids[position]) for position in expected[0]]
+        assert [score for _, score in neighbors] == pytest.approx(scores[0].tolist())
+        assert similar_books(session, 999) == []
+
+def test_incremental_update_matches_full_recompute(SessionLocal):
+    matrix = _matrix()
+    with SessionLocal() as session:
+        compute_all_neighbors(session, matrix, top_n=TOP_N)
+
+        # Book 7 now looks like book 30 and book 12 is gone from the vector store
+        vectors = matrix.vectors.copy()
+        vectors[6] = normalize_rows([vectors[29] + 0.05])[0]
+        keep = np.arange(NUM_BOOKS) != 11
+        changed = EmbeddingMatrix(matrix.book_ids[keep], vectors[keep])
+        session.add_all([BookNeighborQueue(book_id=7), BookNeighborQueue(book_id=12)])
+        session.commit()
+
+        recomputed = update_queued_neighbors(session, changed, top_n=TOP_N)
+        incremental = _table(session)
+        assert 0 < recomputed < NUM_BOOKS
+        assert session.scalar(select(BookNeighborQueue.book_id)) is None
+
+        compute_all_neighbors(session, changed, top_n=TOP_N)
+        assert incremental == _table(session)
+        assert similar_books(session, 7, limit=1)[0][0] == 30
+
+def test_lists_stay_full_after_a_book_is_deleted(SessionLocal):
+    matrix = _matrix()
+    with SessionLocal() as session:
+        compute_all_neighbors(session, matrix, top_n=TOP_N)
+
+        # As on Postgres, deleting the book cascades to every list that named it
+        session.execute(text("PRAGMA foreign_keys=ON"))
+        session.execute(delete(Book).where(Book.id == 12))
+        session.add(BookNeighborQueue(book_id=12))
+        session.commit()
+        assert session.scalar(select(func.count()).where(BookNeighbor.neighbor_id == 12)) == 0
+
+        keep = np.arange(NUM_BOOKS) != 11
+        remaining = EmbeddingMatrix(matrix.book_ids[keep], matrix.vectors[keep])
+        update_queued_neighbors(session, remaining, top_n=TOP_N)
+        counts = dict(session.execute(
+            select(BookNeighbor.book_id, func.count()).group_by(BookNeighbor.book_id)
+        ).all())
+        assert len(counts) == NUM_BOOKS - 1
+        assert set(counts.values()) == {TOP_N}
+        incremental = _table(session)
+
+        compute_all_neighbors(session, remaining, top_n=TOP_N)
+        assert incremental == _table(session)
+
+def test_update_without_changes_is_a_no_op(SessionLocal):
+    with SessionLocal() as session:
+        assert update_neighbors(session, _matrix(), []) == 0
+
+
+def test_load_embedding_matrix_maps_vector_ids_to_books(SessionLocal):
+    ids = ["9780000000003", "book-5", "9789999999999", "9780000000001"]
+    embeddings = [[3.0, 4.0], [1.0, 0.0], [0.0, 1.0], [0.0, 2.0]]
+    with SessionLocal() as session:
+        matrix = load_embedding_matrix(session, FakeCollection(ids, embeddings), page_size=3)
+    assert matrix.book_ids.tolist() == [3, 5, 1]
+    assert np.allclose(matrix.vectors[0], [0.6, 0.8])
+    assert matrix.positions[1] == 2
@@ -0,0 +1,63 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from llm.onnx_embedder import SETTINGS_FILE, OnnxEmbedder, mean_pool
+
+BOOKS_CSV = os.path.join(os.path.dirname(__file__), "..", "books.csv")
+
+
+def test_mean_pool_ignores_padding():
+    tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+    pooled = mean_pool(tokens, np.array([[1, 1, 0]]))
+    assert np.allclose(pooled, [[1.0, 0.0]])
+    # An all-padding row does not divide by zero
+    assert np.all(np.isfinite(mean_pool(tokens, np.array([[0, 0, 0]]))))
+
+def test_an_export_of_another_model_is_refused(tmp_path):
+    with open(tmp_path / SETTINGS_FILE, "w") as file:
+        json.dump({"model_name": "sentence-transformers/all-mpnet-base-v2", "max_seq_length": 384,
+                   "dimension": 768}, file)
+    with pytest.raises(ValueError, match="all-mpnet-base-v2"):
+        OnnxEmbedder(str(tmp_path), model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    from app.config import EMBEDDING_MODEL
+    from llm.onnx_embedder import export_onnx
+
+    try:
+        reference = sentence_transformers.SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    except OSError as e:
+        pytest.skip(f"{EMBEDDING_MODEL} is not available: {e}")
+    path = str(tmp_path_factory.mktemp("onnx"))
+    export_onnx(path, EMBEDDING_MODEL, quantize=True)
+    return reference, path
+
+def _book_texts(count=64):
+    with open(BOOKS_CSV, newline="", encoding="utf-8") as file:
+        rows = [row for _, row in zip(range(count), csv.DictReader(file))]
+    # Short queries and long descriptions (past the 256 token limit) both have to agree
+    return [row["title"] for row in rows[:16]] + \
+        [f"{row['title']}; {row['authors']}; {row['categories']}; {row['description'] * 3}" for row in rows[16:]]
+
+@pytest.mark.parametrize("model_file, min_cosine", [("model.onnx", 0.999), ("model_quantized.onnx", 0.98)])
+def test_cosine_agreement_with_the_reference_encoder(exported, model_file, min_cosine):
+    from llm.onnx_embedder import OnnxEmbedder
+
+    reference, path = exported
+    embedder = OnnxEmbedder(path, model_file)
+    texts = _book_texts()
+    expected = reference.encode(texts, batch_size=16, normalize_embeddings=True)
+    actual = embedder.encode(texts, batch_size=16)
+    assert actual.shape == expected.shape
+    assert (actual * expected).sum(axis=1).min() >= min_cosine
+    assert embedder.encode(texts[0]) == pytest.approx(actual[0], abs=1e-5)
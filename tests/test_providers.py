@@ -0,0 +1,62 @@
+import json
+import time
+
+import numpy as np
+
+from app.config import EMBEDDING_MODEL, LLM_MODEL
+from llm.providers import FakeLLM, HashingEmbedder, get_llm, get_embedder
+
+
+def test_fake_llm_is_deterministic():
+    llm = FakeLLM(latency=0, tokens_per_second=0)
+    assert llm.invoke("Summarize this description") == llm.invoke("Summarize this description")
+    assert llm.invoke("Summarize this description") != llm.invoke("Summarize another description")
+
+
+def test_fake_llm_answers_classification_prompts():
+    llm = FakeLLM(latency=0, tokens_per_second=0)
+    response = llm.invoke("Intent Number: [1-6]\nEntity: [Entity Name]\n'Who wrote Gilead?'")
+    assert response == "Intent Number: 2\nEntity: gilead"
+
+    fused = json.loads(llm.invoke('{"intent_number": <1-7>}\n\'Summarize Gilead\''))
+    assert fused["intent_number"] == 3
+    assert fused["entity_name"] == "gilead"
+    assert fused["summary"]
+
+
+def test_fake_llm_latency_follows_token_rate():
+    llm = FakeLLM(latency=0.05, tokens_per_second=200, response_tokens=20)
+    start = time.perf_counter()
+    llm.invoke("Tell me something")
+    assert time.perf_counter() - start >= 0.05 + 20 / 200
+
+
+def test_fake_llm_streams_the_invoke_response():
+    llm = FakeLLM(latency=0, tokens_per_second=0, response_tokens=10)
+    assert "".join(llm.stream("Tell me something")) == llm.invoke("Tell me something")
+
+
+def test_hashing_embedder_shapes_and_normalization():
+    embedder = HashingEmbedder(dimension=64)
+    single = embedder.encode("a book about dragons")
+    batch = embedder.encode(["a book about dragons", "a cookbook"])
+    assert single.shape == (64,)
+    assert batch.shape == (2, 64)
+    assert np.allclose(batch[0], single)
+    assert np.isclose(np.linalg.norm(single), 1.0)
+
+
+def test_hashing_embedder_ranks_overlapping_text_higher():
+    embedder = HashingEmbedder()
+    query, near, far = embedder.encode(["dragons and wizards", "a story of dragons and wizards", "quarterly tax accounting"])
+    assert query @ near > query @ far
+
+
+def test_provider_accessors_select_fakes():
+    assert isinstance(get_llm("fake"), FakeLLM)
+    assert isinstance(get_embedder("hashing"), HashingEmbedder)
+    assert get_embedder("hashing") is get_embedder("hashing")
+
+def test_provider_accessors_share_instances_however_called():
+    assert get_llm("fake") is get_llm("fake", LLM_MODEL) is get_llm(provider="fake", model_name=LLM_MODEL)
+    assert get_embedder("hashing") is get_embedder("hashing", EMBEDDING_MODEL)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from llm.quantized_store import QuantizedCollection, quantize
+
+
+def clustered_vectors(count, dimension=64, clusters=20, seed=0):
+    # Unit vectors around a few centres, like embeddings of a catalogue with genres
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimension))
+    vectors = centres[rng.integers(clusters, size=count)] + 0.6 * rng.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def exact_top(vectors, query, n):
+    return list(np.argsort(((vectors - query) ** 2).sum(axis=1), kind="stable")[:n])
+
+def store(tmp_path, quantization="int8", vectors=None, **kwargs):
+    collection = QuantizedCollection(str(tmp_path / "store"), quantization, **kwargs)
+    if vectors is not None:
+        collection.upsert(ids=[f"book-{index}" for index in range(len(vectors))], embeddings=vectors,
+                          metadatas=[{"book_id": index} for index in range(len(vectors))])
+    return collection
+
+
+def test_int8_codes_stay_close_to_the_vectors():
+    vectors = clustered_vectors(100)
+    codes, scales = quantize(vectors, "int8")
+    assert codes.dtype == np.int8
+    assert np.abs(codes * scales[:, None] - vectors).max() <= scales.max() / 2 + 1e-6
+
+@pytest.mark.parametrize("quantization", ["int8", "float16", "float32"])
+def test_rescored_results_match_exact_search(tmp_path, quantization):
+    vectors = clustered_vectors(2000)
+    collection = store(tmp_path, quantization, vectors)
+    queries = clustered_vectors(20, seed=1)
+    results = collection.query(query_embeddings=queries, n_results=10, include=["metadatas", "distances"])
+    recall = np.mean([len({metadata["book_id"] for metadata in metadatas} & set(exact_top(vectors, query, 10))) / 10
+                      for query, metadatas in zip(queries, results["metadatas"])])
+    assert recall >= 0.99
+    # Distances are exact squared L2 after rescoring
+    best = exact_top(vectors, queries[0], 1)[0]
+    assert results["distances"][0][0] == pytest.approx(float(((vectors[best] - queries[0]) ** 2).sum()), abs=1e-5)
+
+def test_upserts_replace_and_deletes_hide_vectors(tmp_path):
+    vectors = clustered_vectors(50)
+    collection = store(tmp_path, "int8", vectors)
+    collection.upsert(ids=["book-3"], embeddings=[vectors[7]], metadatas=[{"book_id": 3, "genre_id": 2}])
+    collection.delete(ids=["book-7"])
+
+    assert collection.count() == 49
+    hits = collection.query(query_embeddings=[vectors[7]], n_results=2, include=["metadatas"])
+    assert hits["ids"][0][0] == "book-3"
+    assert "book-7" not in hits["ids"][0]
+    got = collection.get(ids=["book-3", "book-7"], include=["embeddings", "metadatas"])
+    assert got["ids"] == ["book-3"]
+    # get returns the full-precision vector, not the codes
+    assert np.array_equal(got["embeddings"][0], vectors[7])
+    assert got["metadatas"] == [{"book_id": 3, "genre_id": 2}]
+    assert len(collection.get(include=[], limit=10, offset=45)["ids"]) == 4
+
+def test_writes_are_seen_by_other_instances_and_survive_reopening(tmp_path):
+    vectors = clustered_vectors(30)
+    writer = store(tmp_path, "int8", vectors[:20])
+    reader = store(tmp_path, "int8")
+    assert reader.count() == 20
+    writer.upsert(ids=[f"book-{index}" for index in range(20, 30)], embeddings=vectors[20:])
+    writer.delete(ids=["book-0"])
+    assert reader.count() == 29
+    assert reader.query(query_embeddings=[vectors[25]], n_results=1)["ids"] == [["book-25"]]
+
+    assert store(tmp_path, "int8").count() == 29
+    with pytest.raises(ValueError):
+        store(tmp_path, "float16")
+    with pytest.raises(ValueError):
+        writer.upsert(ids=["wrong"], embeddings=[[0.0] * 8])
+
+def test_empty_store(tmp_path):
+    collection = store(tmp_path)
+    assert collection.count() == 0
+    assert collection.query(query_embeddings=[[0.1] * 8], n_results=5) == {"ids": [[]], "metadatas": [[]], "distances": [[]]}
+
+@pytest.mark.parametrize("quantization", ["int8", "float32"])
+def test_compaction_drops_dead_rows_for_every_instance(tmp_path, quantization):
+    vectors = clustered_vectors(60)
+    collection = store(tmp_path, quantization, vectors[:50])
+    other = store(tmp_path, quantization)
+    collection.upsert(ids=[f"book-{index}" for index in range(10)], embeddings=vectors[50:],
+                      metadatas=[{"book_id": index, "edition": 2} for index in range(10)])
+    collection.delete(ids=["book-20"])
+    queries = clustered_vectors(5, seed=1)
+    expected = other.query(query_embeddings=queries, n_results=5, include=["metadatas", "distances"])
+    assert other.stats()["dead_rows"] == 11
+
+    stats = collection.compact()
+    assert stats["after"] == {"rows": 49, "live_rows": 49, "dead_rows": 0,
+                              "disk_bytes": stats["after"]["disk_bytes"]}
+    assert stats["after"]["disk_bytes"] < stats["before"]["disk_bytes"]
+    assert not (tmp_path / "store" / "vectors.f32").exists()
+    # The other instance reloads the compacted files and answers the same
+    for instance in (other, collection, store(tmp_path, quantization)):
+        assert instance.query(query_embeddings=queries, n_results=5, include=["metadatas", "distances"]) == expected
+        assert np.array_equal(instance.get(ids=["book-3"], include=["embeddings"])["embeddings"][0], vectors[53])
+
+    # Writes after a compaction append to the new generation
+    other.upsert(ids=["book-20"], embeddings=[vectors[20]], metadatas=[{"book_id": 20}])
+    assert collection.count() == 50
+    assert collection.query(query_embeddings=[vectors[20]], n_results=1)["ids"] == [["book-20"]]
+    assert collection.compact()["after"]["rows"] == 50
+    assert store(tmp_path, quantization).get(ids=["book-20"], include=["metadatas"])["metadatas"] == [{"book_id": 20}]
+
+def test_compacting_an_empty_store(tmp_path):
+    assert store(tmp_path).compact()["after"]["rows"] == 0
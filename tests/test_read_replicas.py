@@ -0,0 +1,133 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine, select, update, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database.routing import ReplicaSet, RoutingSession, RecentWrites, use_primary
+from app.database.schemas.books import Book
+from app.database.schemas.user import User
+from app.services.book_services import add_to_favourites
+from app.utils.hash import deterministic_hash
+
+
+def _database(make_engine, name, title):
+    # Primary and replica hold different titles so each test can tell which one answered
+    engine = make_engine(name)
+    with sessionmaker(bind=engine)() as session:
+        session.add(Book(id=1, title=title, genre="Fantasy", published_year=1968, average_rating=4.0,
+                         num_pages=200, ratings_count=10))
+        session.add(User(email="reader@example.com", fname="Ged", lname="Sparrowhawk",
+                         hashed_pw=deterministic_hash("secret"), role=0))
+        session.commit()
+    return engine
+
+
+@pytest.fixture
+def cluster(make_engine):
+    primary = _database(make_engine, "primary.db", "primary")
+    replicas = [_database(make_engine, f"replica{index}.db", f"replica{index}") for index in range(2)]
+    replica_set = ReplicaSet(primary, replicas, health_interval=0)
+    SessionLocal = sessionmaker(bind=primary, class_=RoutingSession, replica_set=replica_set)
+    return replica_set, SessionLocal
+
+
+def _title(session):
+    return session.scalar(select(Book.title).where(Book.id == 1))
+
+
+def test_reads_are_spread_over_replicas(cluster):
+    _, SessionLocal = cluster
+    titles = set()
+    for _ in range(4):
+        with SessionLocal() as session:
+            titles.add(_title(session))
+    assert titles == {"replica0", "replica1"}
+
+
+def test_a_session_reads_from_one_replica(cluster):
+    _, SessionLocal = cluster
+    with SessionLocal() as session:
+        titles = {_title(session) for _ in range(4)}
+        session.commit()
+        titles.add(_title(session))
+    assert len(titles) == 1
+
+def test_a_session_leaves_its_replica_when_it_goes_down(cluster):
+    replica_set, SessionLocal = cluster
+    with SessionLocal() as session:
+        first = _title(session)
+        replica_set.health[int(first[-1])] = False
+        assert _title(session) not in (first, "primary")
+
+
+def test_writes_go_to_primary_and_pin_the_session(cluster):
+    _, SessionLocal = cluster
+    with SessionLocal() as session:
+        assert _title(session).startswith("replica")
+        session.execute(update(Book).where(Book.id == 1).values(title="primary, edited"))
+        # Read-your-writes: the rest of the session stays on the primary
+        assert _title(session) == "primary, edited"
+        session.commit()
+        assert _title(session) == "primary, edited"
+
+
+def test_orm_flush_goes_to_primary(cluster):
+    replica_set, SessionLocal = cluster
+    with SessionLocal() as session:
+        use_primary(session)
+        success, _ = add_to_favourites(session, "reader@example.com", 1)
+        assert success
+    with replica_set.primary.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM favorite_books")).scalar() == 1
+    for replica in replica_set.replicas:
+        with replica.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM favorite_books")).scalar() == 0
+
+
+def test_unhealthy_replicas_fail_over(cluster, tmp_path):
+    replica_set, SessionLocal = cluster
+    replica_set.health[0] = False
+    with SessionLocal() as session:
+        assert {_title(session) for _ in range(3)} == {"replica1"}
+
+    replica_set.health[1] = False
+    with SessionLocal() as session:
+        assert _title(session) == "primary"
+
+
+def test_health_check_detects_unreachable_replica(make_engine, tmp_path):
+    primary = _database(make_engine, "primary.db", "primary")
+    healthy = _database(make_engine, "replica.db", "replica")
+    # A directory cannot be opened as a database file
+    (tmp_path / "missing").mkdir()
+    unreachable = create_engine(f"sqlite:///{tmp_path / 'missing'}")
+    replica_set = ReplicaSet(primary, [unreachable, healthy], health_interval=0)
+
+    replica_set.check()
+    assert replica_set.health == [False, True]
+    assert all(replica_set.choose() is healthy for _ in range(3))
+
+
+def test_disconnect_marks_replica_down(cluster):
+    replica_set, SessionLocal = cluster
+    replica = replica_set.replicas[0]
+    # Any driver error the dialect classifies as a dropped connection
+    replica.dialect.is_disconnect = lambda *args, **kwargs: True
+    with pytest.raises(OperationalError):
+        with replica.connect() as conn:
+            conn.execute(text("SELECT * FROM missing_table"))
+    assert replica_set.health[0] is False
+    with SessionLocal() as session:
+        assert {_title(session) for _ in range(3)} == {"replica1"}
+
+
+def test_recent_writes_expire():
+    writes = RecentWrites(window=0.05)
+    writes.record("reader@example.com")
+    assert writes.active("reader@example.com")
+    assert not writes.active("other@example.com")
+    assert not writes.active(None)
+    time.sleep(0.06)
+    assert not writes.active("reader@example.com")
@@ -0,0 +1,129 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import anyio
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from sqlalchemy import create_engine, select, text
+
+from app.database.schemas.logs import RequestLog, RequestLogMinute
+from app.database.request_log_partitions import (
+    DEFAULT_PARTITION,
+    create_partitioned_request_logs,
+    maintain_request_logs,
+    partition_name,
+)
+from app.middleware.request_logger import RequestLogWriter, RequestLoggerMiddleware
+
+
+@pytest.fixture
+def engine(make_engine):
+    return make_engine("logs.db")
+
+
+def make_app(writer, **options):
+    web = FastAPI()
+    web.add_middleware(RequestLoggerMiddleware, writer=writer, **options)
+
+    @web.post("/users/login")
+    async def login(request: Request):
+        await request.json()
+        return {"ok": True}
+
+    @web.get("/books/{book_id}")
+    def book(book_id: int):
+        return {"id": book_id}
+
+    return web
+
+
+def send(web, requests):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=web), base_url="http://test") as client:
+            for method, path, payload in requests:
+                await client.request(method, path, json=payload)
+    anyio.run(run)
+
+
+def test_rows_get_their_own_timestamps_and_redacted_truncated_bodies(engine):
+    writer = RequestLogWriter(engine=engine)
+    web = make_app(writer, body_mode="truncate", body_max_bytes=60)
+    send(web, [("POST", "/users/login", {"email": "reader@example.com", "password": "hunter2"}), ("GET", "/books/1", None)])
+    writer.close()
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(RequestLog).order_by(RequestLog.id)).all()
+    assert [row.endpoint for row in rows] == ["/users/login", "/books/1"]
+    assert rows[0].timestamp != rows[1].timestamp
+    assert "hunter2" not in rows[0].request_body
+    assert len(rows[0].request_body) <= 60 + len("[REDACTED]")
+    assert rows[1].request_body is None
+    assert rows[1].status_code == 200
+
+
+def test_body_capture_off_and_sampled(engine):
+    writer = RequestLogWriter(engine=engine)
+    send(make_app(writer, body_mode="off"), [("POST", "/users/login", {"email": "a@b.c"})])
+    send(make_app(writer, body_mode="sample", body_sample_rate=0.0), [("POST", "/users/login", {"email": "a@b.c"})])
+    writer.close()
+    with engine.connect() as conn:
+        assert conn.execute(select(RequestLog.request_body)).scalars().all() == [None, None]
+
+
+def test_minute_aggregates_are_rolled_up_by_route_template(engine):
+    writer = RequestLogWriter(engine=engine, batch_size=2)
+    web = make_app(writer, body_mode="off")
+    send(web, [("GET", f"/books/{book_id}", None) for book_id in range(5)])
+    writer.close()
+
+    with engine.connect() as conn:
+        aggregates = conn.execute(select(RequestLogMinute)).all()
+    assert sum(row.request_count for row in aggregates) == 5
+    assert {row.endpoint for row in aggregates} == {"/books/{book_id}"}
+    assert all(row.max_duration_ms <= row.total_duration_ms for row in aggregates)
+
+
+def test_retention_removes_expired_rows_and_aggregates(engine):
+    now = datetime(2026, 3, 20, 12, 0, tzinfo=timezone.utc)
+    writer = RequestLogWriter(engine=engine)
+    for age_days in (0, 30):
+        writer.write_batch([{
+            "endpoint": "/books", "route": "/books", "method": "GET", "status_code": 200,
+            "duration_ms": 1.0, "request_body": None, "timestamp": now - timedelta(days=age_days),
+        }])
+
+    summary = maintain_request_logs(engine, now=now, retention_days=14, aggregate_retention_days=7)
+    assert summary["deleted_rows"] == 1
+    assert summary["deleted_aggregates"] == 1
+    with engine.connect() as conn:
+        assert len(conn.execute(select(RequestLog)).all()) == 1
+
+
+def test_partition_names_sort_by_day():
+    assert partition_name(datetime(2026, 1, 2).date()) == "request_logs_p20260102"
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs a scratch Postgres database (TEST_POSTGRES_URL)")
+def test_late_partitions_take_over_rows_from_the_default_partition():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    now = datetime(2026, 3, 20, 12, 0, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS request_logs CASCADE"))
+        create_partitioned_request_logs(conn)
+        RequestLogMinute.__table__.create(bind=conn, checkfirst=True)
+        # The job fell behind: today's row and an expired one landed in the default partition
+        for age_days in (0, 30):
+            conn.execute(text(
+                "INSERT INTO request_logs (endpoint, method, status_code, duration_ms, timestamp) "
+                "VALUES ('/books', 'GET', 200, 1.0, :timestamp)"
+            ), {"timestamp": now - timedelta(days=age_days)})
+
+    summary = maintain_request_logs(engine, now=now, retention_days=14, days_ahead=1)
+    assert partition_name(now.date()) in summary["created"]
+    assert summary["deleted_rows"] == 1
+    with engine.begin() as conn:
+        assert conn.execute(text(f"SELECT count(*) FROM {partition_name(now.date())}")).scalar() == 1
+        assert conn.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar() == 0
+        conn.execute(text("DROP TABLE request_logs CASCADE"))
+    engine.dispose()
@@ -0,0 +1,18 @@
+import logging
+
+from server import startup_imports, timed_imports
+
+
+def test_startup_imports_follow_the_configured_providers():
+    default = startup_imports("ollama", "sentence_transformers", "chroma")
+    assert default[:3] == ["sentence_transformers", "chromadb", "langchain_ollama"]
+    slim = startup_imports("fake", "onnx", "quantized")
+    assert not {"sentence_transformers", "chromadb", "langchain_ollama", "pandas"} & set(slim)
+    assert slim[:2] == ["onnxruntime", "tokenizers"]
+    assert slim[-1] == "api"
+
+def test_missing_modules_are_skipped_with_a_warning(caplog):
+    with caplog.at_level(logging.WARNING, logger="server"):
+        timings = timed_imports(["json", "bookapp_not_installed", "csv"])
+    assert [module for module, _ in timings] == ["json", "csv"]
+    assert caplog.records[0].missing == "bookapp_not_installed"
@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+from app.database.schemas.books import Book
+from app.database.schemas.preferences import Preferences
+from app.database.schemas.user import User
+from app.database.schemas.user_taste import UserTaste
+from llm.taste import TasteProfiles
+from tests.conftest import FakeVectorManager
+
+EMAIL = "reader@example.com"
+BOOKS = [
+    (1, "9780000000001", "Dune", "desert planet spice sand worms"),
+    (2, "9780000000002", "Children of Dune", "desert planet spice emperor twins"),
+    (3, None, "Dune Messiah", "desert planet spice prophet"),
+    (4, "9780000000004", "The Hobbit", "hobbit dwarves dragon mountain"),
+    (5, "9780000000005", "The Silmarillion", "elves jewels dragon ages"),
+]
+
+
+def _vector_manager():
+    # Slim payloads name their book; the vector without an isbn is an older one without book_id
+    return FakeVectorManager(ids=[isbn or f"book-{book_id}" for book_id, isbn, *_ in BOOKS],
+                             texts=[description for *_, description in BOOKS],
+                             metadatas=[{"book_id": book_id} if isbn else {} for book_id, isbn, *_ in BOOKS])
+
+
+@pytest.fixture
+def SessionLocal(make_sessionmaker):
+    SessionLocal = make_sessionmaker("taste.db")
+    with SessionLocal() as session:
+        session.add_all(Book(id=book_id, isbn13=isbn, title=title, description=description)
+                        for book_id, isbn, title, description in BOOKS)
+        session.add(User(email=EMAIL, fname="Reader", hashed_pw="x", role=0))
+        session.commit()
+    return SessionLocal
+
+def _favorite(session, book_id, added=True):
+    user = session.get(User, EMAIL)
+    book = session.get(Book, book_id)
+    if added:
+        user.favorite_books.append(book)
+    else:
+        user.favorite_books.remove(book)
+    session.commit()
+
+def _titles(books):
+    return [book["title"] for book in books]
+
+
+def test_no_signal_means_no_recommendations(SessionLocal):
+    manager = _vector_manager()
+    with SessionLocal() as session:
+        success, _, books = TasteProfiles(manager).recommend(session, EMAIL)
+    assert success and books == []
+    assert manager.queries == 0
+
+def test_favorites_are_excluded_and_similar_books_lead(SessionLocal):
+    manager = _vector_manager()
+    profiles = TasteProfiles(manager)
+    with SessionLocal() as session:
+        _favorite(session, 1)
+        profiles.apply_favorite(session, EMAIL, 1, added=True)
+        _, _, books = profiles.recommend(session, EMAIL, limit=2)
+    assert "Dune" not in _titles(books)
+    assert set(_titles(books)) == {"Children of Dune", "Dune Messiah"}
+    assert manager.queries == 1
+
+def test_incremental_updates_match_a_rebuild(SessionLocal):
+    manager = _vector_manager()
+    profiles = TasteProfiles(manager, cache_size=0)
+    with SessionLocal() as session:
+        for book_id in (1, 3, 4):
+            _favorite(session, book_id)
+            profiles.apply_favorite(session, EMAIL, book_id, added=True)
+        _favorite(session, 1, added=False)
+        profiles.apply_favorite(session, EMAIL, 1, added=False)
+        total, count = profiles.favorites(session, EMAIL)
+        rebuilt, rebuilt_count = profiles.rebuild(session, EMAIL)
+    assert count == rebuilt_count == 2
+    assert np.allclose(total, rebuilt, atol=1e-5)
+    assert np.allclose(total, manager.vectors[2] + manager.vectors[3], atol=1e-5)
+
+def test_repeated_and_reordered_updates_are_idempotent(SessionLocal):
+    manager = _vector_manager()
+    profiles = TasteProfiles(manager, cache_size=0)
+    with SessionLocal() as session:
+        _favorite(session, 1)
+        profiles.apply_favorite(session, EMAIL, 1, added=True)
+        # A rebuild that already saw book 4, then the background update for it, twice
+        _favorite(session, 4)
+        profiles.rebuild(session, EMAIL)
+        profiles.apply_favorite(session, EMAIL, 4, added=True)
+        profiles.apply_favorite(session, EMAIL, 4, added=True)
+        # Book 5 added then removed before either update runs; the updates arrive out of order
+        _favorite(session, 5)
+        _favorite(session, 5, added=False)
+        profiles.apply_favorite(session, EMAIL, 5, added=False)
+        profiles.apply_favorite(session, EMAIL, 5, added=True)
+        total, count = profiles.favorites(session, EMAIL)
+    assert count == 2
+    assert np.allclose(total, manager.vectors[0] + manager.vectors[3], atol=1e-5)
+
+def test_removing_a_re_embedded_book_leaves_no_residue(SessionLocal):
+    manager = _vector_manager()
+    profiles = TasteProfiles(manager, cache_size=0)
+    with SessionLocal() as session:
+        for book_id in (1, 4):
+            _favorite(session, book_id)
+            profiles.apply_favorite(session, EMAIL, book_id, added=True)
+        manager.collection.upsert(ids=["9780000000001"], embeddings=manager.model.encode(["a new description"]))
+        _favorite(session, 1, added=False)
+        profiles.apply_favorite(session, EMAIL, 1, added=False)
+        total, count = profiles.favorites(session, EMAIL)
+    assert count == 1
+    assert np.array_equal(total, manager.vectors[3])
+
+def test_preferences_blend_into_the_taste_vector(SessionLocal):
+    manager = _vector_manager()
+    with SessionLocal() as session:
+        session.add(Preferences(email=EMAIL, preference="hobbit dwarves dragon mountain"))
+        session.commit()
+        _, _, books = TasteProfiles(manager).recommend(session, EMAIL, limit=1)
+        assert _titles(books) == ["The Hobbit"]
+
+        _favorite(session, 1)
+        TasteProfiles(manager).apply_favorite(session, EMAIL, 1, added=True)
+        only_preferences = TasteProfiles(manager, preference_weight=1.0).taste_vector(session, EMAIL)
+        blended = TasteProfiles(manager, preference_weight=0.3).taste_vector(session, EMAIL)
+    hobbit, dune = manager.vectors[3], manager.vectors[0]
+    assert np.allclose(only_preferences, hobbit / np.linalg.norm(hobbit), atol=1e-5)
+    assert blended @ dune > blended @ hobbit
+
+def test_cached_sums_skip_the_database(SessionLocal):
+    manager = _vector_manager()
+    profiles = TasteProfiles(manager, cache_ttl=3600)
+    with SessionLocal() as session:
+        _favorite(session, 4)
+        profiles.favorites(session, EMAIL)
+        session.query(UserTaste).delete()
+        session.commit()
+        _, count = profiles.favorites(session, EMAIL)
+    assert count == 1
+
+def test_concurrent_first_builds_update_one_row(SessionLocal, monkeypatch):
+    manager = _vector_manager()
+    with SessionLocal() as session:
+        _favorite(session, 1)
+        TasteProfiles(manager).favorites(session, EMAIL)
+    with SessionLocal() as session:
+        _favorite(session, 4)
+        # Both builds found no row; the other one has committed its row since
+        monkeypatch.setattr(session, "get", lambda *args, **kwargs: None)
+        _, count = TasteProfiles(manager).favorites(session, EMAIL)
+    assert count == 2
+    with SessionLocal() as session:
+        assert session.get(UserTaste, EMAIL).favorites_count == 2
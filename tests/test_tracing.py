@@ -0,0 +1,109 @@
+from sqlalchemy import create_engine, text
+
+from app.utils import tracing
+from app.utils.metrics import CHAT_NODE_DURATION, Histogram, render_metrics
+from app.utils.tracing import span
+from llm.latency import TracedWorkflow, traced_node, intent_latency_snapshot
+import app.database.connector  # noqa: F401  registers the db.query span listeners
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, finished_span):
+        self.spans.append(finished_span)
+
+
+class StandInGraph:
+    # Runs two traced nodes in sequence the way the compiled LangGraph workflow would
+    def __init__(self):
+        self.classify = traced_node("classify_input", lambda state: {**state, "intent_number": 2})
+        self.answer = traced_node("get_author_name", lambda state: {**state, "response": "Jane Austen"})
+
+    def invoke(self, state):
+        return self.answer(self.classify(state))
+
+
+def collect_spans():
+    exporter = CollectingExporter()
+    tracing.set_exporter(exporter)
+    return exporter
+
+
+def test_child_spans_share_trace_and_parent():
+    exporter = collect_spans()
+    try:
+        with span("outer") as outer:
+            with span("inner", step=1):
+                pass
+    finally:
+        tracing.set_exporter(None)
+    inner, finished_outer = exporter.spans
+    assert finished_outer is outer
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_span_id == outer.span_id
+    assert inner.attributes == {"step": 1}
+
+
+def test_workflow_records_node_spans_and_intent_histogram():
+    exporter = collect_spans()
+    try:
+        result = TracedWorkflow(StandInGraph()).invoke({"question": "Who wrote Emma?"})
+    finally:
+        tracing.set_exporter(None)
+    assert result["response"] == "Jane Austen"
+    names = [finished.name for finished in exporter.spans]
+    assert names == ["langgraph.node.classify_input", "langgraph.node.get_author_name", "langgraph.workflow"]
+    snapshot = intent_latency_snapshot()["get_author_name"]
+    assert snapshot["total"]["count"] >= 1
+    assert snapshot["total"]["buckets"][0]["le"] == 5
+    assert set(snapshot["nodes"]) == {"classify_input", "get_author_name"}
+    # The same series are exported on /metrics
+    assert CHAT_NODE_DURATION.count(intent="get_author_name", node="classify_input") >= 1
+    assert 'chat_workflow_duration_seconds_count{intent="get_author_name"}' in render_metrics()
+
+
+def test_db_queries_inside_a_span_are_traced():
+    engine = create_engine("sqlite://")
+    exporter = collect_spans()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            with span("request"):
+                connection.execute(text("SELECT 2"))
+    finally:
+        tracing.set_exporter(None)
+    query_spans = [finished for finished in exporter.spans if finished.name == "db.query"]
+    assert len(query_spans) == 1
+    assert query_spans[0].attributes["db.statement"] == "SELECT 2"
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = Histogram("demo_chat_seconds", "Demo chat latency", ("intent",))
+    for value in [0.003] * 90 + [0.4] * 9 + [100]:
+        histogram.observe(value, intent="demo")
+    assert histogram.quantile(0.5, intent="demo") == 0.005
+    assert histogram.quantile(0.95, intent="demo") == 0.5
+    assert histogram.quantile(1.0, intent="demo") == 60
+    assert histogram.quantile(0.5, intent="other") == 0.0
+
+
+def test_spans_inside_llm_calls_belong_to_the_request_trace():
+    from llm.scheduler import LLMScheduler
+    exporter = collect_spans()
+    scheduler = LLMScheduler(max_concurrency=1)
+
+    def call_llm():
+        with span("ollama.generate"):
+            return "answer"
+
+    try:
+        with span("http.request") as request:
+            assert scheduler.run(call_llm) == "answer"
+    finally:
+        tracing.set_exporter(None)
+    generate, llm_call, _ = exporter.spans
+    assert generate.name == "ollama.generate" and llm_call.name == "llm.call"
+    assert generate.trace_id == request.trace_id
+    assert generate.parent_span_id == llm_call.span_id
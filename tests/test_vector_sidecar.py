@@ -0,0 +1,141 @@
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from llm.providers import HashingEmbedder
+from llm.vector_data_manager import VectorDataManager
+from llm.vector_sidecar import SidecarClient, SidecarUnavailable, VectorSidecar, parse_address, sidecar_vector_manager
+from tests.conftest import FakeCollection
+
+TEXTS = ["a quiet novel about a lighthouse", "space opera with rival empires", "a cookbook of winter soups"]
+
+
+@pytest.fixture
+def sidecar(tmp_path):
+    model = HashingEmbedder(dimension=32)
+    collection = FakeCollection()
+    collection.upsert(ids=[f"book-{index}" for index in range(len(TEXTS))], embeddings=model.encode(TEXTS),
+                      metadatas=[{"book_id": index} for index in range(len(TEXTS))])
+    sidecar = VectorSidecar(VectorDataManager(model=model, collection=collection, batch_queries=False),
+                            address=str(tmp_path / "vectors.sock"), authkey="test")
+    sidecar.start()
+    yield sidecar
+    sidecar.close()
+
+
+def test_worker_queries_through_the_sidecar(sidecar):
+    manager = sidecar_vector_manager(sidecar.address, "test")
+    vector = manager.embed_query(TEXTS[1])
+    assert np.allclose(vector, sidecar.manager.model.encode(TEXTS[1]))
+    assert manager.model.get_sentence_embedding_dimension() == 32
+
+    results = manager.query_collection("test", vector, 2)
+    assert results["ids"][0][0] == "book-1"
+    assert results["metadatas"][0][0] == {"book_id": 1}
+
+def test_upserts_are_visible_to_every_worker(sidecar):
+    writer = sidecar_vector_manager(sidecar.address, "test")
+    reader = sidecar_vector_manager(sidecar.address, "test")
+    writer.collection.upsert(ids=["book-9"], embeddings=writer.model.encode(["a heist thriller"]).tolist(),
+                             metadatas=[{"book_id": 9}])
+    assert reader.collection.count() == 4
+    assert reader.collection.get(ids=["book-9"], include=["metadatas"])["metadatas"] == [{"book_id": 9}]
+
+def test_errors_are_raised_in_the_worker(sidecar):
+    client = SidecarClient(sidecar.address, "test")
+    with pytest.raises(ValueError):
+        client.call("shutdown")
+    # The connection is still usable afterwards
+    assert client.call("ping") == "pong"
+
+def test_falls_back_to_in_process(sidecar, tmp_path):
+    assert sidecar_vector_manager(str(tmp_path / "missing.sock"), "test") is None
+    assert sidecar_vector_manager(sidecar.address, "wrong key") is None
+
+    local = HashingEmbedder(dimension=32)
+    manager = sidecar_vector_manager(sidecar.address, "test")
+    manager.model.fallback = lambda: local
+    sidecar.close()
+    # The pooled connection is gone and no new one can be made
+    assert np.allclose(manager.model.encode(TEXTS[0]), local.encode(TEXTS[0]))
+    assert manager.model.local is local
+
+def test_sidecar_is_tried_again_after_a_fallback(sidecar):
+    local = HashingEmbedder(dimension=32)
+    manager = sidecar_vector_manager(sidecar.address, "test")
+    manager.model.fallback = lambda: local
+    manager.model.retry_interval = 0.2
+    sidecar.close()
+    assert manager.model.get_sentence_embedding_dimension() == 32
+
+    restarted = VectorSidecar(VectorDataManager(model=HashingEmbedder(dimension=16), collection=FakeCollection(),
+                                                batch_queries=False), address=sidecar.address, authkey="test")
+    restarted.start()
+    try:
+        # The in-process model answers until the retry interval has passed
+        assert manager.model.get_sentence_embedding_dimension() == 32
+        time.sleep(0.25)
+        assert manager.model.get_sentence_embedding_dimension() == 16
+        assert manager.model.encode(TEXTS[0]).shape == (16,)
+    finally:
+        restarted.close()
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_pooled_connections_survive_a_sidecar_restart():
+    # Over TCP the send on a connection the old sidecar closed succeeds, and the EOF only shows up
+    # when the answer is read
+    address = f"127.0.0.1:{_free_port()}"
+    sidecar = VectorSidecar(VectorDataManager(model=HashingEmbedder(dimension=32), collection=FakeCollection(),
+                                              batch_queries=False), address=address, authkey="test")
+    sidecar.start()
+    manager = sidecar_vector_manager(address, "test")
+    manager.model.fallback = lambda: pytest.fail("fell back to in-process")
+    assert manager.model.get_sentence_embedding_dimension() == 32
+    sidecar.close()
+
+    restarted = VectorSidecar(VectorDataManager(model=HashingEmbedder(dimension=16), collection=FakeCollection(),
+                                                batch_queries=False), address=address, authkey="test")
+    restarted.start()
+    try:
+        assert manager.model.get_sentence_embedding_dimension() == 16
+        assert manager.model.local is None
+    finally:
+        restarted.close()
+
+def test_writes_do_not_fall_back(sidecar):
+    local = FakeCollection()
+    manager = sidecar_vector_manager(sidecar.address, "test")
+    manager.collection.fallback = lambda: local
+    sidecar.close()
+    assert manager.collection.count() == 0
+    with pytest.raises(SidecarUnavailable):
+        manager.collection.upsert(ids=["book-9"], embeddings=[[0.0] * 32], metadatas=[{"book_id": 9}])
+    with pytest.raises(SidecarUnavailable):
+        manager.collection.delete(ids=["book-0"])
+    assert local.count() == 0
+
+def test_authkey_must_be_set(tmp_path):
+    address = str(tmp_path / "vectors.sock")
+    with pytest.raises(ValueError):
+        VectorSidecar(None, address=address, authkey="")
+    with pytest.raises(ValueError):
+        SidecarClient(address, "")
+
+def test_tcp_is_loopback_only():
+    assert parse_address("127.0.0.1:7000") == ("127.0.0.1", 7000)
+    assert parse_address("localhost:7000") == ("localhost", 7000)
+    assert parse_address("/run/bookapp/vectors.sock") == "/run/bookapp/vectors.sock"
+    for address in ("0.0.0.0:7000", "10.0.0.5:7000", "vectors.internal:7000"):
+        with pytest.raises(ValueError):
+            parse_address(address)
+
+def test_no_fallback_raises(tmp_path):
+    client = SidecarClient(str(tmp_path / "missing.sock"), "test")
+    with pytest.raises(SidecarUnavailable):
+        client.call("ping")